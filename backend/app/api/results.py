@@ -1,22 +1,156 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from app.db.session import get_db
+import csv
+import io
+import json
+import uuid
+from datetime import datetime
+
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, WebSocket, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import case, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Union
+from app.db.session import get_db, new_session
 from app.db import models, schemas
-from app.api.v1.users import get_current_user
+from app.api.v1.users import get_current_user, get_token_principal, token_user_id
+from app.core.principals import Principal, TokenPrincipal
+from app.core.analytics import record_result, summarize
+from app.core.bulk_results import import_results
+from app.core.grading import answer_key_for, cached_answer_key, grade_submission, needs_embeddings, regrade_quiz
+from app.core.live_results import live_results, load_subscription
+from app.core.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, keyset_paginate, page_from_rows
+from app.core.config import settings
+from app.core.serialization import compile_serializer, json_response, loads
 
 router = APIRouter(
     prefix="/results",
     tags=["Results"]
 )
 
+EXPORT_BATCH_SIZE = 1000
+
+# ---------- Helpers ----------
+
+_SUMMARY_COLUMNS = (
+    models.QuizResult.id,
+    models.QuizResult.quiz_id,
+    models.QuizResult.student_id,
+    models.QuizResult.student_name,
+    models.QuizResult.student_number,
+    models.QuizResult.score,
+    models.QuizResult.total_questions,
+    models.QuizResult.time_spent,
+    models.QuizResult.completed_at,
+)
+
+_EXPORT_COLUMNS = (
+    models.QuizResult.id,
+    models.QuizResult.quiz_id,
+    models.Quiz.title.label("quiz_title"),
+    models.QuizResult.student_id,
+    models.QuizResult.student_name,
+    models.QuizResult.student_number,
+    models.QuizResult.score,
+    models.QuizResult.total_questions,
+    models.QuizResult.time_spent,
+    models.QuizResult.completed_at,
+    models.QuizResult.answers,
+)
+_EXPORT_FIELDS = [column.key for column in _EXPORT_COLUMNS]
+
+_serialize_result = compile_serializer(schemas.QuizResultOut)
+_serialize_summary = compile_serializer(schemas.QuizResultSummaryOut)
+
+
+async def _list_result_summaries(db: AsyncSession, filters: list, cursor: Optional[str], limit: int, join_quiz: bool = False) -> dict:
+    """One keyset page of result summaries (the `answers` column is not read), ready to encode."""
+    stmt = select(*_SUMMARY_COLUMNS)
+    if join_quiz:
+        stmt = stmt.join(models.Quiz, models.Quiz.id == models.QuizResult.quiz_id)
+    try:
+        stmt = keyset_paginate(
+            stmt.where(*filters),
+            models.QuizResult.completed_at, models.QuizResult.id, cursor, limit
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    rows = (await db.execute(stmt)).all()
+    items, next_cursor = page_from_rows(rows, limit, created_at_attr="completed_at")
+    return {"items": [_serialize_summary(row) for row in items], "next_cursor": next_cursor}
+
+
+def _json_default(value):
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+def _ndjson_lines(rows) -> str:
+    return "".join(json.dumps(dict(row._mapping), default=_json_default) + "\n" for row in rows)
+
+
+def _csv_header() -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(_EXPORT_FIELDS)
+    return buffer.getvalue()
+
+
+def _csv_lines(rows) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        values = list(row)
+        values[-1] = json.dumps(values[-1])  # answers as a JSON cell
+        writer.writerow(values)
+    return buffer.getvalue()
+
+def _too_many_results() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"At most {settings.RESULTS_BULK_MAX_ROWS} results per import"
+    )
+
+
+def _parse_line(line: bytes):
+    try:
+        return loads(line)
+    except ValueError as e:
+        return e
+
+
+async def _read_bulk_items(request: Request) -> list:
+    """The results in a JSON array body, or in an NDJSON body parsed line by line as it arrives."""
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" not in content_type and "jsonl" not in content_type:
+        try:
+            items = loads(await request.body())
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid JSON")
+        if not isinstance(items, list):
+            raise HTTPException(status_code=400, detail="Expected a JSON array of results")
+        if len(items) > settings.RESULTS_BULK_MAX_ROWS:
+            raise _too_many_results()
+        return items
+
+    items, pending = [], b""
+    async for chunk in request.stream():
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        items.extend(_parse_line(line) for line in lines if line.strip())
+        if len(items) > settings.RESULTS_BULK_MAX_ROWS:
+            raise _too_many_results()
+    if pending.strip():
+        items.append(_parse_line(pending))
+    if len(items) > settings.RESULTS_BULK_MAX_ROWS:
+        raise _too_many_results()
+    return items
+
 # ---------- Endpoints ----------
 
 @router.post("/", response_model=schemas.QuizResultOut)
-def create_result(
+async def create_result(
     result_data: schemas.QuizResultCreate,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
 ):
     # Only students can submit results
     if current_user.role != "student":
@@ -26,15 +160,19 @@ def create_result(
         )
 
     # Verify quiz exists
-    quiz = db.query(models.Quiz).filter(models.Quiz.id == result_data.quiz_id).first()
-    if not quiz:
+    try:
+        quiz_id = uuid.UUID(result_data.quiz_id)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Quiz not found")
+    version = await db.scalar(select(models.Quiz.version).where(models.Quiz.id == quiz_id))
+    if version is None:
         raise HTTPException(status_code=404, detail="Quiz not found")
 
     # Check if student already submitted this quiz
-    existing_result = db.query(models.QuizResult).filter(
-        models.QuizResult.quiz_id == result_data.quiz_id,
+    existing_result = await db.scalar(select(models.QuizResult.id).where(
+        models.QuizResult.quiz_id == quiz_id,
         models.QuizResult.student_id == current_user.id
-    ).first()
+    ))
     
     if existing_result:
         raise HTTPException(
@@ -42,37 +180,93 @@ def create_result(
             detail="You have already submitted this quiz"
         )
 
+    # A live session grades its own answers when it finishes
+    session_status = await db.scalar(select(models.QuizSession.status).where(
+        models.QuizSession.quiz_id == quiz_id,
+        models.QuizSession.student_id == current_user.id
+    ))
+    if session_status == models.SessionStatusEnum.active.value:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="This quiz is in progress in a live session; finish the session instead"
+        )
+
+    # Grade against the stored answer key; client-sent score and isCorrect are ignored
+    key = cached_answer_key(quiz_id, version)
+    if key is None:
+        key = answer_key_for(await db.get(models.Quiz, quiz_id))
+    submitted = [a.dict() for a in result_data.answers]
+    if needs_embeddings(key):
+        # Encoding open-ended answers is CPU work; keep it off the event loop
+        answers, score = await run_in_threadpool(grade_submission, key, submitted)
+    else:
+        answers, score = grade_submission(key, submitted)
+
     new_result = models.QuizResult(
-        quiz_id=result_data.quiz_id,
+        quiz_id=quiz_id,
         student_id=current_user.id,
         student_name=result_data.student_name,
         student_number=result_data.student_number,
-        answers=[a.dict() for a in result_data.answers],
-        score=result_data.score,
-        total_questions=result_data.total_questions,
+        answers=answers,
+        score=score,
+        total_questions=key.total_questions,
         time_spent=result_data.time_spent
     )
     db.add(new_result)
-    db.commit()
-    db.refresh(new_result)
+    # Same transaction as the insert, so stats never count a result that wasn't saved
+    await db.run_sync(record_result, new_result)
+    await db.commit()
+    await db.refresh(new_result)
     return new_result
 
+@router.post("/bulk", response_model=schemas.BulkResultsOut)
+async def create_results_bulk(
+    request: Request,
+    current_user: Principal = Depends(get_current_user)
+):
+    """
+    Import results for the teacher's quizzes, e.g. synced from exam scanners: a
+    JSON array of `POST /results/` bodies, or one per line with
+    `Content-Type: application/x-ndjson`. Results are graded like submissions;
+    each one that can't be imported (invalid, unknown quiz or student, already
+    submitted) gets an error with its position, from 0, and the rest are imported.
+    """
+    if current_user.role != "teacher":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only teachers can import quiz results"
+        )
+
+    items = await _read_bulk_items(request)
+    inserted, errors = await run_in_threadpool(import_results, current_user.id, items)
+    return json_response({
+        "received": len(items),
+        "inserted": inserted,
+        "errors": [{"row": row, "detail": detail} for row, detail in sorted(errors.items())],
+    })
+
 @router.get("/my-results", response_model=List[schemas.QuizResultOut])
-def get_my_results(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+async def get_my_results(
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
 ):
-    results = db.query(models.QuizResult).filter(
+    results = await db.scalars(select(models.QuizResult).where(
         models.QuizResult.student_id == current_user.id
-    ).all()
-    return results
-
-@router.get("/quiz/{quiz_id}", response_model=List[schemas.QuizResultOut])
-def get_quiz_results(
-    quiz_id: str,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    ))
+    return json_response([_serialize_result(result) for result in results.all()])
+
+@router.get("/quiz/{quiz_id}", response_model=schemas.QuizResultPage)
+async def get_quiz_results(
+    quiz_id: uuid.UUID,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db),
+    current_user: Union[Principal, TokenPrincipal] = Depends(get_token_principal)
 ):
+    """
+    Results for one of the teacher's quizzes, newest first, without answers.
+    Pass `next_cursor` back as `cursor` for the next page.
+    """
     # Only teachers can view quiz results
     if current_user.role != "teacher":
         raise HTTPException(
@@ -81,26 +275,174 @@ def get_quiz_results(
         )
 
     # Verify quiz exists and belongs to teacher
-    quiz = db.query(models.Quiz).filter(models.Quiz.id == quiz_id).first()
-    if not quiz:
+    owner_id = await db.scalar(select(models.Quiz.created_by).where(models.Quiz.id == quiz_id))
+    if not owner_id:
         raise HTTPException(status_code=404, detail="Quiz not found")
     
-    if quiz.created_by != current_user.id:
+    if owner_id != current_user.id:
         raise HTTPException(
             status_code=403,
             detail="You can only view results for your own quizzes"
         )
 
-    results = db.query(models.QuizResult).filter(
-        models.QuizResult.quiz_id == quiz_id
-    ).all()
-    return results
+    return json_response(await _list_result_summaries(db, [models.QuizResult.quiz_id == quiz_id], cursor, limit))
 
-@router.get("/all", response_model=List[schemas.QuizResultOut])
-def get_all_results(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+@router.get("/quiz/{quiz_id}/stats", response_model=schemas.QuizStatsOut)
+async def get_quiz_stats(
+    quiz_id: uuid.UUID,
+    db: AsyncSession = Depends(get_db),
+    current_user: Union[Principal, TokenPrincipal] = Depends(get_token_principal)
 ):
+    """Score, per-question and time-spent aggregates, read from `quiz_stats` in O(1)."""
+    if current_user.role != "teacher":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only teachers can view quiz statistics"
+        )
+
+    owner_id = await db.scalar(select(models.Quiz.created_by).where(models.Quiz.id == quiz_id))
+    if not owner_id:
+        raise HTTPException(status_code=404, detail="Quiz not found")
+
+    if owner_id != current_user.id:
+        raise HTTPException(
+            status_code=403,
+            detail="You can only view statistics for your own quizzes"
+        )
+
+    stats = await db.get(models.QuizStats, quiz_id)
+    return summarize(quiz_id, stats)
+
+@router.websocket("/quiz/{quiz_id}/live")
+async def live_quiz_results(websocket: WebSocket, quiz_id: uuid.UUID, token: str = ""):
+    """
+    Live results for one of the teacher's quizzes, instead of polling. Pass the
+    access token as `?token=` (browsers can't set headers on WebSockets). Each
+    message is `{"type": "update", "results": [...], "stats": {...}, "missed": false}`:
+    result summaries submitted since the previous message and the current stats
+    (the first message has the stats only). `missed` means this connection fell
+    behind and results were dropped; reload `/results/quiz/{id}` then.
+    """
+    user_id = token_user_id(token)
+    if user_id is not None:
+        # One trip to the threadpool with a session of its own: dashboards reconnect all at once after a deploy
+        role, owner_id, stats = await run_in_threadpool(load_subscription, user_id, quiz_id)
+    if user_id is None or role != "teacher" or owner_id != user_id:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+    await live_results.serve(websocket, quiz_id, stats)
+
+@router.get("/quiz/{quiz_id}/questions", response_model=List[schemas.QuestionBreakdownOut])
+async def get_question_breakdown(
+    quiz_id: uuid.UUID,
+    db: AsyncSession = Depends(get_db),
+    current_user: Union[Principal, TokenPrincipal] = Depends(get_token_principal)
+):
+    """
+    Per-question answer counts, correct rate, mean time spent and how often
+    each option was picked, aggregated in SQL over the `answers` table.
+    """
+    if current_user.role != "teacher":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only teachers can view quiz statistics"
+        )
+
+    owner_id = await db.scalar(select(models.Quiz.created_by).where(models.Quiz.id == quiz_id))
+    if not owner_id:
+        raise HTTPException(status_code=404, detail="Quiz not found")
+
+    if owner_id != current_user.id:
+        raise HTTPException(
+            status_code=403,
+            detail="You can only view statistics for your own quizzes"
+        )
+
+    questions = (await db.execute(
+        select(models.QuizQuestion.position, models.QuizQuestion.question_id, models.QuizQuestion.question)
+        .where(models.QuizQuestion.quiz_id == quiz_id)
+        .order_by(models.QuizQuestion.position)
+    )).all()
+    groups = (await db.execute(
+        select(
+            models.ResultAnswer.question_id,
+            models.ResultAnswer.selected_option,
+            func.count().label("answered"),
+            func.sum(case((models.ResultAnswer.is_correct, 1), else_=0)).label("correct"),
+            func.sum(models.ResultAnswer.time_spent).label("time_spent"),
+        )
+        .join(models.QuizResult, models.QuizResult.id == models.ResultAnswer.result_id)
+        .where(models.QuizResult.quiz_id == quiz_id)
+        .group_by(models.ResultAnswer.question_id, models.ResultAnswer.selected_option)
+    )).all()
+
+    breakdown = {}
+    for question in questions:
+        breakdown.setdefault(question.question_id, {
+            "question_id": question.question_id,
+            "position": question.position,
+            "question": question.question,
+            "answered": 0,
+            "correct": 0,
+            "time_spent": 0,
+            "options": [],
+        })
+    for group in groups:
+        item = breakdown.get(group.question_id)
+        if item is None:
+            continue
+        item["answered"] += group.answered
+        item["correct"] += group.correct or 0
+        item["time_spent"] += group.time_spent or 0
+        if group.selected_option is not None and group.selected_option >= 0:
+            item["options"].append({"option": group.selected_option, "count": group.answered})
+
+    for item in breakdown.values():
+        answered = item["answered"]
+        item["correct_rate"] = item["correct"] / answered if answered else None
+        item["average_time_spent"] = item.pop("time_spent") / answered if answered else None
+        item["options"].sort(key=lambda option: option["option"])
+    return list(breakdown.values())
+
+@router.post("/quiz/{quiz_id}/regrade", response_model=schemas.RegradeOut, status_code=status.HTTP_202_ACCEPTED)
+async def regrade_quiz_results(
+    quiz_id: uuid.UUID,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db),
+    current_user: Union[Principal, TokenPrincipal] = Depends(get_token_principal)
+):
+    """Re-score every result of the quiz against its current answer key, in the background."""
+    if current_user.role != "teacher":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only teachers can regrade quiz results"
+        )
+
+    quiz = (await db.execute(
+        select(models.Quiz.created_by, models.Quiz.version).where(models.Quiz.id == quiz_id)
+    )).first()
+    if quiz is None:
+        raise HTTPException(status_code=404, detail="Quiz not found")
+
+    if quiz.created_by != current_user.id:
+        raise HTTPException(
+            status_code=403,
+            detail="You can only regrade results for your own quizzes"
+        )
+
+    background_tasks.add_task(regrade_quiz, quiz_id)
+    return {"quiz_id": quiz_id, "version": quiz.version, "status": "queued"}
+
+@router.get("/all", response_model=schemas.QuizResultPage)
+async def get_all_results(
+    quiz_id: Optional[uuid.UUID] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    """Results across the teacher's own quizzes, newest first, without answers."""
     # Only teachers can view all results
     if current_user.role != "teacher":
         raise HTTPException(
@@ -108,5 +450,63 @@ def get_all_results(
             detail="Only teachers can view all results"
         )
 
-    results = db.query(models.QuizResult).all()
-    return results
+    filters = [models.Quiz.created_by == current_user.id]
+    if quiz_id is not None:
+        filters.append(models.QuizResult.quiz_id == quiz_id)
+    return json_response(await _list_result_summaries(db, filters, cursor, limit, join_quiz=True))
+
+@router.get("/export")
+async def export_results(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    quiz_id: Optional[uuid.UUID] = None,
+    completed_after: Optional[datetime] = None,
+    completed_before: Optional[datetime] = None,
+    current_user: Principal = Depends(get_current_user)
+):
+    """
+    Stream every result of the teacher's quizzes (answers included) as NDJSON
+    or CSV. Rows are read through a server-side cursor in batches, so memory
+    use doesn't grow with the number of results.
+    """
+    if current_user.role != "teacher":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only teachers can export results"
+        )
+
+    stmt = (
+        select(*_EXPORT_COLUMNS)
+        .join(models.Quiz, models.Quiz.id == models.QuizResult.quiz_id)
+        .where(models.Quiz.created_by == current_user.id)
+        .order_by(models.QuizResult.completed_at, models.QuizResult.id)
+    )
+    if quiz_id is not None:
+        stmt = stmt.where(models.QuizResult.quiz_id == quiz_id)
+    if completed_after is not None:
+        stmt = stmt.where(models.QuizResult.completed_at >= completed_after)
+    if completed_before is not None:
+        stmt = stmt.where(models.QuizResult.completed_at < completed_before)
+
+    encode = _csv_lines if format == "csv" else _ndjson_lines
+
+    async def rows():
+        # The session is owned by the stream, which outlives the request dependencies
+        db = new_session()
+        try:
+            result = await db.stream(stmt)
+            try:
+                if format == "csv":
+                    yield _csv_header()
+                async for partition in result.partitions(EXPORT_BATCH_SIZE):
+                    yield encode(partition)
+            finally:
+                await result.close()
+        finally:
+            await db.close()
+
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        rows(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="results.{format}"'},
+    )
@@ -1,20 +1,21 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.db import models, schemas
 from app.db.session import get_db
-from app.core.security import get_password_hash, verify_password, create_access_token
+from app.core.security import create_access_token, hash_password_async, verify_and_update_password
 from datetime import timedelta
 from app.core.config import settings
 
 router = APIRouter()
 
 @router.post("/register", response_model=schemas.UserOut)
-def register(user_in: schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(models.User).filter(models.User.email == user_in.email).first()
+async def register(user_in: schemas.UserCreate, db: AsyncSession = Depends(get_db)):
+    db_user = await db.scalar(select(models.User).where(models.User.email == user_in.email))
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
 
-    hashed_pw = get_password_hash(user_in.password)
+    hashed_pw = await hash_password_async(user_in.password)
     new_user = models.User(
         name=user_in.name,
         email=user_in.email,
@@ -23,16 +24,25 @@ def register(user_in: schemas.UserCreate, db: Session = Depends(get_db)):
         student_number=user_in.student_number,
     )
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
     return new_user
 
 @router.post("/login", response_model=schemas.Token)
-def login(form_data: schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(models.User).filter(models.User.email == form_data.email).first()
-    if not db_user or not verify_password(form_data.password, db_user.hashed_password):
+async def login(form_data: schemas.UserCreate, db: AsyncSession = Depends(get_db)):
+    db_user = await db.scalar(select(models.User).where(models.User.email == form_data.email))
+    if not db_user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
 
+    valid, new_hash = await verify_and_update_password(form_data.password, db_user.hashed_password)
+    if not valid:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+
+    # Stored hash predates the current bcrypt cost: replace it while we have the password
+    if new_hash:
+        db_user.hashed_password = new_hash
+        await db.commit()
+
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={"sub": str(db_user.id), "role": db_user.role}, expires_delta=access_token_expires
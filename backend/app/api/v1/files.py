@@ -1,91 +1,346 @@
-import shutil
+import asyncio
+import json
 import os
-from datetime import datetime
-from typing import List
+import uuid
+import zipfile
+from typing import List, Optional, Tuple, Union
 
+import anyio
 from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, status, Form
-from sqlalchemy.orm import Session
-from PyPDF2 import PdfReader
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.session import get_db
+from app.db.session import get_db, new_session
 from app.db import models, schemas
 from app.api.v1.users import get_current_user
-from app.core.llm import generate_quiz_from_text
+from app.core.principals import Principal, principal_cache
+from app.core.blobs import UploadRejected, add_reference, discard_staged, stage_upload
+from app.core.config import settings
+from app.core.cache import cache_stats, quiz_cache, quiz_cache_key, text_cache
+from app.core.embeddings import embedding_stats
+from app.core.jobs import (
+    complete_job_from_bank, complete_job_from_cache, create_quiz_for_job, discard_upload, enqueue_upload_job,
+    process_upload_batch, record_extraction, requeue_job
+)
+from app.core.llm import astream_quiz_from_text
+from app.core.pdf import ExtractionStats, iter_pages
+from app.core.question_bank import curate_questions, questions_from_bank
+from app.core.response_cache import response_cache_stats
 
 router = APIRouter(
     prefix="/files",
     tags=["Files"]
 )
 
-UPLOAD_DIR = "uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+# ---------- Helpers ----------
+
+def _validate_options(question_type: str, num_questions: Optional[int], current_user: Principal):
+    if current_user.role != "teacher":
+        raise HTTPException(status_code=403, detail="Only teachers can upload files")
+
+    if question_type not in ["multiple-choice", "open-ended"]:
+        raise HTTPException(status_code=400, detail="Question type must be 'multiple-choice' or 'open-ended'")
+
+    if num_questions is not None and not 1 <= num_questions <= settings.QUIZ_MAX_QUESTIONS:
+        raise HTTPException(status_code=400, detail=f"num_questions must be between 1 and {settings.QUIZ_MAX_QUESTIONS}")
+
+
+def _validate_upload(pdf_file: UploadFile, question_type: str, num_questions: Optional[int], current_user: Principal):
+    _validate_options(question_type, num_questions, current_user)
+
+    if not pdf_file.filename.endswith(".pdf"):
+        raise HTTPException(status_code=400, detail="Only PDF files are allowed")
 
-# ---------- Helper: Extract text from PDF ----------
 
-def extract_text_from_pdf(file_path: str) -> str:
-    reader = PdfReader(file_path)
-    text = ""
-    for page in reader.pages:
-        text += page.extract_text() or ""
-    return text.strip()
+def _new_job(file_name: str, file_path: str, content_sha256: str, question_type: str,
+             num_questions: Optional[int], user_id) -> models.UploadJob:
+    return models.UploadJob(
+        id=uuid.uuid4(),
+        status=models.JobStatusEnum.queued.value,
+        file_name=file_name,
+        file_path=file_path,
+        content_sha256=content_sha256,
+        question_type=question_type,
+        num_questions=num_questions,
+        created_by=user_id
+    )
+
+
+async def _save_upload(db: AsyncSession, pdf_file: UploadFile, question_type: str, num_questions: Optional[int], user_id) -> models.UploadJob:
+    """Store the PDF (once per distinct content) and record a queued upload job for it."""
+    # The content hash is computed while streaming and keys the blob store and the extraction/quiz caches
+    try:
+        staged = await stage_upload(pdf_file)
+    except UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    try:
+        file_path = await db.run_sync(add_reference, staged)
+    except Exception:
+        discard_staged(staged)
+        await db.rollback()
+        raise
+
+    job = _new_job(pdf_file.filename, file_path, staged.sha256, question_type, num_questions, user_id)
+    db.add(job)
+    await db.commit()
+    return job
+
+
+def _open_batch(pdf_files: List[UploadFile]) -> List[Union[UploadFile, Tuple[str, str]]]:
+    """
+    The PDFs of a batch in upload order, zip archives replaced by the PDFs
+    they contain. Files that can't be used become (file name, reason) pairs.
+    Reads archive directories, so it runs in the threadpool.
+    """
+    entries: List[Union[UploadFile, Tuple[str, str]]] = []
+    for upload in pdf_files:
+        name = upload.filename or ""
+        if name.lower().endswith(".pdf"):
+            entries.append(upload)
+            continue
+        if not name.lower().endswith(".zip"):
+            entries.append((name, "Only PDF or zip files are allowed"))
+            continue
+        try:
+            archive = zipfile.ZipFile(upload.file)
+        except zipfile.BadZipFile:
+            entries.append((name, "Not a valid zip archive"))
+            continue
+        for info in archive.infolist():
+            member_name = os.path.basename(info.filename)
+            if info.is_dir() or not member_name or info.filename.startswith("__MACOSX/"):
+                continue
+            if not member_name.lower().endswith(".pdf"):
+                entries.append((f"{name}/{info.filename}", "Only PDF files are allowed"))
+                continue
+            # Declared size, checked again while the member is decompressed
+            entries.append(UploadFile(archive.open(info), size=info.file_size, filename=member_name))
+    return entries
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
 
 # ---------- Endpoints ----------
 
-@router.post("/upload", response_model=schemas.PDFUploadResponse)
-def upload_file(
+@router.post("/upload", response_model=schemas.UploadJobOut, status_code=status.HTTP_202_ACCEPTED)
+async def upload_file(
     pdf_file: UploadFile = File(...),
     question_type: str = Form(...),
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    num_questions: Optional[int] = Form(None),
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
 ):
-    if current_user.role != "teacher":
-        raise HTTPException(status_code=403, detail="Only teachers can upload files")
+    _validate_upload(pdf_file, question_type, num_questions, current_user)
+    job = await _save_upload(db, pdf_file, question_type, num_questions, current_user.id)
 
-    if not pdf_file.filename.endswith(".pdf"):
-        raise HTTPException(status_code=400, detail="Only PDF files are allowed")
+    # Same bytes and question type already generated: the quiz is created right away
+    if not await db.run_sync(complete_job_from_cache, job) and not await db.run_sync(complete_job_from_bank, job):
+        # Extraction and generation run in the background worker pool
+        enqueue_upload_job(job.id)
 
-    if question_type not in ["multiple-choice", "open-ended"]:
-        raise HTTPException(status_code=400, detail="Question type must be 'multiple-choice' or 'open-ended'")
+    await db.refresh(job)
+    return job
 
-    # Save file locally
-    file_path = os.path.join(UPLOAD_DIR, pdf_file.filename)
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(pdf_file.file, buffer)
+@router.post("/upload/stream")
+async def upload_file_stream(
+    pdf_file: UploadFile = File(...),
+    question_type: str = Form(...),
+    num_questions: Optional[int] = Form(None),
+    current_user: Principal = Depends(get_current_user)
+):
+    """
+    Upload a PDF and follow quiz generation as Server-Sent Events:
+    `status` (job state changes), `page` (extraction progress), `question`
+    (each question as soon as the LLM finishes it), then `done` with the
+    persisted quiz id, or `error`. If the client disconnects first, the job
+    is handed to the background workers (follow it at `/files/jobs/{id}`).
+    """
+    _validate_upload(pdf_file, question_type, num_questions, current_user)
 
+    # The session is owned by the stream, which outlives the request dependencies
+    db = new_session()
     try:
-        # Extract text from PDF
-        text_content = extract_text_from_pdf(file_path)
-        if not text_content:
-            raise ValueError("No readable text in PDF")
-
-        # Generate quiz questions using LLM
-        questions_data = generate_quiz_from_text(text_content, question_type)
-        
-        if not questions_data:
-            raise ValueError("Failed to generate questions from PDF")
-
-        # Create quiz
-        quiz_title = pdf_file.filename.replace('.pdf', '')
-        new_quiz = models.Quiz(
-            title=quiz_title,
-            file_name=pdf_file.filename,
-            question_type=question_type,
-            questions=questions_data,
-            created_by=current_user.id,
-            is_published=True
-        )
-        db.add(new_quiz)
-        db.commit()
-        db.refresh(new_quiz)
-
-        return schemas.PDFUploadResponse(
-            success=True,
-            quiz=new_quiz,
-            message="PDF uploaded and quiz generated successfully"
-        )
-
-    except Exception as e:
-        # Clean up uploaded file if quiz generation fails
-        if os.path.exists(file_path):
-            os.remove(file_path)
-        raise HTTPException(status_code=500, detail=f"Failed to process PDF: {str(e)}")
+        job = await _save_upload(db, pdf_file, question_type, num_questions, current_user.id)
+    except Exception:
+        await db.close()
+        raise
+    # Read once: a rollback expires the instance, and async sessions can't lazy-load
+    job_id, file_path, content_sha256 = str(job.id), job.file_path, job.content_sha256
+
+    async def set_status(status_value: models.JobStatusEnum) -> str:
+        job.status = status_value.value
+        await db.commit()
+        return _sse("status", {"job_id": job_id, "status": status_value.value})
+
+    async def events():
+        stats = ExtractionStats()
+        try:
+            yield _sse("status", {"job_id": job_id, "status": job.status})
+
+            cache_key = quiz_cache_key(content_sha256, question_type, num_questions)
+            text_content = text_cache.get(content_sha256)
+            questions = quiz_cache.get(cache_key)
+            if questions is None:
+                count = num_questions or settings.QUIZ_NUM_QUESTIONS
+                questions = await db.run_sync(questions_from_bank, current_user.id, question_type, content_sha256, count) or None
+            if questions is not None:
+                for question in questions:
+                    yield _sse("question", question)
+            else:
+                yield await set_status(models.JobStatusEnum.extracting)
+                if text_content is None:
+                    pages = iter_pages(file_path, stats=stats)
+                    parts, collected = [], 0
+                    try:
+                        while True:
+                            page_text = await run_in_threadpool(next, pages, None)
+                            if page_text is None:
+                                break
+                            parts.append(page_text)
+                            collected += len(page_text)
+                            yield _sse("page", {"page": len(parts), "total": stats.total_pages})
+                            if settings.PDF_MAX_EXTRACT_CHARS and collected >= settings.PDF_MAX_EXTRACT_CHARS:
+                                break
+                    finally:
+                        await run_in_threadpool(pages.close)
+                    record_extraction(job, stats)
+                    text_content = "\n".join(parts).strip()
+                    if text_content:
+                        text_cache.set(content_sha256, text_content)
+                if not text_content:
+                    raise ValueError("No readable text in PDF")
+
+                yield await set_status(models.JobStatusEnum.generating)
+                questions = []
+                async for question in astream_quiz_from_text(text_content, question_type, num_questions):
+                    questions.append(question)
+                    yield _sse("question", question)
+                # Streamed questions are already shown, so duplicates are kept; only a shortfall is topped up
+                streamed = len(questions)
+                questions = await db.run_sync(
+                    curate_questions, current_user.id, question_type, questions,
+                    num_questions or settings.QUIZ_NUM_QUESTIONS, text_content, content_sha256, False
+                )
+                for question in questions[streamed:]:
+                    yield _sse("question", question)
+                if not questions:
+                    raise ValueError("Failed to generate questions from PDF")
+                quiz_cache.set(cache_key, questions)
+
+            quiz = await db.run_sync(create_quiz_for_job, job, questions, text_content)
+            await db.commit()
+            yield _sse("done", {"job_id": job_id, "quiz_id": str(quiz.id), "question_count": len(questions)})
+
+        except Exception as e:
+            await db.rollback()
+            job.status = models.JobStatusEnum.failed.value
+            job.error = str(e)
+            record_extraction(job, stats)
+            await db.run_sync(discard_upload, job)
+            yield _sse("error", {"job_id": job_id, "detail": f"Failed to process PDF: {e}"})
+        except (asyncio.CancelledError, GeneratorExit):
+            # The client disconnected: a worker finishes the job, which keeps its upload
+            # and can still be followed at /files/jobs/{id}. Shielded, as the response's
+            # cancellation would otherwise cancel these awaits too.
+            with anyio.CancelScope(shield=True):
+                await db.rollback()
+                await db.run_sync(requeue_job, job_id)
+            raise
+        finally:
+            with anyio.CancelScope(shield=True):
+                await db.close()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.post("/upload-batch", response_model=schemas.BatchUploadOut)
+async def upload_batch(
+    pdf_files: List[UploadFile] = File(...),
+    question_type: str = Form(...),
+    num_questions: Optional[int] = Form(None),
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    """
+    Upload several PDFs (or zip archives of PDFs) and generate all their
+    quizzes within the request. Documents are processed concurrently and the
+    quizzes are inserted together; the response lists every file in upload
+    order as `done` (with its quiz), `failed` (with the job's error) or
+    `rejected` (not stored).
+    """
+    _validate_options(question_type, num_questions, current_user)
+    entries = await run_in_threadpool(_open_batch, pdf_files)
+    if len(entries) > settings.UPLOAD_BATCH_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"A batch can hold at most {settings.UPLOAD_BATCH_MAX_FILES} files")
+    if sum(entry.size or 0 for entry in entries if not isinstance(entry, tuple)) > settings.UPLOAD_BATCH_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds the limit of {settings.UPLOAD_BATCH_MAX_BYTES} bytes")
+
+    items: List[Union[models.UploadJob, Tuple[str, str]]] = []
+    for entry in entries:
+        if isinstance(entry, tuple):
+            items.append(entry)
+            continue
+        try:
+            staged = await stage_upload(entry)
+        except UploadRejected as e:
+            items.append((entry.filename, e.detail))
+            continue
+        try:
+            file_path = await db.run_sync(add_reference, staged)
+        except Exception:
+            discard_staged(staged)
+            await db.rollback()
+            raise
+        job = _new_job(entry.filename, file_path, staged.sha256, question_type, num_questions, current_user.id)
+        db.add(job)
+        items.append(job)
+    # Committed first so /files/jobs/{id} can see the jobs while the batch runs
+    await db.commit()
+
+    await process_upload_batch(db, [item for item in items if not isinstance(item, tuple)])
+
+    results = []
+    for item in items:
+        if isinstance(item, tuple):
+            results.append(schemas.BatchUploadItemOut(file_name=item[0], status="rejected", error=item[1]))
+        else:
+            results.append(schemas.BatchUploadItemOut(
+                file_name=item.file_name, status=item.status, job_id=item.id, quiz_id=item.quiz_id, error=item.error
+            ))
+    return schemas.BatchUploadOut(
+        items=results,
+        done=sum(result.status == models.JobStatusEnum.done.value for result in results),
+        failed=sum(result.status == models.JobStatusEnum.failed.value for result in results),
+        rejected=sum(result.status == "rejected" for result in results),
+    )
+
+@router.get("/jobs/{job_id}", response_model=schemas.UploadJobOut)
+async def get_upload_job(
+    job_id: uuid.UUID,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    job = await db.get(models.UploadJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    if job.created_by != current_user.id:
+        raise HTTPException(status_code=403, detail="You can only view your own upload jobs")
+
+    return job
+
+@router.get("/cache/stats")
+async def get_cache_stats(current_user: Principal = Depends(get_current_user)):
+    if current_user.role != "teacher":
+        raise HTTPException(status_code=403, detail="Only teachers can view cache statistics")
+    return {
+        **cache_stats(),
+        "principals": principal_cache.stats(),
+        "embeddings": embedding_stats(),
+        "responses": response_cache_stats(),
+    }
@@ -1,22 +1,84 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+import uuid
+from datetime import datetime
+
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Union
 from app.db.session import get_db
 from app.db import models, schemas
-from app.api.v1.users import get_current_user
+from app.api.v1.users import get_current_user, get_optional_user
+from app.core.principals import Principal
+from app.core.blobs import collect_garbage
+from app.core.grading import regrade_quiz
+from app.core.config import settings
+from app.core.jobs import release_quiz_uploads
+from app.core.pagination import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_offset_cursor, encode_offset_cursor, keyset_paginate, page_from_rows
+)
+from app.core.response_cache import cached_response, listing_responses, quiz_responses, respond
+from app.core.search import query_terms, render_highlight, search_statement
+from app.core.serialization import compile_serializer, dumps, json_response
 
 router = APIRouter(
     prefix="/quizzes",
     tags=["Quizzes"]
 )
 
+# ---------- Helpers ----------
+
+_SUMMARY_COLUMNS = (
+    models.Quiz.id,
+    models.Quiz.title,
+    models.Quiz.file_name,
+    models.Quiz.question_type,
+    models.Quiz.question_count,
+    models.Quiz.created_by,
+    models.Quiz.created_at,
+    models.Quiz.is_published,
+)
+
+_serialize_quiz = compile_serializer(schemas.QuizOut)
+_serialize_public_quiz = compile_serializer(schemas.QuizPublicOut)
+_serialize_summary = compile_serializer(schemas.QuizSummaryOut)
+
+
+async def _list_quiz_summaries(
+    db: AsyncSession,
+    filters: list,
+    question_type: Optional[schemas.QuestionTypeEnum],
+    created_after: Optional[datetime],
+    created_before: Optional[datetime],
+    cursor: Optional[str],
+    limit: int,
+) -> dict:
+    """One keyset page of quiz summaries (no `questions` column is read), ready to encode."""
+    if question_type is not None:
+        filters.append(models.Quiz.question_type == question_type.value)
+    if created_after is not None:
+        filters.append(models.Quiz.created_at >= created_after)
+    if created_before is not None:
+        filters.append(models.Quiz.created_at < created_before)
+
+    try:
+        stmt = keyset_paginate(
+            select(*_SUMMARY_COLUMNS).where(*filters),
+            models.Quiz.created_at, models.Quiz.id, cursor, limit
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    rows = (await db.execute(stmt)).all()
+    items, next_cursor = page_from_rows(rows, limit)
+    return {"items": [_serialize_summary(row) for row in items], "next_cursor": next_cursor}
+
 # ---------- Endpoints ----------
 
 @router.post("/", response_model=schemas.QuizOut)
-def create_quiz(
+async def create_quiz(
     quiz_data: schemas.QuizCreate,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
 ):
     if current_user.role != "teacher":
         raise HTTPException(
@@ -30,46 +92,208 @@ def create_quiz(
         question_type=quiz_data.question_type,
         questions=[q.dict() for q in quiz_data.questions],
         created_by=current_user.id,
-        is_published=quiz_data.is_published
+        is_published=quiz_data.is_published,
+        time_limit_seconds=quiz_data.time_limit_seconds
     )
     db.add(new_quiz)
-    db.commit()
-    db.refresh(new_quiz)
+    await db.commit()
+    await db.refresh(new_quiz)
     return new_quiz
 
-@router.get("/", response_model=List[schemas.QuizOut])
-def list_quizzes(db: Session = Depends(get_db)):
-    quizzes = db.query(models.Quiz).filter(models.Quiz.is_published == True).all()
-    return quizzes
+@router.get("/", response_model=schemas.QuizSummaryPage)
+async def list_quizzes(
+    request: Request,
+    created_by: Optional[uuid.UUID] = None,
+    question_type: Optional[schemas.QuestionTypeEnum] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)
+):
+    """
+    Published quizzes, newest first. Pass `next_cursor` from the previous
+    page as `cursor` to continue; it is null on the last page. Pages are
+    served from the response cache with an ETag (`If-None-Match` gets 304).
+    """
+    async def load_page(db):
+        filters = [models.Quiz.is_published == True]
+        if created_by is not None:
+            filters.append(models.Quiz.created_by == created_by)
+        page = await _list_quiz_summaries(db, filters, question_type, created_after, created_before, cursor, limit)
+        return {"page": cached_response(dumps(page))}
 
-@router.get("/my-quizzes", response_model=List[schemas.QuizOut])
-def list_my_quizzes(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    key = repr((created_by, question_type, created_after, created_before, cursor, limit))
+    variants = await listing_responses.get_or_load(key, load_page)
+    return respond(request, variants["page"])
+
+@router.get("/my-quizzes", response_model=schemas.QuizSummaryPage)
+async def list_my_quizzes(
+    question_type: Optional[schemas.QuestionTypeEnum] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
 ):
     if current_user.role != "teacher":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only teachers can view their own quizzes"
         )
-    
-    quizzes = db.query(models.Quiz).filter(models.Quiz.created_by == current_user.id).all()
-    return quizzes
 
-@router.get("/{quiz_id}", response_model=schemas.QuizOut)
-def get_quiz(quiz_id: str, db: Session = Depends(get_db)):
-    quiz = db.query(models.Quiz).filter(models.Quiz.id == quiz_id).first()
+    filters = [models.Quiz.created_by == current_user.id]
+    return json_response(await _list_quiz_summaries(db, filters, question_type, created_after, created_before, cursor, limit))
+
+@router.get("/search", response_model=schemas.QuizSearchPage)
+async def search_quizzes(
+    q: str = Query(..., min_length=1, max_length=200),
+    question_type: Optional[schemas.QuestionTypeEnum] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db),
+    current_user: Optional[Principal] = Depends(get_optional_user)
+):
+    """
+    Published quizzes (and the caller's own) whose title, questions or source
+    document contain every word of `q`, best match first. `highlight` is an
+    HTML-escaped excerpt with the matches wrapped in `<mark>` tags. Pass
+    `next_cursor` back as `cursor` for the next page; at most
+    `SEARCH_MAX_RESULTS` hits can be paged through.
+    """
+    terms = query_terms(q)
+    if not terms:
+        raise HTTPException(status_code=400, detail="Search query has no words")
+    try:
+        offset = decode_offset_cursor(cursor) if cursor else 0
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    limit = min(limit, settings.SEARCH_MAX_RESULTS - offset)
+    if limit <= 0:
+        return {"items": [], "next_cursor": None}
+
+    stmt = search_statement(
+        terms,
+        viewer_id=current_user.id if current_user is not None else None,
+        question_type=question_type.value if question_type is not None else None,
+        offset=offset,
+        limit=limit + 1,
+    )
+    rows = (await db.execute(stmt)).all()
+    items = [{**row._mapping, "highlight": render_highlight(row.highlight)} for row in rows[:limit]]
+    next_cursor = encode_offset_cursor(offset + limit) if len(rows) > limit else None
+    return {"items": items, "next_cursor": next_cursor}
+
+@router.get("/{quiz_id}", response_model=Union[schemas.QuizOut, schemas.QuizPublicOut])
+async def get_quiz(
+    quiz_id: uuid.UUID,
+    request: Request,
+    current_user: Optional[Principal] = Depends(get_optional_user)
+):
+    """
+    The quiz with its questions. Only its creator gets the answer key;
+    everyone else gets the questions without correct answers or explanations
+    (submissions are graded server-side). Served from the response cache with
+    an ETag (`If-None-Match` gets 304).
+    """
+    async def load_quiz(db):
+        quiz = await db.get(models.Quiz, quiz_id)
+        if not quiz:
+            return None
+        return {
+            "public": cached_response(dumps(_serialize_public_quiz(quiz))),
+            f"owner:{quiz.created_by}": cached_response(dumps(_serialize_quiz(quiz))),
+        }
+
+    variants = await quiz_responses.get_or_load(str(quiz_id), load_quiz)
+    if variants is None:
+        raise HTTPException(status_code=404, detail="Quiz not found")
+    owner_view = variants.get(f"owner:{current_user.id}") if current_user is not None else None
+    return respond(request, owner_view or variants["public"])
+
+@router.get("/{quiz_id}/questions/{question_id}", response_model=Union[schemas.Question, schemas.QuestionPublic])
+async def get_quiz_question(
+    quiz_id: uuid.UUID,
+    question_id: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: Optional[Principal] = Depends(get_optional_user)
+):
+    """A single question, read from the `questions` table without loading the rest of the quiz."""
+    row = (await db.execute(
+        select(
+            models.QuizQuestion.question_id,
+            models.QuizQuestion.type,
+            models.QuizQuestion.question,
+            models.QuizQuestion.options,
+            models.QuizQuestion.correct_answer,
+            models.QuizQuestion.explanation,
+            models.Quiz.created_by,
+        )
+        .join(models.Quiz, models.Quiz.id == models.QuizQuestion.quiz_id)
+        .where(models.QuizQuestion.quiz_id == quiz_id, models.QuizQuestion.question_id == question_id)
+        .order_by(models.QuizQuestion.position)
+        .limit(1)
+    )).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Question not found")
+
+    question = {"id": row.question_id, "type": row.type, "question": row.question, "options": row.options}
+    if current_user is not None and row.created_by == current_user.id:
+        return schemas.Question(**question, correctAnswer=row.correct_answer, explanation=row.explanation)
+    return schemas.QuestionPublic(**question)
+
+@router.put("/{quiz_id}/answer-key", response_model=schemas.QuizOut)
+async def update_answer_key(
+    quiz_id: uuid.UUID,
+    entries: List[schemas.AnswerKeyEntry],
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    """
+    Correct one or more questions' `correctAnswer` (or, for open-ended
+    questions, the `explanation` answers are graded against). Bumps the quiz
+    version and re-grades its existing results in the background.
+    """
+    quiz = await db.get(models.Quiz, quiz_id)
     if not quiz:
         raise HTTPException(status_code=404, detail="Quiz not found")
+
+    if quiz.created_by != current_user.id:
+        raise HTTPException(
+            status_code=403,
+            detail="You can only change the answer key of your own quizzes"
+        )
+
+    corrections = {entry.question_id: entry for entry in entries}
+    questions = []
+    for question in quiz.questions:
+        question = dict(question)
+        entry = corrections.pop(question["id"], None)
+        if entry is not None and entry.correctAnswer is not None:
+            if not 0 <= entry.correctAnswer < len(question.get("options") or []):
+                raise HTTPException(status_code=400, detail=f"correctAnswer out of range for question {question['id']}")
+            question["correctAnswer"] = entry.correctAnswer
+        if entry is not None and entry.explanation is not None:
+            question["explanation"] = entry.explanation
+        questions.append(question)
+    if corrections:
+        raise HTTPException(status_code=400, detail=f"Unknown question ids: {', '.join(corrections)}")
+
+    quiz.questions = questions  # bumps quiz.version
+    await db.commit()
+    await db.refresh(quiz)
+    background_tasks.add_task(regrade_quiz, quiz.id)
     return quiz
 
 @router.delete("/{quiz_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_quiz(
-    quiz_id: str,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+async def delete_quiz(
+    quiz_id: uuid.UUID,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
 ):
-    quiz = db.query(models.Quiz).filter(models.Quiz.id == quiz_id).first()
+    quiz = await db.get(models.Quiz, quiz_id)
     if not quiz:
         raise HTTPException(status_code=404, detail="Quiz not found")
 
@@ -79,6 +303,10 @@ def delete_quiz(
             detail="You are not allowed to delete this quiz"
         )
 
-    db.delete(quiz)
-    db.commit()
+    # The uploaded PDF is deleted too unless another job still holds the same bytes
+    released = await db.run_sync(release_quiz_uploads, quiz.id)
+    await db.delete(quiz)
+    await db.commit()
+    if released:
+        await db.run_sync(collect_garbage, released)
     return
@@ -0,0 +1,156 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Union
+
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.session import get_db
+from app.db import models, schemas
+from app.api.v1.users import get_current_user, get_token_principal
+from app.core.config import settings
+from app.core.principals import Principal, TokenPrincipal
+from app.core.sessions import ACTIVE, answer_buffer, buffer_answer, finish_session, load_session_state
+
+router = APIRouter(
+    prefix="/sessions",
+    tags=["Sessions"]
+)
+
+# ---------- Helpers ----------
+
+async def _session_out(db: AsyncSession, session: models.QuizSession) -> schemas.QuizSessionOut:
+    answered = set(await db.scalars(
+        select(models.QuizSessionAnswer.question_id).where(models.QuizSessionAnswer.session_id == session.id)
+    ))
+    if answer_buffer.blocking:
+        answered.update(await run_in_threadpool(answer_buffer.pending_questions, str(session.id)))
+    else:
+        answered.update(answer_buffer.pending_questions(str(session.id)))
+    return schemas.QuizSessionOut(
+        id=session.id,
+        quiz_id=session.quiz_id,
+        status=session.status,
+        started_at=session.started_at,
+        deadline=session.deadline,
+        finished_at=session.finished_at,
+        result_id=session.result_id,
+        answered=sorted(answered),
+    )
+
+
+async def _own_session_state(session_id: uuid.UUID, student_id: uuid.UUID):
+    state = await load_session_state(session_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    if state.student_id != student_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to access this session"
+        )
+    return state
+
+# ---------- Endpoints ----------
+
+@router.post("/", response_model=schemas.QuizSessionOut)
+async def start_session(
+    session_data: schemas.QuizSessionStart,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    """Start a timed attempt at a quiz, or resume the student's active one."""
+    if current_user.role != "student":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only students can take quizzes"
+        )
+
+    time_limit = (await db.execute(
+        select(models.Quiz.time_limit_seconds).where(models.Quiz.id == session_data.quiz_id)
+    )).first()
+    if time_limit is None:
+        raise HTTPException(status_code=404, detail="Quiz not found")
+
+    submitted = await db.scalar(select(models.QuizResult.id).where(
+        models.QuizResult.quiz_id == session_data.quiz_id,
+        models.QuizResult.student_id == current_user.id
+    ))
+    if submitted:
+        raise HTTPException(status_code=400, detail="You have already submitted this quiz")
+
+    own_session = select(models.QuizSession).where(
+        models.QuizSession.quiz_id == session_data.quiz_id,
+        models.QuizSession.student_id == current_user.id
+    )
+    session = await db.scalar(own_session)
+    if session is None:
+        now = datetime.now(timezone.utc)
+        session = models.QuizSession(
+            quiz_id=session_data.quiz_id,
+            student_id=current_user.id,
+            started_at=now,
+            deadline=now + timedelta(seconds=time_limit[0] or settings.QUIZ_SESSION_DURATION_SECONDS),
+        )
+        db.add(session)
+        try:
+            await db.commit()
+        except IntegrityError:
+            # Started twice at once (e.g. a double click): resume the other one
+            await db.rollback()
+            session = await db.scalar(own_session)
+    if session.status != ACTIVE:
+        raise HTTPException(status_code=400, detail="You have already submitted this quiz")
+    await load_session_state(session.id)  # cached for the answers that follow
+    return await _session_out(db, session)
+
+@router.get("/{session_id}", response_model=schemas.QuizSessionOut)
+async def get_session(
+    session_id: uuid.UUID,
+    db: AsyncSession = Depends(get_db),
+    current_user: Union[Principal, TokenPrincipal] = Depends(get_token_principal)
+):
+    """The session's deadline and status, and the questions answered so far (e.g. after a reconnect)."""
+    session = await db.get(models.QuizSession, session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    if session.student_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to access this session"
+        )
+    return await _session_out(db, session)
+
+@router.post("/{session_id}/answers", status_code=status.HTTP_204_NO_CONTENT)
+async def submit_answer(
+    session_id: uuid.UUID,
+    answer: schemas.SessionAnswer,
+    current_user: Union[Principal, TokenPrincipal] = Depends(get_token_principal)
+):
+    """
+    Save one answer (the latest answer to a question wins). Answers are
+    buffered and written in batches; they are graded when the session finishes.
+    """
+    state = await _own_session_state(session_id, current_user.id)
+    if not state.accepts_answers():
+        raise HTTPException(status_code=409, detail="This session has ended")
+    if answer.questionId not in state.question_ids:
+        raise HTTPException(status_code=404, detail="Question not found")
+    await buffer_answer(state, answer.dict())
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+@router.post("/{session_id}/finish", response_model=schemas.QuizResultOut)
+async def finish(
+    session_id: uuid.UUID,
+    db: AsyncSession = Depends(get_db),
+    current_user: Union[Principal, TokenPrincipal] = Depends(get_token_principal)
+):
+    """Grade the session's answers and return the result; repeating it (or finishing an expired session) returns the same result."""
+    await _own_session_state(session_id, current_user.id)
+    result_id = await run_in_threadpool(finish_session, session_id)
+    result = await db.get(models.QuizResult, result_id) if result_id is not None else None
+    if result is None:
+        raise HTTPException(status_code=404, detail="Result not found")
+    return result
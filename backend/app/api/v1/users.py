@@ -1,13 +1,16 @@
-from typing import Generator, Optional
+import uuid
+from typing import Optional, Tuple
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from pydantic import BaseModel, EmailStr
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from jose import jwt, JWTError
 
 from app.core.config import settings
-from app.core.security import get_password_hash
+from app.core.principals import Principal, TokenPrincipal, load_principal
+from app.core.security import hash_password_async
 from app.db import models, schemas
 from app.db.session import get_db
 
@@ -15,6 +18,7 @@ router = APIRouter()
 
 # OAuth2 scheme (tokenUrl should match where your login endpoint is mounted)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login", auto_error=False)
 
 
 # Local lightweight schema for public registration (no role field)
@@ -25,26 +29,67 @@ class UserRegistration(BaseModel):
     student_number: Optional[str] = None
 
 
-# Helper: get current user from JWT token
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
+# Helpers: resolve the principal from the JWT token
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+
+def _decode_token(token: str) -> Tuple[uuid.UUID, dict]:
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         sub = payload.get("sub")
         if sub is None:
-            raise credentials_exception
-        user_id = sub  # Keep as string since we're using UUIDs
-    except JWTError:
-        raise credentials_exception
+            raise _credentials_exception()
+        return uuid.UUID(sub), payload
+    except (JWTError, ValueError):
+        raise _credentials_exception()
 
-    user = db.query(models.User).filter(models.User.id == str(user_id)).first()
-    if not user:
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> Principal:
+    user_id, _ = _decode_token(token)
+    principal = await load_principal(db, user_id)
+    if principal is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return principal
+
+
+def token_user_id(token: str) -> Optional[uuid.UUID]:
+    """The user id in `token`, or None if it isn't valid; for WebSocket routes, which take the token as a query parameter."""
+    try:
+        user_id, _ = _decode_token(token)
+    except HTTPException:
+        return None
+    return user_id
+
+
+async def get_optional_user(token: Optional[str] = Depends(optional_oauth2_scheme), db: AsyncSession = Depends(get_db)) -> Optional[Principal]:
+    """For endpoints open to anonymous callers that show more to some users."""
+    if token is None:
+        return None
+    return await get_current_user(token, db)
+
+
+async def get_token_principal(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
+    """
+    For endpoints that only need the caller's id and role. With
+    AUTH_TRUST_TOKEN_ROLE the role claim is used as-is (a role change takes
+    effect when the token is reissued); otherwise this is get_current_user.
+    """
+    user_id, payload = _decode_token(token)
+    if settings.AUTH_TRUST_TOKEN_ROLE and payload.get("role"):
+        try:
+            return TokenPrincipal(id=user_id, role=models.RoleEnum(payload["role"]))
+        except ValueError:
+            raise _credentials_exception()
+
+    principal = await load_principal(db, user_id)
+    if principal is None:
         raise HTTPException(status_code=404, detail="User not found")
-    return user
+    return principal
 
 
 # --------------------------
@@ -52,18 +97,18 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
 # --------------------------
 
 @router.post("/register", response_model=schemas.UserOut, status_code=status.HTTP_201_CREATED)
-def register(user_in: UserRegistration, db: Session = Depends(get_db)):
+async def register(user_in: UserRegistration, db: AsyncSession = Depends(get_db)):
     """
     Self-registration endpoint (students by default).
     If you want to allow teacher signups, either use a separate admin flow
     or add verification step — by default this creates a student account.
     """
     # check duplicate email
-    existing = db.query(models.User).filter(models.User.email == user_in.email).first()
+    existing = await db.scalar(select(models.User).where(models.User.email == user_in.email))
     if existing:
         raise HTTPException(status_code=400, detail="Email already registered")
 
-    hashed_pw = get_password_hash(user_in.password)
+    hashed_pw = await hash_password_async(user_in.password)
 
     new_user = models.User(
         name=user_in.name,
@@ -73,14 +118,14 @@ def register(user_in: UserRegistration, db: Session = Depends(get_db)):
         student_number=user_in.student_number,
     )
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
 
     return new_user
 
 
 @router.get("/me", response_model=schemas.UserOut)
-def read_current_user(current_user: models.User = Depends(get_current_user)):
+async def read_current_user(current_user: Principal = Depends(get_current_user)):
     """
     Return current authenticated user's profile.
     """
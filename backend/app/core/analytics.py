@@ -0,0 +1,181 @@
+"""
+Per-quiz result analytics, maintained incrementally in `quiz_stats`.
+
+Each submission adds to running sums, a 10-bucket score histogram,
+per-question answered/correct counts and a time-spent quantile sketch, so
+reading the stats costs the same whether a quiz has ten results or a
+hundred thousand. `backfill_quiz_stats.py` rebuilds the rows from existing
+results.
+"""
+
+from collections import defaultdict
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from app.core.sketch import QuantileSketch
+from app.db import models
+
+HISTOGRAM_BUCKETS = 10  # 10% wide
+
+
+def score_bucket(score: int, total_questions: int) -> int:
+    if total_questions <= 0:
+        return 0
+    return max(0, min(HISTOGRAM_BUCKETS - 1, score * HISTOGRAM_BUCKETS // total_questions))
+
+
+def score_percent(score: int, total_questions: int) -> float:
+    return score / total_questions * 100 if total_questions > 0 else 0.0
+
+
+def new_stats(quiz_id) -> models.QuizStats:
+    return models.QuizStats(
+        quiz_id=quiz_id,
+        submissions=0,
+        score_sum=0,
+        percent_sum=0.0,
+        time_spent_sum=0,
+        score_histogram=[0] * HISTOGRAM_BUCKETS,
+        question_counts={},
+        time_spent_sketch=QuantileSketch().to_dict(),
+    )
+
+
+def apply_result(stats: models.QuizStats, score: int, total_questions: int, time_spent: int, answers: Iterable[dict]) -> None:
+    """Fold one submission into `stats` (JSON columns are replaced so the ORM sees the change)."""
+    apply_results(stats, [(score, total_questions, time_spent, answers)])
+
+
+def apply_results(stats: models.QuizStats, results: Iterable[Tuple[int, int, int, Iterable[dict]]]) -> None:
+    """Fold (score, total_questions, time_spent, answers) submissions into `stats`, decoding its JSON columns once."""
+    histogram = list(stats.score_histogram)
+    question_counts = {key: list(value) for key, value in stats.question_counts.items()}
+    sketch = QuantileSketch.from_dict(stats.time_spent_sketch)
+    for score, total_questions, time_spent, answers in results:
+        stats.submissions += 1
+        stats.score_sum += score
+        stats.percent_sum += score_percent(score, total_questions)
+        stats.time_spent_sum += time_spent
+        histogram[score_bucket(score, total_questions)] += 1
+        for answer in answers:
+            counts = question_counts.setdefault(str(answer["questionId"]), [0, 0])
+            counts[0] += 1
+            counts[1] += 1 if answer.get("isCorrect") else 0
+        sketch.add(time_spent)
+    stats.score_histogram = histogram
+    stats.question_counts = question_counts
+    stats.time_spent_sketch = sketch.to_dict()
+
+
+def lock_stats(db, quiz_id) -> models.QuizStats:
+    """
+    Return the quiz's stats row locked for update, creating it if needed.
+    Pending objects are flushed first so a lost creation race only rolls back
+    the savepoint holding the stats insert.
+    """
+    query = select(models.QuizStats).where(models.QuizStats.quiz_id == quiz_id).with_for_update()
+    stats = db.scalar(query)
+    if stats is not None:
+        return stats
+
+    db.flush()
+    try:
+        with db.begin_nested():
+            stats = new_stats(quiz_id)
+            db.add(stats)
+        return stats
+    except IntegrityError:
+        # Another submission created the row first
+        return db.scalar(query.execution_options(populate_existing=True))
+
+
+def record_result(db, result: models.QuizResult) -> None:
+    """Add a new result to its quiz's stats within the caller's transaction (sync session)."""
+    stats = lock_stats(db, result.quiz_id)
+    apply_result(stats, result.score, result.total_questions, result.time_spent, result.answers)
+
+
+def record_results(db, quiz_id, results: Iterable[Tuple[int, int, int, Iterable[dict]]]) -> None:
+    """`record_result` for results inserted without the ORM, e.g. a bulk import."""
+    apply_results(lock_stats(db, quiz_id), results)
+
+
+def rebuild_quiz_stats(db, quiz_id) -> int:
+    """
+    Recompute one quiz's stats row from its results with NumPy; returns the
+    number of results. The row is locked before the results are read, so a
+    concurrent submission is either counted here or added on top afterwards.
+    """
+    stats = lock_stats(db, quiz_id)
+
+    rows = db.execute(
+        select(
+            models.QuizResult.score,
+            models.QuizResult.total_questions,
+            models.QuizResult.time_spent,
+            models.QuizResult.answers,
+        ).where(models.QuizResult.quiz_id == quiz_id)
+    ).all()
+
+    scores = np.fromiter((row.score for row in rows), dtype=np.int64, count=len(rows))
+    totals = np.fromiter((row.total_questions for row in rows), dtype=np.int64, count=len(rows))
+    times = np.fromiter((row.time_spent for row in rows), dtype=np.int64, count=len(rows))
+
+    valid = totals > 0
+    safe_totals = np.where(valid, totals, 1)
+    percents = np.where(valid, scores / safe_totals * 100, 0.0)
+    buckets = np.where(valid, np.clip(scores * HISTOGRAM_BUCKETS // safe_totals, 0, HISTOGRAM_BUCKETS - 1), 0)
+
+    question_counts = defaultdict(lambda: [0, 0])
+    for row in rows:
+        for answer in row.answers or []:
+            counts = question_counts[str(answer["questionId"])]
+            counts[0] += 1
+            counts[1] += 1 if answer.get("isCorrect") else 0
+
+    sketch = QuantileSketch()
+    sketch.add_many(times)
+
+    stats.submissions = len(rows)
+    stats.score_sum = int(scores.sum())
+    stats.percent_sum = float(percents.sum())
+    stats.time_spent_sum = int(times.sum())
+    stats.score_histogram = np.bincount(buckets, minlength=HISTOGRAM_BUCKETS).tolist()
+    stats.question_counts = dict(question_counts)
+    stats.time_spent_sketch = sketch.to_dict()
+    return len(rows)
+
+
+def summarize(quiz_id, stats: Optional[models.QuizStats]) -> dict:
+    stats = stats or new_stats(quiz_id)
+    submissions = stats.submissions
+    sketch = QuantileSketch.from_dict(stats.time_spent_sketch)
+    width = 100 // HISTOGRAM_BUCKETS
+    return {
+        "quiz_id": quiz_id,
+        "submissions": submissions,
+        "average_score": stats.score_sum / submissions if submissions else None,
+        "average_percent": stats.percent_sum / submissions if submissions else None,
+        "score_histogram": [
+            {"min_percent": i * width, "max_percent": (i + 1) * width, "count": count}
+            for i, count in enumerate(stats.score_histogram)
+        ],
+        "questions": [
+            {
+                "question_id": question_id,
+                "answered": answered,
+                "correct": correct,
+                "correct_rate": correct / answered if answered else None,
+            }
+            for question_id, (answered, correct) in stats.question_counts.items()
+        ],
+        "time_spent_ms": {
+            "mean": stats.time_spent_sum / submissions if submissions else None,
+            "p50": sketch.quantile(0.5),
+            "p90": sketch.quantile(0.9),
+            "p99": sketch.quantile(0.99),
+        },
+    }
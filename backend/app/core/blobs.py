@@ -0,0 +1,188 @@
+"""
+Content-addressed store for uploaded files.
+
+Uploads are streamed to a temporary file in chunks, hashed (SHA-256) and
+size-checked while they are written, and rejected as soon as their first
+bytes show they are not a PDF. The file is then moved to
+`UPLOAD_DIR/<first two hex digits>/<sha256>`, so identical uploads share one
+copy on disk. The `blobs` table counts the upload jobs holding each file;
+`collect_garbage` deletes a blob once nothing references it any more (its
+upload failed, or the quizzes generated from it were deleted).
+"""
+
+import hashlib
+import os
+import uuid
+from contextlib import suppress
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+import anyio
+from fastapi import UploadFile
+from fastapi.responses import JSONResponse
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.core.config import settings
+from app.db.models import Blob
+from app.db.session import engine
+
+CHUNK_SIZE = 1024 * 1024
+# Readers accept a PDF header anywhere in the first 1024 bytes
+PDF_MAGIC = b"%PDF-"
+SNIFF_BYTES = 1024
+# Multipart boundaries and form fields sent along with the file
+FORM_OVERHEAD_BYTES = 64 * 1024
+
+_TEMP_DIR = os.path.join(settings.UPLOAD_DIR, "tmp")
+os.makedirs(_TEMP_DIR, exist_ok=True)
+
+
+class UploadRejected(Exception):
+    """The upload is not stored; `status_code` and `detail` are meant for the client."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class StagedUpload(NamedTuple):
+    temp_path: str
+    sha256: str
+    size: int
+
+
+def blob_path(sha256: str) -> str:
+    return os.path.join(settings.UPLOAD_DIR, sha256[:2], sha256)
+
+
+def _too_large(max_bytes: int) -> UploadRejected:
+    return UploadRejected(413, f"File exceeds the upload limit of {max_bytes} bytes")
+
+
+def _remove(path: str) -> None:
+    with suppress(FileNotFoundError):
+        os.remove(path)
+
+# ---------- Writing ----------
+
+async def stage_upload(upload: UploadFile, max_bytes: Optional[int] = None) -> StagedUpload:
+    """
+    Stream an upload to a temporary file, hashing it on the way. Raises
+    UploadRejected, leaving nothing behind, for files over `max_bytes`
+    (default `UPLOAD_MAX_BYTES`) or not starting like a PDF.
+    """
+    max_bytes = settings.UPLOAD_MAX_BYTES if max_bytes is None else max_bytes
+    if upload.size is not None and upload.size > max_bytes:
+        raise _too_large(max_bytes)
+
+    temp_path = os.path.join(_TEMP_DIR, uuid.uuid4().hex)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with await anyio.open_file(temp_path, "wb") as buffer:
+            chunk = await upload.read(SNIFF_BYTES)
+            if PDF_MAGIC not in chunk:
+                raise UploadRejected(400, "File is not a PDF")
+            while chunk:
+                size += len(chunk)
+                if size > max_bytes:
+                    raise _too_large(max_bytes)
+                digest.update(chunk)
+                await buffer.write(chunk)
+                chunk = await upload.read(CHUNK_SIZE)
+    except BaseException:
+        _remove(temp_path)
+        raise
+    return StagedUpload(temp_path, digest.hexdigest(), size)
+
+
+def _insert(model):
+    if engine.dialect.name == "postgresql":
+        return postgresql.insert(model)
+    if engine.dialect.name == "sqlite":
+        return sqlite.insert(model)
+    raise ValueError(f"The blob store is not supported on {engine.dialect.name}")
+
+
+def add_reference(db, staged: StagedUpload) -> str:
+    """
+    Count a new reference to the staged upload's content and move the file
+    into the store, or drop it if the same bytes are already stored. Returns
+    the blob's path. The caller commits.
+    """
+    db.execute(
+        _insert(Blob)
+        .values(sha256=staged.sha256, size=staged.size, ref_count=1)
+        .on_conflict_do_update(index_elements=[Blob.sha256], set_={"ref_count": Blob.ref_count + 1})
+    )
+    # The upsert holds the row until commit, so `collect_garbage` cannot delete the file in between
+    path = blob_path(staged.sha256)
+    if os.path.exists(path):
+        _remove(staged.temp_path)
+    else:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(staged.temp_path, path)
+    return path
+
+
+def discard_staged(staged: StagedUpload) -> None:
+    """Remove a staged upload that was never added to the store."""
+    _remove(staged.temp_path)
+
+# ---------- Garbage collection ----------
+
+def release(db, sha256: str) -> None:
+    """Drop one reference to a blob. The caller commits, then runs `collect_garbage`."""
+    db.execute(
+        update(Blob)
+        .where(Blob.sha256 == sha256, Blob.ref_count > 0)
+        .values(ref_count=Blob.ref_count - 1)
+    )
+
+
+def collect_garbage(db, sha256s: Optional[Iterable[str]] = None) -> int:
+    """
+    Delete unreferenced blobs, row and file, among `sha256s` (all of them
+    when None), committing after each. Returns the number deleted.
+    """
+    if sha256s is None:
+        sha256s = db.scalars(select(Blob.sha256).where(Blob.ref_count <= 0)).all()
+    deleted: List[str] = []
+    for sha256 in set(sha256s):
+        # The delete locks the row: an upload of the same bytes waits for the
+        # commit, then re-creates the row and stores its own copy of the file
+        result = db.execute(delete(Blob).where(Blob.sha256 == sha256, Blob.ref_count <= 0))
+        if result.rowcount:
+            _remove(blob_path(sha256))
+            deleted.append(sha256)
+        db.commit()
+    if deleted:
+        print(f"[BLOBS] Deleted {len(deleted)} unreferenced upload(s)")
+    return len(deleted)
+
+# ---------- Middleware ----------
+
+class UploadSizeLimit:
+    """
+    ASGI middleware answering 413 to POSTs whose Content-Length already
+    exceeds the limit of their path, before the body is read. `limits` maps
+    path prefixes to byte limits; the longest matching prefix applies.
+    """
+
+    def __init__(self, app, limits: Dict[str, int]):
+        self.app = app
+        self.limits = sorted(limits.items(), key=lambda item: len(item[0]), reverse=True)
+
+    def _limit(self, path: str) -> Optional[int]:
+        return next((max_bytes for prefix, max_bytes in self.limits if path.startswith(prefix)), None)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["method"] == "POST":
+            max_bytes = self._limit(scope["path"])
+            length = dict(scope["headers"]).get(b"content-length", b"")
+            if max_bytes is not None and length.isdigit() and int(length) > max_bytes + FORM_OVERHEAD_BYTES:
+                response = JSONResponse(status_code=413, content={"detail": _too_large(max_bytes).detail})
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
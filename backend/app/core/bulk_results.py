@@ -0,0 +1,190 @@
+"""
+Bulk result imports (`POST /results/bulk`), e.g. results synced from scanners
+grading paper exams offline.
+
+Submitting through `POST /results/` costs a quiz lookup, a duplicate check,
+an insert and a commit per result. An import validates every row first,
+loads its quizzes once, then takes the rows RESULTS_BULK_CHUNK_SIZE at a
+time: one query finds which of the students exist, one finds which
+(quiz_id, student_id) pairs already have a result, the rest are graded
+together per quiz and written with one COPY (a multi-row INSERT on SQLite)
+for the results and one for their `answers` rows. Each quiz's stats are
+updated once, and the whole import is one transaction. Rows that can't be
+imported are reported by position; the others are.
+
+A student can submit on their own between the duplicate check and the
+insert, which fails the whole transaction on UNIQUE(quiz_id, student_id).
+The import is then run again, and its last attempt inserts row by row in
+savepoints, so rows still colliding are reported as already submitted.
+"""
+
+import uuid
+from collections import defaultdict
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import select, tuple_
+from sqlalchemy.exc import IntegrityError
+
+from app.core.analytics import record_results
+from app.core.config import settings
+from app.core.grading import answer_key_for, grade_submissions
+from app.core.live_results import publish_results
+from app.db import models, schemas
+from app.db.session import SessionLocal
+
+Row = Tuple[int, schemas.QuizResultCreate]  # with its position in the request
+# (position, quiz id, `quiz_results` row, stats entry) of a graded result to insert
+NewResult = Tuple[int, uuid.UUID, Dict[str, Any], Tuple[int, int, int, List[dict]]]
+
+IMPORT_ATTEMPTS = 3  # the last one inserts row by row
+ALREADY_SUBMITTED = "This student has already submitted this quiz"
+
+
+def _chunks(items: Sequence, size: int) -> Iterator[Sequence]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _validate(items: List[Any]) -> Tuple[List[Row], Dict[int, str]]:
+    rows, errors = [], {}
+    for position, item in enumerate(items):
+        if isinstance(item, ValueError):
+            errors[position] = f"Invalid JSON: {item}"
+            continue
+        try:
+            rows.append((position, schemas.QuizResultCreate.model_validate(item)))
+        except ValidationError as e:
+            errors[position] = "; ".join(
+                f"{'.'.join(str(part) for part in error['loc']) or 'result'}: {error['msg']}" for error in e.errors()
+            )
+    return rows, errors
+
+
+def _insert(db, new_results: List[NewResult], row_by_row: bool, errors: Dict[int, str]) -> List[NewResult]:
+    """Write the results and their `answers` rows; returns those inserted."""
+    if not row_by_row:
+        models.copy_rows(db.connection(), models.QuizResult, [row for _, _, row, _ in new_results])
+        models.insert_answer_rows(db.connection(), {row["id"]: row["answers"] for _, _, row, _ in new_results})
+        return new_results
+
+    inserted = []
+    for new_result in new_results:
+        position, _, row, _ = new_result
+        try:
+            with db.begin_nested():
+                models.copy_rows(db.connection(), models.QuizResult, [row])
+                models.insert_answer_rows(db.connection(), {row["id"]: row["answers"]})
+        except IntegrityError:
+            errors[position] = ALREADY_SUBMITTED
+            continue
+        inserted.append(new_result)
+    return inserted
+
+
+def _import(db, teacher_id: uuid.UUID, rows: List[Row], row_by_row: bool = False) -> Tuple[int, Dict[int, str]]:
+    errors: Dict[int, str] = {}
+    parsed = []
+    for position, result in rows:
+        try:
+            parsed.append((position, result, uuid.UUID(result.quiz_id), uuid.UUID(result.student_id)))
+        except ValueError:
+            errors[position] = "Invalid quiz_id or student_id"
+
+    quiz_ids = {quiz_id for _, _, quiz_id, _ in parsed}
+    quizzes = {quiz.id: quiz for quiz in db.scalars(
+        select(models.Quiz).where(models.Quiz.id.in_(quiz_ids), models.Quiz.created_by == teacher_id)
+    )} if quiz_ids else {}
+
+    first_row: Dict[Tuple[uuid.UUID, uuid.UUID], int] = {}
+    candidates = []
+    for position, result, quiz_id, student_id in parsed:
+        if quiz_id not in quizzes:
+            errors[position] = "Quiz not found"
+        elif (quiz_id, student_id) in first_row:
+            errors[position] = f"Duplicate of row {first_row[quiz_id, student_id]}"
+        else:
+            first_row[quiz_id, student_id] = position
+            candidates.append((position, result, quiz_id, student_id))
+
+    stats_rows: Dict[uuid.UUID, list] = defaultdict(list)
+    for chunk in _chunks(candidates, settings.RESULTS_BULK_CHUNK_SIZE):
+        students = set(db.scalars(select(models.User.id).where(
+            models.User.id.in_({student_id for *_, student_id in chunk}),
+            models.User.role == models.RoleEnum.student
+        )))
+        submitted = {tuple(row) for row in db.execute(
+            select(models.QuizResult.quiz_id, models.QuizResult.student_id).where(
+                tuple_(models.QuizResult.quiz_id, models.QuizResult.student_id).in_([(q, s) for *_, q, s in chunk])
+            )
+        )}
+
+        by_quiz = defaultdict(list)
+        for position, result, quiz_id, student_id in chunk:
+            if student_id not in students:
+                errors[position] = "Student not found"
+            elif (quiz_id, student_id) in submitted:
+                errors[position] = ALREADY_SUBMITTED
+            else:
+                by_quiz[quiz_id].append((position, result, student_id))
+
+        new_results: List[NewResult] = []
+        for quiz_id, group in by_quiz.items():
+            key = answer_key_for(quizzes[quiz_id])
+            graded = grade_submissions(key, [result.model_dump(include={"answers"})["answers"] for _, result, _ in group])
+            for (position, result, student_id), (answers, score) in zip(group, graded):
+                new_results.append((position, quiz_id, {
+                    "id": uuid.uuid4(),
+                    "quiz_id": quiz_id,
+                    "student_id": student_id,
+                    "student_name": result.student_name,
+                    "student_number": result.student_number,
+                    "answers": answers,
+                    "score": score,
+                    "total_questions": key.total_questions,
+                    "time_spent": result.time_spent,
+                }, (score, key.total_questions, result.time_spent, answers)))
+        if not new_results:
+            continue
+
+        result_ids = defaultdict(list)
+        for _, quiz_id, row, stats_entry in _insert(db, new_results, row_by_row, errors):
+            stats_rows[quiz_id].append(stats_entry)
+            result_ids[quiz_id].append(row["id"])
+        # Core INSERTs fire no ORM events, so the live feed is told explicitly
+        for quiz_id, ids in result_ids.items():
+            publish_results(db, quiz_id, ids)
+
+    for quiz_id, results in stats_rows.items():
+        record_results(db, quiz_id, results)
+    return sum(len(results) for results in stats_rows.values()), errors
+
+
+def import_results(teacher_id: uuid.UUID, items: List[Any]) -> Tuple[int, Dict[int, str]]:
+    """
+    Validate, grade and insert results for the teacher's quizzes (`items` are
+    parsed JSON, or the ValueError of a line that didn't parse), with a session
+    of its own; returns the number inserted and the error of each row that wasn't.
+    """
+    rows, invalid = _validate(items)
+    db = SessionLocal()
+    try:
+        for attempt in range(1, IMPORT_ATTEMPTS + 1):
+            try:
+                inserted, errors = _import(db, teacher_id, rows, row_by_row=attempt == IMPORT_ATTEMPTS)
+                db.commit()
+                break
+            except IntegrityError:
+                # A student submitted on their own between the duplicate check and the insert
+                db.rollback()
+                if attempt == IMPORT_ATTEMPTS:
+                    raise
+                print(f"[RESULTS] Import attempt {attempt} collided with a new submission; retrying")
+        errors.update(invalid)
+        print(f"[RESULTS] Imported {inserted} of {len(items)} results ({len(errors)} rejected)")
+        return inserted, errors
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
@@ -0,0 +1,222 @@
+"""
+Content-addressed cache for extracted PDF text and generated quizzes.
+
+Entries are keyed by the SHA-256 of the uploaded bytes (plus question type,
+question count and prompt version for quizzes) and live in two tiers:
+- a per-process in-memory LRU
+- a shared on-disk directory, evicted oldest-access-first once it grows past
+  `CACHE_DISK_MAX_BYTES`
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from app.core.config import settings
+from app.core.llm import PROMPT_VERSION
+
+# ---------- Tiers ----------
+
+class LRUCache:
+    """Thread-safe in-memory LRU bounded by entry count."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class TTLCache(LRUCache):
+    """LRU whose entries also expire `ttl` seconds after they were set."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        super().__init__(max_entries)
+        self.ttl = ttl
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = super().get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self.delete(key)
+            return None
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        super().set(key, (time.monotonic() + self.ttl, value))
+
+
+class DiskCache:
+    """
+    JSON files under `directory`, one per key. Reads refresh the file mtime so
+    eviction removes the least recently used entries first.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._size = sum(size for _, size, _ in self._entries())
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _entries(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+    def get(self, key: str) -> Optional[Any]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = json.dumps(value).encode("utf-8")
+        if len(data) > self.max_bytes:
+            return
+
+        # Write to a temp file and rename so concurrent readers never see partial JSON
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        with self._lock:
+            previous = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+            self._size += len(data) - previous
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        # Caller holds the lock. Other processes share the directory, so re-scan it.
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        self._size = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if self._size <= self.max_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+                self._size -= size
+            except FileNotFoundError:
+                pass
+
+    def size_bytes(self) -> int:
+        return self._size
+
+
+class TieredCache:
+    """Memory LRU in front of a disk cache, with hit/miss counters per tier."""
+
+    def __init__(self, name: str, memory_entries: int, disk_dir: str, disk_max_bytes: int):
+        self.name = name
+        self.memory = LRUCache(memory_entries)
+        self.disk = DiskCache(disk_dir, disk_max_bytes)
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self.memory.get(key)
+        if value is not None:
+            self.memory_hits += 1
+            return value
+
+        value = self.disk.get(key)
+        if value is not None:
+            self.disk_hits += 1
+            self.memory.set(key, value)
+            return value
+
+        self.misses += 1
+        return None
+
+    def set(self, key: str, value: Any) -> None:
+        self.memory.set(key, value)
+        self.disk.set(key, value)
+
+    def stats(self) -> dict:
+        hits = self.memory_hits + self.disk_hits
+        lookups = hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "memory_entries": len(self.memory),
+            "disk_bytes": self.disk.size_bytes(),
+        }
+
+# ---------- Caches ----------
+
+text_cache = TieredCache(
+    "text",
+    settings.CACHE_MEMORY_ENTRIES,
+    os.path.join(settings.CACHE_DIR, "text"),
+    settings.CACHE_DISK_MAX_BYTES,
+)
+quiz_cache = TieredCache(
+    "quiz",
+    settings.CACHE_MEMORY_ENTRIES,
+    os.path.join(settings.CACHE_DIR, "quiz"),
+    settings.CACHE_DISK_MAX_BYTES,
+)
+
+
+def quiz_cache_key(content_sha256: str, question_type: str, num_questions: Optional[int] = None) -> str:
+    num_questions = num_questions or settings.QUIZ_NUM_QUESTIONS
+    return hashlib.sha256(
+        f"{content_sha256}:{question_type}:{num_questions}:{PROMPT_VERSION}".encode()
+    ).hexdigest()
+
+
+def cache_stats() -> dict:
+    return {"text": text_cache.stats(), "quiz": quiz_cache.stats()}
@@ -0,0 +1,53 @@
+"""
+Split extracted document text into chunks that respect paragraph and sentence
+boundaries, so each LLM call sees a coherent passage instead of a hard cut.
+"""
+
+import re
+from typing import List
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def _split_long(paragraph: str, max_chars: int) -> List[str]:
+    """Break an oversized paragraph at sentence ends, falling back to a hard cut."""
+    pieces: List[str] = []
+    for sentence in _SENTENCE_END.split(paragraph):
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            pieces.append(sentence[:cut])
+            sentence = sentence[cut:].lstrip()
+        if sentence:
+            pieces.append(sentence)
+    return pieces
+
+
+def split_into_chunks(text: str, max_chars: int = 4000) -> List[str]:
+    """
+    Pack paragraphs (then sentences, for paragraphs longer than `max_chars`)
+    into chunks of at most `max_chars` characters, preserving document order.
+    """
+    units: List[str] = []
+    for paragraph in _PARAGRAPH_BREAK.split(text):
+        paragraph = " ".join(paragraph.split())
+        if not paragraph:
+            continue
+        if len(paragraph) > max_chars:
+            units.extend(_split_long(paragraph, max_chars))
+        else:
+            units.append(paragraph)
+
+    chunks: List[str] = []
+    current: List[str] = []
+    current_len = 0
+    for unit in units:
+        if current and current_len + len(unit) > max_chars:
+            chunks.append("\n\n".join(current))
+            current, current_len = [], 0
+        current.append(unit)
+        current_len += len(unit) + 2
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
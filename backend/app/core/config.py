@@ -8,6 +8,17 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24  # 1 day
     ALGORITHM: str = "HS256"
 
+    # Password hashing (bcrypt cost; existing hashes are upgraded on login when it changes)
+    PASSWORD_BCRYPT_ROUNDS: int = int(os.getenv("PASSWORD_BCRYPT_ROUNDS", "12"))
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+    PASSWORD_HASH_MAX_PENDING: int = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))  # beyond this, 503
+
+    # Authenticated principal cache (0 entries disables it)
+    AUTH_PRINCIPAL_CACHE_ENTRIES: int = int(os.getenv("AUTH_PRINCIPAL_CACHE_ENTRIES", "10000"))
+    AUTH_PRINCIPAL_CACHE_TTL: float = float(os.getenv("AUTH_PRINCIPAL_CACHE_TTL", "60"))  # seconds
+    # Let role-only endpoints use the token's role claim without loading the user
+    AUTH_TRUST_TOKEN_ROLE: bool = os.getenv("AUTH_TRUST_TOKEN_ROLE", "false").lower() in ("1", "true", "yes")
+
     # Supabase Configuration
     SUPABASE_URL: str = os.getenv("SUPABASE_URL", "")
     SUPABASE_KEY: str = os.getenv("SUPABASE_KEY", "")
@@ -21,6 +32,125 @@ class Settings(BaseSettings):
     POSTGRES_PORT: str = os.getenv("POSTGRES_PORT", "5432")
     POSTGRES_DB: str = os.getenv("POSTGRES_DB", "eduportal")
 
+    # Database engine / pool
+    DB_ASYNC: bool = os.getenv("DB_ASYNC", "false").lower() in ("1", "true", "yes")
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+    DB_STATEMENT_CACHE_SIZE: int = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))  # asyncpg; 0 behind PgBouncer
+
+    # Background jobs ('inprocess' runs workers inside the API, 'redis' uses app.worker)
+    JOB_BACKEND: str = os.getenv("JOB_BACKEND", "inprocess")
+    JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", "2"))
+    # Jobs queued or in progress this long without a change are requeued (the worker stopped mid-job)
+    JOB_STALE_SECONDS: float = float(os.getenv("JOB_STALE_SECONDS", "1800"))
+    JOB_SWEEP_INTERVAL: float = float(os.getenv("JOB_SWEEP_INTERVAL", "60"))  # seconds between checks
+    JOB_MAX_ATTEMPTS: int = int(os.getenv("JOB_MAX_ATTEMPTS", "2"))  # then a stalled job fails
+    REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379")
+
+    # PDF extraction
+    PDF_EXTRACT_WORKERS: int = int(os.getenv("PDF_EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+    PDF_PARALLEL_MIN_PAGES: int = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "64"))
+    PDF_PAGES_PER_TASK: int = int(os.getenv("PDF_PAGES_PER_TASK", "16"))
+    PDF_MAX_EXTRACT_CHARS: int = int(os.getenv("PDF_MAX_EXTRACT_CHARS", "200000"))  # 0 = no limit
+    # Files this large are extracted in a process of their own, with a heap limit and a timeout (0 = never)
+    PDF_LARGE_DOCUMENT_BYTES: int = int(os.getenv("PDF_LARGE_DOCUMENT_BYTES", str(32 * 1024 * 1024)))
+    PDF_LARGE_MEMORY_LIMIT_BYTES: int = int(os.getenv("PDF_LARGE_MEMORY_LIMIT_BYTES", str(1024 * 1024 * 1024)))
+    PDF_LARGE_TIMEOUT_SECONDS: float = float(os.getenv("PDF_LARGE_TIMEOUT_SECONDS", "300"))
+    PDF_LARGE_WINDOW_PAGES: int = int(os.getenv("PDF_LARGE_WINDOW_PAGES", "64"))  # pages parsed between cache resets
+
+    # Uploads, stored once per distinct content under UPLOAD_DIR
+    UPLOAD_DIR: str = os.getenv("UPLOAD_DIR", "uploads")
+    UPLOAD_MAX_BYTES: int = int(os.getenv("UPLOAD_MAX_BYTES", str(50 * 1024 * 1024)))
+    # POST /files/upload-batch: PDFs (zipped or not) per request, their total size, documents extracted at once
+    UPLOAD_BATCH_MAX_FILES: int = int(os.getenv("UPLOAD_BATCH_MAX_FILES", "50"))
+    UPLOAD_BATCH_MAX_BYTES: int = int(os.getenv("UPLOAD_BATCH_MAX_BYTES", str(500 * 1024 * 1024)))
+    UPLOAD_BATCH_EXTRACT_CONCURRENCY: int = int(os.getenv("UPLOAD_BATCH_EXTRACT_CONCURRENCY", "4"))
+
+    # LLM gateway
+    OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
+    LLM_PROVIDER: str = os.getenv("LLM_PROVIDER", "openai")  # 'openai' or 'fake' (offline)
+    LLM_MODEL: str = os.getenv("LLM_MODEL", "gpt-3.5-turbo")
+    LLM_BASE_URL: str = os.getenv("LLM_BASE_URL", "")  # any OpenAI-compatible server, e.g. a local mock
+    LLM_FAKE_LATENCY_MS: int = int(os.getenv("LLM_FAKE_LATENCY_MS", "0"))
+    LLM_MAX_CONNECTIONS: int = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+    LLM_REQUESTS_PER_MINUTE: int = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "500"))
+    LLM_TOKENS_PER_MINUTE: int = int(os.getenv("LLM_TOKENS_PER_MINUTE", "200000"))
+    LLM_ESTIMATED_COMPLETION_TOKENS: int = int(os.getenv("LLM_ESTIMATED_COMPLETION_TOKENS", "1000"))
+    LLM_MAX_RETRIES: int = int(os.getenv("LLM_MAX_RETRIES", "5"))
+    LLM_RETRY_BASE_DELAY: float = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))
+    LLM_RETRY_MAX_DELAY: float = float(os.getenv("LLM_RETRY_MAX_DELAY", "20"))
+    LLM_TIMEOUT_SECONDS: float = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+
+    # Question generation
+    LLM_CHUNK_CHARS: int = int(os.getenv("LLM_CHUNK_CHARS", "4000"))
+    LLM_MAX_CHUNKS: int = int(os.getenv("LLM_MAX_CHUNKS", "8"))
+    LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+    LLM_DEDUP_THRESHOLD: float = float(os.getenv("LLM_DEDUP_THRESHOLD", "0.8"))
+    QUIZ_NUM_QUESTIONS: int = int(os.getenv("QUIZ_NUM_QUESTIONS", "5"))
+    QUIZ_MAX_QUESTIONS: int = int(os.getenv("QUIZ_MAX_QUESTIONS", "50"))
+
+    # Content-addressed cache for extracted text and generated quizzes
+    CACHE_DIR: str = os.getenv("CACHE_DIR", "cache")
+    CACHE_MEMORY_ENTRIES: int = int(os.getenv("CACHE_MEMORY_ENTRIES", "256"))
+    CACHE_DISK_MAX_BYTES: int = int(os.getenv("CACHE_DISK_MAX_BYTES", str(512 * 1024 * 1024)))
+
+    # Pre-serialized GET /quizzes/{id} and GET /quizzes/ responses with ETags (0 entries disables caching)
+    RESPONSE_CACHE_ENTRIES: int = int(os.getenv("RESPONSE_CACHE_ENTRIES", "1024"))
+    RESPONSE_CACHE_TTL: float = float(os.getenv("RESPONSE_CACHE_TTL", "10"))  # seconds; bounds staleness across processes
+    # Share quiz responses between processes through Redis (REDIS_URL)
+    RESPONSE_CACHE_REDIS: bool = os.getenv("RESPONSE_CACHE_REDIS", "false").lower() in ("1", "true", "yes")
+    RESPONSE_CACHE_REDIS_TTL: int = int(os.getenv("RESPONSE_CACHE_REDIS_TTL", "60"))  # seconds
+
+    # Live results feed (WebSocket /results/quiz/{id}/live); 'redis' fans out to every API process (REDIS_URL)
+    LIVE_RESULTS_BACKEND: str = os.getenv("LIVE_RESULTS_BACKEND", "inprocess")
+    LIVE_RESULTS_COALESCE_SECONDS: float = float(os.getenv("LIVE_RESULTS_COALESCE_SECONDS", "0.25"))  # events sent together
+    LIVE_RESULTS_MAX_PENDING: int = int(os.getenv("LIVE_RESULTS_MAX_PENDING", "500"))  # unsent results before a dashboard must reload
+
+    # Server-side grading
+    GRADING_KEY_CACHE_ENTRIES: int = int(os.getenv("GRADING_KEY_CACHE_ENTRIES", "1024"))
+    GRADING_BATCH_SIZE: int = int(os.getenv("GRADING_BATCH_SIZE", "1000"))
+
+    # Bulk result imports (POST /results/bulk)
+    RESULTS_BULK_MAX_ROWS: int = int(os.getenv("RESULTS_BULK_MAX_ROWS", "50000"))  # per request; beyond this, 413
+    RESULTS_BULK_CHUNK_SIZE: int = int(os.getenv("RESULTS_BULK_CHUNK_SIZE", "1000"))  # rows checked and inserted together
+
+    # Live quiz sessions: answers buffered ('inprocess', or 'redis' to share them and keep them across restarts)
+    QUIZ_SESSION_BUFFER: str = os.getenv("QUIZ_SESSION_BUFFER", "inprocess")
+    # API processes, as given to uvicorn/gunicorn; 'inprocess' buffering needs exactly one
+    WEB_CONCURRENCY: int = int(os.getenv("WEB_CONCURRENCY", "1"))
+    QUIZ_SESSION_DURATION_SECONDS: int = int(os.getenv("QUIZ_SESSION_DURATION_SECONDS", "3600"))  # quizzes without a time limit
+    QUIZ_SESSION_GRACE_SECONDS: float = float(os.getenv("QUIZ_SESSION_GRACE_SECONDS", "2"))  # answers in flight at the deadline
+    QUIZ_SESSION_FLUSH_INTERVAL: float = float(os.getenv("QUIZ_SESSION_FLUSH_INTERVAL", "0.5"))  # seconds
+    QUIZ_SESSION_FLUSH_BATCH: int = int(os.getenv("QUIZ_SESSION_FLUSH_BATCH", "2000"))  # sessions written per transaction
+    QUIZ_SESSION_CACHE_ENTRIES: int = int(os.getenv("QUIZ_SESSION_CACHE_ENTRIES", "10000"))
+
+    # Open-ended grading ('semantic' compares answers to the explanation, 'completion' accepts any answer)
+    OPEN_ENDED_GRADING: str = os.getenv("OPEN_ENDED_GRADING", "semantic")
+    # 'hashing' (hashed TF-IDF, no extra dependencies) or a sentence-transformers model, e.g. all-MiniLM-L6-v2
+    EMBEDDING_MODEL: str = os.getenv("EMBEDDING_MODEL", "hashing")
+    EMBEDDING_BATCH_SIZE: int = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+    EMBEDDING_HASH_DIM: int = int(os.getenv("EMBEDDING_HASH_DIM", "4096"))
+    EMBEDDING_MATCH_THRESHOLD: float = float(os.getenv("EMBEDDING_MATCH_THRESHOLD", "0"))  # 0 = the model's default
+    EMBEDDING_CONFIDENCE_MARGIN: float = float(os.getenv("EMBEDDING_CONFIDENCE_MARGIN", "0.15"))
+    EMBEDDING_CACHE_MEMORY_ENTRIES: int = int(os.getenv("EMBEDDING_CACHE_MEMORY_ENTRIES", "10000"))
+
+    # Question bank (generated questions kept per teacher, near-duplicates found with MinHash/LSH)
+    QUESTION_BANK_ENABLED: bool = os.getenv("QUESTION_BANK_ENABLED", "true").lower() in ("1", "true", "yes")
+    QUESTION_BANK_NUM_PERM: int = int(os.getenv("QUESTION_BANK_NUM_PERM", "128"))  # changing it invalidates stored signatures
+    QUESTION_BANK_THRESHOLD: float = float(os.getenv("QUESTION_BANK_THRESHOLD", "0.8"))  # estimated token Jaccard
+    # Drop generated questions that duplicate another document's bank entries (the quiz is topped up instead)
+    QUESTION_BANK_SKIP_DUPLICATES: bool = os.getenv("QUESTION_BANK_SKIP_DUPLICATES", "true").lower() in ("1", "true", "yes")
+    QUESTION_BANK_TOPUP_CANDIDATES: int = int(os.getenv("QUESTION_BANK_TOPUP_CANDIDATES", "500"))
+    QUESTION_BANK_MIN_RELEVANCE: float = float(os.getenv("QUESTION_BANK_MIN_RELEVANCE", "0.5"))  # share of words found in the document
+
+    # Full-text search (Postgres tsvector/GIN, SQLite FTS5)
+    SEARCH_DOCUMENT_MAX_CHARS: int = int(os.getenv("SEARCH_DOCUMENT_MAX_CHARS", "20000"))  # extracted text indexed per quiz
+    SEARCH_MAX_RESULTS: int = int(os.getenv("SEARCH_MAX_RESULTS", "1000"))  # deepest hit reachable by paging
+    # Broader queries rank only their newest matches, which bounds the cost of very common words
+    SEARCH_MAX_CANDIDATES: int = int(os.getenv("SEARCH_MAX_CANDIDATES", "5000"))
+
     @property
     def DATABASE_URL(self) -> str:
         # Use Supabase database URL if provided
@@ -33,6 +163,16 @@ class Settings(BaseSettings):
             f"@{self.POSTGRES_SERVER}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
         )
 
+    @property
+    def ASYNC_DATABASE_URL(self) -> str:
+        url = self.DATABASE_URL
+        for prefix in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+            if url.startswith(prefix):
+                return "postgresql+asyncpg://" + url[len(prefix):]
+        if url.startswith("sqlite://"):
+            return "sqlite+aiosqlite://" + url[len("sqlite://"):]
+        return url
+
     class Config:
         env_file = ".env"
 
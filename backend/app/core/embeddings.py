@@ -0,0 +1,244 @@
+"""
+Local, CPU-only text embeddings for grading open-ended answers.
+
+`EMBEDDING_MODEL` picks the encoder:
+- "hashing" (default): TF-IDF over hashed word unigrams and bigrams. No
+  model download or extra dependency; the IDF weights are fitted on a
+  corpus passed by the caller (the quiz's questions and explanations), so a
+  text gets the same vector whichever batch it is graded in.
+- any sentence-transformers model name (e.g. all-MiniLM-L6-v2), loaded once
+  per process on the CPU. Falls back to hashing if the package or the model
+  is unavailable.
+
+Vectors are cached by SHA-256 of (model, text) in a `TieredCache` under
+`CACHE_DIR/vectors`: every sentence-transformer vector, so re-grading only
+encodes answers it has not seen before, and the hashing encoder's reference
+answers (keyed by their IDF corpus too), which recur in every submission to
+a quiz. The hashing encoder also keeps the IDF weights fitted per corpus.
+"""
+
+import base64
+import hashlib
+import math
+import os
+import re
+import threading
+import zlib
+from collections import Counter
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.core.cache import LRUCache, TieredCache
+from app.core.config import settings
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were which with".split()
+)
+_SUFFIXES = ("ing", "ed", "es", "s")
+IDF_CACHE_ENTRIES = 256  # corpora (quizzes) whose IDF weights the hashing encoder keeps
+
+# ---------- Encoders ----------
+
+class HashingEmbedder:
+    """TF-IDF over hashed unigrams and bigrams, L2-normalized."""
+
+    name = "hashing"
+    cache_vectors = False  # answers are cheap to recompute and rarely repeat
+    cache_references = True
+    default_threshold = 0.35
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self._idf = LRUCache(IDF_CACHE_ENTRIES)
+
+    def fingerprint(self, corpus: Optional[Sequence[str]]) -> str:
+        """Identifies what a vector depends on besides its text: the dimension and the IDF corpus."""
+        digest = hashlib.sha256()
+        for text in corpus or ():
+            digest.update(text.encode("utf-8"))
+            digest.update(b"\0")
+        return f"{self.dim}:{digest.hexdigest()}"
+
+    @staticmethod
+    def _terms(text: str) -> List[str]:
+        words = []
+        for word in _WORD_RE.findall(text.lower()):
+            if word in _STOPWORDS:
+                continue
+            for suffix in _SUFFIXES:
+                if len(word) > len(suffix) + 3 and word.endswith(suffix):
+                    word = word[: -len(suffix)]
+                    break
+            words.append(word)
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def _term_frequencies(self, texts: Sequence[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for term, count in Counter(self._terms(text)).items():
+                h = zlib.crc32(term.encode("utf-8"))
+                sign = 1.0 if h & 0x80000000 else -1.0
+                matrix[row, h % self.dim] += sign * (1.0 + math.log(count))
+        return matrix
+
+    def _fit(self, reference: np.ndarray) -> np.ndarray:
+        df = np.count_nonzero(reference, axis=0)
+        return (np.log((1 + len(reference)) / (1 + df)) + 1.0).astype(np.float32)
+
+    def encode(self, texts: Sequence[str], corpus: Optional[Sequence[str]] = None) -> np.ndarray:
+        """IDF is fitted on `corpus` (once per corpus), or on `texts` themselves when it is not given."""
+        matrix = self._term_frequencies(texts)
+        if corpus:
+            fingerprint = self.fingerprint(corpus)
+            idf = self._idf.get(fingerprint)
+            if idf is None:
+                idf = self._fit(self._term_frequencies(corpus))
+                self._idf.set(fingerprint, idf)
+        else:
+            idf = self._fit(matrix)
+        return _normalize(matrix * idf)
+
+
+class SentenceTransformerEmbedder:
+    """A sentence-transformers model on the CPU."""
+
+    cache_vectors = True
+    cache_references = True
+    default_threshold = 0.6
+
+    def __init__(self, model_name: str, batch_size: int):
+        from sentence_transformers import SentenceTransformer
+
+        self.name = model_name
+        self.batch_size = batch_size
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self._lock = threading.Lock()  # one batch at a time; torch already uses every core
+
+    def encode(self, texts: Sequence[str], corpus: Optional[Sequence[str]] = None) -> np.ndarray:
+        with self._lock:
+            vectors = self.model.encode(
+                list(texts), batch_size=self.batch_size, normalize_embeddings=True, convert_to_numpy=True
+            )
+        return vectors.astype(np.float32)
+
+    def fingerprint(self, corpus: Optional[Sequence[str]]) -> str:
+        return ""  # the corpus plays no part
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms > 0, norms, 1.0)
+
+
+_embedder = None
+_embedder_lock = threading.Lock()
+
+
+def get_embedder():
+    global _embedder
+    if _embedder is None:
+        with _embedder_lock:
+            if _embedder is None:
+                _embedder = _load_embedder(settings.EMBEDDING_MODEL)
+    return _embedder
+
+
+def _load_embedder(model_name: str):
+    if model_name and model_name != HashingEmbedder.name:
+        try:
+            embedder = SentenceTransformerEmbedder(model_name, settings.EMBEDDING_BATCH_SIZE)
+            print(f"[EMBEDDINGS] Loaded {model_name} on CPU")
+            return embedder
+        except Exception as e:  # ImportError, or the model can't be downloaded/loaded
+            print(f"[EMBEDDINGS] Could not load {model_name} ({e}); using hashed TF-IDF")
+    return HashingEmbedder(settings.EMBEDDING_HASH_DIM)
+
+# ---------- Vector cache ----------
+
+vector_cache = TieredCache(
+    "vectors",
+    settings.EMBEDDING_CACHE_MEMORY_ENTRIES,
+    os.path.join(settings.CACHE_DIR, "vectors"),
+    settings.CACHE_DISK_MAX_BYTES,
+)
+
+
+def _vector_key(model_name: str, fingerprint: str, text: str) -> str:
+    return hashlib.sha256(f"{model_name}:{fingerprint}:{text}".encode("utf-8")).hexdigest()
+
+
+def _pack(vector: np.ndarray) -> dict:
+    return {"dtype": "float16", "data": base64.b64encode(vector.astype(np.float16).tobytes()).decode("ascii")}
+
+
+def _unpack(value: dict) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(value["data"]), dtype=value["dtype"]).astype(np.float32)
+
+
+def encode_texts(texts: Sequence[str], embedder=None, corpus: Optional[Sequence[str]] = None,
+                 references: bool = False) -> np.ndarray:
+    """
+    Embed `texts` in one batch (one row each, L2-normalized). Duplicates are
+    encoded once; when the model caches these texts (all of them, or only
+    `references`, the texts answers are compared with) only those missing
+    from the vector cache are encoded.
+    """
+    embedder = embedder or get_embedder()
+    unique = list(dict.fromkeys(texts))
+    vectors: Dict[str, np.ndarray] = {}
+
+    cached_texts = embedder.cache_references if references else embedder.cache_vectors
+    if cached_texts:
+        fingerprint = embedder.fingerprint(corpus)
+        keys = {text: _vector_key(embedder.name, fingerprint, text) for text in unique}
+        for text in unique:
+            cached = vector_cache.get(keys[text])
+            if cached is not None:
+                vectors[text] = _unpack(cached)
+    missing = [text for text in unique if text not in vectors]
+
+    if missing:
+        encoded = embedder.encode(missing, corpus=corpus)
+        for text, vector in zip(missing, encoded):
+            if cached_texts:
+                packed = _pack(vector)
+                vector_cache.set(keys[text], packed)
+                # As stored, so a score doesn't depend on whether the vector was cached
+                vector = _unpack(packed)
+            vectors[text] = vector
+
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+    return np.stack([vectors[text] for text in texts])
+
+
+def match_threshold(embedder=None) -> float:
+    embedder = embedder or get_embedder()
+    return settings.EMBEDDING_MATCH_THRESHOLD or embedder.default_threshold
+
+
+def similarities(references: Sequence[str], answers: Sequence[str], embedder=None,
+                 corpus: Optional[Sequence[str]] = None) -> np.ndarray:
+    """Cosine similarity of each answer to the reference at the same position."""
+    if not answers:
+        return np.zeros(0, dtype=np.float32)
+    embedder = embedder or get_embedder()
+    # References repeat in every submission to the quiz, so they are looked up separately
+    reference_vectors = encode_texts(references, embedder, corpus, references=True)
+    answer_vectors = encode_texts(answers, embedder, corpus)
+    return np.einsum("ij,ij->i", reference_vectors, answer_vectors)
+
+
+def confidence(similarity: np.ndarray, threshold: float) -> np.ndarray:
+    """0 at the threshold, rising linearly to 1 once EMBEDDING_CONFIDENCE_MARGIN away from it."""
+    return np.clip(np.abs(similarity - threshold) / settings.EMBEDDING_CONFIDENCE_MARGIN, 0.0, 1.0)
+
+
+def embedding_stats() -> dict:
+    return {
+        "model": _embedder.name if _embedder is not None else settings.EMBEDDING_MODEL,
+        "loaded": _embedder is not None,
+        "cache": vector_cache.stats(),
+    }
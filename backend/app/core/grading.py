@@ -0,0 +1,255 @@
+"""
+Server-side grading of quiz submissions against the stored answer key.
+
+Each quiz's questions are compiled once per version into an `AnswerKey`
+(question id -> position, array of correct option indices) and kept in a
+per-process LRU. Submissions are laid out as a results x questions matrix of
+selected options, so grading one submission or re-grading thousands after an
+answer-key fix is the same vectorized comparison.
+
+Open-ended answers are compared with the question's explanation through
+text embeddings (`app.core.embeddings`): every open-ended answer in a batch
+is encoded at once and counts as correct when its cosine similarity reaches
+the model's threshold; the answer also records the similarity and a 0-1
+confidence. Without an explanation, or with OPEN_ENDED_GRADING=completion,
+any non-empty answer counts as correct.
+"""
+
+import uuid
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import select, update
+
+from app.core.analytics import rebuild_quiz_stats
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.embeddings import confidence, match_threshold, similarities
+from app.db import models
+from app.db.session import SessionLocal
+
+NOT_ANSWERED = -1
+NO_KEY = -2  # question without a usable correctAnswer; nothing matches it
+INT32_MAX = np.iinfo(np.int32).max
+
+# ---------- Answer keys ----------
+
+@dataclass(frozen=True)
+class AnswerKey:
+    quiz_id: uuid.UUID
+    version: int
+    positions: Dict[str, int]  # question id -> column
+    correct: np.ndarray  # correct option index per column
+    option_counts: Tuple[int, ...]  # options per column; selections outside them count as not answered
+    open_ended: np.ndarray  # bool per column
+    references: Tuple[Optional[str], ...]  # model answer per open-ended column
+    corpus: Tuple[str, ...]  # question and explanation texts, for TF-IDF weights
+
+    @property
+    def total_questions(self) -> int:
+        return len(self.correct)
+
+
+@dataclass(frozen=True)
+class GradedBatch:
+    correct: np.ndarray  # bool, results x questions
+    scores: np.ndarray
+    columns: List[List[Optional[int]]]  # column each answer counted for, None if dropped
+    similarity: np.ndarray  # float, NaN where not graded semantically
+    threshold: float
+
+
+def compile_answer_key(quiz_id, version: int, questions: Sequence[dict]) -> AnswerKey:
+    positions: Dict[str, int] = {}
+    correct: List[int] = []
+    option_counts: List[int] = []
+    open_ended: List[bool] = []
+    references: List[Optional[str]] = []
+    corpus: List[str] = []
+    for question in questions:
+        corpus.extend(text for text in (question.get("question"), question.get("explanation")) if text)
+        question_id = str(question.get("id"))
+        if question_id in positions:
+            continue
+        positions[question_id] = len(correct)
+        answer = question.get("correctAnswer")
+        correct.append(answer if isinstance(answer, int) and 0 <= answer <= INT32_MAX else NO_KEY)
+        option_counts.append(len(question.get("options") or []))
+        is_open_ended = question.get("type") == "open-ended"
+        open_ended.append(is_open_ended)
+        explanation = (question.get("explanation") or "").strip()
+        references.append(explanation if is_open_ended and explanation else None)
+    return AnswerKey(
+        quiz_id=quiz_id,
+        version=version,
+        positions=positions,
+        correct=np.array(correct, dtype=np.int32),
+        option_counts=tuple(option_counts),
+        open_ended=np.array(open_ended, dtype=bool),
+        references=tuple(references),
+        corpus=tuple(corpus),
+    )
+
+
+_answer_keys = LRUCache(settings.GRADING_KEY_CACHE_ENTRIES)
+
+
+def cached_answer_key(quiz_id, version: int) -> Optional[AnswerKey]:
+    return _answer_keys.get(f"{quiz_id}:{version}")
+
+
+def answer_key_for(quiz: models.Quiz) -> AnswerKey:
+    key = cached_answer_key(quiz.id, quiz.version)
+    if key is None:
+        key = compile_answer_key(quiz.id, quiz.version, quiz.questions)
+        _answer_keys.set(f"{quiz.id}:{quiz.version}", key)
+    return key
+
+# ---------- Scoring ----------
+
+def grade_batch(key: AnswerKey, submissions: Sequence[Sequence[dict]]) -> GradedBatch:
+    """
+    Grade many submissions at once: option answers by comparing a results x
+    questions matrix with the key, open-ended answers by one batch of
+    embeddings against the explanations.
+    """
+    rows = len(submissions)
+    selected = np.full((rows, key.total_questions), NOT_ANSWERED, dtype=np.int32)
+    texts: Dict[Tuple[int, int], str] = {}
+    answer_columns: List[List[Optional[int]]] = []
+
+    for row, answers in enumerate(submissions):
+        columns: List[Optional[int]] = []
+        seen = set()
+        for answer in answers:
+            column = key.positions.get(str(answer.get("questionId")))
+            # Only the first answer to a question counts
+            if column is None or column in seen:
+                columns.append(None)
+                continue
+            seen.add(column)
+            columns.append(column)
+            option = answer.get("selectedOption")
+            # Range-checked before it goes into the int32 matrix, where 2**32 + k would wrap to k
+            valid = isinstance(option, int) and 0 <= option < key.option_counts[column]
+            selected[row, column] = option if valid else NOT_ANSWERED
+            text = (answer.get("openEndedAnswer") or "").strip()
+            if text:
+                texts[row, column] = text
+        answer_columns.append(columns)
+
+    has_text = np.zeros((rows, key.total_questions), dtype=bool)
+    for row, column in texts:
+        has_text[row, column] = True
+
+    # Open-ended answers with a reference to compare against, embedded in one batch
+    similarity = np.full((rows, key.total_questions), np.nan, dtype=np.float32)
+    threshold = 0.0
+    if settings.OPEN_ENDED_GRADING == "semantic":
+        cells = [(row, column) for row, column in texts if key.open_ended[column] and key.references[column]]
+        if cells:
+            threshold = match_threshold()
+            row_index, column_index = np.array(cells).T
+            similarity[row_index, column_index] = similarities(
+                [key.references[column] for _, column in cells],
+                [texts[cell] for cell in cells],
+                corpus=key.corpus,
+            )
+
+    open_correct = np.where(np.isnan(similarity), has_text, similarity >= threshold)
+    correct = np.where(key.open_ended, open_correct, selected == key.correct)
+    return GradedBatch(correct, correct.sum(axis=1), answer_columns, similarity, threshold)
+
+
+def needs_embeddings(key: AnswerKey) -> bool:
+    return settings.OPEN_ENDED_GRADING == "semantic" and any(key.references)
+
+
+def _graded_answers(answers: Sequence[dict], graded: GradedBatch, row: int) -> List[dict]:
+    # Answers to unknown or repeated questions are dropped rather than stored
+    result = []
+    for answer, column in zip(answers, graded.columns[row]):
+        if column is None:
+            continue
+        answer = {k: v for k, v in answer.items() if k not in ("similarity", "confidence")}
+        answer["isCorrect"] = bool(graded.correct[row, column])
+        similarity = graded.similarity[row, column]
+        if not np.isnan(similarity):
+            answer["similarity"] = round(float(similarity), 4)
+            answer["confidence"] = round(float(confidence(similarity, graded.threshold)), 4)
+        result.append(answer)
+    return result
+
+
+def grade_submission(key: AnswerKey, answers: Sequence[dict]) -> Tuple[List[dict], int]:
+    """Return the gradeable answers with server-computed `isCorrect` and the score."""
+    return grade_submissions(key, [answers])[0]
+
+
+def grade_submissions(key: AnswerKey, submissions: Sequence[Sequence[dict]]) -> List[Tuple[List[dict], int]]:
+    """`grade_submission` for many submissions to the same quiz, graded as one batch."""
+    graded = grade_batch(key, submissions)
+    return [(_graded_answers(answers, graded, row), int(graded.scores[row])) for row, answers in enumerate(submissions)]
+
+# ---------- Regrading ----------
+
+def regrade_quiz(quiz_id: uuid.UUID) -> Tuple[int, int]:
+    """
+    Re-score every result of a quiz against its current answer key, in
+    batches of GRADING_BATCH_SIZE, then rebuild its stats. Runs as a
+    background task with its own session; returns (results, changed).
+    """
+    db = SessionLocal()
+    try:
+        quiz = db.get(models.Quiz, quiz_id)
+        if quiz is None:
+            return 0, 0
+        key = answer_key_for(quiz)
+
+        total = changed = 0
+        last_id = None
+        while True:
+            query = (
+                select(models.QuizResult.id, models.QuizResult.answers, models.QuizResult.score, models.QuizResult.total_questions)
+                .where(models.QuizResult.quiz_id == quiz_id)
+                .order_by(models.QuizResult.id)
+                .limit(settings.GRADING_BATCH_SIZE)
+            )
+            if last_id is not None:
+                query = query.where(models.QuizResult.id > last_id)
+            rows = db.execute(query).all()
+            if not rows:
+                break
+
+            graded = grade_batch(key, [row.answers or [] for row in rows])
+            updates = []
+            for i, row in enumerate(rows):
+                answers = _graded_answers(row.answers or [], graded, i)
+                score = int(graded.scores[i])
+                if score != row.score or key.total_questions != row.total_questions or answers != row.answers:
+                    updates.append({
+                        "id": row.id,
+                        "score": score,
+                        "total_questions": key.total_questions,
+                        "answers": answers,
+                    })
+            if updates:
+                db.execute(update(models.QuizResult), updates)
+                models.replace_answer_rows(db.connection(), {row["id"]: row["answers"] for row in updates})
+            db.commit()
+
+            total += len(rows)
+            changed += len(updates)
+            last_id = rows[-1].id
+
+        rebuild_quiz_stats(db, quiz_id)
+        db.commit()
+        print(f"[GRADING] Regraded quiz {quiz_id} (version {key.version}): {total} results, {changed} changed")
+        return total, changed
+    except Exception as e:
+        db.rollback()
+        print(f"[GRADING] Regrade of quiz {quiz_id} failed: {e}")
+        raise
+    finally:
+        db.close()
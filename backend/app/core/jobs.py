@@ -0,0 +1,493 @@
+"""
+Background job pipeline for turning uploaded PDFs into quizzes.
+
+Uploads only create an `UploadJob` row and push its id onto a queue. A pool of
+worker threads pops ids and runs extraction and generation, recording every
+state change on the job row so `/files/jobs/{id}` can report progress.
+
+Two queue backends are available (see `settings.JOB_BACKEND`):
+- "inprocess": a local FIFO drained by workers started with the API
+- "redis":     a Redis list drained by `python -m app.worker`
+
+Queue entries don't survive a stopped process (the in-process queue) or a
+worker killed mid-job, so each pool also sweeps for jobs left queued or in
+progress for JOB_STALE_SECONDS and requeues them, up to JOB_MAX_ATTEMPTS.
+"""
+
+import asyncio
+import os
+import queue
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from sqlalchemy import select, update
+
+from app.core.blobs import blob_path, collect_garbage, release
+from app.core.cache import quiz_cache, quiz_cache_key, text_cache
+from app.core.config import settings
+from app.core.llm import agenerate_quiz_from_text, generate_quiz_from_text
+from app.core.pdf import ExtractionStats, extract_text_from_pdf
+from app.core.question_bank import curate_questions, questions_from_bank
+from app.core.search import document_excerpt
+from app.db import models
+from app.db.session import SessionLocal
+
+REDIS_QUEUE_KEY = "pdfquiz:upload-jobs"
+
+# ---------- Queue backends ----------
+
+class LocalJobQueue:
+    """In-memory FIFO. Used by the in-process backend and as an offline stand-in for Redis."""
+
+    def __init__(self):
+        self._queue: "queue.Queue[str]" = queue.Queue()
+
+    def enqueue(self, job_id: str) -> None:
+        self._queue.put(job_id)
+
+    def dequeue(self, timeout: float = 1.0) -> Optional[str]:
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def __len__(self) -> int:
+        return self._queue.qsize()
+
+
+class RedisJobQueue:
+    """Redis list shared by the API (producer) and `app.worker` processes (consumers)."""
+
+    def __init__(self, url: str, key: str = REDIS_QUEUE_KEY):
+        import redis
+
+        self._redis = redis.Redis.from_url(url)
+        self._key = key
+
+    def enqueue(self, job_id: str) -> None:
+        self._redis.lpush(self._key, job_id)
+
+    def dequeue(self, timeout: float = 1.0) -> Optional[str]:
+        item = self._redis.brpop(self._key, timeout=max(1, int(timeout)))
+        if item is None:
+            return None
+        return item[1].decode()
+
+    def __len__(self) -> int:
+        return self._redis.llen(self._key)
+
+
+# ---------- Worker pool ----------
+
+class WorkerPool:
+    """
+    Fixed number of daemon threads pulling job ids from a queue and running
+    `handler`, plus one calling `sweep` every `sweep_interval` seconds if given.
+    """
+
+    def __init__(self, job_queue, handler: Callable[[str], None], size: int,
+                 sweep: Optional[Callable[[], int]] = None, sweep_interval: float = 60.0):
+        self.job_queue = job_queue
+        self.handler = handler
+        self.size = size
+        self.sweep = sweep
+        self.sweep_interval = sweep_interval
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+
+    def start(self) -> None:
+        self._stop.clear()
+        for i in range(self.size):
+            thread = threading.Thread(target=self._run, name=f"upload-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        if self.sweep is not None:
+            thread = threading.Thread(target=self._run_sweep, name="upload-job-sweeper", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads = []
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            job_id = self.job_queue.dequeue(timeout=0.5)
+            if job_id is None:
+                continue
+            try:
+                self.handler(job_id)
+            except Exception as e:
+                print(f"[JOBS] Unhandled error in job {job_id}: {e}")
+
+    def _run_sweep(self) -> None:
+        # Once at start, for the jobs a previous process left behind, then periodically
+        while True:
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"[JOBS] Sweep for stalled jobs failed: {e}")
+            if self._stop.wait(self.sweep_interval):
+                break
+
+
+def create_job_queue():
+    """Build the queue configured by `settings.JOB_BACKEND`."""
+    if settings.JOB_BACKEND == "redis":
+        return RedisJobQueue(settings.REDIS_URL)
+    if settings.JOB_BACKEND == "inprocess":
+        return LocalJobQueue()
+    raise ValueError(f"Unknown JOB_BACKEND: {settings.JOB_BACKEND}")
+
+
+job_queue = create_job_queue()
+
+# ---------- Pipeline ----------
+
+def _set_status(db, job: models.UploadJob, status: models.JobStatusEnum) -> None:
+    job.status = status.value
+    db.commit()
+
+
+def _cached_text(job: models.UploadJob) -> Optional[str]:
+    return text_cache.get(job.content_sha256) if job.content_sha256 else None
+
+
+def create_quiz_for_job(db, job: models.UploadJob, questions_data, document_text: Optional[str] = None) -> models.Quiz:
+    """
+    Add the quiz generated for `job` and mark the job done (caller commits).
+    `document_text`, the PDF's extracted text, is indexed for search.
+    """
+    return create_quizzes_for_jobs(db, [(job, questions_data, document_text)])[0]
+
+
+def create_quizzes_for_jobs(db, generated: List[Tuple[models.UploadJob, list, Optional[str]]]) -> List[models.Quiz]:
+    """
+    `create_quiz_for_job` for many (job, questions, document text) at once:
+    the quizzes, their question rows and search documents are inserted in a
+    single flush (caller commits).
+    """
+    quizzes = []
+    for job, questions_data, document_text in generated:
+        new_quiz = models.Quiz(
+            id=uuid.uuid4(),  # known before the flush, so the inserts can be batched
+            title=job.file_name.replace(".pdf", ""),
+            file_name=job.file_name,
+            question_type=job.question_type,
+            questions=questions_data,
+            created_by=job.created_by,
+            is_published=True
+        )
+        new_quiz.document_text = document_excerpt(document_text)
+        quizzes.append(new_quiz)
+
+        job.quiz_id = new_quiz.id
+        job.status = models.JobStatusEnum.done.value
+    db.add_all(quizzes)
+    db.flush()
+    return quizzes
+
+
+def _release_upload(db, job: models.UploadJob) -> Optional[str]:
+    """Drop the job's reference to its stored upload; returns the blob's hash, or None for a file stored per job."""
+    if job.content_sha256 and job.file_path == blob_path(job.content_sha256):
+        release(db, job.content_sha256)
+        return job.content_sha256
+    return None
+
+
+def discard_upload(db, job: models.UploadJob) -> None:
+    """Release a failed job's upload and delete the file if nothing else uses it (commits)."""
+    sha256 = _release_upload(db, job)
+    db.commit()
+    if sha256:
+        collect_garbage(db, [sha256])
+    elif os.path.exists(job.file_path):
+        # Stored before uploads were deduplicated: the file belongs to this job alone
+        os.remove(job.file_path)
+
+
+def release_quiz_uploads(db, quiz_id) -> List[str]:
+    """
+    Detach the upload jobs of a quiz that is being deleted and release their
+    uploads. Returns the blob hashes to pass to `collect_garbage` once the
+    deletion is committed.
+    """
+    released = []
+    for job in db.scalars(select(models.UploadJob).where(models.UploadJob.quiz_id == quiz_id)).all():
+        job.quiz_id = None
+        sha256 = _release_upload(db, job)
+        if sha256:
+            released.append(sha256)
+    return released
+
+
+def complete_job_from_cache(db, job: models.UploadJob) -> bool:
+    """
+    If the same bytes were already turned into a quiz of this type, create the
+    quiz from the cached questions without extraction or an LLM call.
+    """
+    if not job.content_sha256:
+        return False
+    cached_questions = quiz_cache.get(quiz_cache_key(job.content_sha256, job.question_type, job.num_questions))
+    if cached_questions is None:
+        return False
+    create_quiz_for_job(db, job, cached_questions, _cached_text(job))
+    db.commit()
+    return True
+
+
+def complete_job_from_bank(db, job: models.UploadJob) -> bool:
+    """
+    If the question bank already holds enough questions generated from the
+    same bytes, create the quiz from them without extraction or an LLM call.
+    """
+    count = job.num_questions or settings.QUIZ_NUM_QUESTIONS
+    questions = questions_from_bank(db, job.created_by, job.question_type, job.content_sha256, count)
+    if not questions:
+        return False
+    create_quiz_for_job(db, job, questions, _cached_text(job))
+    db.commit()
+    return True
+
+
+def record_extraction(job: models.UploadJob, stats: ExtractionStats) -> None:
+    """Copy extraction metrics onto the job if the PDF was extracted (caller commits)."""
+    if stats.seconds:
+        job.extract_seconds = round(stats.seconds, 3)
+        job.extract_peak_memory_bytes = stats.peak_memory_bytes
+
+
+def _extract_text(file_path: str, content_sha256: Optional[str], stats: ExtractionStats) -> str:
+    if content_sha256:
+        cached_text = text_cache.get(content_sha256)
+        if cached_text is not None:
+            return cached_text
+
+    text_content = extract_text_from_pdf(file_path, stats=stats)
+    if content_sha256 and text_content:
+        text_cache.set(content_sha256, text_content)
+    return text_content
+
+
+def recover_stalled_jobs(limit: int = 100) -> int:
+    """
+    Requeue up to `limit` jobs left queued, extracting or generating for
+    JOB_STALE_SECONDS without a change, e.g. by a worker that was restarted
+    mid-job or a queue lost with its process. Jobs a worker has already
+    started JOB_MAX_ATTEMPTS times fail instead. Returns how many were handled.
+    """
+    stale = [status.value for status in (
+        models.JobStatusEnum.queued, models.JobStatusEnum.extracting, models.JobStatusEnum.generating
+    )]
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.JOB_STALE_SECONDS)
+    is_stalled = (models.UploadJob.status.in_(stale), models.UploadJob.updated_at < cutoff)
+    db = SessionLocal()
+    requeued, failed = [], 0
+    try:
+        stalled = db.execute(
+            select(models.UploadJob.id, models.UploadJob.attempts).where(*is_stalled).limit(limit)
+        ).all()
+        for job_id, attempts in stalled:
+            retry = attempts < settings.JOB_MAX_ATTEMPTS
+            # Conditional, so a job that moved on meanwhile (or that another process swept) is left alone;
+            # the update also refreshes `updated_at`, so a requeued job gets JOB_STALE_SECONDS again
+            values = {"status": models.JobStatusEnum.queued.value} if retry else {
+                "status": models.JobStatusEnum.failed.value,
+                "error": "Processing was interrupted too many times, please upload the file again",
+            }
+            claimed = db.execute(
+                update(models.UploadJob).where(models.UploadJob.id == job_id, *is_stalled).values(**values)
+            ).rowcount
+            db.commit()
+            if not claimed:
+                continue
+            if retry:
+                requeued.append(job_id)
+            else:
+                failed += 1
+                discard_upload(db, db.get(models.UploadJob, job_id))
+    finally:
+        db.close()
+
+    for job_id in requeued:
+        enqueue_upload_job(job_id)
+    if requeued or failed:
+        print(f"[JOBS] Requeued {len(requeued)} and failed {failed} stalled job(s)")
+    return len(requeued) + failed
+
+
+def process_upload_job(job_id: str) -> None:
+    """Run extraction and generation for a queued job and persist the resulting quiz."""
+    db = SessionLocal()
+    try:
+        # The queue carries ids as strings; the UUID column binds uuid.UUID values
+        job = db.query(models.UploadJob).filter(models.UploadJob.id == uuid.UUID(str(job_id))).first()
+        if not job or job.status != models.JobStatusEnum.queued.value:
+            return
+
+        stats = ExtractionStats()
+        try:
+            # An identical upload may have finished while this job was queued
+            if complete_job_from_cache(db, job) or complete_job_from_bank(db, job):
+                return
+
+            job.attempts = (job.attempts or 0) + 1
+            _set_status(db, job, models.JobStatusEnum.extracting)
+            text_content = _extract_text(job.file_path, job.content_sha256, stats)
+            record_extraction(job, stats)
+            if not text_content:
+                raise ValueError("No readable text in PDF")
+
+            _set_status(db, job, models.JobStatusEnum.generating)
+            questions_data = generate_quiz_from_text(text_content, job.question_type, job.num_questions)
+            questions_data = curate_questions(
+                db, job.created_by, job.question_type, questions_data,
+                job.num_questions or settings.QUIZ_NUM_QUESTIONS, text_content, job.content_sha256
+            )
+            if not questions_data:
+                raise ValueError("Failed to generate questions from PDF")
+
+            if job.content_sha256:
+                quiz_cache.set(quiz_cache_key(job.content_sha256, job.question_type, job.num_questions), questions_data)
+            create_quiz_for_job(db, job, questions_data, text_content)
+            db.commit()
+
+        except Exception as e:
+            db.rollback()
+            job.status = models.JobStatusEnum.failed.value
+            job.error = str(e)
+            record_extraction(job, stats)
+            # Clean up uploaded file if quiz generation fails
+            discard_upload(db, job)
+    finally:
+        db.close()
+
+
+# ---------- Batches ----------
+
+def _curate_in_savepoint(db, job: models.UploadJob, questions: list, text: str) -> list:
+    """`curate_questions` for one job of a batch in a savepoint, so that if it fails only that job does."""
+    with db.begin_nested():
+        return curate_questions(
+            db, job.created_by, job.question_type, questions,
+            job.num_questions or settings.QUIZ_NUM_QUESTIONS, text, job.content_sha256
+        )
+
+
+async def process_upload_batch(db, jobs: List[models.UploadJob]) -> None:
+    """
+    Generate the quizzes of a batch of queued jobs within the request
+    (`db` is a request session). Jobs with the same content and options share
+    one generation, and every quiz is inserted and every job updated in one
+    transaction. Failed jobs carry their `error`.
+
+    Documents are extracted `UPLOAD_BATCH_EXTRACT_CONCURRENCY` at a time and
+    each is sent to the LLM as soon as its text is ready; the gateway's
+    connection and rate limits bound generation, so the batch takes about as
+    long as its slowest document while they allow.
+    """
+    groups: Dict[str, List[models.UploadJob]] = {}
+    for job in jobs:
+        groups.setdefault(quiz_cache_key(job.content_sha256, job.question_type, job.num_questions), []).append(job)
+
+    # Cached quizzes and full quizzes from the bank need no extraction or LLM call
+    questions_by_key: Dict[str, list] = {}
+    texts: Dict[str, Optional[str]] = {}
+    pending: List[str] = []
+    for key, group in groups.items():
+        job = group[0]
+        texts[key] = _cached_text(job)
+        questions = quiz_cache.get(key)
+        if questions is None:
+            count = job.num_questions or settings.QUIZ_NUM_QUESTIONS
+            questions = await db.run_sync(
+                questions_from_bank, job.created_by, job.question_type, job.content_sha256, count
+            ) or None
+        if questions is None:
+            pending.append(key)
+        else:
+            questions_by_key[key] = questions
+
+    stats = {key: ExtractionStats() for key in pending}
+    extracting = asyncio.Semaphore(settings.UPLOAD_BATCH_EXTRACT_CONCURRENCY)
+
+    async def generate(key: str) -> list:
+        job = groups[key][0]
+        if texts[key] is None:
+            async with extracting:
+                texts[key] = await run_in_threadpool(_extract_text, job.file_path, job.content_sha256, stats[key])
+        if not texts[key]:
+            raise ValueError("No readable text in PDF")
+        return await agenerate_quiz_from_text(texts[key], job.question_type, job.num_questions)
+
+    outcomes = await asyncio.gather(*(generate(key) for key in pending), return_exceptions=True)
+    errors: Dict[str, str] = {}
+    for key, outcome in zip(pending, outcomes):
+        job = groups[key][0]
+        if isinstance(outcome, BaseException):
+            errors[key] = str(outcome)
+            continue
+        try:
+            questions = await db.run_sync(_curate_in_savepoint, job, outcome, texts[key])
+        except Exception as e:
+            errors[key] = str(e)
+            continue
+        if not questions:
+            errors[key] = "Failed to generate questions from PDF"
+            continue
+        questions_by_key[key] = questions
+        quiz_cache.set(key, questions)
+
+    generated, released = [], []
+    for key, group in groups.items():
+        for job in group:
+            if key in stats:
+                record_extraction(job, stats[key])
+            if key in questions_by_key:
+                generated.append((job, questions_by_key[key], texts[key]))
+            else:
+                job.status = models.JobStatusEnum.failed.value
+                job.error = errors[key]
+                released.append(await db.run_sync(_release_upload, job))
+    await db.run_sync(create_quizzes_for_jobs, generated)
+    await db.commit()
+
+    released = [sha256 for sha256 in released if sha256]
+    if released:
+        await db.run_sync(collect_garbage, released)
+
+
+def enqueue_upload_job(job_id) -> None:
+    job_queue.enqueue(str(job_id))
+
+
+def requeue_job(db, job_id) -> bool:
+    """
+    Hand a job whose request went away mid-processing (e.g. a closed upload
+    stream) to the workers, unless it already finished (commits). Returns
+    whether it was queued.
+    """
+    in_progress = [status.value for status in (
+        models.JobStatusEnum.queued, models.JobStatusEnum.extracting, models.JobStatusEnum.generating
+    )]
+    claimed = db.execute(
+        update(models.UploadJob)
+        .where(models.UploadJob.id == uuid.UUID(str(job_id)), models.UploadJob.status.in_(in_progress))
+        .values(status=models.JobStatusEnum.queued.value)
+    ).rowcount
+    db.commit()
+    if claimed:
+        enqueue_upload_job(job_id)
+    return bool(claimed)
+
+
+# Workers for the in-process backend; started/stopped by app.main
+worker_pool = WorkerPool(job_queue, process_upload_job, settings.JOB_WORKERS,
+                         sweep=recover_stalled_jobs, sweep_interval=settings.JOB_SWEEP_INTERVAL)
@@ -0,0 +1,55 @@
+"""
+Incremental parser for a JSON array of objects arriving in arbitrary pieces
+(e.g. streamed LLM output), yielding each object as soon as it is complete.
+"""
+
+import json
+from typing import Any, List
+
+
+class JSONArrayStreamParser:
+    def __init__(self):
+        self._buffer: List[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._started = False
+
+    def feed(self, text: str) -> List[Any]:
+        """Consume the next piece of text and return the objects it completed."""
+        completed = []
+        for char in text:
+            if not self._started:
+                # Skip prose or code fences before the opening bracket
+                if char == "[":
+                    self._started = True
+                continue
+
+            if self._depth == 0:
+                if char == "{":
+                    self._depth = 1
+                    self._buffer = [char]
+                continue
+
+            self._buffer.append(char)
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    raw = "".join(self._buffer)
+                    self._buffer = []
+                    try:
+                        completed.append(json.loads(raw))
+                    except json.JSONDecodeError:
+                        print("[LLM] Skipping malformed streamed object:", raw[:200])
+        return completed
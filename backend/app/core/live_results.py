@@ -0,0 +1,353 @@
+"""
+Live results feed: teachers' dashboards subscribe to a quiz over a WebSocket
+(`/results/quiz/{id}/live`) and are pushed new submissions and updated stats
+as they commit, instead of polling `/results/quiz/{id}`.
+
+Committing a new result or a stats change (a submission, a finished live
+session, a regrade) publishes `{quiz_id, result_ids}` through a broker (see
+`settings.LIVE_RESULTS_BACKEND`):
+- "inprocess": delivered to the dashboards connected to this process
+- "redis":     Redis pub/sub (REDIS_URL), so dashboards connected to any API
+               process get it
+
+Each process keeps a topic per quiz with dashboards connected. A topic
+gathers events for LIVE_RESULTS_COALESCE_SECONDS, loads the new result
+summaries and the stats once, and hands the update to every dashboard, so a
+burst of submissions costs two queries per quiz however many dashboards
+watch it. Dashboards are written to at their own pace: while one is busy,
+updates for it are merged (newer stats replace older ones), and past
+LIVE_RESULTS_MAX_PENDING unsent results it is told it missed some and should
+reload the list, so a slow connection neither holds up the others nor grows
+without bound.
+"""
+
+import asyncio
+import json
+import threading
+import uuid
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from fastapi import WebSocket
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from app.core.analytics import summarize
+from app.core.config import settings
+from app.core.serialization import compile_serializer, dumps
+from app.db import models, schemas
+from app.db.session import SessionLocal
+
+REDIS_CHANNEL = "pdfquiz:live-results"
+
+_SUMMARY_COLUMNS = tuple(getattr(models.QuizResult, name) for name in schemas.QuizResultSummaryOut.model_fields)
+_serialize_summary = compile_serializer(schemas.QuizResultSummaryOut)
+
+
+def load_update(quiz_id: str, result_ids: Iterable[str]) -> Tuple[List[dict], dict]:
+    """Summaries of the given results and the quiz's stats, read with a session of its own."""
+    db = SessionLocal()
+    try:
+        results = []
+        ids = [uuid.UUID(result_id) for result_id in result_ids]
+        if ids:
+            rows = db.execute(
+                select(*_SUMMARY_COLUMNS)
+                .where(models.QuizResult.id.in_(ids))
+                .order_by(models.QuizResult.completed_at, models.QuizResult.id)
+            ).all()
+            results = [_serialize_summary(row) for row in rows]
+        quiz_uuid = uuid.UUID(quiz_id)
+        return results, summarize(quiz_uuid, db.get(models.QuizStats, quiz_uuid))
+    finally:
+        db.close()
+
+
+def load_subscription(user_id: uuid.UUID, quiz_id: uuid.UUID) -> Tuple[Optional[str], Optional[uuid.UUID], dict]:
+    """The subscribing user's role, the quiz's owner and its stats, read with a session of its own."""
+    db = SessionLocal()
+    try:
+        role = db.scalar(select(models.User.role).where(models.User.id == user_id))
+        owner_id = db.scalar(select(models.Quiz.created_by).where(models.Quiz.id == quiz_id))
+        return role, owner_id, summarize(quiz_id, db.get(models.QuizStats, quiz_id))
+    finally:
+        db.close()
+
+
+def update_message(results: List[dict], stats: Optional[dict], missed: bool = False) -> bytes:
+    return dumps({"type": "update", "results": results, "stats": stats, "missed": missed})
+
+# ---------- Dashboards ----------
+
+class Dashboard:
+    """One subscriber's unsent update, merged with newer ones until it is taken."""
+
+    def __init__(self, max_pending: int):
+        self.max_pending = max_pending
+        self.missed_results = 0
+        self.ready = asyncio.Event()
+        self._results: List[dict] = []
+        self._stats: Optional[dict] = None
+        self._missed = False
+        self._message: Optional[bytes] = None  # the update encoded once for every dashboard, while unmerged
+
+    def offer(self, results: List[dict], stats: Optional[dict], message: Optional[bytes] = None) -> None:
+        self._message = None if self.ready.is_set() else message
+        if self._missed or len(self._results) + len(results) > self.max_pending:
+            self.missed_results += len(self._results) + len(results)
+            self._results = []
+            self._missed = True
+            self._message = None
+        else:
+            self._results.extend(results)
+        if stats is not None:
+            self._stats = stats
+        self.ready.set()
+
+    def miss(self) -> None:
+        """Drop the unsent results and tell the dashboard to reload, e.g. when an update could not be loaded."""
+        self._results, self._missed, self._message = [], True, None
+        self.ready.set()
+
+    def take(self) -> bytes:
+        message = self._message or update_message(self._results, self._stats, self._missed)
+        self._results, self._stats, self._missed, self._message = [], None, False, None
+        self.ready.clear()
+        return message
+
+
+class _Topic:
+    def __init__(self):
+        self.dashboards: Set[Dashboard] = set()
+        self.result_ids: Set[str] = set()
+        self.pending = False
+        self.flush: Optional[asyncio.Future] = None
+
+# ---------- Hub ----------
+
+class LiveResultsHub:
+    """This process's dashboards, by quiz; events may be delivered from any thread."""
+
+    def __init__(self, coalesce_seconds: float, max_pending: int):
+        self.coalesce_seconds = coalesce_seconds
+        self.max_pending = max_pending
+        self.updates = 0
+        self._topics: Dict[str, _Topic] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def subscribe(self, quiz_id: str) -> Dashboard:
+        self._loop = asyncio.get_running_loop()
+        dashboard = Dashboard(self.max_pending)
+        self._topics.setdefault(quiz_id, _Topic()).dashboards.add(dashboard)
+        return dashboard
+
+    def unsubscribe(self, quiz_id: str, dashboard: Dashboard) -> None:
+        topic = self._topics.get(quiz_id)
+        if topic is not None:
+            topic.dashboards.discard(dashboard)
+            if not topic.dashboards and topic.flush is None:
+                del self._topics[quiz_id]
+
+    def deliver(self, quiz_id: str, result_ids: List[str]) -> None:
+        """Hand an event to the event loop serving the dashboards (a no-op for quizzes nobody watches here)."""
+        loop = self._loop
+        if loop is None or loop.is_closed() or quiz_id not in self._topics:
+            return
+        loop.call_soon_threadsafe(self._receive, quiz_id, result_ids)
+
+    def _receive(self, quiz_id: str, result_ids: List[str]) -> None:
+        topic = self._topics.get(quiz_id)
+        if topic is None:
+            return
+        topic.result_ids.update(result_ids)
+        topic.pending = True
+        if topic.flush is None:
+            topic.flush = asyncio.ensure_future(self._flush(quiz_id, topic))
+
+    async def _flush(self, quiz_id: str, topic: _Topic) -> None:
+        try:
+            while topic.pending and topic.dashboards:
+                await asyncio.sleep(self.coalesce_seconds)
+                result_ids, topic.result_ids, topic.pending = topic.result_ids, set(), False
+                # More than any dashboard keeps (e.g. a bulk import): send the stats and have them reload
+                overflow = len(result_ids) > self.max_pending
+                try:
+                    results, stats = await run_in_threadpool(load_update, quiz_id, () if overflow else result_ids)
+                except Exception as e:
+                    print(f"[LIVE_RESULTS] Could not load the update for quiz {quiz_id}: {e}")
+                    for dashboard in topic.dashboards:
+                        dashboard.miss()
+                    continue
+                self.updates += 1
+                message = update_message(results, stats)
+                for dashboard in topic.dashboards:
+                    if overflow:
+                        dashboard.miss()
+                    dashboard.offer(results, stats, message)
+        finally:
+            topic.flush = None
+            if not topic.dashboards and self._topics.get(quiz_id) is topic:
+                del self._topics[quiz_id]
+
+    async def serve(self, websocket: WebSocket, quiz_id: uuid.UUID, stats: dict) -> None:
+        """Push updates for `quiz_id` to an accepted WebSocket, starting with `stats`, until the client leaves."""
+        key = str(quiz_id)
+        results_broker.start()
+        dashboard = self.subscribe(key)
+        dashboard.offer([], stats)
+
+        async def send() -> None:
+            while True:
+                await dashboard.ready.wait()
+                await websocket.send_text(dashboard.take().decode("utf-8"))
+
+        async def receive() -> None:
+            # Dashboards don't send anything; this only notices them closing
+            while (await websocket.receive())["type"] != "websocket.disconnect":
+                pass
+
+        tasks = [asyncio.ensure_future(send()), asyncio.ensure_future(receive())]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            self.unsubscribe(key, dashboard)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "quizzes": len(self._topics),
+            "dashboards": sum(len(topic.dashboards) for topic in self._topics.values()),
+            "updates": self.updates,
+        }
+
+
+live_results = LiveResultsHub(settings.LIVE_RESULTS_COALESCE_SECONDS, settings.LIVE_RESULTS_MAX_PENDING)
+
+# ---------- Brokers ----------
+
+class LocalResultsBroker:
+    """Events go straight to this process's hub."""
+
+    def __init__(self, hub: LiveResultsHub):
+        self.hub = hub
+
+    def publish(self, quiz_id: str, result_ids: List[str]) -> None:
+        self.hub.deliver(quiz_id, result_ids)
+
+    def start(self) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+
+class RedisResultsBroker:
+    """Events go through a Redis channel that every process with dashboards listens to."""
+
+    def __init__(self, hub: LiveResultsHub, url: str, channel: str = REDIS_CHANNEL):
+        import redis
+
+        self.hub = hub
+        self.channel = channel
+        self._redis = redis.Redis.from_url(url)
+        self._pubsub = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def publish(self, quiz_id: str, result_ids: List[str]) -> None:
+        try:
+            self._redis.publish(self.channel, json.dumps({"quiz_id": quiz_id, "result_ids": result_ids}))
+        except Exception as e:
+            print(f"[LIVE_RESULTS] Redis publish failed: {e}")
+
+    def start(self) -> None:
+        """Start listening, once, when the first dashboard connects."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+            self._pubsub.subscribe(self.channel)
+            self._thread = threading.Thread(target=self._listen, name="live-results", daemon=True)
+            self._thread.start()
+
+    def _listen(self) -> None:
+        while not self._stop.is_set():
+            try:
+                message = self._pubsub.get_message(timeout=1.0)
+            except Exception as e:
+                print(f"[LIVE_RESULTS] Redis subscription failed: {e}")
+                self._stop.wait(1.0)
+                continue
+            if message is not None:
+                data = json.loads(message["data"])
+                self.hub.deliver(data["quiz_id"], data["result_ids"])
+
+    def stop(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                return
+            self._stop.set()
+            self._thread.join(timeout=5.0)
+            self._pubsub.close()
+            self._thread = self._pubsub = None
+
+
+def create_results_broker(hub: LiveResultsHub):
+    """Build the broker configured by `settings.LIVE_RESULTS_BACKEND`."""
+    if settings.LIVE_RESULTS_BACKEND == "redis":
+        return RedisResultsBroker(hub, settings.REDIS_URL)
+    if settings.LIVE_RESULTS_BACKEND == "inprocess":
+        return LocalResultsBroker(hub)
+    raise ValueError(f"Unknown LIVE_RESULTS_BACKEND: {settings.LIVE_RESULTS_BACKEND}")
+
+
+results_broker = create_results_broker(live_results)
+
+# ---------- Publishing ----------
+
+_PENDING_KEY = "live_results_events"
+
+
+def _pending(session: Session) -> Dict[str, Set[str]]:
+    return session.info.setdefault(_PENDING_KEY, {})
+
+
+def _on_result_inserted(mapper, connection, target: models.QuizResult) -> None:
+    session = Session.object_session(target)
+    if session is not None:
+        _pending(session).setdefault(str(target.quiz_id), set()).add(str(target.id))
+
+
+def _on_stats_changed(mapper, connection, target: models.QuizStats) -> None:
+    session = Session.object_session(target)
+    if session is not None:
+        _pending(session).setdefault(str(target.quiz_id), set())
+
+
+def publish_results(session: Session, quiz_id: uuid.UUID, result_ids: Iterable[uuid.UUID]) -> None:
+    """Publish results inserted without the ORM (which fires no events) when `session` commits."""
+    _pending(session).setdefault(str(quiz_id), set()).update(str(result_id) for result_id in result_ids)
+
+
+def _on_commit(session: Session) -> None:
+    if session.in_nested_transaction():
+        return  # a savepoint released, not committed yet
+    for quiz_id, result_ids in session.info.pop(_PENDING_KEY, {}).items():
+        results_broker.publish(quiz_id, sorted(result_ids))
+
+
+def _on_rollback(session: Session, previous_transaction) -> None:
+    # Rolling back a savepoint (e.g. the stats row creation race) keeps what was flushed before it
+    if not session.in_transaction():
+        session.info.pop(_PENDING_KEY, None)
+
+
+event.listen(models.QuizResult, "after_insert", _on_result_inserted)
+event.listen(models.QuizStats, "after_insert", _on_stats_changed)
+event.listen(models.QuizStats, "after_update", _on_stats_changed)
+event.listen(Session, "after_commit", _on_commit)
+event.listen(Session, "after_soft_rollback", _on_rollback)
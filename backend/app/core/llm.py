@@ -1,20 +1,25 @@
-import os
+import re
 import json
-from openai import OpenAI
-from typing import List, Dict, Any
+import math
+import asyncio
+from typing import AsyncIterator, List, Dict, Any, Optional
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+from app.core.chunking import split_into_chunks
+from app.core.config import settings
+from app.core.json_stream import JSONArrayStreamParser
+from app.core.llm_gateway import LLMError, gateway
 
-def generate_quiz_from_text(text: str, question_type: str = "multiple-choice") -> List[Dict[str, Any]]:
-    """
-    Uses an LLM to generate a quiz from extracted PDF text.
-    Returns a list of questions with options and correct answers.
-    """
-    
+# Bump whenever the prompts change so cached quizzes from older prompts are not reused
+PROMPT_VERSION = "2"
+
+SYSTEM_PROMPT = "You are an educational assistant that generates quiz questions from course material. Always return valid JSON."
+
+
+def build_prompt(text: str, question_type: str, count: int) -> str:
     if question_type == "multiple-choice":
-        prompt = f"""
-        You are an educational assistant. Based on the following course material, 
-        generate 5 multiple-choice questions. Return JSON in this exact structure:
+        return f"""
+        You are an educational assistant. Based on the following course material,
+        generate {count} multiple-choice questions. Return JSON in this exact structure:
         [
           {{
             "id": "1",
@@ -28,12 +33,12 @@ def generate_quiz_from_text(text: str, question_type: str = "multiple-choice") -
         ]
 
         Text:
-        {text[:4000]}
+        {text}
         """
-    else:  # open-ended
-        prompt = f"""
-        You are an educational assistant. Based on the following course material, 
-        generate 5 open-ended questions. Return JSON in this exact structure:
+    # open-ended
+    return f"""
+        You are an educational assistant. Based on the following course material,
+        generate {count} open-ended questions. Return JSON in this exact structure:
         [
           {{
             "id": "1",
@@ -47,25 +52,174 @@ def generate_quiz_from_text(text: str, question_type: str = "multiple-choice") -
         ]
 
         Text:
-        {text[:4000]}
+        {text}
         """
 
+# ---------- Map: questions per chunk ----------
+
+async def generate_questions_for_chunk(text: str, question_type: str, count: int) -> List[Dict[str, Any]]:
+    prompt = build_prompt(text, question_type, count)
+    content = await gateway.complete([
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ])
     try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are an educational assistant that generates quiz questions from course material. Always return valid JSON."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3,
-        )
-
-        content = response.choices[0].message.content
-        try:
-            return json.loads(content)
-        except json.JSONDecodeError:
-            print("[LLM] Failed to parse JSON. Raw content:", content)
-            return []
-    except Exception as e:
-        print(f"[LLM] Error generating quiz: {e}")
+        questions = json.loads(content)
+    except json.JSONDecodeError:
+        print("[LLM] Failed to parse JSON. Raw content:", content)
+        return []
+    return questions if isinstance(questions, list) else []
+
+# ---------- Reduce: dedupe and select ----------
+
+class QuestionDeduper:
+    """Rejects questions whose wording overlaps a kept one by at least `LLM_DEDUP_THRESHOLD` (token Jaccard)."""
+
+    def __init__(self):
+        self._kept: List[set] = []
+
+    def add(self, question: Any) -> bool:
+        if not isinstance(question, dict) or not question.get("question"):
+            return False
+        tokens = set(re.findall(r"\w+", str(question["question"]).lower()))
+        if any(len(tokens & kept) / max(1, len(tokens | kept)) >= settings.LLM_DEDUP_THRESHOLD for kept in self._kept):
+            return False
+        self._kept.append(tokens)
+        return True
+
+
+def merge_questions(per_chunk: List[List[Dict[str, Any]]], num_questions: int, question_type: str) -> List[Dict[str, Any]]:
+    """
+    Drop near-duplicate questions, then pick round-robin across chunks so the
+    quiz covers the whole document.
+    """
+    deduper = QuestionDeduper()
+    unique_per_chunk = [[q for q in questions if deduper.add(q)] for questions in per_chunk]
+
+    selected: List[Dict[str, Any]] = []
+    position = 0
+    while len(selected) < num_questions and any(position < len(q) for q in unique_per_chunk):
+        for questions in unique_per_chunk:
+            if position < len(questions) and len(selected) < num_questions:
+                selected.append(questions[position])
+        position += 1
+
+    for i, question in enumerate(selected):
+        question["id"] = str(i + 1)
+        question["type"] = question_type
+    return selected
+
+
+def _plan_chunks(text: str, num_questions: int):
+    chunks = _spread(split_into_chunks(text, settings.LLM_CHUNK_CHARS), settings.LLM_MAX_CHUNKS)
+    # Ask each chunk for a little more than its share to leave room for deduplication
+    per_chunk = math.ceil(num_questions / max(1, len(chunks))) + (1 if len(chunks) > 1 else 0)
+    return chunks, per_chunk
+
+
+def _spread(chunks: List[str], limit: int) -> List[str]:
+    """Evenly sample at most `limit` chunks across the document."""
+    if len(chunks) <= limit:
+        return chunks
+    step = len(chunks) / limit
+    return [chunks[int(i * step)] for i in range(limit)]
+
+
+async def agenerate_quiz_from_text(text: str, question_type: str = "multiple-choice", num_questions: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Uses an LLM to generate a quiz from extracted PDF text.
+    Returns a list of questions with options and correct answers.
+
+    The text is split into chunks that are sent to the LLM concurrently (at most
+    `LLM_MAX_CONCURRENCY` calls in flight), so latency stays close to a single
+    call while the whole document is covered. Chunks that fail are skipped; if
+    every chunk fails the first `LLMError` is raised.
+    """
+    num_questions = num_questions or settings.QUIZ_NUM_QUESTIONS
+    chunks, per_chunk = _plan_chunks(text, num_questions)
+    if not chunks:
         return []
+
+    limit = asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY)
+
+    async def generate(chunk: str) -> List[Dict[str, Any]]:
+        async with limit:
+            return await generate_questions_for_chunk(chunk, question_type, per_chunk)
+
+    outcomes = await asyncio.gather(*(generate(chunk) for chunk in chunks), return_exceptions=True)
+    errors = [o for o in outcomes if isinstance(o, BaseException)]
+    results = [o for o in outcomes if not isinstance(o, BaseException)]
+    if errors:
+        if not results:
+            raise errors[0] if isinstance(errors[0], LLMError) else LLMError(str(errors[0]))
+        print(f"[LLM] {len(errors)} of {len(chunks)} chunks failed: {errors[0]}")
+
+    return merge_questions(results, num_questions, question_type)
+
+
+def generate_quiz_from_text(text: str, question_type: str = "multiple-choice", num_questions: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Blocking wrapper around `agenerate_quiz_from_text` for worker threads."""
+    return gateway.run(agenerate_quiz_from_text(text, question_type, num_questions))
+
+
+async def astream_quiz_from_text(text: str, question_type: str = "multiple-choice", num_questions: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Streaming variant of `agenerate_quiz_from_text`: every chunk's completion is
+    streamed and parsed incrementally, and each unique question is yielded as
+    soon as its JSON object closes. Questions arrive in completion order rather
+    than round-robin; generation stops once `num_questions` have been yielded.
+    Chunks failing with an `LLMError` are skipped like in the non-streaming
+    variant; any other error (e.g. a malformed provider payload) is raised.
+    """
+    num_questions = num_questions or settings.QUIZ_NUM_QUESTIONS
+    chunks, per_chunk = _plan_chunks(text, num_questions)
+    if not chunks:
+        return
+
+    limit = asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY)
+    found: asyncio.Queue = asyncio.Queue()
+    finished = object()
+
+    async def generate(chunk: str) -> None:
+        try:
+            async with limit:
+                parser = JSONArrayStreamParser()
+                messages = [
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": build_prompt(chunk, question_type, per_chunk)}
+                ]
+                async for delta in gateway.stream(messages):
+                    for question in parser.feed(delta):
+                        await found.put(question)
+        except Exception as e:
+            # Handed to the consumer, which decides; a task's own exception would go unnoticed
+            await found.put(e)
+        finally:
+            await found.put(finished)
+
+    tasks = [asyncio.create_task(generate(chunk)) for chunk in chunks]
+    deduper = QuestionDeduper()
+    emitted = 0
+    pending = len(tasks)
+    errors: List[LLMError] = []
+    try:
+        while pending and emitted < num_questions:
+            item = await found.get()
+            if item is finished:
+                pending -= 1
+            elif isinstance(item, LLMError):
+                errors.append(item)
+            elif isinstance(item, Exception):
+                raise item
+            elif deduper.add(item):
+                emitted += 1
+                item["id"] = str(emitted)
+                item["type"] = question_type
+                yield item
+        if errors:
+            if not emitted:
+                raise errors[0]
+            print(f"[LLM] {len(errors)} of {len(chunks)} chunks failed: {errors[0]}")
+    finally:
+        for task in tasks:
+            task.cancel()
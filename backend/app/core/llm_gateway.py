@@ -0,0 +1,396 @@
+"""
+Async gateway for all LLM calls.
+
+A single background event loop owns the provider and its pooled HTTP client, so
+every API worker thread and job worker shares one connection pool and one set of
+rate limits:
+- token buckets for requests/minute and tokens/minute; callers queue (FIFO) on
+  the buckets instead of failing when a burst of uploads arrives
+- retries with full-jitter exponential backoff on 429, 5xx, timeouts and
+  connection errors (honouring Retry-After when the provider sends it)
+- per-request timeouts; cancelling the caller cancels the in-flight request
+- streaming completions (`stream`) that hand deltas to the caller's event loop
+
+Providers are pluggable: `OpenAIProvider` talks to the OpenAI API or any
+OpenAI-compatible server (`LLM_BASE_URL`, e.g. a local mock server), and
+`FakeProvider` answers offline.
+"""
+
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Dict, List, Optional
+
+from app.core.config import settings
+
+Messages = List[Dict[str, str]]
+
+
+class LLMError(Exception):
+    """The LLM call failed and will not succeed by retrying."""
+
+
+class RetryableLLMError(LLMError):
+    """Transient failure (rate limit, server error, timeout)."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@dataclass
+class LLMResponse:
+    content: str
+    total_tokens: Optional[int] = None
+
+# ---------- Rate limiting ----------
+
+class TokenBucket:
+    """
+    Refills `rate_per_minute` units per minute up to `capacity`. Waiters are
+    served in arrival order; the balance may go negative when actual usage turns
+    out larger than estimated, which delays the next callers accordingly.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1) -> None:
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def consume(self, amount: float) -> None:
+        """Adjust the balance without waiting (positive or negative correction)."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+# ---------- Providers ----------
+
+class LLMProvider:
+    """Interface for chat-completion backends. Instances live on the gateway loop."""
+
+    async def complete(self, messages: Messages) -> LLMResponse:
+        raise NotImplementedError
+
+    def stream(self, messages: Messages) -> AsyncIterator[str]:
+        """Yield completion text deltas as they are produced."""
+        raise NotImplementedError
+
+    async def aclose(self) -> None:
+        pass
+
+
+class OpenAIProvider(LLMProvider):
+    def __init__(self, api_key: str, model: str, base_url: Optional[str] = None, max_connections: int = 20):
+        import httpx
+        from openai import AsyncOpenAI
+
+        self.model = model
+        self._http = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=None,  # the gateway enforces per-request timeouts
+        )
+        # Retries are handled by the gateway so they share the rate limiter
+        self.client = AsyncOpenAI(api_key=api_key, base_url=base_url or None, http_client=self._http, max_retries=0)
+
+    async def complete(self, messages: Messages) -> LLMResponse:
+        try:
+            response = await self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=0.3,
+            )
+        except Exception as e:
+            raise _translate_openai_error(e)
+
+        usage = response.usage.total_tokens if response.usage else None
+        return LLMResponse(content=response.choices[0].message.content or "", total_tokens=usage)
+
+    async def stream(self, messages: Messages) -> AsyncIterator[str]:
+        try:
+            response = await self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=0.3,
+                stream=True,
+            )
+            async for chunk in response:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except Exception as e:
+            raise _translate_openai_error(e)
+
+    async def aclose(self) -> None:
+        await self._http.aclose()
+
+
+def _translate_openai_error(e: Exception) -> Exception:
+    import openai
+
+    if isinstance(e, openai.RateLimitError):
+        return RetryableLLMError(f"Rate limited: {e}", _retry_after(e.response))
+    if isinstance(e, openai.APIStatusError):
+        if e.status_code >= 500:
+            return RetryableLLMError(f"Server error {e.status_code}: {e}", _retry_after(e.response))
+        return LLMError(f"LLM request rejected ({e.status_code}): {e}")
+    if isinstance(e, (openai.APITimeoutError, openai.APIConnectionError)):
+        return RetryableLLMError(f"Connection error: {e}")
+    return e
+
+
+def _retry_after(response) -> Optional[float]:
+    try:
+        return float(response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+class FakeProvider(LLMProvider):
+    """
+    Offline stand-in for tests and local development: turns sentences from the
+    prompt's text section into questions after `latency_ms`.
+    """
+
+    def __init__(self, latency_ms: int = 0):
+        self.latency_ms = latency_ms
+
+    async def complete(self, messages: Messages) -> LLMResponse:
+        await asyncio.sleep(self.latency_ms / 1000)
+        return LLMResponse(content=json.dumps(fake_questions(messages[-1]["content"])))
+
+    async def stream(self, messages: Messages) -> AsyncIterator[str]:
+        # Spread the latency over the output like a real token stream
+        content = json.dumps(fake_questions(messages[-1]["content"]))
+        pieces = [content[i:i + 32] for i in range(0, len(content), 32)] or [""]
+        for piece in pieces:
+            await asyncio.sleep(self.latency_ms / 1000 / len(pieces))
+            yield piece
+
+
+def fake_questions(prompt: str) -> List[Dict[str, Any]]:
+    count = int(re.search(r"generate (\d+)", prompt).group(1))
+    question_type = "open-ended" if "open-ended questions" in prompt else "multiple-choice"
+    source = prompt.rsplit("Text:", 1)[-1]
+    sentences = [s.strip() for s in re.split(r"(?<=[.!?])\s+", " ".join(source.split())) if len(s.strip()) > 20]
+
+    questions = []
+    for i, sentence in enumerate(sentences[:count]):
+        questions.append({
+            "id": str(i + 1),
+            "question": f"According to the material, is it true that {sentence.rstrip('.!?')}?",
+            "options": [sentence, "None of the above"] if question_type == "multiple-choice" else [],
+            "correctAnswer": 0,
+            "explanation": sentence,
+            "type": question_type,
+        })
+    return questions
+
+
+def create_provider() -> LLMProvider:
+    if settings.LLM_PROVIDER == "fake":
+        return FakeProvider(settings.LLM_FAKE_LATENCY_MS)
+    if settings.LLM_PROVIDER == "openai":
+        return OpenAIProvider(
+            api_key=settings.OPENAI_API_KEY,
+            model=settings.LLM_MODEL,
+            base_url=settings.LLM_BASE_URL,
+            max_connections=settings.LLM_MAX_CONNECTIONS,
+        )
+    raise ValueError(f"Unknown LLM_PROVIDER: {settings.LLM_PROVIDER}")
+
+# ---------- Gateway ----------
+
+def _estimate_tokens(messages: Messages) -> int:
+    # ~4 characters per token for English text, plus room for the completion
+    prompt_tokens = sum(len(m["content"]) for m in messages) // 4
+    return prompt_tokens + settings.LLM_ESTIMATED_COMPLETION_TOKENS
+
+
+class LLMGateway:
+    def __init__(self, provider_factory=create_provider):
+        self._provider_factory = provider_factory
+        self._provider: Optional[LLMProvider] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self.retries = 0
+        self.failures = 0
+
+    # -- loop management --
+
+    def _ensure_started(self) -> asyncio.AbstractEventLoop:
+        with self._start_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+
+                def run():
+                    asyncio.set_event_loop(loop)
+                    self._provider = self._provider_factory()
+                    self._requests = TokenBucket(settings.LLM_REQUESTS_PER_MINUTE)
+                    self._tokens = TokenBucket(settings.LLM_TOKENS_PER_MINUTE)
+                    self._slots = asyncio.Semaphore(settings.LLM_MAX_CONNECTIONS)
+                    ready.set()
+                    loop.run_forever()
+
+                self._thread = threading.Thread(target=run, name="llm-gateway", daemon=True)
+                self._thread.start()
+                ready.wait()
+                self._loop = loop
+            return self._loop
+
+    def run(self, coro: Awaitable):
+        """Run a coroutine on the gateway loop and block the calling thread for its result."""
+        future = asyncio.run_coroutine_threadsafe(coro, self._ensure_started())
+        try:
+            return future.result()
+        except BaseException:
+            future.cancel()
+            raise
+
+    async def submit(self, coro: Awaitable):
+        """Await a coroutine on the gateway loop from any other event loop (cancellation propagates)."""
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self._ensure_started()))
+
+    def close(self) -> None:
+        with self._start_lock:
+            if self._loop is None:
+                return
+            asyncio.run_coroutine_threadsafe(self._provider.aclose(), self._loop).result(timeout=5)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+            self._loop = None
+
+    # -- calls (run on the gateway loop) --
+
+    async def _complete(self, messages: Messages, timeout: Optional[float] = None) -> str:
+        timeout = timeout or settings.LLM_TIMEOUT_SECONDS
+        estimate = _estimate_tokens(messages)
+        last_error: Optional[Exception] = None
+
+        for attempt in range(settings.LLM_MAX_RETRIES + 1):
+            await self._requests.acquire(1)
+            await self._tokens.acquire(estimate)
+            try:
+                async with self._slots:
+                    response = await asyncio.wait_for(self._provider.complete(messages), timeout)
+                if response.total_tokens is not None:
+                    self._tokens.consume(response.total_tokens - estimate)
+                return response.content
+            except asyncio.TimeoutError:
+                last_error = RetryableLLMError(f"LLM request timed out after {timeout}s")
+            except RetryableLLMError as e:
+                last_error = e
+
+            if attempt < settings.LLM_MAX_RETRIES:
+                await self._backoff(last_error, attempt)
+
+        self.failures += 1
+        raise LLMError(f"LLM request failed after {settings.LLM_MAX_RETRIES + 1} attempts: {last_error}")
+
+    async def _stream(self, messages: Messages, emit, timeout: Optional[float] = None) -> None:
+        """
+        Stream deltas into `emit`. Failures before the first delta are retried like
+        `_complete`; once output has been emitted the error is raised to the caller.
+        `timeout` bounds the wait for each delta.
+        """
+        timeout = timeout or settings.LLM_TIMEOUT_SECONDS
+        estimate = _estimate_tokens(messages)
+        last_error: Optional[Exception] = None
+
+        for attempt in range(settings.LLM_MAX_RETRIES + 1):
+            await self._requests.acquire(1)
+            await self._tokens.acquire(estimate)
+            emitted = False
+            try:
+                async with self._slots:
+                    deltas = self._provider.stream(messages).__aiter__()
+                    while True:
+                        try:
+                            delta = await asyncio.wait_for(deltas.__anext__(), timeout)
+                        except StopAsyncIteration:
+                            return
+                        emitted = True
+                        emit(delta)
+            except asyncio.TimeoutError:
+                last_error = RetryableLLMError(f"LLM stream stalled for {timeout}s")
+            except RetryableLLMError as e:
+                last_error = e
+            if emitted:
+                raise LLMError(f"LLM stream interrupted: {last_error}")
+
+            if attempt < settings.LLM_MAX_RETRIES:
+                await self._backoff(last_error, attempt)
+
+        self.failures += 1
+        raise LLMError(f"LLM request failed after {settings.LLM_MAX_RETRIES + 1} attempts: {last_error}")
+
+    async def _backoff(self, error: Exception, attempt: int) -> None:
+        self.retries += 1
+        backoff = min(settings.LLM_RETRY_MAX_DELAY, settings.LLM_RETRY_BASE_DELAY * 2 ** attempt)
+        delay = error.retry_after if getattr(error, "retry_after", None) else random.uniform(0, backoff)
+        print(f"[LLM] {error}; retrying in {delay:.2f}s (attempt {attempt + 1})")
+        await asyncio.sleep(delay)
+
+    async def complete(self, messages: Messages, timeout: Optional[float] = None) -> str:
+        """Chat completion from any event loop."""
+        return await self.submit(self._complete(messages, timeout))
+
+    def complete_sync(self, messages: Messages, timeout: Optional[float] = None) -> str:
+        """Chat completion from a plain thread (job workers)."""
+        return self.run(self._complete(messages, timeout))
+
+    async def stream(self, messages: Messages, timeout: Optional[float] = None) -> AsyncIterator[str]:
+        """
+        Streaming chat completion from any event loop. Deltas produced on the
+        gateway loop are handed over through a queue on the caller's loop;
+        closing the iterator cancels the upstream request.
+        """
+        caller_loop = asyncio.get_running_loop()
+        deltas: asyncio.Queue = asyncio.Queue()
+        done = object()
+
+        def emit(item) -> None:
+            caller_loop.call_soon_threadsafe(deltas.put_nowait, item)
+
+        async def produce() -> None:
+            try:
+                await self._stream(messages, emit, timeout)
+                emit(done)
+            except BaseException as e:
+                emit(e)
+                raise
+
+        future = asyncio.run_coroutine_threadsafe(produce(), self._ensure_started())
+        try:
+            while True:
+                item = await deltas.get()
+                if item is done:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            future.cancel()
+
+
+gateway = LLMGateway()
@@ -0,0 +1,116 @@
+"""
+MinHash signatures and LSH banding for near-duplicate question detection.
+
+A question's wording is reduced to its set of lower-cased word tokens (the
+same notion of overlap `QuestionDeduper` uses) and summarized by a MinHash
+signature: the fraction of equal positions in two signatures estimates the
+Jaccard similarity of the token sets. Signatures are split into `bands` of
+`rows`; two questions share a band key when that whole slice is equal, which
+happens with probability 1 - (1 - J^rows)^bands. Looking up band keys in an
+index finds likely duplicates without comparing against every stored
+question.
+
+The permutations come from a fixed seed so signatures stay comparable across
+processes and restarts; changing the seed or `num_perm` invalidates stored
+signatures.
+"""
+
+import re
+import zlib
+from functools import lru_cache
+from typing import Iterable, List, Sequence, Set, Tuple
+
+import numpy as np
+
+_WORD_RE = re.compile(r"\w+")
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_SEED = 1
+_BATCH_TOKENS = 200_000  # bounds the tokens x permutations matrix per step
+
+
+def tokens(text: str) -> Set[str]:
+    return set(_WORD_RE.findall(text.lower()))
+
+
+class MinHasher:
+    def __init__(self, num_perm: int, seed: int = _SEED):
+        self.num_perm = num_perm
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+
+    def _permuted(self, hashes: np.ndarray) -> np.ndarray:
+        # Universal hashing (a * h + b) mod p; uint64 wrap-around is part of the mix
+        return ((hashes[:, None] * self._a + self._b) % _MERSENNE_PRIME) & _MAX_HASH
+
+    def signatures(self, token_sets: Sequence[Iterable[str]]) -> np.ndarray:
+        """One uint32 signature row per token set (empty sets get all-max rows)."""
+        out = np.full((len(token_sets), self.num_perm), _MAX_HASH, dtype=np.uint64)
+        start = 0
+        while start < len(token_sets):
+            # Take as many sets as fit in one batch of tokens
+            hashes: List[int] = []
+            offsets: List[int] = []
+            end = start
+            while end < len(token_sets) and (end == start or len(hashes) < _BATCH_TOKENS):
+                offsets.append(len(hashes))
+                hashes.extend(zlib.crc32(token.encode("utf-8")) for token in token_sets[end])
+                end += 1
+
+            if hashes:
+                permuted = self._permuted(np.array(hashes, dtype=np.uint64))
+                counts = np.diff(offsets + [len(hashes)])
+                nonempty = counts > 0
+                starts = np.array(offsets)[nonempty]
+                out[np.arange(start, end)[nonempty]] = np.minimum.reduceat(permuted, starts, axis=0)
+            start = end
+        return out.astype(np.uint32)
+
+    def signature(self, token_set: Iterable[str]) -> np.ndarray:
+        return self.signatures([list(token_set)])[0]
+
+
+@lru_cache(maxsize=None)
+def lsh_params(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """
+    (bands, rows) minimizing the weighted false positive and false negative
+    probability mass around `threshold`, with bands * rows <= num_perm.
+    Misses weigh three times as much: extra candidates are only a few more
+    index hits, since they are verified against their signatures anyway.
+    """
+    grid = np.linspace(0.0, 1.0, 201)  # uniform, so a mean is the integral over [0, 1]
+    best, best_error = (1, num_perm), float("inf")
+    for bands in range(1, num_perm + 1):
+        rows = num_perm // bands
+        collide = 1 - (1 - grid ** rows) ** bands
+        false_positive = np.where(grid < threshold, collide, 0.0).mean()
+        false_negative = np.where(grid >= threshold, 1 - collide, 0.0).mean()
+        error = 0.25 * false_positive + 0.75 * false_negative
+        if error < best_error:
+            best, best_error = (bands, rows), error
+    return best
+
+
+_BAND_SALT = np.uint64(0x9E3779B97F4A7C15)
+_ROW_MULTIPLIER = np.uint64(0x100000001B3)
+
+
+def band_keys(signatures: np.ndarray, bands: int, rows: int) -> np.ndarray:
+    """
+    One 64-bit key per (signature, band), as int64 for BIGINT columns. The
+    band index is mixed in, so keys from different bands never collide.
+    """
+    sliced = signatures[:, : bands * rows].astype(np.uint64).reshape(len(signatures), bands, rows)
+    keys = np.zeros((len(signatures), bands), dtype=np.uint64)
+    for row in range(rows):
+        keys = keys * _ROW_MULTIPLIER + sliced[:, :, row]
+    keys ^= (np.arange(bands, dtype=np.uint64) + np.uint64(1)) * _BAND_SALT
+    return keys.view(np.int64)
+
+
+def estimate_similarity(signature: np.ndarray, others: np.ndarray) -> np.ndarray:
+    """Estimated Jaccard similarity of `signature` to each row of `others`."""
+    if len(others) == 0:
+        return np.zeros(0)
+    return (others == signature).mean(axis=1)
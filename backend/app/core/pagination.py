@@ -0,0 +1,73 @@
+"""
+Keyset (cursor) pagination over `(timestamp, id)`, newest first.
+
+The cursor is the sort key of the last row on the page, so each page is an
+index range scan from that point regardless of how deep the client is,
+unlike OFFSET which reads and discards every earlier row.
+"""
+
+import base64
+import json
+import uuid
+from datetime import datetime
+from typing import Any, List, Optional, Sequence, Tuple
+
+from sqlalchemy import tuple_
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(created_at: datetime, row_id: uuid.UUID) -> str:
+    raw = json.dumps([created_at.isoformat(), str(row_id)]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, uuid.UUID]:
+    """Inverse of encode_cursor; raises ValueError on anything malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+        # uuid.UUID(1) raises AttributeError, not ValueError
+        if not isinstance(created_at, str) or not isinstance(row_id, str):
+            raise ValueError("Invalid cursor")
+        return datetime.fromisoformat(created_at), uuid.UUID(row_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def encode_offset_cursor(offset: int) -> str:
+    """Cursor for result lists ordered by relevance, which have no stable sort key."""
+    return base64.urlsafe_b64encode(json.dumps({"offset": offset}).encode()).decode().rstrip("=")
+
+
+def decode_offset_cursor(cursor: str) -> int:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        offset = json.loads(raw)["offset"]
+    except (TypeError, ValueError, KeyError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(offset, int) or offset < 0:
+        raise ValueError("Invalid cursor")
+    return offset
+
+
+def keyset_paginate(statement, created_at_column, id_column, cursor: Optional[str], limit: int):
+    """
+    Order `statement` newest first and restrict it to the rows after `cursor`.
+    One extra row is fetched so `page_from_rows` can tell whether more exist.
+    """
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        statement = statement.where(tuple_(created_at_column, id_column) < (created_at, row_id))
+    return statement.order_by(created_at_column.desc(), id_column.desc()).limit(limit + 1)
+
+
+def page_from_rows(rows: Sequence[Any], limit: int, created_at_attr: str = "created_at") -> Tuple[List[Any], Optional[str]]:
+    """Split the `limit + 1` rows into the page and the cursor for the next one."""
+    items = list(rows[:limit])
+    next_cursor = None
+    if len(rows) > limit and items:
+        last = items[-1]
+        next_cursor = encode_cursor(getattr(last, created_at_attr), last.id)
+    return items, next_cursor
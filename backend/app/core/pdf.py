@@ -0,0 +1,278 @@
+"""
+PDF text extraction.
+
+Pages are streamed one at a time so callers can report progress or stop early.
+Files are memory-mapped rather than read (PyPDF2 copies a file it is given by
+path into memory), so only the parts being parsed are resident.
+
+Long documents are split into page ranges that are extracted in a shared
+process pool (PyPDF2 is pure Python, so threads would serialize on the GIL).
+Files of at least `PDF_LARGE_DOCUMENT_BYTES` are extracted in a process of
+their own instead, with a memory limit and a timeout, so a huge or
+pathological PDF fails its job rather than exhausting or stalling the worker.
+"""
+
+import mmap
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterator, List, Optional
+
+from PyPDF2 import PdfReader
+
+from app.core.config import settings
+
+try:
+    import resource
+except ImportError:  # not available on Windows: no memory limit or peak memory
+    resource = None
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+_process_pool_lock = threading.Lock()
+
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            # spawn: forking a multi-threaded API worker is not safe
+            _process_pool = ProcessPoolExecutor(
+                max_workers=settings.PDF_EXTRACT_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _process_pool
+
+
+def shutdown_process_pool() -> None:
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is not None:
+            _process_pool.shutdown(cancel_futures=True)
+            _process_pool = None
+
+
+class PdfExtractionError(ValueError):
+    """Isolated extraction failed: memory limit, timeout or a crashed process."""
+
+
+@dataclass
+class ExtractionStats:
+    """Filled in by `iter_pages` while it runs."""
+    total_pages: Optional[int] = None  # set before the first page is yielded
+    pages: int = 0
+    seconds: float = 0.0
+    peak_memory_bytes: Optional[int] = None  # isolated extraction only: other paths share a long-lived process
+    isolated: bool = False
+
+# ---------- Page streaming ----------
+
+@contextmanager
+def open_pdf(file_path: str):
+    """A PdfReader over a read-only memory map of the file."""
+    with open(file_path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        yield PdfReader(data)
+
+
+def count_pages(file_path: str) -> int:
+    with open_pdf(file_path) as reader:
+        return len(reader.pages)
+
+
+def iter_page_text(file_path: str, start: int = 0, stop: Optional[int] = None,
+                   window: Optional[int] = None) -> Iterator[str]:
+    """
+    Yield the text of pages [start, stop) in order, parsing one page at a
+    time. With a `window`, the reader's cache of parsed objects (fonts,
+    decoded content streams) is dropped every `window` pages, so memory
+    stays bounded however long the document is.
+    """
+    with open_pdf(file_path) as reader:
+        yield from _page_texts(reader, start, stop, window)
+
+
+def _page_texts(reader: PdfReader, start: int, stop: Optional[int], window: Optional[int]) -> Iterator[str]:
+    pages = reader.pages
+    stop = len(pages) if stop is None else min(stop, len(pages))
+    for index in range(start, stop):
+        yield pages[index].extract_text() or ""
+        if window and (index - start + 1) % window == 0:
+            reader.resolved_objects.clear()
+
+
+def _extract_page_range(file_path: str, start: int, stop: int) -> List[str]:
+    # Runs inside a pool process
+    return list(iter_page_text(file_path, start, stop))
+
+
+def is_large_document(file_path: str) -> bool:
+    return bool(settings.PDF_LARGE_DOCUMENT_BYTES) and os.path.getsize(file_path) >= settings.PDF_LARGE_DOCUMENT_BYTES
+
+
+def iter_pages(file_path: str, parallel: Optional[bool] = None, stats: Optional[ExtractionStats] = None) -> Iterator[str]:
+    """
+    Yield page texts in document order, recording progress in `stats`.
+
+    Large documents (`is_large_document`) are extracted in an isolated process,
+    see `_iter_pages_isolated`. Otherwise documents with at least
+    `PDF_PARALLEL_MIN_PAGES` pages are extracted in page ranges on the process
+    pool. Only one range per worker is in flight at a time, so a consumer that
+    stops iterating early wastes at most one window.
+    """
+    stats = stats if stats is not None else ExtractionStats()
+    started = time.perf_counter()
+    pages = _iter_pages(file_path, parallel, stats)
+    try:
+        for page_text in pages:
+            stats.pages += 1
+            yield page_text
+    finally:
+        pages.close()
+        stats.seconds = time.perf_counter() - started
+
+
+def _iter_pages(file_path: str, parallel: Optional[bool], stats: ExtractionStats) -> Iterator[str]:
+    if is_large_document(file_path):
+        stats.isolated = True
+        yield from _iter_pages_isolated(file_path, stats)
+        return
+
+    total_pages = stats.total_pages = count_pages(file_path)
+    if parallel is None:
+        parallel = settings.PDF_EXTRACT_WORKERS > 1 and total_pages >= settings.PDF_PARALLEL_MIN_PAGES
+
+    if not parallel:
+        yield from iter_page_text(file_path)
+        return
+
+    pool = _get_process_pool()
+    # Every task re-parses the document structure, so keep the number of ranges
+    # proportional to the worker count rather than to the page count
+    workers = settings.PDF_EXTRACT_WORKERS
+    step = max(settings.PDF_PAGES_PER_TASK, -(-total_pages // (workers * 4)))
+    ranges = deque((start, min(start + step, total_pages)) for start in range(0, total_pages, step))
+    in_flight = deque()
+    try:
+        while ranges or in_flight:
+            while ranges and len(in_flight) < workers:
+                start, stop = ranges.popleft()
+                in_flight.append(pool.submit(_extract_page_range, file_path, start, stop))
+            yield from in_flight.popleft().result()
+    finally:
+        for future in in_flight:
+            future.cancel()
+
+# ---------- Large documents ----------
+
+def _peak_memory_bytes() -> Optional[int]:
+    if resource is None:
+        return None
+    # Peak resident set size: kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _extract_isolated(file_path: str, connection, memory_limit: int, window: int) -> None:
+    """
+    Runs in its own process: send ("total", page count), then ("pages",
+    [text, ...], peak memory) once per window, then ("done", None) or
+    ("error", message).
+    """
+    hard_limit = None
+    try:
+        if memory_limit and resource is not None:
+            # Caps heap allocations; the memory-mapped file does not count
+            _, hard_limit = resource.getrlimit(resource.RLIMIT_DATA)
+            resource.setrlimit(resource.RLIMIT_DATA, (memory_limit, hard_limit))
+        with open_pdf(file_path) as reader:
+            connection.send(("total", len(reader.pages)))
+            batch: List[str] = []
+            for page_text in _page_texts(reader, 0, None, window):
+                batch.append(page_text)
+                if len(batch) >= window:
+                    # Blocks while the consumer is a window behind
+                    connection.send(("pages", batch, _peak_memory_bytes()))
+                    batch = []
+            if batch:
+                connection.send(("pages", batch, _peak_memory_bytes()))
+        connection.send(("done", None))
+    except MemoryError:
+        if hard_limit is not None:
+            # Lift the limit again so the report itself can be sent
+            resource.setrlimit(resource.RLIMIT_DATA, (hard_limit, hard_limit))
+        connection.send(("error", f"PDF extraction exceeded the {memory_limit // (1024 * 1024)} MB memory limit"))
+    except Exception as e:
+        connection.send(("error", str(e) or type(e).__name__))
+    finally:
+        connection.close()
+
+
+def _iter_pages_isolated(file_path: str, stats: ExtractionStats) -> Iterator[str]:
+    """
+    Extract in a fresh process limited to `PDF_LARGE_MEMORY_LIMIT_BYTES` of
+    heap, parsing `PDF_LARGE_WINDOW_PAGES` pages at a time. The process is
+    killed once `PDF_LARGE_TIMEOUT_SECONDS` have passed or when the consumer
+    stops iterating; either failure raises PdfExtractionError.
+    """
+    context = multiprocessing.get_context("spawn")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(
+        target=_extract_isolated,
+        args=(file_path, sender, settings.PDF_LARGE_MEMORY_LIMIT_BYTES, settings.PDF_LARGE_WINDOW_PAGES),
+        daemon=True,
+    )
+    process.start()
+    sender.close()
+    deadline = time.monotonic() + settings.PDF_LARGE_TIMEOUT_SECONDS
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not receiver.poll(remaining):
+                raise PdfExtractionError(f"PDF extraction timed out after {settings.PDF_LARGE_TIMEOUT_SECONDS:g}s")
+            try:
+                kind, payload, *peak_memory = receiver.recv()
+            except EOFError:
+                # e.g. killed by the kernel's OOM killer (exit code -9)
+                process.join(1)
+                raise PdfExtractionError(f"PDF extraction process exited unexpectedly (exit code {process.exitcode})")
+            if kind == "total":
+                stats.total_pages = payload
+            elif kind == "pages":
+                stats.peak_memory_bytes = peak_memory[0]
+                yield from payload
+            elif kind == "done":
+                return
+            else:
+                raise PdfExtractionError(payload)
+    finally:
+        receiver.close()
+        if process.is_alive():
+            process.kill()
+        process.join()
+
+# ---------- Full-text helper ----------
+
+def extract_text_from_pdf(file_path: str, max_chars: Optional[int] = None, parallel: Optional[bool] = None,
+                          stats: Optional[ExtractionStats] = None) -> str:
+    """
+    Extract the document text, stopping once `max_chars` characters have been
+    collected (defaults to `PDF_MAX_EXTRACT_CHARS`; 0 disables the limit).
+    """
+    if max_chars is None:
+        max_chars = settings.PDF_MAX_EXTRACT_CHARS
+
+    parts: List[str] = []
+    collected = 0
+    pages = iter_pages(file_path, parallel=parallel, stats=stats)
+    try:
+        for page_text in pages:
+            parts.append(page_text)
+            collected += len(page_text)
+            if max_chars and collected >= max_chars:
+                break
+    finally:
+        pages.close()
+    return "\n".join(parts).strip()
@@ -0,0 +1,156 @@
+"""
+Authenticated principals and the per-process cache that saves the users
+lookup on every authenticated request.
+
+Cached entries are immutable snapshots of the user row. They are dropped when
+the ORM updates or deletes the user (at flush and again after commit) and
+otherwise expire after `AUTH_PRINCIPAL_CACHE_TTL` seconds, which also bounds
+staleness across processes and for bulk UPDATE statements that bypass ORM
+events.
+"""
+
+import threading
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.db import models
+
+# ---------- Principals ----------
+
+@dataclass(frozen=True)
+class Principal:
+    """Snapshot of the authenticated user, detached from any session."""
+    id: uuid.UUID
+    name: str
+    email: str
+    role: models.RoleEnum
+    student_number: Optional[str]
+    created_at: Optional[datetime]
+
+    @classmethod
+    def from_user(cls, user: models.User) -> "Principal":
+        return cls(
+            id=user.id,
+            name=user.name,
+            email=user.email,
+            role=models.RoleEnum(user.role),
+            student_number=user.student_number,
+            created_at=user.created_at,
+        )
+
+
+@dataclass(frozen=True)
+class TokenPrincipal:
+    """Identity and role taken from the token claims alone (AUTH_TRUST_TOKEN_ROLE)."""
+    id: uuid.UUID
+    role: models.RoleEnum
+
+# ---------- Cache ----------
+
+class PrincipalCache:
+    """
+    TTL LRU of principals keyed by user id, with hit/miss counters.
+
+    Invalidation bumps a generation counter; a principal loaded before an
+    invalidation is not cached, so a lookup racing an update can't
+    re-populate the cache with the old row.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.cache = TTLCache(max_entries, ttl)
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+
+    def get(self, user_id: uuid.UUID) -> Optional[Principal]:
+        principal = self.cache.get(str(user_id))
+        if principal is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return principal
+
+    def set(self, principal: Principal, generation: int) -> None:
+        with self._lock:
+            if generation == self.generation:
+                self.cache.set(str(principal.id), principal)
+
+    def invalidate(self, user_id: uuid.UUID) -> None:
+        with self._lock:
+            self.generation += 1
+            self.invalidations += 1
+            self.cache.delete(str(user_id))
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self.cache.clear()
+        self.hits = self.misses = self.invalidations = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "entries": len(self.cache),
+        }
+
+
+principal_cache = PrincipalCache(settings.AUTH_PRINCIPAL_CACHE_ENTRIES, settings.AUTH_PRINCIPAL_CACHE_TTL)
+
+
+async def load_principal(db, user_id: uuid.UUID) -> Optional[Principal]:
+    """Return the principal for `user_id` from the cache, or load and cache it."""
+    principal = principal_cache.get(user_id)
+    if principal is not None:
+        return principal
+
+    generation = principal_cache.generation
+    user = await db.get(models.User, user_id)
+    if user is None:
+        return None
+    principal = Principal.from_user(user)
+    principal_cache.set(principal, generation)
+    return principal
+
+# ---------- Invalidation ----------
+
+_PENDING_KEY = "principal_invalidations"
+
+
+def _on_user_changed(mapper, connection, target: models.User) -> None:
+    principal_cache.invalidate(target.id)
+    # Readers in other sessions still see the old row until commit, so repeat then
+    session = Session.object_session(target)
+    if session is not None:
+        session.info.setdefault(_PENDING_KEY, set()).add(target.id)
+
+
+def _on_commit(session: Session) -> None:
+    if session.in_nested_transaction():
+        return  # a savepoint released, not committed yet
+    for user_id in session.info.pop(_PENDING_KEY, ()):
+        principal_cache.invalidate(user_id)
+
+
+def _on_rollback(session: Session, previous_transaction) -> None:
+    # Only when the whole transaction is gone: changes flushed before a rolled back savepoint still commit
+    if not session.in_transaction():
+        session.info.pop(_PENDING_KEY, None)
+
+
+event.listen(models.User, "after_update", _on_user_changed)
+event.listen(models.User, "after_delete", _on_user_changed)
+event.listen(Session, "after_commit", _on_commit)
+event.listen(Session, "after_soft_rollback", _on_rollback)
@@ -0,0 +1,272 @@
+"""
+Question bank: every generated question is kept per teacher so later quizzes
+can reuse it, with near-duplicates found through MinHash/LSH (app/core/minhash.py).
+
+Each entry stores its signature, and `question_bank_buckets` maps every band
+key of that signature to the entry. Looking a question up reads the buckets of
+its band keys (primary key lookups) and compares signatures only for the
+entries found there, so the cost grows with the number of near matches rather
+than with the size of the bank.
+
+Generation uses the bank in two ways (`curate_questions`):
+- generated questions that near-duplicate a bank question from another
+  document are skipped, and near-duplicates within the batch are dropped
+- a quiz left short is topped up with bank questions whose words appear in the
+  document, without another LLM call; skipped duplicates are the last resort
+"""
+
+import uuid
+from collections import defaultdict
+from typing import Any, Dict, List, NamedTuple, Optional
+
+import numpy as np
+from sqlalchemy import insert, select, update
+
+from app.core.config import settings
+from app.core.minhash import MinHasher, band_keys, estimate_similarity, lsh_params, tokens
+from app.db.models import QuestionBankBucket, QuestionBankEntry
+
+hasher = MinHasher(settings.QUESTION_BANK_NUM_PERM)
+BANDS, ROWS = lsh_params(settings.QUESTION_BANK_THRESHOLD, settings.QUESTION_BANK_NUM_PERM)
+_IN_CHUNK = 5000  # band keys per `bucket IN (...)` query
+
+
+class Duplicate(NamedTuple):
+    entry_id: uuid.UUID
+    source_sha256: Optional[str]
+    in_batch: bool  # matched an earlier question of the same batch rather than a stored one
+
+
+def _question_text(question: Any) -> str:
+    return str(question.get("question") or "") if isinstance(question, dict) else ""
+
+
+def _content_words(text: str) -> set:
+    # Short words are mostly function words and say little about the topic
+    return {token for token in tokens(text) if len(token) > 3}
+
+
+def signatures_for(questions: List[Dict[str, Any]]) -> np.ndarray:
+    """MinHash signatures of the questions' wording."""
+    return hasher.signatures([tokens(_question_text(question)) for question in questions])
+
+
+def _decode(signature: bytes) -> np.ndarray:
+    return np.frombuffer(signature, dtype=np.uint32)
+
+
+def _best_match(signature: np.ndarray, others: List[np.ndarray]) -> Optional[int]:
+    if not others:
+        return None
+    similarity = estimate_similarity(signature, np.stack(others))
+    best = int(np.argmax(similarity))
+    return best if similarity[best] >= settings.QUESTION_BANK_THRESHOLD else None
+
+
+def find_duplicates(db, owner_id, question_type: str, signatures: np.ndarray) -> List[Optional[Duplicate]]:
+    """The closest bank entry at or above `QUESTION_BANK_THRESHOLD` for each signature, or None."""
+    if not len(signatures):
+        return []
+    keys = band_keys(signatures, BANDS, ROWS)
+    unique_keys = [int(key) for key in np.unique(keys)]
+
+    # Primary key lookups only, with the owner and type checked here: filtering
+    # on them in SQL lets a planner start from the owner's (possibly huge) set
+    # of entries instead of the few candidates
+    buckets: Dict[int, List[uuid.UUID]] = defaultdict(list)
+    for start in range(0, len(unique_keys), _IN_CHUNK):
+        rows = db.execute(
+            select(QuestionBankBucket.bucket, QuestionBankBucket.entry_id)
+            .where(QuestionBankBucket.bucket.in_(unique_keys[start:start + _IN_CHUNK]))
+        ).all()
+        for bucket, entry_id in rows:
+            buckets[bucket].append(entry_id)
+
+    entries: Dict[uuid.UUID, tuple] = {}
+    candidate_ids = list({entry_id for entry_ids in buckets.values() for entry_id in entry_ids})
+    for start in range(0, len(candidate_ids), _IN_CHUNK):
+        rows = db.execute(
+            select(QuestionBankEntry.id, QuestionBankEntry.created_by, QuestionBankEntry.question_type,
+                   QuestionBankEntry.source_sha256, QuestionBankEntry.signature)
+            .where(QuestionBankEntry.id.in_(candidate_ids[start:start + _IN_CHUNK]))
+        ).all()
+        for entry_id, created_by, entry_type, source_sha256, signature in rows:
+            if str(created_by) == str(owner_id) and entry_type == question_type:
+                entries[entry_id] = (source_sha256, _decode(signature))
+
+    matches: List[Optional[Duplicate]] = []
+    for signature, row_keys in zip(signatures, keys):
+        candidates = list({entry_id for key in row_keys for entry_id in buckets.get(int(key), ()) if entry_id in entries})
+        best = _best_match(signature, [entries[entry_id][1] for entry_id in candidates])
+        if best is None:
+            matches.append(None)
+        else:
+            matches.append(Duplicate(candidates[best], entries[candidates[best]][0], False))
+    return matches
+
+
+def add_to_bank(db, owner_id, question_type: str, questions: List[Dict[str, Any]],
+                source_sha256: Optional[str] = None, signatures: Optional[np.ndarray] = None) -> List[Optional[Duplicate]]:
+    """
+    Store the questions that are not near-duplicates of a bank entry (or of an
+    earlier question in the batch) and count the others as new occurrences of
+    their match. Returns the match of each question, None for stored ones.
+    The caller commits.
+    """
+    if signatures is None:
+        signatures = signatures_for(questions)
+    matches = find_duplicates(db, owner_id, question_type, signatures)
+    keys = band_keys(signatures, BANDS, ROWS) if len(signatures) else []
+
+    new_rows: List[dict] = []
+    bucket_rows: List[dict] = []
+    new_signatures: List[np.ndarray] = []
+    repeats: Dict[uuid.UUID, int] = defaultdict(int)
+    for i, question in enumerate(questions):
+        if not _question_text(question).strip():
+            continue
+        if matches[i] is None:
+            best = _best_match(signatures[i], new_signatures)
+            if best is not None:
+                new_rows[best]["occurrences"] += 1
+                matches[i] = Duplicate(new_rows[best]["id"], source_sha256, True)
+                continue
+        else:
+            repeats[matches[i].entry_id] += 1
+            continue
+
+        entry_id = uuid.uuid4()
+        new_rows.append({
+            "id": entry_id,
+            "created_by": owner_id,
+            "question_type": question_type,
+            "question": question,
+            "signature": signatures[i].tobytes(),
+            "source_sha256": source_sha256,
+            "occurrences": 1,
+        })
+        bucket_rows.extend({"bucket": int(key), "entry_id": entry_id} for key in keys[i])
+        new_signatures.append(signatures[i])
+
+    if new_rows:
+        db.execute(insert(QuestionBankEntry), new_rows)
+        db.execute(insert(QuestionBankBucket), bucket_rows)
+    by_count: Dict[int, List[uuid.UUID]] = defaultdict(list)
+    for entry_id, count in repeats.items():
+        by_count[count].append(entry_id)
+    for count, entry_ids in by_count.items():
+        db.execute(
+            update(QuestionBankEntry)
+            .where(QuestionBankEntry.id.in_(entry_ids))
+            .values(occurrences=QuestionBankEntry.occurrences + count)
+        )
+    return matches
+
+
+def top_up(db, owner_id, question_type: str, count: int, text: str = "", source_sha256: Optional[str] = None,
+           selected: Optional[List[np.ndarray]] = None, exclude=()) -> List[Dict[str, Any]]:
+    """
+    Up to `count` bank questions for a quiz on `text`: entries generated from
+    the same upload first, then the newest `QUESTION_BANK_TOPUP_CANDIDATES`
+    entries of this type with at least `QUESTION_BANK_MIN_RELEVANCE` of their
+    words in the document. Near-duplicates of the `selected` signatures and of
+    each other are skipped, as are the `exclude` entry ids.
+    """
+    if count <= 0:
+        return []
+    base = select(
+        QuestionBankEntry.id, QuestionBankEntry.question, QuestionBankEntry.signature, QuestionBankEntry.source_sha256
+    ).where(QuestionBankEntry.created_by == owner_id, QuestionBankEntry.question_type == question_type)
+    rows = []
+    if source_sha256:
+        rows += db.execute(base.where(QuestionBankEntry.source_sha256 == source_sha256)).all()
+    if text:
+        rows += db.execute(
+            base.order_by(QuestionBankEntry.created_at.desc()).limit(settings.QUESTION_BANK_TOPUP_CANDIDATES)
+        ).all()
+
+    document = _content_words(text)
+    seen = set(exclude)
+    candidates = []
+    for entry_id, question, signature, entry_source in rows:
+        if entry_id in seen:
+            continue
+        seen.add(entry_id)
+        if source_sha256 and entry_source == source_sha256:
+            relevance = 1.0
+        else:
+            words = _content_words(_question_text(question))
+            relevance = len(words & document) / len(words) if words else 0.0
+        if relevance >= settings.QUESTION_BANK_MIN_RELEVANCE:
+            candidates.append((relevance, question, _decode(signature)))
+    # Stable sort: ties keep same-upload first, then newest first
+    candidates.sort(key=lambda candidate: -candidate[0])
+
+    chosen = list(selected or [])
+    questions: List[Dict[str, Any]] = []
+    for _, question, signature in candidates:
+        if len(questions) >= count:
+            break
+        if _best_match(signature, chosen) is not None:
+            continue
+        questions.append(dict(question))
+        chosen.append(signature)
+    return questions
+
+
+def _numbered(questions: List[Dict[str, Any]], question_type: str) -> List[Dict[str, Any]]:
+    numbered = []
+    for i, question in enumerate(questions):
+        question = dict(question)
+        question["id"] = str(i + 1)
+        question["type"] = question_type
+        numbered.append(question)
+    return numbered
+
+
+def questions_from_bank(db, owner_id, question_type: str, source_sha256: Optional[str], count: int) -> List[Dict[str, Any]]:
+    """
+    A full quiz from bank questions generated from the same upload, or [] if
+    the bank holds fewer than `count` of them.
+    """
+    if not settings.QUESTION_BANK_ENABLED or not source_sha256:
+        return []
+    questions = top_up(db, owner_id, question_type, count, source_sha256=source_sha256)
+    return _numbered(questions, question_type) if len(questions) >= count else []
+
+
+def curate_questions(db, owner_id, question_type: str, generated: List[Dict[str, Any]], count: int, text: str,
+                     source_sha256: Optional[str] = None, skip_duplicates: Optional[bool] = None) -> List[Dict[str, Any]]:
+    """
+    Add freshly generated questions to the bank and return the quiz's
+    questions: the generated ones minus skipped duplicates (see
+    `QUESTION_BANK_SKIP_DUPLICATES`), topped up to `count` from the bank.
+    With `skip_duplicates=False` every generated question is kept, in order.
+    The caller commits.
+    """
+    if not settings.QUESTION_BANK_ENABLED:
+        return generated
+    if skip_duplicates is None:
+        skip_duplicates = settings.QUESTION_BANK_SKIP_DUPLICATES
+
+    signatures = signatures_for(generated)
+    matches = add_to_bank(db, owner_id, question_type, generated, source_sha256, signatures)
+
+    kept, kept_signatures, skipped, matched = [], [], [], set()
+    for question, signature, match in zip(generated, signatures, matches):
+        if match is not None:
+            matched.add(match.entry_id)
+            if skip_duplicates and (match.in_batch or match.source_sha256 != source_sha256):
+                skipped.append(question)
+                continue
+        kept.append(question)
+        kept_signatures.append(signature)
+
+    added = top_up(db, owner_id, question_type, count - len(kept), text, source_sha256, kept_signatures, matched)
+    questions = kept + added
+    questions += skipped[:max(0, count - len(questions))]
+
+    duplicates = sum(match is not None for match in matches)
+    if duplicates or added:
+        print(f"[QUESTION_BANK] {len(generated)} generated, {duplicates} near-duplicates, {len(added)} taken from the bank")
+    return _numbered(questions, question_type)
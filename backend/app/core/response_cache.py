@@ -0,0 +1,272 @@
+"""
+Pre-serialized responses for the hottest quiz reads, GET /quizzes/{id} and
+GET /quizzes/, so a class opening the same quiz at once costs about one
+database query instead of one per student.
+
+An entry holds a response's JSON bytes and a strong ETag (a hash of those
+bytes, so it changes with the quiz `version` and every other field), and
+requests whose `If-None-Match` matches get `304 Not Modified`. Entries live in
+a per-process memory LRU and, for quizzes with RESPONSE_CACHE_REDIS, in Redis
+shared by all processes. Concurrent misses for one key wait for a single load,
+which runs on a session of its own so no request's cancellation can break it.
+
+Any ORM insert, update or delete of a quiz (creating, editing or deleting it,
+or an upload generating it) drops that quiz's entry and every listing page,
+at flush and again after commit. Bulk statements on quizzes executed through
+a session (`update(Quiz)`, `delete(Quiz)`, ...) skip those mapper events and
+can touch any row, so they drop every entry. Memory entries also expire after
+`RESPONSE_CACHE_TTL` seconds, which bounds how long other processes can serve
+a quiz changed elsewhere.
+"""
+
+import asyncio
+import hashlib
+import json
+import threading
+from typing import Any, Awaitable, Callable, Dict, NamedTuple, Optional
+
+from fastapi import Request, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.db import models
+from app.db.session import new_session
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+
+
+# A cached entry: one response per variant, e.g. the public view of a quiz and its owner's view
+Variants = Dict[str, CachedResponse]
+# Builds an entry with the session it is given (None if there is nothing to cache)
+Loader = Callable[[Any], Awaitable[Optional[Variants]]]
+
+
+def cached_response(body: bytes) -> CachedResponse:
+    return CachedResponse(body, f'"{hashlib.sha256(body).hexdigest()[:32]}"')
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    # If-None-Match uses the weak comparison, so W/"x" matches "x"
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
+
+def respond(request: Request, response: CachedResponse) -> Response:
+    headers = {"ETag": response.etag, "Cache-Control": "no-cache", "Vary": "Authorization"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, response.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=response.body, media_type="application/json", headers=headers)
+
+# ---------- Cache ----------
+
+class ResponseCache:
+    """
+    TTL LRU of `Variants` keyed by string, optionally backed by Redis, with
+    hit/miss counters.
+
+    Like the principal cache, invalidation bumps a generation counter and an
+    entry loaded before an invalidation is not stored; it also detaches the
+    load in flight, so later requests start a fresh one.
+    """
+
+    def __init__(self, name: str, max_entries: int, ttl: float, redis_url: Optional[str] = None):
+        self.name = name
+        self.memory = TTLCache(max_entries, ttl)
+        self.generation = 0
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._loading: Dict[str, asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self._redis = None
+        if redis_url:
+            import redis
+
+            self._redis = redis.Redis.from_url(redis_url)
+
+    def _redis_key(self, key: str) -> str:
+        return f"response-cache:{self.name}:{key}"
+
+    def _shared_get(self, key: str) -> Optional[Variants]:
+        try:
+            data = self._redis.get(self._redis_key(key))
+        except Exception as e:
+            print(f"[RESPONSE_CACHE] Redis get failed: {e}")
+            return None
+        if data is None:
+            return None
+        return {variant: CachedResponse(body.encode("utf-8"), etag) for variant, (etag, body) in json.loads(data).items()}
+
+    def _shared_set(self, key: str, variants: Variants) -> None:
+        data = json.dumps({variant: [r.etag, r.body.decode("utf-8")] for variant, r in variants.items()})
+        try:
+            self._redis.set(self._redis_key(key), data, ex=settings.RESPONSE_CACHE_REDIS_TTL)
+        except Exception as e:
+            print(f"[RESPONSE_CACHE] Redis set failed: {e}")
+
+    async def _load(self, key: str, loader: Loader) -> Optional[Variants]:
+        generation = self.generation
+        variants = await run_in_threadpool(self._shared_get, key) if self._redis is not None else None
+        if variants is not None:
+            self.shared_hits += 1
+        else:
+            self.misses += 1
+            # Not the first requester's session: it is closed if that request goes away, others still wait
+            db = new_session()
+            try:
+                variants = await loader(db)
+            finally:
+                await db.close()
+            if variants is None:
+                return None
+            if self._redis is not None and generation == self.generation:
+                await run_in_threadpool(self._shared_set, key, variants)
+        with self._lock:
+            if generation == self.generation:
+                self.memory.set(key, variants)
+        return variants
+
+    async def get_or_load(self, key: str, loader: Loader) -> Optional[Variants]:
+        """
+        The cached entry for `key`, or the one `loader` builds with a session
+        opened for the load (None, e.g. for a missing quiz, is returned
+        without being cached).
+        """
+        variants = self.memory.get(key)
+        if variants is not None:
+            self.hits += 1
+            return variants
+
+        with self._lock:
+            load = self._loading.get(key)
+            if load is None:
+                load = self._loading[key] = asyncio.ensure_future(self._load(key, loader))
+                load.add_done_callback(lambda done: self._finished(key, done))
+            else:
+                self.coalesced += 1
+        # Shielded: a client disconnecting does not cancel the load others wait for
+        return await asyncio.shield(load)
+
+    def _finished(self, key: str, load: asyncio.Future) -> None:
+        with self._lock:
+            if self._loading.get(key) is load:
+                del self._loading[key]
+        if not load.cancelled():
+            load.exception()  # retrieved here in case every waiter went away
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            self.generation += 1
+            self.memory.delete(key)
+            self._loading.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self.memory.clear()
+            self._loading.clear()
+
+    def invalidate_shared(self, key: str) -> None:
+        if self._redis is None:
+            return
+        try:
+            self._redis.delete(self._redis_key(key))
+        except Exception as e:
+            print(f"[RESPONSE_CACHE] Redis delete failed: {e}")
+
+    def clear_shared(self) -> None:
+        if self._redis is None:
+            return
+        try:
+            keys = list(self._redis.scan_iter(match=self._redis_key("*"), count=1000))
+            for start in range(0, len(keys), 1000):
+                self._redis.delete(*keys[start:start + 1000])
+        except Exception as e:
+            print(f"[RESPONSE_CACHE] Redis clear failed: {e}")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.shared_hits + self.misses
+        return {
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": (self.hits + self.shared_hits) / lookups if lookups else 0.0,
+            "entries": len(self.memory),
+        }
+
+
+quiz_responses = ResponseCache(
+    "quiz",
+    settings.RESPONSE_CACHE_ENTRIES,
+    settings.RESPONSE_CACHE_TTL,
+    settings.REDIS_URL if settings.RESPONSE_CACHE_REDIS else None,
+)
+# Every new or changed quiz can move every page, so listings stay per process
+listing_responses = ResponseCache("quiz-listing", settings.RESPONSE_CACHE_ENTRIES, settings.RESPONSE_CACHE_TTL)
+
+
+def response_cache_stats() -> dict:
+    return {"quiz": quiz_responses.stats(), "listing": listing_responses.stats()}
+
+# ---------- Invalidation ----------
+
+_PENDING_KEY = "quiz_response_invalidations"
+_EVERY_QUIZ = "*"  # pending after a bulk statement, whose rows aren't known
+
+
+def _invalidate(quiz_id) -> None:
+    if quiz_id == _EVERY_QUIZ:
+        quiz_responses.clear()
+    else:
+        quiz_responses.invalidate(str(quiz_id))
+    listing_responses.clear()
+
+
+def _on_quiz_changed(mapper, connection, target: models.Quiz) -> None:
+    _invalidate(target.id)
+    # Readers in other sessions still see the old row until commit, so repeat then
+    session = Session.object_session(target)
+    if session is not None:
+        session.info.setdefault(_PENDING_KEY, set()).add(target.id)
+
+
+def _on_bulk_statement(orm_execute_state) -> None:
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    if any(mapper.class_ is models.Quiz for mapper in orm_execute_state.all_mappers):
+        _invalidate(_EVERY_QUIZ)
+        orm_execute_state.session.info.setdefault(_PENDING_KEY, set()).add(_EVERY_QUIZ)
+
+
+def _on_commit(session: Session) -> None:
+    if session.in_nested_transaction():
+        return  # a savepoint released, not committed yet
+    for quiz_id in session.info.pop(_PENDING_KEY, ()):
+        _invalidate(quiz_id)
+        if quiz_id == _EVERY_QUIZ:
+            quiz_responses.clear_shared()
+        else:
+            quiz_responses.invalidate_shared(str(quiz_id))
+
+
+def _on_rollback(session: Session, previous_transaction) -> None:
+    # Only when the whole transaction is gone, not a savepoint
+    if not session.in_transaction():
+        session.info.pop(_PENDING_KEY, None)
+
+
+event.listen(models.Quiz, "after_insert", _on_quiz_changed)
+event.listen(models.Quiz, "after_update", _on_quiz_changed)
+event.listen(models.Quiz, "after_delete", _on_quiz_changed)
+event.listen(Session, "do_orm_execute", _on_bulk_statement)
+event.listen(Session, "after_commit", _on_commit)
+event.listen(Session, "after_soft_rollback", _on_rollback)
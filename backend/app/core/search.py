@@ -0,0 +1,144 @@
+"""
+Full-text search over quizzes: titles, question text and the text extracted
+from their source PDFs (the `quiz_search` table, see app/db/models.py).
+
+Postgres matches a weighted tsvector column through its GIN index and ranks
+with ts_rank_cd; SQLite (local/dev) uses an FTS5 table and bm25. Either way
+title matches weigh most, then questions, then the document, and the index is
+updated in the same transaction that writes the quiz.
+
+Queries are reduced to their words, all of which must match (after stemming,
+so "cells" finds "cell"). Only the newest `SEARCH_MAX_CANDIDATES` matches are ranked, so a query made of
+very common words costs the same as one that matches that many quizzes.
+"""
+
+import html
+import re
+from typing import List, Optional
+
+from sqlalchemy import column, func, literal_column, or_, select, table
+
+from app.core.config import settings
+from app.db import models
+from app.db.session import engine
+
+MAX_QUERY_TERMS = 16
+_TERM_RE = re.compile(r"\w+")
+# Match markers that cannot occur in text, swapped for <mark> tags after escaping
+_MARK_START, _MARK_END = "\x02", "\x03"
+
+_fts = table("quiz_search_fts", column("rowid"))
+
+_HIT_COLUMNS = (
+    models.Quiz.id,
+    models.Quiz.title,
+    models.Quiz.file_name,
+    models.Quiz.question_type,
+    models.Quiz.question_count,
+    models.Quiz.created_by,
+    models.Quiz.created_at,
+    models.Quiz.is_published,
+)
+
+
+def query_terms(query: str) -> List[str]:
+    return _TERM_RE.findall(query.lower())[:MAX_QUERY_TERMS]
+
+
+def document_excerpt(text: Optional[str]) -> Optional[str]:
+    """The part of a document's extracted text that is indexed."""
+    return text[:settings.SEARCH_DOCUMENT_MAX_CHARS] if text else None
+
+
+def render_highlight(excerpt: Optional[str]) -> Optional[str]:
+    if not excerpt:
+        return None
+    return html.escape(" ".join(excerpt.split())).replace(_MARK_START, "<mark>").replace(_MARK_END, "</mark>")
+
+
+def _sqlite_statement(terms: List[str], filters: list, offset: int, limit: int):
+    fts = literal_column("quiz_search_fts")
+    match = fts.op("MATCH")(" ".join(f'"{term}"' for term in terms))
+    rank = -func.bm25(fts, 10.0, 4.0, 1.0)
+    # FTS5 yields matches in rowid order, so the newest candidates are read
+    # without a sort and bm25() only runs for them
+    candidates = (
+        select(_fts.c.rowid.label("rowid"), *_HIT_COLUMNS, rank.label("rank"))
+        .select_from(_fts)
+        .join(models.QuizSearchDocument, models.QuizSearchDocument.id == _fts.c.rowid)
+        .join(models.Quiz, models.Quiz.id == models.QuizSearchDocument.quiz_id)
+        .where(match, *filters)
+        .order_by(_fts.c.rowid.desc())
+        .limit(settings.SEARCH_MAX_CANDIDATES)
+        .subquery()
+    )
+    page = (
+        select(candidates)
+        .order_by(candidates.c.rank.desc(), candidates.c.id)
+        .offset(offset)
+        .limit(limit)
+        .subquery()
+    )
+    # snippet() is far more expensive than bm25(), so it only runs for the page
+    highlight = func.snippet(fts, -1, _MARK_START, _MARK_END, "…", 16)
+    return (
+        select(*(page.c[c.key] for c in _HIT_COLUMNS), page.c.rank, highlight.label("highlight"))
+        .select_from(page)
+        .join(_fts, _fts.c.rowid == page.c.rowid)
+        .where(match)
+        .order_by(page.c.rank.desc(), page.c.id)
+    )
+
+
+def _postgres_statement(terms: List[str], filters: list, offset: int, limit: int):
+    config = literal_column("'english'::regconfig")
+    tsquery = func.to_tsquery(config, " & ".join(terms))
+    vector = literal_column("quiz_search.search_vector")
+    candidates = (
+        select(models.QuizSearchDocument.id)
+        .join(models.Quiz, models.Quiz.id == models.QuizSearchDocument.quiz_id)
+        .where(vector.op("@@")(tsquery), *filters)
+        .order_by(models.QuizSearchDocument.id.desc())
+        .limit(settings.SEARCH_MAX_CANDIDATES)
+        .subquery()
+    )
+    rank = func.ts_rank_cd(vector, tsquery)
+    page = (
+        select(*_HIT_COLUMNS, models.QuizSearchDocument.id.label("search_id"), rank.label("rank"))
+        .select_from(candidates)
+        .join(models.QuizSearchDocument, models.QuizSearchDocument.id == candidates.c.id)
+        .join(models.Quiz, models.Quiz.id == models.QuizSearchDocument.quiz_id)
+        .order_by(rank.desc(), models.Quiz.id)
+        .offset(offset)
+        .limit(limit)
+        .subquery()
+    )
+    # ts_headline re-parses the text, so it only runs for the page
+    highlight = func.ts_headline(
+        config, func.concat_ws(" ", models.QuizSearchDocument.questions_text, models.QuizSearchDocument.document_text),
+        tsquery, f'StartSel="{_MARK_START}", StopSel="{_MARK_END}", MaxFragments=2, MinWords=8, MaxWords=20',
+    )
+    return (
+        select(*(page.c[c.key] for c in _HIT_COLUMNS), page.c.rank, highlight.label("highlight"))
+        .select_from(page)
+        .join(models.QuizSearchDocument, models.QuizSearchDocument.id == page.c.search_id)
+        .order_by(page.c.rank.desc(), page.c.id)
+    )
+
+
+def search_statement(terms: List[str], viewer_id=None, question_type: Optional[str] = None, offset: int = 0, limit: int = 20):
+    """
+    Quizzes matching every term, best first: published ones and, with a
+    `viewer_id`, the viewer's own. Rows carry the summary columns plus
+    `rank` and a raw `highlight` (pass it through `render_highlight`).
+    """
+    visible = models.Quiz.is_published == True
+    filters = [or_(visible, models.Quiz.created_by == viewer_id) if viewer_id is not None else visible]
+    if question_type is not None:
+        filters.append(models.Quiz.question_type == question_type)
+
+    if engine.dialect.name == "postgresql":
+        return _postgres_statement(terms, filters, offset, limit)
+    if engine.dialect.name == "sqlite":
+        return _sqlite_statement(terms, filters, offset, limit)
+    raise ValueError(f"Full-text search is not supported on {engine.dialect.name}")
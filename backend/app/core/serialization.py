@@ -0,0 +1,135 @@
+"""
+Fast JSON responses for list endpoints.
+
+Returning ORM rows through a `response_model` validates every row and every
+nested question or answer again (from_attributes), then encodes the result
+with FastAPI's JSON encoder. The data was validated when it was written, so
+`compile_serializer` instead builds, once per schema, a function that copies
+the schema's fields straight off a row into a dict (nested models are
+projected from the stored JSON, filling in their defaults), and `dumps`
+encodes it with orjson. The output is the same JSON the response model
+produces; the `response_model` stays on the route for the OpenAPI schema.
+
+orjson is optional: without it the standard library encoder is used.
+"""
+
+import datetime
+import json
+import uuid
+from enum import Enum
+from operator import attrgetter
+from typing import Any, Callable, List, Optional, Tuple, Type, Union, get_args, get_origin
+
+from fastapi import Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+Serializer = Callable[[Any], dict]
+
+# ---------- Encoding ----------
+
+def _default(value):
+    if isinstance(value, datetime.datetime):
+        text = value.isoformat()
+        # pydantic writes UTC as "Z"
+        return text[:-6] + "Z" if text.endswith("+00:00") else text
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, Enum):
+        return value.value
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """`content` as compact JSON bytes, datetimes and UUIDs written the way pydantic writes them."""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_UTC_Z)
+    return json.dumps(content, default=_default, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """Parse JSON, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def json_response(content: Any, status_code: int = 200) -> Response:
+    return Response(content=dumps(content), status_code=status_code, media_type="application/json")
+
+# ---------- Serializers ----------
+
+def _nested_model(annotation) -> Tuple[Optional[Type[BaseModel]], bool]:
+    """The model behind `Model`, `Optional[Model]` or `List[Model]`, and whether it is a list."""
+    origin = get_origin(annotation)
+    if origin is Union:
+        args = [arg for arg in get_args(annotation) if arg is not type(None)]
+        return _nested_model(args[0]) if len(args) == 1 else (None, False)
+    if origin in (list, List):
+        model, _ = _nested_model(get_args(annotation)[0])
+        return model, True
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation, False
+    return None, False
+
+
+def _project(model: Type[BaseModel]) -> Callable[[dict], dict]:
+    """Copy `model`'s fields out of a stored JSON object, with their defaults for missing keys."""
+    fields = [(name, None if field.is_required() else field.get_default(call_default_factory=True))
+              for name, field in model.model_fields.items()]
+    nested = _nested_fields(model)
+    if nested:
+        def project(item: dict) -> dict:
+            data = {name: item.get(name, default) for name, default in fields}
+            _apply_nested(data, nested)
+            return data
+        return project
+
+    names = tuple(model.model_fields)
+
+    def project_flat(item: dict) -> dict:
+        if tuple(item) == names:
+            return item  # stored exactly as the model writes it
+        return {name: item.get(name, default) for name, default in fields}
+    return project_flat
+
+
+def _nested_fields(model: Type[BaseModel]) -> List[Tuple[str, Callable[[dict], dict], bool]]:
+    nested = []
+    for name, field in model.model_fields.items():
+        inner, many = _nested_model(field.annotation)
+        if inner is not None:
+            nested.append((name, _project(inner), many))
+    return nested
+
+
+def _apply_nested(data: dict, nested) -> None:
+    for name, project, many in nested:
+        value = data[name]
+        if value is not None:
+            data[name] = [project(item) for item in value] if many else project(value)
+
+
+def compile_serializer(model: Type[BaseModel]) -> Serializer:
+    """
+    A function turning an ORM object or a result row with `model`'s fields
+    into the dict `model` would serialize to, without validating it.
+    """
+    names = tuple(model.model_fields)
+    # attrgetter returns a tuple only for several names
+    get = attrgetter(*names) if len(names) > 1 else (lambda row: (getattr(row, names[0]),))
+    nested = _nested_fields(model)
+    if nested:
+        def serialize(row) -> dict:
+            data = dict(zip(names, get(row)))
+            _apply_nested(data, nested)
+            return data
+        return serialize
+    return lambda row: dict(zip(names, get(row)))
+
@@ -0,0 +1,474 @@
+"""
+Live quiz sessions: timed attempts whose answers are saved as they are given.
+
+A session row records its deadline (start + the quiz's `time_limit_seconds`,
+or QUIZ_SESSION_DURATION_SECONDS), so any API process can serve it and it
+outlives restarts. Each answer is checked against a cached snapshot of the
+session (owner, deadline, question ids) and buffered rather than written on
+its own. Two buffer backends are available (see `settings.QUIZ_SESSION_BUFFER`):
+- "inprocess": a dict per API process; stopping the API flushes it, a crash
+  loses at most the last QUIZ_SESSION_FLUSH_INTERVAL seconds of answers
+- "redis":     a hash per session in Redis, shared by every process and kept
+  across restarts
+
+`SessionFlusher` (one thread per API process) writes the buffered answers of
+up to QUIZ_SESSION_FLUSH_BATCH sessions in one upsert, and finishes sessions
+whose deadline (plus QUIZ_SESSION_GRACE_SECONDS) has passed. Finishing grades
+the saved and still-buffered answers into a `QuizResult` like a submission.
+Flushing and finishing both lock the session rows first, so an answer is
+graded whether or not it had been flushed, and one flushed after its session
+finished is dropped. A session whose student already has a result for the
+quiz (e.g. imported in bulk meanwhile) is closed as `superseded`, pointing
+at that result.
+
+The in-process buffer is only visible to its own process, so a finish would
+miss answers buffered by another; with several API processes (WEB_CONCURRENCY)
+it refuses to start and Redis is required.
+"""
+
+import itertools
+import json
+import math
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, FrozenSet, List, NamedTuple, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+
+from app.core.analytics import record_result
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.grading import answer_key_for, cached_answer_key, grade_submission
+from app.db import models
+from app.db.session import SessionLocal, engine
+
+REDIS_BUFFER_PREFIX = "pdfquiz:session-answers"
+ACTIVE = models.SessionStatusEnum.active.value
+# Snapshots may be this stale in other processes; what they accept after a finish is dropped when flushed
+STATE_TTL = 60.0
+EXPIRY_CHECK_INTERVAL = 5.0
+
+
+def _utc(value: datetime) -> datetime:
+    # SQLite hands timezone-aware columns back naive; they are stored in UTC
+    return value if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
+
+# ---------- Buffer backends ----------
+
+class LocalAnswerBuffer:
+    """Latest pending answer per (session, question), in this process."""
+    blocking = False
+
+    def __init__(self):
+        self._answers: Dict[str, Dict[str, dict]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, session_id: str, question_id: str, answer: dict) -> None:
+        with self._lock:
+            self._answers.setdefault(session_id, {})[question_id] = answer
+
+    def dirty_sessions(self, limit: int) -> List[str]:
+        """Sessions with pending answers, longest waiting first."""
+        with self._lock:
+            return list(itertools.islice(self._answers, limit))
+
+    def take(self, session_id: str) -> Dict[str, dict]:
+        with self._lock:
+            return self._answers.pop(session_id, {})
+
+    def restore(self, session_id: str, answers: Dict[str, dict]) -> None:
+        """Put back answers whose write failed, unless newer ones arrived meanwhile."""
+        with self._lock:
+            pending = self._answers.setdefault(session_id, {})
+            for question_id, answer in answers.items():
+                pending.setdefault(question_id, answer)
+
+    def pending_questions(self, session_id: str) -> List[str]:
+        with self._lock:
+            return list(self._answers.get(session_id, ()))
+
+    def __len__(self) -> int:
+        return len(self._answers)
+
+
+class RedisAnswerBuffer:
+    """A Redis hash of pending answers per session plus a set of sessions to flush, shared by all processes."""
+    blocking = True
+
+    def __init__(self, url: str, prefix: str = REDIS_BUFFER_PREFIX):
+        import redis
+
+        self._redis = redis.Redis.from_url(url)
+        self._prefix = prefix
+        self._dirty = f"{prefix}:dirty"
+
+    def _key(self, session_id: str) -> str:
+        return f"{self._prefix}:{session_id}"
+
+    def add(self, session_id: str, question_id: str, answer: dict) -> None:
+        pipe = self._redis.pipeline()
+        pipe.hset(self._key(session_id), question_id, json.dumps(answer))
+        pipe.sadd(self._dirty, session_id)
+        pipe.execute()
+
+    def dirty_sessions(self, limit: int) -> List[str]:
+        # Popped: a session whose answers are added again afterwards is re-added
+        return [session_id.decode() for session_id in self._redis.spop(self._dirty, limit) or []]
+
+    def take(self, session_id: str) -> Dict[str, dict]:
+        pipe = self._redis.pipeline()
+        pipe.hgetall(self._key(session_id))
+        pipe.delete(self._key(session_id))
+        answers, _ = pipe.execute()
+        return {question_id.decode(): json.loads(answer) for question_id, answer in answers.items()}
+
+    def restore(self, session_id: str, answers: Dict[str, dict]) -> None:
+        pipe = self._redis.pipeline()
+        for question_id, answer in answers.items():
+            pipe.hsetnx(self._key(session_id), question_id, json.dumps(answer))
+        pipe.sadd(self._dirty, session_id)
+        pipe.execute()
+
+    def pending_questions(self, session_id: str) -> List[str]:
+        return [question_id.decode() for question_id in self._redis.hkeys(self._key(session_id))]
+
+    def __len__(self) -> int:
+        return self._redis.scard(self._dirty)
+
+
+def create_answer_buffer():
+    """Build the buffer configured by `settings.QUIZ_SESSION_BUFFER`."""
+    if settings.QUIZ_SESSION_BUFFER == "redis":
+        return RedisAnswerBuffer(settings.REDIS_URL)
+    if settings.QUIZ_SESSION_BUFFER == "inprocess":
+        if settings.WEB_CONCURRENCY > 1:
+            raise ValueError(
+                "QUIZ_SESSION_BUFFER=inprocess can't be used with several API processes: a finish "
+                "would miss the answers buffered by the others. Set QUIZ_SESSION_BUFFER=redis."
+            )
+        return LocalAnswerBuffer()
+    raise ValueError(f"Unknown QUIZ_SESSION_BUFFER: {settings.QUIZ_SESSION_BUFFER}")
+
+
+answer_buffer = create_answer_buffer()
+# Held by the flusher while it writes a batch and while a session is finished, so
+# within a process neither reads the rows the other is about to commit (SQLite
+# has no row locks; on Postgres the row locks below also cover other processes)
+_write_lock = threading.Lock()
+
+# ---------- Session snapshots ----------
+
+class SessionState(NamedTuple):
+    id: uuid.UUID
+    quiz_id: uuid.UUID
+    student_id: uuid.UUID
+    deadline: float  # epoch seconds
+    active: bool
+    question_ids: FrozenSet[str]
+
+    def accepts_answers(self) -> bool:
+        return self.active and time.time() <= self.deadline + settings.QUIZ_SESSION_GRACE_SECONDS
+
+
+_states = TTLCache(settings.QUIZ_SESSION_CACHE_ENTRIES, STATE_TTL)
+
+
+def _load_state(session_id: uuid.UUID) -> Optional[SessionState]:
+    db = SessionLocal()
+    try:
+        session = db.get(models.QuizSession, session_id)
+        if session is None:
+            return None
+        version = db.scalar(select(models.Quiz.version).where(models.Quiz.id == session.quiz_id))
+        key = cached_answer_key(session.quiz_id, version)
+        if key is None:
+            key = answer_key_for(db.get(models.Quiz, session.quiz_id))
+        return SessionState(
+            id=session.id,
+            quiz_id=session.quiz_id,
+            student_id=session.student_id,
+            deadline=_utc(session.deadline).timestamp(),
+            active=session.status == ACTIVE,
+            question_ids=frozenset(key.positions),
+        )
+    finally:
+        db.close()
+
+
+async def load_session_state(session_id: uuid.UUID) -> Optional[SessionState]:
+    """
+    The session's snapshot, from the cache or loaded in one threadpool call
+    that returns its connection before it ends: when a whole class's snapshots
+    expire together, no thread waits for a connection another request holds.
+    """
+    state = _states.get(str(session_id))
+    if state is None:
+        state = await run_in_threadpool(_load_state, session_id)
+        if state is not None:
+            _states.set(str(session_id), state)
+    return state
+
+
+async def buffer_answer(state: SessionState, answer: dict) -> None:
+    """Queue `answer` (an `Answer`-shaped dict) for the next flush."""
+    answer = {**answer, "answeredAt": time.time()}
+    if answer_buffer.blocking:
+        await run_in_threadpool(answer_buffer.add, str(state.id), answer["questionId"], answer)
+    else:
+        answer_buffer.add(str(state.id), answer["questionId"], answer)
+
+# ---------- Writing ----------
+
+def _insert(model):
+    if engine.dialect.name == "postgresql":
+        return postgresql.insert(model)
+    if engine.dialect.name == "sqlite":
+        return sqlite.insert(model)
+    raise ValueError(f"Quiz sessions are not supported on {engine.dialect.name}")
+
+
+def _answer_row(session_id: uuid.UUID, answer: dict) -> dict:
+    return {
+        "session_id": session_id,
+        "question_id": answer["questionId"],
+        "selected_option": answer["selectedOption"],
+        "time_spent": answer["timeSpent"],
+        "open_ended_answer": answer.get("openEndedAnswer"),
+        "answered_at": datetime.fromtimestamp(answer["answeredAt"], timezone.utc),
+    }
+
+
+def _write_answers(db, rows: List[dict]) -> None:
+    stmt = _insert(models.QuizSessionAnswer)
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[models.QuizSessionAnswer.session_id, models.QuizSessionAnswer.question_id],
+            set_={column: stmt.excluded[column]
+                  for column in ("selected_option", "time_spent", "open_ended_answer", "answered_at")},
+        ),
+        rows,
+    )
+
+
+def flush_answers(batch_size: int) -> int:
+    """Write the buffered answers of up to `batch_size` sessions in one transaction; returns the answers written."""
+    with _write_lock:
+        session_ids = answer_buffer.dirty_sessions(batch_size)
+        if not session_ids:
+            return 0
+        db = SessionLocal()
+        taken: Dict[str, Dict[str, dict]] = {}
+        try:
+            ids = [uuid.UUID(session_id) for session_id in session_ids]
+            # Waits for a session being finished; answers for closed sessions are dropped
+            open_ids = set(db.scalars(
+                select(models.QuizSession.id)
+                .where(models.QuizSession.id.in_(ids), models.QuizSession.status == ACTIVE)
+                .with_for_update(read=True)
+            ).all())
+            rows, dropped = [], 0
+            for session_id, session_uuid in zip(session_ids, ids):
+                answers = answer_buffer.take(session_id)
+                if answers and session_uuid in open_ids:
+                    taken[session_id] = answers
+                    rows.extend(_answer_row(session_uuid, answer) for answer in answers.values())
+                else:
+                    dropped += len(answers)
+            if dropped:
+                # Accepted on a stale snapshot after the session finished elsewhere
+                print(f"[SESSIONS] Dropped {dropped} answer(s) buffered for closed sessions")
+            if rows:
+                _write_answers(db, rows)
+            db.commit()
+            return len(rows)
+        except Exception:
+            db.rollback()
+            for session_id, answers in taken.items():
+                answer_buffer.restore(session_id, answers)
+            raise
+        finally:
+            db.close()
+
+# ---------- Finishing ----------
+
+def _lock_session(db, session_id: uuid.UUID) -> Optional[models.QuizSession]:
+    return db.scalars(
+        select(models.QuizSession).where(models.QuizSession.id == session_id).with_for_update()
+    ).first()
+
+
+def _existing_result(db, session: models.QuizSession) -> Optional[uuid.UUID]:
+    return db.scalar(select(models.QuizResult.id).where(
+        models.QuizResult.quiz_id == session.quiz_id,
+        models.QuizResult.student_id == session.student_id
+    ))
+
+
+def _supersede(db, session: models.QuizSession, result_id: uuid.UUID) -> uuid.UUID:
+    """Close the session without grading it, pointing at the result the student already has (commits)."""
+    answer_buffer.take(str(session.id))
+    session.status = models.SessionStatusEnum.superseded.value
+    session.finished_at = datetime.now(timezone.utc)
+    session.result_id = result_id
+    db.commit()
+    _states.delete(str(session.id))
+    print(f"[SESSIONS] Session {session.id} superseded by result {result_id}")
+    return result_id
+
+
+def _finish(db, session_id: uuid.UUID, status: models.SessionStatusEnum) -> Optional[uuid.UUID]:
+    """Grade an active session into a result and close it; returns the result id (None if there is no session)."""
+    session = _lock_session(db, session_id)
+    if session is None:
+        return None
+    if session.status != ACTIVE:
+        return session.result_id
+    # Submitted or imported while the session was open
+    existing = _existing_result(db, session)
+    if existing is not None:
+        return _supersede(db, session, existing)
+
+    answers = {
+        row.question_id: {
+            "questionId": row.question_id,
+            "selectedOption": row.selected_option,
+            "timeSpent": row.time_spent,
+            "openEndedAnswer": row.open_ended_answer,
+        }
+        for row in db.scalars(select(models.QuizSessionAnswer).where(models.QuizSessionAnswer.session_id == session_id))
+    }
+    for question_id, answer in answer_buffer.take(str(session_id)).items():
+        answer.pop("answeredAt", None)
+        answers[question_id] = answer
+    key = answer_key_for(db.get(models.Quiz, session.quiz_id))
+    submitted = sorted(answers.values(), key=lambda answer: key.positions.get(answer["questionId"], key.total_questions))
+    graded, score = grade_submission(key, submitted)
+
+    now = datetime.now(timezone.utc)
+    started_at = _utc(session.started_at)
+    student = db.get(models.User, session.student_id)
+    result = models.QuizResult(
+        id=uuid.uuid4(),
+        quiz_id=session.quiz_id,
+        student_id=session.student_id,
+        student_name=student.name,
+        student_number=student.student_number or "",
+        answers=graded,
+        score=score,
+        total_questions=key.total_questions,
+        time_spent=int((min(now, _utc(session.deadline)) - started_at).total_seconds() * 1000),
+    )
+    try:
+        db.add(result)
+        record_result(db, result)  # may flush the insert
+        session.status = status.value
+        session.finished_at = now
+        session.result_id = result.id
+        db.commit()
+    except IntegrityError:
+        # UNIQUE(quiz_id, student_id): a result committed between the check above and this insert
+        db.rollback()
+        session = _lock_session(db, session_id)
+        if session is None or session.status != ACTIVE:
+            return session.result_id if session is not None else None
+        existing = _existing_result(db, session)
+        if existing is None:
+            raise
+        return _supersede(db, session, existing)
+    _states.delete(str(session_id))
+    return result.id
+
+
+def finish_session(session_id: uuid.UUID, status: models.SessionStatusEnum = models.SessionStatusEnum.finished) -> Optional[uuid.UUID]:
+    """`_finish` with its own session; blocking, run it in the threadpool from requests."""
+    with _write_lock:
+        db = SessionLocal()
+        try:
+            return _finish(db, session_id, status)
+        finally:
+            db.close()
+
+
+def expire_sessions(limit: int) -> int:
+    """Finish up to `limit` sessions whose time ran out without a finish; returns how many."""
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.QUIZ_SESSION_GRACE_SECONDS)
+    db = SessionLocal()
+    try:
+        session_ids = db.scalars(
+            select(models.QuizSession.id)
+            .where(models.QuizSession.status == ACTIVE, models.QuizSession.deadline < cutoff)
+            .order_by(models.QuizSession.deadline)
+            .limit(limit)
+        ).all()
+    finally:
+        db.close()
+    for session_id in session_ids:
+        try:
+            finish_session(session_id, models.SessionStatusEnum.expired)
+        except Exception as e:
+            print(f"[SESSIONS] Could not expire session {session_id}: {e}")
+    if session_ids:
+        print(f"[SESSIONS] Expired {len(session_ids)} session(s)")
+    return len(session_ids)
+
+# ---------- Flusher ----------
+
+class SessionFlusher:
+    """Daemon thread flushing buffered answers every `interval` seconds and expiring overdue sessions."""
+
+    def __init__(self, interval: float, batch_size: int):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.flushed = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="session-flusher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Stop the thread, which writes whatever is still buffered first."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def flush(self) -> int:
+        """
+        Flush the sessions buffered when it is called, a batch at a time;
+        returns the answers written. Bounded, so steady answer traffic can't
+        keep it from returning (and the flusher from expiring sessions).
+        """
+        written = 0
+        for _ in range(math.ceil(len(answer_buffer) / self.batch_size)):
+            count = flush_answers(self.batch_size)
+            written += count
+            if count == 0:
+                break
+        self.flushed += written
+        return written
+
+    def _run(self) -> None:
+        next_expiry = time.monotonic()
+        while not self._stop.wait(self.interval):
+            try:
+                self.flush()
+                if time.monotonic() >= next_expiry:
+                    next_expiry = time.monotonic() + EXPIRY_CHECK_INTERVAL
+                    expire_sessions(self.batch_size)
+            except Exception as e:
+                print(f"[SESSIONS] Flush failed: {e}")
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"[SESSIONS] Final flush failed: {e}")
+
+
+session_flusher = SessionFlusher(settings.QUIZ_SESSION_FLUSH_INTERVAL, settings.QUIZ_SESSION_FLUSH_BATCH)
@@ -1,7 +1,10 @@
-from sqlalchemy import Column, String, Integer, Enum, DateTime, func, Text, Boolean, ForeignKey, JSON
+from sqlalchemy import DDL, Column, String, Integer, BigInteger, Float, Enum, DateTime, func, Text, Boolean, ForeignKey, JSON, Index, LargeBinary, UniqueConstraint, delete, event, insert, update
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import Session, attributes, relationship, validates
 from sqlalchemy.dialects.postgresql import UUID
+import io
+import json
 import uuid
 import enum
 
@@ -11,6 +14,13 @@ class RoleEnum(str, enum.Enum):
     teacher = "teacher"
     student = "student"
 
+class JobStatusEnum(str, enum.Enum):
+    queued = "queued"
+    extracting = "extracting"
+    generating = "generating"
+    done = "done"
+    failed = "failed"
+
 class User(Base):
     __tablename__ = "users"
 
@@ -30,14 +40,34 @@ class Quiz(Base):
     file_name = Column(String, nullable=False)
     question_type = Column(String, nullable=False)  # 'multiple-choice' or 'open-ended'
     questions = Column(JSON, nullable=False)  # Store questions as JSON
+    question_count = Column(Integer, nullable=False, default=0)  # kept in sync with questions
+    version = Column(Integer, nullable=False, default=1)  # bumped whenever questions change
     created_by = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     is_published = Column(Boolean, default=True)
+    time_limit_seconds = Column(Integer, nullable=True)  # for live sessions; QUIZ_SESSION_DURATION_SECONDS when unset
+
+    # Keyset pagination indexes (see supabase/migrations/*_quiz_listing_keyset.sql)
+    __table_args__ = (
+        Index("idx_quizzes_published_created_at", created_at.desc(), id.desc(), postgresql_where=is_published),
+        Index("idx_quizzes_created_by_created_at", created_by, created_at.desc(), id.desc()),
+    )
 
     # Relationships
     creator = relationship("User", back_populates="created_quizzes")
     results = relationship("QuizResult", back_populates="quiz")
 
+    # Not a column: text extracted from the source PDF, indexed for search when the quiz is inserted
+    document_text = None
+
+    @validates("questions")
+    def _sync_questions(self, key, questions):
+        self.question_count = len(questions or [])
+        # New quizzes start at the column default; edits invalidate cached answer keys
+        if self.version is not None:
+            self.version += 1
+        return questions
+
 class QuizResult(Base):
     __tablename__ = "quiz_results"
 
@@ -52,10 +82,392 @@ class QuizResult(Base):
     completed_at = Column(DateTime(timezone=True), server_default=func.now())
     time_spent = Column(Integer, nullable=False)  # in milliseconds
 
+    __table_args__ = (
+        UniqueConstraint(quiz_id, student_id),  # one submission per student (live sessions rely on it)
+        # Keyset pagination index (see supabase/migrations/*_results_keyset.sql)
+        Index("idx_quiz_results_quiz_completed_at", quiz_id, completed_at.desc(), id.desc()),
+    )
+
     # Relationships
     quiz = relationship("Quiz", back_populates="results")
     student = relationship("User", back_populates="quiz_results")
 
+class QuizQuestion(Base):
+    """One row per entry of `Quiz.questions`, written alongside the JSON (see `_sync_normalized_rows`)."""
+    __tablename__ = "questions"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    quiz_id = Column(UUID(as_uuid=True), ForeignKey("quizzes.id", ondelete="CASCADE"), nullable=False)
+    position = Column(Integer, nullable=False)
+    question_id = Column(String, nullable=False)  # the question's "id" within the quiz
+    type = Column(String, nullable=False)
+    question = Column(Text, nullable=False)
+    options = Column(JSON, nullable=False)
+    correct_answer = Column(Integer, nullable=True)
+    explanation = Column(Text, nullable=True)
+
+    __table_args__ = (
+        Index("idx_questions_quiz_position", quiz_id, position),
+        Index("idx_questions_quiz_question_id", quiz_id, question_id),
+    )
+
+    @staticmethod
+    def rows_for(quiz_id, questions) -> list:
+        return [{
+            "id": uuid.uuid4(),
+            "quiz_id": quiz_id,
+            "position": position,
+            "question_id": str(question.get("id")),
+            "type": question.get("type") or "",
+            "question": question.get("question") or "",
+            "options": question.get("options") or [],
+            "correct_answer": question.get("correctAnswer"),
+            "explanation": question.get("explanation"),
+        } for position, question in enumerate(questions or [])]
+
+class ResultAnswer(Base):
+    """One row per entry of `QuizResult.answers`, written alongside the JSON."""
+    __tablename__ = "answers"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    result_id = Column(UUID(as_uuid=True), ForeignKey("quiz_results.id", ondelete="CASCADE"), nullable=False)
+    position = Column(Integer, nullable=False)
+    question_id = Column(String, nullable=False)
+    selected_option = Column(Integer, nullable=True)
+    is_correct = Column(Boolean, nullable=False, default=False)
+    time_spent = Column(Integer, nullable=True)  # in milliseconds
+    open_ended_answer = Column(Text, nullable=True)
+    similarity = Column(Float, nullable=True)
+    confidence = Column(Float, nullable=True)
+
+    __table_args__ = (
+        Index("idx_answers_result_position", result_id, position),
+    )
+
+    @staticmethod
+    def rows_for(result_id, answers) -> list:
+        return [{
+            "id": uuid.uuid4(),
+            "result_id": result_id,
+            "position": position,
+            "question_id": str(answer.get("questionId")),
+            "selected_option": answer.get("selectedOption"),
+            "is_correct": bool(answer.get("isCorrect")),
+            "time_spent": answer.get("timeSpent"),
+            "open_ended_answer": answer.get("openEndedAnswer"),
+            "similarity": answer.get("similarity"),
+            "confidence": answer.get("confidence"),
+        } for position, answer in enumerate(answers or [])]
+
+class QuizSearchDocument(Base):
+    """
+    Searchable text of a quiz, written alongside it (see `_sync_normalized_rows`).
+    The full-text index over it is dialect specific (see `_SEARCH_INDEX_DDL`).
+    """
+    __tablename__ = "quiz_search"
+
+    id = Column(Integer, primary_key=True)  # stable rowid for SQLite FTS5
+    quiz_id = Column(UUID(as_uuid=True), ForeignKey("quizzes.id", ondelete="CASCADE"), nullable=False, unique=True)
+    title = Column(String, nullable=False)
+    questions_text = Column(Text, nullable=False)  # question wording and options, no answers
+    document_text = Column(Text, nullable=True)  # extracted PDF text (uploads only)
+
+    @staticmethod
+    def questions_text_for(questions) -> str:
+        lines = []
+        for question in questions or []:
+            if isinstance(question, dict):
+                options = " ".join(str(option) for option in question.get("options") or [])
+                lines.append(f"{question.get('question') or ''} {options}".strip())
+        return "\n".join(lines)
+
+class QuizStats(Base):
+    """Running aggregates of a quiz's results, updated with each submission."""
+    __tablename__ = "quiz_stats"
+
+    quiz_id = Column(UUID(as_uuid=True), ForeignKey("quizzes.id", ondelete="CASCADE"), primary_key=True)
+    submissions = Column(Integer, nullable=False, default=0)
+    score_sum = Column(BigInteger, nullable=False, default=0)
+    percent_sum = Column(Float, nullable=False, default=0.0)  # sum of score / total_questions * 100
+    time_spent_sum = Column(BigInteger, nullable=False, default=0)  # in milliseconds
+    score_histogram = Column(JSON, nullable=False)  # submission counts per 10% score bucket
+    question_counts = Column(JSON, nullable=False)  # {question_id: [answered, correct]}
+    time_spent_sketch = Column(JSON, nullable=False)  # QuantileSketch.to_dict()
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class SessionStatusEnum(str, enum.Enum):
+    active = "active"
+    finished = "finished"  # by the student
+    expired = "expired"  # finished by the server when the time ran out
+    superseded = "superseded"  # closed without grading: the student already had a result for the quiz
+
+class QuizSession(Base):
+    """A timed attempt at a quiz whose answers are saved as they are given (see app/core/sessions.py)."""
+    __tablename__ = "quiz_sessions"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    quiz_id = Column(UUID(as_uuid=True), ForeignKey("quizzes.id", ondelete="CASCADE"), nullable=False)
+    student_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    status = Column(String, nullable=False, default=SessionStatusEnum.active.value)
+    started_at = Column(DateTime(timezone=True), nullable=False)
+    deadline = Column(DateTime(timezone=True), nullable=False)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    result_id = Column(UUID(as_uuid=True), ForeignKey("quiz_results.id", ondelete="SET NULL"), nullable=True)
+
+    __table_args__ = (
+        Index("idx_quiz_sessions_quiz_student", quiz_id, student_id, unique=True),
+        Index("idx_quiz_sessions_active_deadline", deadline, postgresql_where=status == SessionStatusEnum.active.value),
+    )
+
+class QuizSessionAnswer(Base):
+    """The latest answer to each question of a session, written in batches."""
+    __tablename__ = "quiz_session_answers"
+
+    session_id = Column(UUID(as_uuid=True), ForeignKey("quiz_sessions.id", ondelete="CASCADE"), primary_key=True)
+    question_id = Column(String, primary_key=True)
+    selected_option = Column(Integer, nullable=False)
+    time_spent = Column(Integer, nullable=False)  # in milliseconds
+    open_ended_answer = Column(Text, nullable=True)
+    answered_at = Column(DateTime(timezone=True), nullable=False)
+
+class UploadJob(Base):
+    __tablename__ = "upload_jobs"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
+    status = Column(String, nullable=False, default=JobStatusEnum.queued.value)
+    file_name = Column(String, nullable=False)
+    file_path = Column(String, nullable=False)
+    content_sha256 = Column(String(64), nullable=True, index=True)
+    question_type = Column(String, nullable=False)
+    num_questions = Column(Integer, nullable=True)
+    created_by = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    quiz_id = Column(UUID(as_uuid=True), ForeignKey("quizzes.id", ondelete="SET NULL"), nullable=True)
+    error = Column(Text, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")  # times a worker started it
+    # Text extraction metrics, unset when the text came from the cache
+    extract_seconds = Column(Float, nullable=True)
+    extract_peak_memory_bytes = Column(BigInteger, nullable=True)  # measured for isolated (large-document) extraction
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    # Relationships
+    quiz = relationship("Quiz")
+
+    __table_args__ = (
+        Index("idx_upload_jobs_status_updated_at", status, updated_at),
+    )
+
+class Blob(Base):
+    """An uploaded file stored once under its SHA-256 (see app/core/blobs.py)."""
+    __tablename__ = "blobs"
+
+    sha256 = Column(String(64), primary_key=True)
+    size = Column(BigInteger, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0)  # upload jobs holding it; deleted from disk at 0
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class QuestionBankEntry(Base):
+    """A generated question kept for reuse, with its MinHash signature (see app/core/question_bank.py)."""
+    __tablename__ = "question_bank"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    created_by = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    question_type = Column(String, nullable=False)
+    question = Column(JSON, nullable=False)  # the question object as generated
+    signature = Column(LargeBinary, nullable=False)  # uint32 MinHash values
+    source_sha256 = Column(String(64), nullable=True)  # upload the question was generated from
+    occurrences = Column(Integer, nullable=False, default=1)  # times it (or a near-duplicate) was generated
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("idx_question_bank_owner_type_created_at", created_by, question_type, created_at.desc()),
+        Index("idx_question_bank_source", source_sha256),
+    )
+
+class QuestionBankBucket(Base):
+    """LSH index: one row per (band key, entry), so a lookup is a primary key range scan per band."""
+    __tablename__ = "question_bank_buckets"
+
+    bucket = Column(BigInteger, primary_key=True)
+    entry_id = Column(UUID(as_uuid=True), ForeignKey("question_bank.id", ondelete="CASCADE"), primary_key=True)
+
+    __table_args__ = (
+        Index("idx_question_bank_buckets_entry", entry_id),  # for ON DELETE CASCADE
+    )
+
 # Add relationships to User model
 User.created_quizzes = relationship("Quiz", back_populates="creator")
 User.quiz_results = relationship("QuizResult", back_populates="student")
+
+
+# ---------- Normalized rows ----------
+
+def _replace_rows(connection, model, parent_column, items: dict, existing: set) -> None:
+    """Delete the child rows of `existing` parents, then insert rows for every {parent_id: items} entry."""
+    if existing:
+        connection.execute(delete(model).where(parent_column.in_(list(existing))))
+    rows = [row for parent_id, values in items.items() for row in model.rows_for(parent_id, values)]
+    if rows:
+        connection.execute(insert(model), rows)
+
+
+def replace_answer_rows(connection, answers_by_result: dict) -> None:
+    """Rewrite the `answers` rows of the given results ({result_id: answers}); for bulk UPDATEs that skip the ORM."""
+    _replace_rows(connection, ResultAnswer, ResultAnswer.result_id, answers_by_result, set(answers_by_result))
+
+
+_COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+def _copy_value(value) -> str:
+    # COPY's text format
+    kind = type(value)
+    if kind is int or kind is float or kind is uuid.UUID:
+        return str(value)
+    if value is None:
+        return "\\N"
+    if kind is bool:
+        return "t" if value else "f"
+    if kind is str:
+        return value.translate(_COPY_ESCAPES)
+    if kind is dict or kind is list:
+        return json.dumps(value).translate(_COPY_ESCAPES)
+    return str(value).translate(_COPY_ESCAPES)
+
+
+def copy_rows(connection, model, rows: list) -> None:
+    """
+    Insert `rows` (dicts with the same column keys, Python-side defaults filled
+    in) with COPY on Postgres, which skips building and parsing a statement for
+    them; with a multi-row INSERT elsewhere.
+    """
+    if not rows:
+        return
+    if connection.dialect.name != "postgresql" or connection.dialect.driver != "psycopg2":
+        connection.execute(insert(model), rows)
+        return
+    columns = list(rows[0])
+    data = io.StringIO()
+    for row in rows:
+        data.write("\t".join([_copy_value(row[column]) for column in columns]))
+        data.write("\n")
+    data.seek(0)
+    preparer = connection.dialect.identifier_preparer
+    statement = (
+        f"COPY {preparer.format_table(model.__table__)} "
+        f"({', '.join(preparer.quote(column) for column in columns)}) FROM STDIN"
+    )
+    cursor = connection.connection.cursor()  # the DBAPI connection, in the same transaction
+    try:
+        cursor.copy_expert(statement, data)
+    except connection.dialect.dbapi.Error as e:
+        # Raised as SQLAlchemy's exceptions (e.g. IntegrityError), like statements run through it
+        raise DBAPIError.instance(statement, None, e, connection.dialect.dbapi.Error) from e
+    finally:
+        cursor.close()
+
+
+def insert_answer_rows(connection, answers_by_result: dict) -> None:
+    """Write the `answers` rows of new results ({result_id: answers}) with `copy_rows`; for bulk INSERTs that skip the ORM."""
+    copy_rows(connection, ResultAnswer, [row for result_id, answers in answers_by_result.items()
+                                         for row in ResultAnswer.rows_for(result_id, answers)])
+
+
+def _sync_search_rows(connection, new_quizzes: list, changed_quizzes: list, deleted_ids: set) -> None:
+    if deleted_ids:
+        connection.execute(delete(QuizSearchDocument).where(QuizSearchDocument.quiz_id.in_(list(deleted_ids))))
+    if new_quizzes:
+        connection.execute(insert(QuizSearchDocument), [{
+            "quiz_id": quiz.id,
+            "title": quiz.title,
+            "questions_text": QuizSearchDocument.questions_text_for(quiz.questions),
+            "document_text": quiz.document_text,
+        } for quiz in new_quizzes])
+    for quiz in changed_quizzes:
+        connection.execute(
+            update(QuizSearchDocument)
+            .where(QuizSearchDocument.quiz_id == quiz.id)
+            .values(title=quiz.title, questions_text=QuizSearchDocument.questions_text_for(quiz.questions))
+        )
+
+
+@event.listens_for(Session, "after_flush")
+def _sync_normalized_rows(session, flush_context):
+    """
+    Keep `questions`, `answers` and `quiz_search` in step with the quiz and
+    result columns they mirror, in the same transaction. Runs after the parent rows are written, with
+    Core statements, so no relationship is ever lazy-loaded (safe under
+    AsyncSession too).
+    """
+    questions, answers, existing_quizzes, existing_results = {}, {}, set(), set()
+    new_quizzes, changed_quizzes = [], []
+    for obj in session.new:
+        if isinstance(obj, Quiz):
+            questions[obj.id] = obj.questions
+            new_quizzes.append(obj)
+        elif isinstance(obj, QuizResult):
+            answers[obj.id] = obj.answers
+    for obj in session.dirty:
+        if isinstance(obj, Quiz):
+            if attributes.get_history(obj, "questions").has_changes():
+                questions[obj.id] = obj.questions
+                existing_quizzes.add(obj.id)
+            if obj.id in questions or attributes.get_history(obj, "title").has_changes():
+                changed_quizzes.append(obj)
+        elif isinstance(obj, QuizResult) and attributes.get_history(obj, "answers").has_changes():
+            answers[obj.id] = obj.answers
+            existing_results.add(obj.id)
+    for obj in session.deleted:
+        if isinstance(obj, Quiz):
+            existing_quizzes.add(obj.id)
+        elif isinstance(obj, QuizResult):
+            existing_results.add(obj.id)
+
+    if questions or existing_quizzes:
+        _replace_rows(session.connection(), QuizQuestion, QuizQuestion.quiz_id, questions, existing_quizzes)
+    if answers or existing_results:
+        _replace_rows(session.connection(), ResultAnswer, ResultAnswer.result_id, answers, existing_results)
+    deleted_quizzes = existing_quizzes - set(questions)
+    if new_quizzes or changed_quizzes or deleted_quizzes:
+        _sync_search_rows(session.connection(), new_quizzes, changed_quizzes, deleted_quizzes)
+
+
+# ---------- Full-text search index ----------
+
+# SQLite: an FTS5 table over `quiz_search`, kept in sync by triggers.
+# Postgres: a weighted tsvector column with a GIN index (also created by
+# supabase/migrations/*_quiz_search.sql). Only needed for `create_all` setups.
+_SEARCH_INDEX_DDL = {
+    "sqlite": [
+        """CREATE VIRTUAL TABLE IF NOT EXISTS quiz_search_fts USING fts5(
+            title, questions_text, document_text,
+            content='quiz_search', content_rowid='id', tokenize='porter unicode61'
+        )""",
+        """CREATE TRIGGER IF NOT EXISTS quiz_search_ai AFTER INSERT ON quiz_search BEGIN
+            INSERT INTO quiz_search_fts(rowid, title, questions_text, document_text)
+            VALUES (new.id, new.title, new.questions_text, new.document_text);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS quiz_search_ad AFTER DELETE ON quiz_search BEGIN
+            INSERT INTO quiz_search_fts(quiz_search_fts, rowid, title, questions_text, document_text)
+            VALUES ('delete', old.id, old.title, old.questions_text, old.document_text);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS quiz_search_au AFTER UPDATE ON quiz_search BEGIN
+            INSERT INTO quiz_search_fts(quiz_search_fts, rowid, title, questions_text, document_text)
+            VALUES ('delete', old.id, old.title, old.questions_text, old.document_text);
+            INSERT INTO quiz_search_fts(rowid, title, questions_text, document_text)
+            VALUES (new.id, new.title, new.questions_text, new.document_text);
+        END""",
+    ],
+    "postgresql": [
+        """ALTER TABLE quiz_search ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(questions_text, '')), 'B') ||
+            setweight(to_tsvector('english', coalesce(document_text, '')), 'C')
+        ) STORED""",
+        "CREATE INDEX IF NOT EXISTS idx_quiz_search_vector ON quiz_search USING GIN (search_vector)",
+    ],
+}
+
+for _dialect, _statements in _SEARCH_INDEX_DDL.items():
+    for _statement in _statements:
+        event.listen(QuizSearchDocument.__table__, "after_create", DDL(_statement).execute_if(dialect=_dialect))
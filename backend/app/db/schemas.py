@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from datetime import datetime
 from enum import Enum
 from typing import List, Optional, Dict, Any, Union
@@ -12,6 +12,13 @@ class QuestionTypeEnum(str, Enum):
     multiple_choice = "multiple-choice"
     open_ended = "open-ended"
 
+class JobStatusEnum(str, Enum):
+    queued = "queued"
+    extracting = "extracting"
+    generating = "generating"
+    done = "done"
+    failed = "failed"
+
 # User Schemas
 class UserBase(BaseModel):
     name: str
@@ -23,7 +30,7 @@ class UserCreate(UserBase):
     student_number: str | None = None
 
 class UserOut(UserBase):
-    id: str
+    id: uuid.UUID
     student_number: str | None
     created_at: datetime
 
@@ -47,12 +54,27 @@ class Question(BaseModel):
     explanation: Optional[str] = None
     type: QuestionTypeEnum
 
+class QuestionPublic(BaseModel):
+    """A question as students see it: no correct answer or explanation."""
+    id: str
+    question: str
+    options: List[str]
+    type: QuestionTypeEnum
+
+class AnswerKeyEntry(BaseModel):
+    question_id: str
+    correctAnswer: Optional[int] = None
+    explanation: Optional[str] = None  # the model answer open-ended questions are graded against
+
 class Answer(BaseModel):
     questionId: str
-    selectedOption: int
-    isCorrect: bool
+    selectedOption: int = Field(ge=-1, le=2**31 - 1)  # -1 when not answered; stored in an INTEGER column
+    isCorrect: bool = False  # set by the server when the result is graded
     timeSpent: int
     openEndedAnswer: Optional[str] = None
+    # Open-ended answers graded against the explanation
+    similarity: Optional[float] = None
+    confidence: Optional[float] = None
 
 # Quiz Schemas
 class QuizBase(BaseModel):
@@ -61,18 +83,62 @@ class QuizBase(BaseModel):
     question_type: QuestionTypeEnum
     questions: List[Question]
     is_published: bool = True
+    time_limit_seconds: Optional[int] = Field(None, gt=0)  # live sessions; QUIZ_SESSION_DURATION_SECONDS when unset
 
 class QuizCreate(QuizBase):
     pass
 
 class QuizOut(QuizBase):
-    id: str
-    created_by: str
+    id: uuid.UUID
+    version: int
+    created_by: uuid.UUID
     created_at: datetime
 
     class Config:
         from_attributes = True
 
+class QuizPublicOut(BaseModel):
+    """A quiz without its answer key, returned to anyone but its creator."""
+    id: uuid.UUID
+    title: str
+    file_name: str
+    question_type: QuestionTypeEnum
+    questions: List[QuestionPublic]
+    is_published: bool
+    time_limit_seconds: Optional[int] = None
+    version: int
+    created_by: uuid.UUID
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class QuizSummaryOut(BaseModel):
+    """Listing projection: everything but the questions themselves."""
+    id: uuid.UUID
+    title: str
+    file_name: str
+    question_type: QuestionTypeEnum
+    question_count: int
+    created_by: uuid.UUID
+    created_at: datetime
+    is_published: bool
+
+    class Config:
+        from_attributes = True
+
+class QuizSummaryPage(BaseModel):
+    items: List[QuizSummaryOut]
+    next_cursor: Optional[str] = None
+
+class QuizSearchHit(QuizSummaryOut):
+    rank: float  # higher is more relevant
+    highlight: Optional[str] = None  # HTML-escaped excerpt with matches in <mark> tags
+
+class QuizSearchPage(BaseModel):
+    items: List[QuizSearchHit]
+    next_cursor: Optional[str] = None
+
 # Quiz Result Schemas
 class QuizResultBase(BaseModel):
     quiz_id: str
@@ -85,17 +151,155 @@ class QuizResultBase(BaseModel):
     time_spent: int
 
 class QuizResultCreate(QuizResultBase):
-    pass
+    # Recomputed server-side from the answers; kept for older clients
+    score: int = 0
+    total_questions: int = 0
 
 class QuizResultOut(QuizResultBase):
-    id: str
+    id: uuid.UUID
+    quiz_id: uuid.UUID
+    student_id: uuid.UUID
     completed_at: datetime
 
     class Config:
         from_attributes = True
 
+class QuizResultSummaryOut(BaseModel):
+    """Listing projection: the result without its per-question answers."""
+    id: uuid.UUID
+    quiz_id: uuid.UUID
+    student_id: uuid.UUID
+    student_name: str
+    student_number: str
+    score: int
+    total_questions: int
+    time_spent: int
+    completed_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class QuizResultPage(BaseModel):
+    items: List[QuizResultSummaryOut]
+    next_cursor: Optional[str] = None
+
+class BulkResultError(BaseModel):
+    row: int  # position in the request, from 0
+    detail: str
+
+class BulkResultsOut(BaseModel):
+    received: int
+    inserted: int
+    errors: List[BulkResultError]
+
+# Live Quiz Session Schemas
+class QuizSessionStart(BaseModel):
+    quiz_id: uuid.UUID
+
+class SessionAnswer(BaseModel):
+    """One answer given during a session; answering a question again replaces it."""
+    questionId: str
+    selectedOption: int = Field(ge=-1, le=2**31 - 1)
+    timeSpent: int = 0
+    openEndedAnswer: Optional[str] = None
+
+class QuizSessionOut(BaseModel):
+    id: uuid.UUID
+    quiz_id: uuid.UUID
+    status: str  # 'active', 'finished', 'expired' or 'superseded'
+    started_at: datetime
+    deadline: datetime
+    finished_at: Optional[datetime] = None
+    result_id: Optional[uuid.UUID] = None
+    answered: List[str] = []  # question ids answered so far
+
+    class Config:
+        from_attributes = True
+
+# Quiz Stats Schemas
+class ScoreBucketOut(BaseModel):
+    min_percent: int
+    max_percent: int
+    count: int
+
+class QuestionStatsOut(BaseModel):
+    question_id: str
+    answered: int
+    correct: int
+    correct_rate: Optional[float] = None
+
+class TimeSpentStatsOut(BaseModel):
+    mean: Optional[float] = None
+    p50: Optional[float] = None
+    p90: Optional[float] = None
+    p99: Optional[float] = None
+
+class QuizStatsOut(BaseModel):
+    quiz_id: uuid.UUID
+    submissions: int
+    average_score: Optional[float] = None
+    average_percent: Optional[float] = None
+    score_histogram: List[ScoreBucketOut]
+    questions: List[QuestionStatsOut]
+    time_spent_ms: TimeSpentStatsOut
+
+class RegradeOut(BaseModel):
+    quiz_id: uuid.UUID
+    version: int
+    status: str
+
+class OptionCountOut(BaseModel):
+    option: int
+    count: int
+
+class QuestionBreakdownOut(BaseModel):
+    """Per-question aggregates computed in SQL from the `answers` table."""
+    question_id: str
+    position: int
+    question: str
+    answered: int
+    correct: int
+    correct_rate: Optional[float] = None
+    average_time_spent: Optional[float] = None
+    options: List[OptionCountOut]
+
 # PDF Upload Schema
 class PDFUploadResponse(BaseModel):
     success: bool
     quiz: QuizOut
     message: str
+
+# Upload Job Schemas
+class UploadJobOut(BaseModel):
+    id: uuid.UUID
+    status: JobStatusEnum
+    file_name: str
+    question_type: QuestionTypeEnum
+    num_questions: Optional[int] = None
+    quiz_id: Optional[uuid.UUID] = None
+    error: Optional[str] = None
+    extract_seconds: Optional[float] = None
+    # A shared process's peak says nothing about one document, so in-process and pooled extraction leave it null
+    extract_peak_memory_bytes: Optional[int] = Field(
+        None,
+        description="Peak memory of the isolated extraction process used for large documents (PDF_LARGE_DOCUMENT_BYTES); "
+                    "null for documents extracted in-process or on the shared pool",
+    )
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class BatchUploadItemOut(BaseModel):
+    file_name: str
+    status: str  # 'done' or 'failed' (the job's status), or 'rejected' when the file was not stored
+    job_id: Optional[uuid.UUID] = None
+    quiz_id: Optional[uuid.UUID] = None
+    error: Optional[str] = None
+
+class BatchUploadOut(BaseModel):
+    items: List[BatchUploadItemOut]
+    done: int
+    failed: int  # generation failed
+    rejected: int  # not stored (e.g. not a PDF, too large)
@@ -1,13 +1,136 @@
+from typing import Any, Callable
+
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 from app.core.config import settings
 
-engine = create_engine(settings.DATABASE_URL)
+
+def _pool_options(url: str) -> dict:
+    options = {"pool_pre_ping": settings.DB_POOL_PRE_PING}
+    if not url.startswith("sqlite"):
+        options.update(
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+        )
+    return options
+
+
+# Synchronous engine: background workers, scripts and the threaded request sessions
+engine = create_engine(settings.DATABASE_URL, **_pool_options(settings.DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Request sessions keep loaded attributes after commit, like AsyncSession below
+RequestSessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+# Asynchronous engine (asyncpg / aiosqlite), enabled with DB_ASYNC
+async_engine = None
+AsyncSessionLocal = None
+if settings.DB_ASYNC:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    connect_args = {}
+    if settings.ASYNC_DATABASE_URL.startswith("postgresql+asyncpg"):
+        # Set to 0 behind PgBouncer in transaction mode
+        connect_args = {
+            "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+            "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+        }
+    async_engine = create_async_engine(
+        settings.ASYNC_DATABASE_URL,
+        connect_args=connect_args,
+        **_pool_options(settings.ASYNC_DATABASE_URL)
+    )
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+class ThreadedStreamResult:
+    """The part of AsyncResult used for streaming: `partitions()` and `close()`."""
+
+    def __init__(self, result):
+        self.result = result
+
+    async def partitions(self, size: int):
+        while True:
+            rows = await run_in_threadpool(self.result.fetchmany, size)
+            if not rows:
+                break
+            yield rows
+
+    async def close(self) -> None:
+        await run_in_threadpool(self.result.close)
+
+
+class ThreadedSession:
+    """
+    AsyncSession-compatible facade over a synchronous Session. Blocking calls run
+    in the threadpool, so `async def` endpoints work the same way whether or not
+    DB_ASYNC is enabled.
+    """
+
+    def __init__(self, sync_session: Session):
+        self.sync_session = sync_session
+
+    def add(self, instance) -> None:
+        self.sync_session.add(instance)
+
+    def add_all(self, instances) -> None:
+        self.sync_session.add_all(instances)
+
+    async def execute(self, statement, params=None, **kwargs):
+        return await run_in_threadpool(self.sync_session.execute, statement, params, **kwargs)
+
+    async def scalar(self, statement, params=None, **kwargs):
+        return await run_in_threadpool(self.sync_session.scalar, statement, params, **kwargs)
+
+    async def scalars(self, statement, params=None, **kwargs):
+        return await run_in_threadpool(self.sync_session.scalars, statement, params, **kwargs)
+
+    async def stream(self, statement, params=None, **kwargs) -> ThreadedStreamResult:
+        """Execute with a server-side cursor (where the driver has one) and fetch lazily."""
+        statement = statement.execution_options(stream_results=True)
+        result = await run_in_threadpool(self.sync_session.execute, statement, params, **kwargs)
+        return ThreadedStreamResult(result)
+
+    async def get(self, entity, ident, **kwargs):
+        return await run_in_threadpool(self.sync_session.get, entity, ident, **kwargs)
+
+    async def delete(self, instance) -> None:
+        await run_in_threadpool(self.sync_session.delete, instance)
+
+    async def flush(self) -> None:
+        await run_in_threadpool(self.sync_session.flush)
+
+    async def commit(self) -> None:
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self) -> None:
+        await run_in_threadpool(self.sync_session.rollback)
+
+    async def refresh(self, instance, attribute_names=None) -> None:
+        await run_in_threadpool(self.sync_session.refresh, instance, attribute_names)
+
+    async def run_sync(self, fn: Callable[..., Any], *args, **kwargs):
+        return await run_in_threadpool(fn, self.sync_session, *args, **kwargs)
+
+    async def close(self) -> None:
+        if not self.sync_session.in_transaction():
+            # Nothing to roll back or return to the pool, e.g. after a cache hit
+            self.sync_session.close()
+            return
+        await run_in_threadpool(self.sync_session.close)
+
+
+def new_session():
+    """Open a request-style session (AsyncSession or ThreadedSession); the caller closes it."""
+    if AsyncSessionLocal is not None:
+        return AsyncSessionLocal()
+    return ThreadedSession(RequestSessionLocal())
+
 
-def get_db():
-    db = SessionLocal()
+async def get_db():
+    db = new_session()
     try:
         yield db
     finally:
-        db.close()
+        await db.close()
@@ -1,9 +1,17 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from app.api.v1 import auth, users, quizzes, files
+from fastapi.responses import JSONResponse
+from app.api.v1 import auth, users, quizzes, files, sessions
 from app.api import results
+from app.core.blobs import UploadSizeLimit
 from app.core.config import settings
+from app.core.jobs import worker_pool
+from app.core.live_results import live_results, results_broker
+from app.core.pdf import shutdown_process_pool
+from app.core.llm_gateway import gateway
+from app.core.security import PasswordHasherBusy, password_hasher
+from app.core.sessions import session_flusher
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -11,6 +19,12 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Refuse oversized uploads before their body is received
+app.add_middleware(UploadSizeLimit, limits={
+    f"{settings.API_V1_STR}/files/": settings.UPLOAD_MAX_BYTES,
+    f"{settings.API_V1_STR}/files/files/upload-batch": settings.UPLOAD_BATCH_MAX_BYTES,
+})
+
 # Add trusted host middleware for security
 app.add_middleware(
     TrustedHostMiddleware,
@@ -31,6 +45,33 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+def start_job_workers():
+    # With the Redis backend, workers run in separate `python -m app.worker` processes
+    if settings.JOB_BACKEND == "inprocess":
+        worker_pool.start()
+    session_flusher.start()
+
+@app.on_event("shutdown")
+def stop_workers():
+    if settings.JOB_BACKEND == "inprocess":
+        worker_pool.stop()
+    # Writes the answers still buffered in this process
+    session_flusher.stop()
+    results_broker.stop()
+    shutdown_process_pool()
+    gateway.close()
+    password_hasher.shutdown()
+
+@app.exception_handler(PasswordHasherBusy)
+async def password_hasher_busy(request: Request, exc: PasswordHasherBusy):
+    # Login storm: shed load instead of queueing requests behind bcrypt
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Authentication is busy, please retry"},
+        headers={"Retry-After": "1"},
+    )
+
 @app.get("/")
 def read_root():
     return {
@@ -42,7 +83,12 @@ def read_root():
 
 @app.get("/health")
 def health_check():
-    return {"status": "healthy", "service": "pdf-quiz-platform-api"}
+    return {
+        "status": "healthy",
+        "service": "pdf-quiz-platform-api",
+        "password_hasher": password_hasher.stats(),
+        "live_results": live_results.stats(),
+    }
 
 # Include routers
 app.include_router(auth.router, prefix=f"{settings.API_V1_STR}/auth", tags=["auth"])
@@ -50,3 +96,4 @@ app.include_router(users.router, prefix=f"{settings.API_V1_STR}/users", tags=["u
 app.include_router(quizzes.router, prefix=f"{settings.API_V1_STR}/quizzes", tags=["quizzes"])
 app.include_router(files.router, prefix=f"{settings.API_V1_STR}/files", tags=["files"])
 app.include_router(results.router, prefix=f"{settings.API_V1_STR}/results", tags=["results"])
+app.include_router(sessions.router, prefix=f"{settings.API_V1_STR}/sessions", tags=["sessions"])
@@ -0,0 +1,39 @@
+"""
+Standalone worker for the Redis job backend.
+
+Run one or more of these next to the API when JOB_BACKEND=redis:
+
+    python -m app.worker
+"""
+
+import signal
+import threading
+
+from app.core.config import settings
+from app.core.jobs import WorkerPool, job_queue, process_upload_job, recover_stalled_jobs
+from app.core.pdf import shutdown_process_pool
+from app.core.llm_gateway import gateway
+
+
+def main():
+    pool = WorkerPool(job_queue, process_upload_job, settings.JOB_WORKERS,
+                      sweep=recover_stalled_jobs, sweep_interval=settings.JOB_SWEEP_INTERVAL)
+    stopped = threading.Event()
+
+    def shutdown(signum, frame):
+        stopped.set()
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+
+    pool.start()
+    print(f"[WORKER] Started {settings.JOB_WORKERS} workers on {settings.JOB_BACKEND} backend")
+    stopped.wait()
+    pool.stop()
+    shutdown_process_pool()
+    gateway.close()
+    print("[WORKER] Stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Rebuild `quiz_stats` from existing quiz results.
+
+    python backfill_quiz_stats.py                 # every quiz with results
+    python backfill_quiz_stats.py --quiz-id <id>  # a single quiz
+
+Each quiz is recomputed in its own transaction (see
+`app.core.analytics.rebuild_quiz_stats`), so submissions arriving meanwhile
+are either included in the rebuild or added on top of it, never lost.
+"""
+
+import argparse
+import sys
+import time
+import uuid
+
+from sqlalchemy import select
+
+from app.core.analytics import rebuild_quiz_stats
+from app.db import models
+from app.db.session import SessionLocal
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--quiz-id", type=uuid.UUID, help="only rebuild this quiz")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.quiz_id:
+            quiz_ids = [args.quiz_id]
+        else:
+            quiz_ids = db.scalars(select(models.QuizResult.quiz_id).distinct()).all()
+
+        print(f"Rebuilding stats for {len(quiz_ids)} quizzes...")
+        start = time.perf_counter()
+        results = 0
+        for quiz_id in quiz_ids:
+            results += rebuild_quiz_stats(db, quiz_id)
+            db.commit()
+        print(f"✓ {results} results aggregated in {time.perf_counter() - start:.1f}s")
+        return 0
+    except Exception as e:
+        db.rollback()
+        print(f"✗ Backfill failed: {e}")
+        return 1
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
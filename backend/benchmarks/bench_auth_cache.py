@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Measure the principal cache and the token-role fast path on authenticated
+requests.
+
+Usage (from the backend directory):
+
+    python -m benchmarks.bench_auth_cache [requests] [users] [concurrency]
+
+Defaults to 10000 requests spread over 100 users. Each scenario reports
+throughput, how many SELECTs hit the users table and the principal cache hit
+rate:
+
+- `no cache`: AUTH_PRINCIPAL_CACHE_ENTRIES=0 behaviour, GET /users/me
+- `cache`: principal cache enabled, GET /users/me
+- `token role`: AUTH_TRUST_TOKEN_ROLE, GET /results/quiz/{id} (role check only)
+
+Uses BENCH_DATABASE_URL, or a temporary SQLite database when it is unset.
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["SUPABASE_DB_URL"] = os.getenv("BENCH_DATABASE_URL") or f"sqlite:///{os.path.join(_tmp.name, 'bench.db')}"
+
+import httpx  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.core.principals import principal_cache  # noqa: E402
+from app.core.security import create_access_token, get_password_hash  # noqa: E402
+from app.db import models  # noqa: E402
+from app.db.session import SessionLocal, async_engine, engine  # noqa: E402
+from app.main import app  # noqa: E402
+
+user_queries = 0
+
+
+def _count_user_queries(conn, cursor, statement, parameters, context, executemany):
+    global user_queries
+    if statement.lstrip().upper().startswith("SELECT") and "FROM users" in statement:
+        user_queries += 1
+
+
+def _seed(users: int):
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        password = get_password_hash("bench")
+        teachers = [
+            models.User(name=f"Teacher {i}", email=f"bench-{time.time_ns()}-{i}@example.com",
+                        hashed_password=password, role="teacher")
+            for i in range(users)
+        ]
+        db.add_all(teachers)
+        db.flush()
+        quiz = models.Quiz(title="Bench quiz", file_name="bench.pdf", question_type="multiple-choice",
+                           questions=[], created_by=teachers[0].id)
+        db.add(quiz)
+        db.commit()
+        tokens = [create_access_token({"sub": str(t.id), "role": "teacher"}) for t in teachers]
+        return str(quiz.id), tokens
+    finally:
+        db.close()
+
+
+async def _scenario(client, url: str, tokens, total: int, concurrency: int) -> dict:
+    global user_queries
+    user_queries = 0
+    principal_cache.clear()
+    status_codes = set()
+    remaining = iter(range(total))
+
+    async def client_loop():
+        for i in remaining:
+            response = await client.get(url, headers={"Authorization": f"Bearer {tokens[i % len(tokens)]}"})
+            status_codes.add(response.status_code)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    stats = principal_cache.stats()
+    return {
+        "rps": total / elapsed,
+        "user_queries": user_queries,
+        "hit_rate": stats["hit_rate"],
+        "status": ",".join(str(code) for code in sorted(status_codes)),
+    }
+
+
+async def main() -> None:
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    users = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    concurrency = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+
+    event.listen(async_engine.sync_engine if async_engine is not None else engine,
+                 "before_cursor_execute", _count_user_queries)
+    quiz_id, tokens = _seed(users)
+    me_url = f"{settings.API_V1_STR}/users/me"
+    results_url = f"{settings.API_V1_STR}/results/results/quiz/{quiz_id}"
+    max_entries = principal_cache.cache.max_entries
+
+    print(f"requests: {total}  users: {users}  concurrency: {concurrency}")
+    print(f"{'scenario':>12} {'req/s':>9} {'user SELECTs':>13} {'hit rate':>9} {'status':>7}")
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://localhost") as client:
+        scenarios = [
+            ("no cache", me_url, 0, False),
+            ("cache", me_url, max_entries, False),
+            ("token role", results_url, max_entries, True),
+        ]
+        for name, url, entries, trust_role in scenarios:
+            principal_cache.cache.max_entries = entries
+            settings.AUTH_TRUST_TOKEN_ROLE = trust_role
+            result = await _scenario(client, url, tokens, total, concurrency)
+            print(f"{name:>12} {result['rps']:9.1f} {result['user_queries']:13d} "
+                  f"{result['hit_rate']:9.1%} {result['status']:>7}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
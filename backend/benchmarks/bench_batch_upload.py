@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Batch upload wall time against uploading the same PDFs one by one.
+
+Usage (from the backend directory):
+
+    python -m benchmarks.bench_batch_upload [files ...]
+
+For each batch size (default 1, 10 and 30 distinct synthetic PDFs), reports
+the time to upload every file through POST /files/upload and wait for its job
+before the next one, next to a single POST /files/upload-batch. Generation
+uses the offline fake provider with LLM_FAKE_LATENCY_MS (default 1000) per
+call (rate limits lifted, connection limit kept), a temporary SQLite
+database and temporary upload/cache directories.
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["SUPABASE_DB_URL"] = f"sqlite:///{os.path.join(_tmp.name, 'bench.db')}"
+os.environ["UPLOAD_DIR"] = os.path.join(_tmp.name, "uploads")
+os.environ["CACHE_DIR"] = os.path.join(_tmp.name, "cache")
+os.environ["LLM_PROVIDER"] = "fake"
+os.environ.setdefault("LLM_FAKE_LATENCY_MS", "1000")
+# Both runs make the same calls; lift the gateway's rate limits so the second does not wait for the first's budget
+os.environ.setdefault("LLM_REQUESTS_PER_MINUTE", "1000000")
+os.environ.setdefault("LLM_TOKENS_PER_MINUTE", "1000000000")
+
+import httpx  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.core.jobs import worker_pool  # noqa: E402
+from app.core.security import create_access_token, get_password_hash  # noqa: E402
+from app.db import models  # noqa: E402
+from app.db.session import SessionLocal, engine  # noqa: E402
+from app.main import app  # noqa: E402
+from benchmarks.bench_pdf_extraction import make_synthetic_pdf  # noqa: E402
+
+FORM = {"question_type": "multiple-choice", "num_questions": "5"}
+
+
+def _documents(count: int, first_pages: int) -> list:
+    """`count` PDFs with distinct page counts, so no two share a cache entry."""
+    documents = []
+    for i in range(count):
+        path = os.path.join(_tmp.name, f"doc-{first_pages + i}.pdf")
+        make_synthetic_pdf(path, first_pages + i, lines_per_page=10)
+        with open(path, "rb") as f:
+            documents.append((f"doc-{first_pages + i}.pdf", f.read()))
+    return documents
+
+
+async def _one_by_one(client, headers, documents) -> float:
+    start = time.perf_counter()
+    for name, data in documents:
+        response = await client.post(f"{settings.API_V1_STR}/files/files/upload", headers=headers,
+                                     files={"pdf_file": (name, data, "application/pdf")}, data=FORM)
+        job = response.json()
+        while job["status"] not in ("done", "failed"):
+            await asyncio.sleep(0.02)
+            job = (await client.get(f"{settings.API_V1_STR}/files/files/jobs/{job['id']}", headers=headers)).json()
+    return time.perf_counter() - start
+
+
+async def _batch(client, headers, documents) -> tuple:
+    start = time.perf_counter()
+    response = await client.post(f"{settings.API_V1_STR}/files/files/upload-batch", headers=headers,
+                                 files=[("pdf_files", (name, data, "application/pdf")) for name, data in documents],
+                                 data=FORM)
+    return time.perf_counter() - start, response.json()["done"]
+
+
+async def main() -> None:
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1, 10, 30]
+
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    teacher = models.User(name="Bench", email=f"bench-{time.time_ns()}@example.com",
+                          hashed_password=get_password_hash("bench"), role="teacher")
+    db.add(teacher)
+    db.commit()
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': str(teacher.id), 'role': 'teacher'})}"}
+    db.close()
+
+    worker_pool.start()
+    print(f"fake LLM latency {settings.LLM_FAKE_LATENCY_MS} ms, {settings.LLM_MAX_CONNECTIONS} LLM connections, "
+          f"{settings.JOB_WORKERS} job workers")
+    print(f"{'files':>5} {'one by one':>11} {'batch':>8} {'done':>5} {'speed-up':>9}")
+    transport = httpx.ASGITransport(app=app)
+    first_pages = 1
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://localhost", timeout=600) as client:
+            for size in sizes:
+                sequential_s = await _one_by_one(client, headers, _documents(size, first_pages))
+                first_pages += size
+                batch_s, done = await _batch(client, headers, _documents(size, first_pages))
+                first_pages += size
+                print(f"{size:5d} {sequential_s:10.2f}s {batch_s:7.2f}s {done:5d} {sequential_s / batch_s:8.1f}x")
+    finally:
+        worker_pool.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
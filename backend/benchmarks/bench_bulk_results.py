@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Importing results through POST /results/bulk vs. submitting them one by one.
+
+Usage (from the backend directory):
+
+    python -m benchmarks.bench_bulk_results [results] [questions]
+
+Imports `results` results (default 10000) of a `questions`-question quiz
+(default 20) as one JSON array and again as an NDJSON stream (into a second
+quiz), and reports the wall time, the rows per second and the rows written.
+For comparison it times BASELINE_RESULTS submissions through POST /results/,
+one request (quiz lookup, duplicate check, insert, commit) each. Uses
+BENCH_DATABASE_URL, or a temporary SQLite database when it is unset.
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["SUPABASE_DB_URL"] = os.getenv("BENCH_DATABASE_URL") or f"sqlite:///{os.path.join(_tmp.name, 'bench.db')}"
+os.environ.setdefault("AUTH_TRUST_TOKEN_ROLE", "true")
+
+import httpx  # noqa: E402
+from sqlalchemy import func, insert, select  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.core.security import create_access_token  # noqa: E402
+from app.db import models  # noqa: E402
+from app.db.session import SessionLocal, engine  # noqa: E402
+from app.main import app  # noqa: E402
+
+BASELINE_RESULTS = 500
+
+
+def _setup(students: int, questions: int) -> tuple:
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        teacher_id = uuid.uuid4()
+        student_ids = [uuid.uuid4() for _ in range(students)]
+        db.execute(insert(models.User), [
+            {"id": teacher_id, "name": "Bench", "email": "bench@example.com", "hashed_password": "-", "role": "teacher"},
+            *({"id": student_id, "name": f"Student {i}", "email": f"student-{i}@example.com", "hashed_password": "-",
+               "role": "student", "student_number": f"S{i}"} for i, student_id in enumerate(student_ids)),
+        ])
+        quizzes = [models.Quiz(
+            title=f"Paper exam {n}", file_name="bench.pdf", question_type="multiple-choice", created_by=teacher_id,
+            questions=[{"id": str(q), "question": f"Question {q}?", "options": ["a", "b", "c", "d"],
+                        "correctAnswer": q % 4, "explanation": f"Because {q}.", "type": "multiple-choice"}
+                       for q in range(questions)],
+        ) for n in range(3)]
+        db.add_all(quizzes)
+        db.commit()
+        return [quiz.id for quiz in quizzes], teacher_id, student_ids
+    finally:
+        db.close()
+
+
+def _result(quiz_id: uuid.UUID, student_id: uuid.UUID, i: int, questions: int) -> dict:
+    return {
+        "quiz_id": str(quiz_id), "student_id": str(student_id), "student_name": f"Student {i}",
+        "student_number": f"S{i}", "time_spent": 600000 + i,
+        "answers": [{"questionId": str(q), "selectedOption": (q + i) % 4, "timeSpent": 30000} for q in range(questions)],
+    }
+
+
+def _count(model) -> int:
+    db = SessionLocal()
+    try:
+        return db.scalar(select(func.count()).select_from(model))
+    finally:
+        db.close()
+
+
+async def main() -> None:
+    results = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    questions = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    (array_quiz, ndjson_quiz, baseline_quiz), teacher_id, student_ids = _setup(results, questions)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': str(teacher_id), 'role': 'teacher'})}"}
+    url = f"{settings.API_V1_STR}/results/results"
+    print(f"{results} results x {questions} questions, chunks of {settings.RESULTS_BULK_CHUNK_SIZE}, {engine.dialect.name}")
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://localhost", timeout=None) as client:
+        body = json.dumps([_result(array_quiz, student_id, i, questions) for i, student_id in enumerate(student_ids)]).encode()
+        start = time.perf_counter()
+        response = await client.post(f"{url}/bulk", headers={**headers, "Content-Type": "application/json"}, content=body)
+        elapsed = time.perf_counter() - start
+        assert response.status_code == 200 and response.json()["inserted"] == results, response.text
+        print(f"JSON array ({len(body) / 1e6:.1f} MB): {elapsed:.2f}s = {results / elapsed:,.0f} results/s")
+
+        lines = [json.dumps(_result(ndjson_quiz, student_id, i, questions)).encode() + b"\n"
+                 for i, student_id in enumerate(student_ids)]
+
+        async def stream():
+            for start_line in range(0, len(lines), 500):
+                yield b"".join(lines[start_line:start_line + 500])
+
+        start = time.perf_counter()
+        response = await client.post(f"{url}/bulk", headers={**headers, "Content-Type": "application/x-ndjson"}, content=stream())
+        elapsed = time.perf_counter() - start
+        assert response.status_code == 200 and response.json()["inserted"] == results, response.text
+        print(f"NDJSON stream: {elapsed:.2f}s = {results / elapsed:,.0f} results/s")
+
+        start = time.perf_counter()
+        response = await client.post(f"{url}/bulk", headers=headers, content=body)
+        elapsed = time.perf_counter() - start
+        print(f"the JSON array again (every row already submitted): {elapsed:.2f}s, {len(response.json()['errors'])} errors")
+        print(f"rows written: {_count(models.QuizResult)} results, {_count(models.ResultAnswer)} answers")
+
+        baseline = student_ids[:BASELINE_RESULTS]
+        start = time.perf_counter()
+        for i, student_id in enumerate(baseline):
+            token = create_access_token({"sub": str(student_id), "role": "student"})
+            response = await client.post(f"{url}/", headers={"Authorization": f"Bearer {token}"},
+                                         json=_result(baseline_quiz, student_id, i, questions))
+            assert response.status_code == 200, response.text
+        elapsed = time.perf_counter() - start
+        print(f"baseline: POST /results/ one by one, {len(baseline) / elapsed:,.0f} results/s "
+              f"({results / (len(baseline) / elapsed):.1f}s for {results})")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
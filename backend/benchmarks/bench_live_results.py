@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Teachers' dashboards on the live results feed during a burst of submissions.
+
+Usage (from the backend directory):
+
+    python -m benchmarks.bench_live_results [dashboards] [submissions] [slow]
+
+Connects `dashboards` (default 200) WebSockets to /results/quiz/{id}/live, of
+which `slow` (default 10%) read one message a second through a one-message
+buffer, like a dashboard on a bad connection. Then `submissions` (default 500)
+students submit through POST /results/ as fast as the database takes them.
+Reports how long after its submission returned each result reached the
+prompt dashboards (p50/p99), the messages each got (coalescing), the update
+loads the feed ran, and what the slow ones received. For comparison it times
+one round of every dashboard polling GET /results/quiz/{id}, which is what
+each poll interval costs without the feed. Uses BENCH_DATABASE_URL, or a
+temporary SQLite database when it is unset.
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["SUPABASE_DB_URL"] = os.getenv("BENCH_DATABASE_URL") or f"sqlite:///{os.path.join(_tmp.name, 'bench.db')}"
+os.environ.setdefault("AUTH_TRUST_TOKEN_ROLE", "true")
+
+import httpx  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.core.live_results import live_results  # noqa: E402
+from app.core.security import create_access_token  # noqa: E402
+from app.db import models  # noqa: E402
+from app.db.session import SessionLocal, engine  # noqa: E402
+from app.main import app  # noqa: E402
+
+QUESTIONS = 20
+# Submissions and polls each hold a connection, within the pool (SQLite also serializes writes)
+REQUEST_CONCURRENCY = 8
+
+
+class Dashboard:
+    """An in-process WebSocket client; with `inbox`, the server's sends block while it is full."""
+
+    def __init__(self, path: str, token: str, inbox: int = 0):
+        self.path, self.token = path, token
+        self.to_app, self.from_app = asyncio.Queue(), asyncio.Queue(inbox)
+        self.messages = self.results = 0
+        self.missed = False
+        self.task = None
+
+    async def connect(self) -> None:
+        scope = {
+            "type": "websocket", "path": self.path, "raw_path": self.path.encode(),
+            "query_string": f"token={self.token}".encode(), "headers": [(b"host", b"localhost")],
+            "scheme": "ws", "subprotocols": [], "server": ("localhost", 80), "client": ("bench", 1),
+            "root_path": "", "asgi": {"version": "3.0"},
+        }
+        self.to_app.put_nowait({"type": "websocket.connect"})
+        self.task = asyncio.ensure_future(app(scope, self.to_app.get, self.from_app.put))
+        assert (await self.from_app.get())["type"] == "websocket.accept"
+        await self.from_app.get()  # the initial stats
+
+    async def read(self, submitted: dict, latencies: list, delay: float = 0.0) -> None:
+        while True:
+            message = json.loads((await self.from_app.get())["text"])
+            now = time.perf_counter()
+            self.messages += 1
+            self.results += len(message["results"])
+            self.missed = self.missed or message["missed"]
+            latencies.extend(now - submitted[result["id"]] for result in message["results"] if result["id"] in submitted)
+            if delay:
+                await asyncio.sleep(delay)
+
+    async def close(self) -> None:
+        self.to_app.put_nowait({"type": "websocket.disconnect", "code": 1000})
+        await self.task
+
+
+def _setup(submissions: int) -> tuple:
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        teacher_id = uuid.uuid4()
+        student_ids = [uuid.uuid4() for _ in range(submissions)]
+        db.execute(insert(models.User), [
+            {"id": teacher_id, "name": "Bench", "email": "bench@example.com", "hashed_password": "-", "role": "teacher"},
+            *({"id": student_id, "name": f"Student {i}", "email": f"student-{i}@example.com", "hashed_password": "-",
+               "role": "student", "student_number": f"S{i}"} for i, student_id in enumerate(student_ids)),
+        ])
+        quiz = models.Quiz(
+            title="Bench exam", file_name="bench.pdf", question_type="multiple-choice", created_by=teacher_id,
+            questions=[{"id": str(n), "question": f"Question {n}?", "options": ["a", "b", "c", "d"],
+                        "correctAnswer": n % 4, "explanation": f"Because {n}.", "type": "multiple-choice"}
+                       for n in range(QUESTIONS)],
+        )
+        db.add(quiz)
+        db.commit()
+        return quiz.id, teacher_id, student_ids
+    finally:
+        db.close()
+
+
+def _percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else float("nan")
+
+
+async def main() -> None:
+    dashboards = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    submissions = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    slow = int(sys.argv[3]) if len(sys.argv) > 3 else dashboards // 10
+    quiz_id, teacher_id, student_ids = _setup(submissions)
+    teacher_token = create_access_token({"sub": str(teacher_id), "role": "teacher"})
+    path = f"{settings.API_V1_STR}/results/results/quiz/{quiz_id}/live"
+    print(f"{dashboards} dashboards ({slow} slow), {submissions} submissions, "
+          f"{settings.LIVE_RESULTS_COALESCE_SECONDS}s coalescing, {engine.dialect.name}")
+
+    clients = [Dashboard(path, teacher_token, inbox=1 if i < slow else 0) for i in range(dashboards)]
+    await asyncio.gather(*(client.connect() for client in clients))
+    submitted, latencies, slow_latencies = {}, [], []
+    readers = [asyncio.ensure_future(client.read(submitted, slow_latencies if i < slow else latencies, 1.0 if i < slow else 0.0))
+               for i, client in enumerate(clients)]
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://localhost") as http:
+        requests = asyncio.Semaphore(REQUEST_CONCURRENCY)
+
+        async def submit(student_id: uuid.UUID) -> None:
+            headers = {"Authorization": f"Bearer {create_access_token({'sub': str(student_id), 'role': 'student'})}"}
+            body = {"quiz_id": str(quiz_id), "student_id": str(student_id), "student_name": "Student",
+                    "student_number": "S", "time_spent": 60000,
+                    "answers": [{"questionId": str(n), "selectedOption": n % 4, "timeSpent": 3000} for n in range(QUESTIONS)]}
+            async with requests:
+                response = await http.post(f"{settings.API_V1_STR}/results/results/", headers=headers, json=body)
+            assert response.status_code == 200, response.text
+            submitted[response.json()["id"]] = time.perf_counter()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(submit(student_id) for student_id in student_ids))
+        burst = time.perf_counter() - start
+        prompt = clients[slow:]
+        while any(client.results < submissions for client in prompt):
+            await asyncio.sleep(0.05)
+        delivered = time.perf_counter() - start
+        print(f"submissions: {submissions} in {burst:.2f}s; every prompt dashboard had all of them after {delivered:.2f}s")
+        print(f"prompt dashboards: latency p50 {_percentile(latencies, 0.5) * 1000:.0f}ms, "
+              f"p99 {_percentile(latencies, 0.99) * 1000:.0f}ms, "
+              f"{sum(client.messages for client in prompt) / len(prompt):.1f} messages each, "
+              f"feed loads {live_results.updates}")
+        if slow:
+            await asyncio.sleep(2.0)
+            slow_clients = clients[:slow]
+            print(f"slow dashboards: {sum(client.messages for client in slow_clients) / slow:.1f} messages, "
+                  f"{sum(client.results for client in slow_clients) / slow:.0f} results each 2s later, "
+                  f"{sum(client.missed for client in slow_clients)} told to reload")
+
+        async def poll() -> httpx.Response:
+            async with requests:
+                return await http.get(f"{settings.API_V1_STR}/results/results/quiz/{quiz_id}",
+                                      headers={"Authorization": f"Bearer {teacher_token}"})
+
+        start = time.perf_counter()
+        polls = await asyncio.gather(*(poll() for _ in range(dashboards)))
+        elapsed = time.perf_counter() - start
+        size = sum(len(response.content) for response in polls)
+        print(f"polling instead: one round of {dashboards} polls takes {elapsed:.2f}s and {size / 1e6:.1f} MB, "
+              f"every poll interval")
+
+    for reader in readers:
+        reader.cancel()
+    await asyncio.gather(*readers, return_exceptions=True)
+    await asyncio.gather(*(client.close() for client in clients))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Latency of non-auth endpoints while a burst of logins is being verified.
+
+Usage (from the backend directory):
+
+    python -m benchmarks.bench_login_storm [logins] [login_concurrency] [seconds]
+
+A probe client requests GET /health and GET /quizzes/ back to back while
+`login_concurrency` clients log in repeatedly. Probe p50/p99 are reported for:
+
+- `idle`: no logins
+- `storm, pool`: bcrypt on the bounded PasswordHasher pool
+- `storm, inline`: bcrypt on the event loop, for comparison
+
+Hash cost follows PASSWORD_BCRYPT_ROUNDS. Uses BENCH_DATABASE_URL, or a
+temporary SQLite database when it is unset.
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["SUPABASE_DB_URL"] = os.getenv("BENCH_DATABASE_URL") or f"sqlite:///{os.path.join(_tmp.name, 'bench.db')}"
+
+import httpx  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.core.security import get_password_hash, password_hasher  # noqa: E402
+from app.db import models  # noqa: E402
+from app.db.session import SessionLocal, engine  # noqa: E402
+from app.main import app  # noqa: E402
+
+PASSWORD = "correct horse battery staple"
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else 0.0
+
+
+def _seed(users: int):
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        hashed = get_password_hash(PASSWORD)
+        emails = [f"storm-{time.time_ns()}-{i}@example.com" for i in range(users)]
+        db.add_all([
+            models.User(name=f"Student {i}", email=email, hashed_password=hashed, role="student")
+            for i, email in enumerate(emails)
+        ])
+        db.commit()
+        return emails
+    finally:
+        db.close()
+
+
+async def _inline(fn, *args):
+    return fn(*args)
+
+
+async def _scenario(client, emails, logins: int, concurrency: int, seconds: float) -> dict:
+    probe_latencies = []
+    login_latencies = []
+    statuses = {}
+    remaining = iter(range(logins))
+    storm_done = asyncio.Event()
+
+    async def login_loop():
+        for i in remaining:
+            body = {"name": "x", "email": emails[i % len(emails)], "role": "student", "password": PASSWORD}
+            start = time.perf_counter()
+            response = await client.post(f"{settings.API_V1_STR}/auth/login", json=body)
+            login_latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    async def storm():
+        await asyncio.gather(*(login_loop() for _ in range(concurrency)))
+        storm_done.set()
+
+    async def probe():
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline and not (logins and storm_done.is_set()):
+            for url in ("/health", f"{settings.API_V1_STR}/quizzes/quizzes/"):
+                start = time.perf_counter()
+                await client.get(url)
+                probe_latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(storm(), probe())
+    elapsed = time.perf_counter() - start
+    return {
+        "probe_p50_ms": _percentile(probe_latencies, 0.50) * 1000,
+        "probe_p99_ms": _percentile(probe_latencies, 0.99) * 1000,
+        "probes": len(probe_latencies),
+        "login_p50_ms": _percentile(login_latencies, 0.50) * 1000,
+        "logins_per_s": len(login_latencies) / elapsed,
+        "statuses": statuses,
+    }
+
+
+async def main() -> None:
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 60.0
+
+    emails = _seed(concurrency)
+    print(f"logins: {logins}  login concurrency: {concurrency}  bcrypt rounds: {settings.PASSWORD_BCRYPT_ROUNDS}  "
+          f"hasher workers: {password_hasher.workers}  max pending: {password_hasher.max_pending}")
+    print(f"{'scenario':>14} {'probe p50':>10} {'probe p99':>10} {'probes':>7} {'login p50':>10} {'logins/s':>9}  statuses")
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://localhost", timeout=None) as client:
+        pooled_run = password_hasher.run
+        scenarios = [
+            ("idle", 0, pooled_run),
+            ("storm, pool", logins, pooled_run),
+            ("storm, inline", logins, _inline),
+        ]
+        for name, count, run in scenarios:
+            password_hasher.run = run
+            result = await _scenario(client, emails, count, concurrency, seconds if count else 2.0)
+            print(f"{name:>14} {result['probe_p50_ms']:9.1f}ms {result['probe_p99_ms']:9.1f}ms {result['probes']:7d} "
+                  f"{result['login_p50_ms']:9.1f}ms {result['logins_per_s']:9.1f}  {result['statuses']}")
+        password_hasher.run = pooled_run
+    password_hasher.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Time semantic grading of open-ended answers.
+
+Usage (from the backend directory):
+
+    python -m benchmarks.bench_open_ended_grading [answers]
+
+Builds a 5-question open-ended quiz and `answers` synthetic answers (default
+1000): half paraphrase the question's explanation, half are on-topic but
+wrong. Reports the time to grade them all in one batch, a second (warm
+cache) run and the agreement with the intended labels. Uses EMBEDDING_MODEL,
+so set it to a sentence-transformers model to compare with hashed TF-IDF;
+vectors are cached in a temporary CACHE_DIR.
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["CACHE_DIR"] = _tmp.name
+os.environ.setdefault("SUPABASE_DB_URL", f"sqlite:///{os.path.join(_tmp.name, 'bench.db')}")  # not queried
+
+import numpy as np  # noqa: E402
+
+from app.core.embeddings import get_embedder, match_threshold, vector_cache  # noqa: E402
+from app.core.grading import compile_answer_key, grade_batch  # noqa: E402
+
+QUESTIONS = [
+    ("Why do plants need sunlight?",
+     "Plants use sunlight to power photosynthesis, converting carbon dioxide and water into glucose and oxygen."),
+    ("What causes the seasons on Earth?",
+     "The tilt of the Earth's axis changes how directly sunlight strikes each hemisphere during the year."),
+    ("Why did the Roman Empire split?",
+     "The empire was too large to govern from one capital, so it was divided into eastern and western halves."),
+    ("How does a vaccine protect the body?",
+     "A vaccine trains the immune system to recognise a pathogen so it can produce antibodies quickly on exposure."),
+    ("What is supply and demand?",
+     "Prices rise when demand exceeds supply and fall when supply exceeds demand, until the market reaches equilibrium."),
+]
+
+WRONG = [
+    "It happens because of the moon and the tides.",
+    "I think it is mostly about the weather getting colder.",
+    "Because people decided it a long time ago.",
+    "The government controls it through laws.",
+    "It is caused by magnetism in the core.",
+]
+
+FILLERS = ["Basically,", "I believe", "From the reading,", "In short,", ""]
+
+
+def _paraphrase(text: str, rng: random.Random) -> str:
+    words = text.rstrip(".").split()
+    # Drop a few words and add a lead-in, so answers are close but not copies
+    kept = [w for w in words if rng.random() > 0.2]
+    return f"{rng.choice(FILLERS)} {' '.join(kept).lower()}".strip()
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    rng = random.Random(7)
+
+    questions = [{
+        "id": str(i), "question": q, "options": [], "correctAnswer": 0,
+        "explanation": explanation, "type": "open-ended",
+    } for i, (q, explanation) in enumerate(QUESTIONS)]
+    key = compile_answer_key(uuid.uuid4(), 1, questions)
+
+    submissions, expected = [], []
+    for n in range(count):
+        column = n % len(QUESTIONS)
+        correct = n % 2 == 0
+        text = _paraphrase(QUESTIONS[column][1], rng) if correct else rng.choice(WRONG)
+        submissions.append([{"questionId": str(column), "selectedOption": -1, "timeSpent": 0, "openEndedAnswer": text}])
+        expected.append(correct)
+
+    start = time.perf_counter()
+    embedder = get_embedder()
+    load_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    graded = grade_batch(key, submissions)
+    cold_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    grade_batch(key, submissions)
+    warm_s = time.perf_counter() - start
+
+    predicted = graded.scores.astype(bool)
+    agreement = float(np.mean(predicted == np.array(expected)))
+    print(f"model: {embedder.name} (threshold {match_threshold():.2f}, loaded in {load_s:.2f}s)")
+    print(f"{count} answers: {cold_s:.3f}s cold, {warm_s:.3f}s warm ({count / cold_s:.0f} answers/s)")
+    print(f"agreement with labels: {agreement:.1%}")
+    print(f"vector cache: {vector_cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
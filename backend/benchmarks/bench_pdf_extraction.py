@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Benchmark serial vs. process-pool PDF text extraction on synthetic documents.
+
+Usage (from the backend directory):
+
+    python -m benchmarks.bench_pdf_extraction [pages ...]
+
+Defaults to 10, 100 and 1000 page documents.
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+from app.core.config import settings
+from app.core.pdf import extract_text_from_pdf, shutdown_process_pool
+
+PARAGRAPH = (
+    "Photosynthesis converts light energy into chemical energy stored in glucose. "
+    "Chlorophyll in the chloroplasts absorbs mostly blue and red light."
+)
+
+
+def make_synthetic_pdf(path: str, pages: int, lines_per_page: int = 40) -> None:
+    """Write a minimal text-only PDF with `pages` pages using Helvetica."""
+    font_id = 3 + 2 * pages
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        ("<< /Type /Pages /Kids [%s] /Count %d >>" % (
+            " ".join(f"{3 + 2 * i} 0 R" for i in range(pages)), pages
+        )).encode(),
+    ]
+    for i in range(pages):
+        lines = " ".join(f"({i + 1}.{n} {PARAGRAPH}) Tj T*" for n in range(lines_per_page))
+        content = f"BT /F1 9 Tf 11 TL 36 760 Td {lines} ET".encode()
+        objects.append(
+            (f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {4 + 2 * i} 0 R "
+             f"/Resources << /Font << /F1 {font_id} 0 R >> >> >>").encode()
+        )
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content))
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref_offset = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def time_extraction(path: str, parallel: bool) -> tuple[float, int]:
+    start = time.perf_counter()
+    text = extract_text_from_pdf(path, max_chars=0, parallel=parallel)
+    return time.perf_counter() - start, len(text)
+
+
+def main(page_counts):
+    print(f"workers={settings.PDF_EXTRACT_WORKERS} pages_per_task={settings.PDF_PAGES_PER_TASK}")
+    print(f"{'pages':>6} {'serial s':>9} {'parallel s':>11} {'serial p/s':>11} {'parallel p/s':>13} {'speedup':>8}")
+
+    # Warm the process pool so spawn cost is not charged to the first document
+    with tempfile.TemporaryDirectory() as tmp:
+        warmup = os.path.join(tmp, "warmup.pdf")
+        make_synthetic_pdf(warmup, settings.PDF_PAGES_PER_TASK * 2)
+        time_extraction(warmup, parallel=True)
+
+        for pages in page_counts:
+            path = os.path.join(tmp, f"synthetic-{pages}.pdf")
+            make_synthetic_pdf(path, pages)
+            serial_s, serial_len = time_extraction(path, parallel=False)
+            parallel_s, parallel_len = time_extraction(path, parallel=True)
+            assert serial_len == parallel_len, "serial and parallel extraction disagree"
+            print(
+                f"{pages:>6} {serial_s:>9.3f} {parallel_s:>11.3f} "
+                f"{pages / serial_s:>11.0f} {pages / parallel_s:>13.0f} {serial_s / parallel_s:>7.2f}x"
+            )
+
+    shutdown_process_pool()
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10, 100, 1000])
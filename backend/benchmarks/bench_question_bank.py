@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Question bank near-duplicate lookups as the bank grows.
+
+Usage (from the backend directory):
+
+    python -m benchmarks.bench_question_bank [sizes ...]
+
+For each bank size (default 10000, 100000 and 1000000 stored questions of
+one teacher), reports the time to look up a batch of generated questions
+(`find_duplicates`) and to add one (`add_to_bank`), next to a linear scan over
+every stored signature. Half of the looked-up questions are edits of stored
+ones (one word swapped or added, token Jaccard 0.85-0.92), half are unrelated;
+recall is measured on the edits and false matches on the unrelated ones.
+Uses BENCH_DATABASE_URL, or a temporary SQLite database when it is unset.
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["SUPABASE_DB_URL"] = os.getenv("BENCH_DATABASE_URL") or f"sqlite:///{os.path.join(_tmp.name, 'bench.db')}"
+
+import numpy as np  # noqa: E402
+from sqlalchemy import func, insert, select  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.core.minhash import band_keys, estimate_similarity  # noqa: E402
+from app.core.question_bank import BANDS, ROWS, add_to_bank, find_duplicates, signatures_for  # noqa: E402
+from app.core.security import get_password_hash  # noqa: E402
+from app.db import models  # noqa: E402
+from app.db.session import SessionLocal, engine  # noqa: E402
+
+QUESTION_TYPE = "multiple-choice"
+VOCABULARY = [f"term{i}" for i in range(20000)]
+BATCH = 50  # questions per generated quiz
+LOAD_CHUNK = 20000
+
+
+def _question(rng: random.Random) -> dict:
+    words = rng.sample(VOCABULARY, 12)
+    return {"question": "Which " + " ".join(words) + "?", "options": [], "correctAnswer": 0, "type": QUESTION_TYPE}
+
+
+def _edit(question: dict, rng: random.Random) -> dict:
+    words = question["question"].rstrip("?").split()
+    if rng.random() < 0.5:
+        words[rng.randrange(1, len(words))] = rng.choice(VOCABULARY)
+    else:
+        words.append(rng.choice(VOCABULARY))
+    return {**question, "question": " ".join(words) + "?"}
+
+
+def _grow_to(size: int, teacher_id, stored: list, signatures: list, rng: random.Random) -> None:
+    """Bulk-load entries and their band rows directly, as `add_to_bank` would write them."""
+    db = SessionLocal()
+    try:
+        while len(stored) < size:
+            questions = [_question(rng) for _ in range(min(LOAD_CHUNK, size - len(stored)))]
+            chunk_signatures = signatures_for(questions)
+            keys = band_keys(chunk_signatures, BANDS, ROWS)
+            ids = [uuid.uuid4() for _ in questions]
+            db.execute(insert(models.QuestionBankEntry), [{
+                "id": entry_id, "created_by": teacher_id, "question_type": QUESTION_TYPE, "question": question,
+                "signature": signature.tobytes(), "source_sha256": None, "occurrences": 1,
+            } for entry_id, question, signature in zip(ids, questions, chunk_signatures)])
+            db.execute(insert(models.QuestionBankBucket), [
+                {"bucket": int(key), "entry_id": entry_id} for entry_id, row_keys in zip(ids, keys) for key in row_keys
+            ])
+            db.commit()
+            stored.extend(questions)
+            signatures.append(chunk_signatures)
+    finally:
+        db.close()
+
+
+def _jaccard(a: str, b: str) -> float:
+    a, b = set(a.lower().split()), set(b.lower().split())
+    return len(a & b) / len(a | b)
+
+
+def main() -> None:
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10000, 100000, 1000000]
+    rng = random.Random(11)
+
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    teacher = models.User(name="Bench", email=f"bench-{time.time_ns()}@example.com",
+                          hashed_password=get_password_hash("bench"), role="teacher")
+    db.add(teacher)
+    db.commit()
+    teacher_id = teacher.id
+    db.close()
+
+    print(f"{settings.QUESTION_BANK_NUM_PERM} permutations, {BANDS} bands x {ROWS} rows, "
+          f"threshold {settings.QUESTION_BANK_THRESHOLD}")
+    print(f"{'stored':>8} {'load':>7} {'lookup/batch':>13} {'add/batch':>10} {'linear scan':>12} {'recall':>7} {'false':>6}")
+    stored, signatures = [], []
+    for size in sizes:
+        start = time.perf_counter()
+        _grow_to(size, teacher_id, stored, signatures, rng)
+        load_s = time.perf_counter() - start
+
+        originals = rng.sample(stored, BATCH // 2)
+        queries = [_edit(question, rng) for question in originals] + [_question(rng) for _ in range(BATCH - BATCH // 2)]
+        expected = [_jaccard(q["question"], o["question"]) >= settings.QUESTION_BANK_THRESHOLD for q, o in zip(queries, originals)]
+        query_signatures = signatures_for(queries)
+
+        db = SessionLocal()
+        try:
+            find_duplicates(db, teacher_id, QUESTION_TYPE, query_signatures)  # warm up
+            start = time.perf_counter()
+            matches = find_duplicates(db, teacher_id, QUESTION_TYPE, query_signatures)
+            lookup_s = time.perf_counter() - start
+
+            start = time.perf_counter()
+            add_to_bank(db, teacher_id, QUESTION_TYPE, [_question(rng) for _ in range(BATCH)])
+            db.commit()
+            add_s = time.perf_counter() - start
+            total = db.scalar(select(func.count()).select_from(models.QuestionBankEntry))
+        finally:
+            db.close()
+        stored.extend([None] * (total - len(stored)))  # the added batch, never sampled as an original
+
+        # What a bank without the LSH index would do: compare against every signature
+        everything = np.concatenate(signatures)
+        start = time.perf_counter()
+        for signature in query_signatures:
+            estimate_similarity(signature, everything).max()
+        scan_s = time.perf_counter() - start
+
+        found = [match is not None for match in matches[:len(originals)]]
+        recall = sum(f for f, e in zip(found, expected) if e) / max(1, sum(expected))
+        false_matches = sum(match is not None for match in matches[len(originals):])
+        print(f"{size:8d} {load_s:6.1f}s {lookup_s * 1000:11.1f}ms {add_s * 1000:8.1f}ms {scan_s * 1000:10.1f}ms "
+              f"{recall:7.1%} {false_matches:6d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Quiz listing latency and response size as the quizzes table grows.
+
+Usage (from the backend directory):
+
+    python -m benchmarks.bench_quiz_listing [sizes ...]
+
+For each table size (default 1000, 10000 and 50000 quizzes of 10 questions),
+reports the first page and a page deep into the listing (reached by cursor)
+of GET /quizzes/, next to what loading every published quiz with its
+questions costs. Uses BENCH_DATABASE_URL, or a temporary SQLite database
+when it is unset.
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["SUPABASE_DB_URL"] = os.getenv("BENCH_DATABASE_URL") or f"sqlite:///{os.path.join(_tmp.name, 'bench.db')}"
+
+import httpx  # noqa: E402
+from sqlalchemy import func, insert, select  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.core.pagination import encode_cursor  # noqa: E402
+from app.core.security import get_password_hash  # noqa: E402
+from app.db import models, schemas  # noqa: E402
+from app.db.session import SessionLocal, engine  # noqa: E402
+from app.main import app  # noqa: E402
+
+QUESTIONS = [{
+    "id": str(i),
+    "question": f"Which statement about topic {i} is supported by the reading?",
+    "options": ["The first option", "The second option", "The third option", "The fourth option"],
+    "correctAnswer": i % 4,
+    "explanation": "The passage states this directly in the second paragraph.",
+    "type": "multiple-choice",
+} for i in range(10)]
+
+
+def _grow_to(size: int, teacher_id) -> None:
+    db = SessionLocal()
+    try:
+        existing = db.scalar(select(func.count()).select_from(models.Quiz))
+        base = datetime(2025, 1, 1)
+        rows = [{
+            "id": uuid.uuid4(),
+            "title": f"Quiz {i}",
+            "file_name": f"quiz-{i}.pdf",
+            "question_type": "multiple-choice",
+            "questions": QUESTIONS,
+            "question_count": len(QUESTIONS),
+            "created_by": teacher_id,
+            "created_at": base + timedelta(seconds=i),
+            "is_published": True,
+        } for i in range(existing, size)]
+        for start in range(0, len(rows), 5000):
+            db.execute(insert(models.Quiz), rows[start:start + 5000])
+        db.commit()
+    finally:
+        db.close()
+
+
+def _full_load() -> tuple:
+    """What the listing used to do: every published quiz, questions included."""
+    db = SessionLocal()
+    try:
+        start = time.perf_counter()
+        quizzes = db.scalars(select(models.Quiz).where(models.Quiz.is_published == True)).all()
+        body = "[" + ",".join(schemas.QuizOut.model_validate(q).model_dump_json() for q in quizzes) + "]"
+        return time.perf_counter() - start, len(body)
+    finally:
+        db.close()
+
+
+def _deep_cursor(size: int) -> str:
+    db = SessionLocal()
+    try:
+        row = db.execute(
+            select(models.Quiz.created_at, models.Quiz.id)
+            .order_by(models.Quiz.created_at.desc(), models.Quiz.id.desc())
+            .offset(size // 2).limit(1)
+        ).one()
+        return encode_cursor(row.created_at, row.id)
+    finally:
+        db.close()
+
+
+async def _timed_get(client, params: dict, repeat: int = 20) -> tuple:
+    url = f"{settings.API_V1_STR}/quizzes/quizzes/"
+    await client.get(url, params=params)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        response = await client.get(url, params=params)
+    return (time.perf_counter() - start) / repeat, len(response.content)
+
+
+async def main() -> None:
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1000, 10000, 50000]
+
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    teacher = models.User(name="Bench", email=f"bench-{time.time_ns()}@example.com",
+                          hashed_password=get_password_hash("bench"), role="teacher")
+    db.add(teacher)
+    db.commit()
+    teacher_id = teacher.id
+    db.close()
+
+    print(f"{'quizzes':>8} {'first page':>11} {'bytes':>7} {'deep page':>10} {'bytes':>7} {'load all':>9} {'bytes':>11}")
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://localhost") as client:
+        for size in sizes:
+            _grow_to(size, teacher_id)
+            first_s, first_bytes = await _timed_get(client, {})
+            deep_s, deep_bytes = await _timed_get(client, {"cursor": _deep_cursor(size)})
+            full_s, full_bytes = _full_load()
+            print(f"{size:8d} {first_s * 1000:9.1f}ms {first_bytes:7d} {deep_s * 1000:8.1f}ms {deep_bytes:7d} "
+                  f"{full_s * 1000:7.0f}ms {full_bytes:11d}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
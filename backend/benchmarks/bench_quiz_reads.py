@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+A class opening the same quiz at once, against the quiz response cache.
+
+Usage (from the backend directory):
+
+    python -m benchmarks.bench_quiz_reads [students ...]
+
+For each class size (default 50, 500 and 2000 concurrent students), reports
+the wall time, p50/p99 latency and database queries of GET /quizzes/{id} for
+a 50-question quiz: with the cache emptied first (without the cache, every
+request would run that round's one query), with it warm, and revalidating
+with If-None-Match (304, no body). Uses BENCH_DATABASE_URL, or a temporary
+SQLite database when it is unset.
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["SUPABASE_DB_URL"] = os.getenv("BENCH_DATABASE_URL") or f"sqlite:///{os.path.join(_tmp.name, 'bench.db')}"
+
+import httpx  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.core.response_cache import quiz_responses  # noqa: E402
+from app.core.security import create_access_token, get_password_hash  # noqa: E402
+from app.db import models  # noqa: E402
+from app.db.session import SessionLocal, async_engine, engine  # noqa: E402
+from app.main import app  # noqa: E402
+
+QUESTIONS = 50
+
+_queries = 0
+
+
+def _count_query(*args) -> None:
+    global _queries
+    _queries += 1
+
+
+def _setup() -> tuple:
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        teacher = models.User(name="Bench", email=f"bench-{time.time_ns()}@example.com",
+                              hashed_password=get_password_hash("bench"), role="teacher")
+        student = models.User(name="Student", email=f"student-{time.time_ns()}@example.com",
+                              hashed_password=get_password_hash("bench"), role="student",
+                              student_number=f"S{time.time_ns()}")
+        db.add_all([teacher, student])
+        db.flush()
+        questions = [{"id": str(n), "question": f"Question {n}: which option describes step {n} of the process?",
+                      "options": [f"Option {n}.{i} with a realistic amount of text" for i in range(4)],
+                      "correctAnswer": n % 4, "explanation": f"Step {n} is explained on page {n}.",
+                      "type": "multiple-choice"} for n in range(QUESTIONS)]
+        quiz = models.Quiz(title="Bench quiz", file_name="bench.pdf", question_type="multiple-choice",
+                           questions=questions, created_by=teacher.id)
+        db.add(quiz)
+        db.commit()
+        token = create_access_token({"sub": str(student.id), "role": "student"})
+        return quiz.id, {"Authorization": f"Bearer {token}"}
+    finally:
+        db.close()
+
+
+async def _class_opens(client, url: str, headers: dict, students: int) -> tuple:
+    global _queries
+    _queries = 0
+
+    async def open_quiz() -> float:
+        start = time.perf_counter()
+        response = await client.get(url, headers=headers)
+        assert response.status_code in (200, 304), response.text
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    timings = sorted(await asyncio.gather(*(open_quiz() for _ in range(students))))
+    wall = time.perf_counter() - start
+    return wall, timings[len(timings) // 2], timings[int(len(timings) * 0.99)], _queries
+
+
+async def main() -> None:
+    sizes = [int(arg) for arg in sys.argv[1:]] or [50, 500, 2000]
+    quiz_id, headers = _setup()
+    event.listen(async_engine.sync_engine if async_engine is not None else engine, "before_cursor_execute", _count_query)
+    url = f"{settings.API_V1_STR}/quizzes/quizzes/{quiz_id}"
+
+    print(f"{'students':>8} {'round':>12} {'wall':>8} {'p50':>8} {'p99':>8} {'queries':>8}")
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://localhost") as client:
+        etag = (await client.get(url, headers=headers)).headers["etag"]  # also caches the student's principal
+        rounds = {
+            "cold cache": headers,
+            "warm cache": headers,
+            "revalidate": {**headers, "If-None-Match": etag},
+        }
+        for students in sizes:
+            for name, round_headers in rounds.items():
+                if name == "cold cache":
+                    quiz_responses.invalidate(str(quiz_id))
+                wall, p50, p99, queries = await _class_opens(client, url, round_headers, students)
+                print(f"{students:8d} {name:>12} {wall * 1000:6.0f}ms {p50 * 1000:6.1f}ms {p99 * 1000:6.1f}ms {queries:8d}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Answer events per second for live quiz sessions on a single node.
+
+Usage (from the backend directory):
+
+    python -m benchmarks.bench_quiz_sessions [students] [questions] [concurrency]
+
+Starts a session for each of `students` (default 2000) students on a
+`questions`-question quiz (default 20), then sends every answer through
+POST /sessions/{id}/answers with `concurrency` (default 200) requests in
+flight, with the session flusher running as it does in the API. Reports the
+answer events accepted per second and their p50/p99 latency, how long the
+flusher took to write what was still buffered, the rows written, and the time
+to finish every session. For comparison it also reports the rate of as many
+GET / requests (no auth, no body), the ceiling of this in-process client and
+event loop, and times writing answers one transaction each, which is what
+saving every answer as it arrives would cost. Several API processes multiply
+the events per second (use QUIZ_SESSION_BUFFER=redis with more than one).
+Uses BENCH_DATABASE_URL, or a temporary SQLite database when it is unset.
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["SUPABASE_DB_URL"] = os.getenv("BENCH_DATABASE_URL") or f"sqlite:///{os.path.join(_tmp.name, 'bench.db')}"
+os.environ.setdefault("AUTH_TRUST_TOKEN_ROLE", "true")
+
+import httpx  # noqa: E402
+from sqlalchemy import func, insert, select  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.core.security import create_access_token  # noqa: E402
+from app.core.sessions import _write_answers, answer_buffer, session_flusher  # noqa: E402
+from app.db import models  # noqa: E402
+from app.db.session import SessionLocal, engine  # noqa: E402
+from app.main import app  # noqa: E402
+
+BASELINE_ANSWERS = 1000
+# Starting and finishing each write rows, within the connection pool (SQLite also serializes them)
+WRITE_CONCURRENCY = 8
+
+
+def _setup(students: int, questions: int) -> tuple:
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        teacher_id = uuid.uuid4()
+        student_ids = [uuid.uuid4() for _ in range(students)]
+        db.execute(insert(models.User), [
+            {"id": teacher_id, "name": "Bench", "email": "bench@example.com", "hashed_password": "-", "role": "teacher"},
+            *({"id": student_id, "name": f"Student {i}", "email": f"student-{i}@example.com", "hashed_password": "-",
+               "role": "student", "student_number": f"S{i}"} for i, student_id in enumerate(student_ids)),
+        ])
+        quiz = models.Quiz(
+            title="Bench exam", file_name="bench.pdf", question_type="multiple-choice", created_by=teacher_id,
+            questions=[{"id": str(n), "question": f"Question {n}?", "options": ["a", "b", "c", "d"],
+                        "correctAnswer": n % 4, "explanation": f"Because {n}.", "type": "multiple-choice"}
+                       for n in range(questions)],
+        )
+        db.add(quiz)
+        db.commit()
+        return quiz.id, student_ids
+    finally:
+        db.close()
+
+
+def _headers(student_id: uuid.UUID) -> dict:
+    return {"Authorization": f"Bearer {create_access_token({'sub': str(student_id), 'role': 'student'})}"}
+
+
+def _one_transaction_each(session_id: uuid.UUID, answers: int) -> float:
+    """Seconds to write `answers` answers with a commit each."""
+    db = SessionLocal()
+    try:
+        start = time.perf_counter()
+        for n in range(answers):
+            _write_answers(db, [{"session_id": session_id, "question_id": f"baseline-{n}", "selected_option": 0,
+                                 "time_spent": 1000, "open_ended_answer": None, "answered_at": datetime.now(timezone.utc)}])
+            db.commit()
+        return time.perf_counter() - start
+    finally:
+        db.close()
+
+
+async def main() -> None:
+    students = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    questions = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    concurrency = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+    quiz_id, student_ids = _setup(students, questions)
+    headers = [_headers(student_id) for student_id in student_ids]
+    url = f"{settings.API_V1_STR}/sessions/sessions"
+    print(f"{students} students x {questions} questions, {concurrency} requests in flight, "
+          f"{settings.QUIZ_SESSION_BUFFER} buffer flushed every {settings.QUIZ_SESSION_FLUSH_INTERVAL}s, "
+          f"{engine.dialect.name}")
+
+    session_flusher.start()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://localhost") as client:
+        answers, writes = asyncio.Semaphore(concurrency), asyncio.Semaphore(WRITE_CONCURRENCY)
+
+        async def call(limit: asyncio.Semaphore, path: str, header: dict, body=None) -> tuple:
+            async with limit:
+                start = time.perf_counter()
+                response = await client.post(path, headers=header, json=body)
+                assert response.status_code < 300, response.text
+                return response, time.perf_counter() - start
+
+        start = time.perf_counter()
+        started = await asyncio.gather(*(call(writes, f"{url}/", header, {"quiz_id": str(quiz_id)}) for header in headers))
+        session_ids = [response.json()["id"] for response, _ in started]
+        print(f"started {students} sessions in {time.perf_counter() - start:.2f}s")
+
+        # Question by question, like a class working through the exam
+        events = [
+            (f"{url}/{session_id}/answers", header,
+             {"questionId": str(n), "selectedOption": (n + i) % 4, "timeSpent": 15000})
+            for n in range(questions) for i, (session_id, header) in enumerate(zip(session_ids, headers))
+        ]
+        start = time.perf_counter()
+        timings = sorted(elapsed for _, elapsed in await asyncio.gather(*(call(answers, *event) for event in events)))
+        wall = time.perf_counter() - start
+        print(f"answers: {len(events)} in {wall:.2f}s = {len(events) / wall:,.0f} events/s, "
+              f"p50 {timings[len(timings) // 2] * 1000:.1f}ms, p99 {timings[int(len(timings) * 0.99)] * 1000:.1f}ms")
+
+        start = time.perf_counter()
+        while len(answer_buffer):
+            await asyncio.sleep(0.01)
+        await asyncio.to_thread(session_flusher.flush)
+        db = SessionLocal()
+        try:
+            rows = db.scalar(select(func.count()).select_from(models.QuizSessionAnswer))
+        finally:
+            db.close()
+        print(f"flush lag after the last answer: {time.perf_counter() - start:.2f}s, {rows} answer rows written")
+
+        start = time.perf_counter()
+        finished = await asyncio.gather(*(call(writes, f"{url}/{session_id}/finish", header)
+                                          for session_id, header in zip(session_ids, headers)))
+        scores = [response.json()["score"] for response, _ in finished]
+        print(f"finished {students} sessions in {time.perf_counter() - start:.2f}s, mean score {sum(scores) / len(scores):.2f}")
+
+        async def ping() -> None:
+            async with answers:
+                await client.get("/")
+
+        start = time.perf_counter()
+        await asyncio.gather(*(ping() for _ in events))
+        wall = time.perf_counter() - start
+        print(f"ceiling: {len(events)} GET / in {wall:.2f}s = {len(events) / wall:,.0f} requests/s")
+    session_flusher.stop()
+
+    elapsed = await asyncio.to_thread(_one_transaction_each, uuid.UUID(session_ids[0]), BASELINE_ANSWERS)
+    print(f"baseline: one transaction per answer writes {BASELINE_ANSWERS / elapsed:,.0f} answers/s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Full-text search latency as the number of indexed quizzes grows.
+
+Usage (from the backend directory):
+
+    python -m benchmarks.bench_search [sizes ...]
+
+For each size (default 10000 and 100000 quizzes, each with 5 questions and
+~300 words of document text drawn from a Zipf-distributed vocabulary),
+reports GET /quizzes/search latency for a rare word, a common word, two words
+and two rare words, next to a LIKE scan of the same text. Uses BENCH_DATABASE_URL
+(Postgres with the quiz_search migration applied), or a temporary SQLite
+database with FTS5 when it is unset.
+"""
+
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["SUPABASE_DB_URL"] = os.getenv("BENCH_DATABASE_URL") or f"sqlite:///{os.path.join(_tmp.name, 'bench.db')}"
+
+import httpx  # noqa: E402
+from sqlalchemy import func, insert, select  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.core.security import get_password_hash  # noqa: E402
+from app.db import models  # noqa: E402
+from app.db.session import SessionLocal, engine  # noqa: E402
+from app.main import app  # noqa: E402
+
+VOCABULARY = [f"word{i}" for i in range(20000)]
+WEIGHTS = [1 / (rank + 1) for rank in range(len(VOCABULARY))]  # Zipf: word0 is the most common
+DOCUMENT_WORDS = 300
+LOAD_CHUNK = 5000
+
+QUERIES = {
+    "rare word": "word15000",
+    "common word": "word3",
+    "two words": "word40 word90",
+    "rare pair": "word19999 word19998",
+}
+
+
+def _words(rng: random.Random, count: int) -> str:
+    return " ".join(rng.choices(VOCABULARY, weights=WEIGHTS, k=count))
+
+
+def _grow_to(size: int, teacher_id, rng: random.Random) -> None:
+    db = SessionLocal()
+    try:
+        existing = db.scalar(select(func.count()).select_from(models.Quiz))
+        base = datetime(2025, 1, 1)
+        for start in range(existing, size, LOAD_CHUNK):
+            count = min(LOAD_CHUNK, size - start)
+            quizzes, documents = [], []
+            for i in range(start, start + count):
+                questions = [{"id": str(n), "question": _words(rng, 10) + "?", "options": [_words(rng, 2) for _ in range(4)],
+                              "correctAnswer": 0, "explanation": "", "type": "multiple-choice"} for n in range(5)]
+                quiz_id = uuid.uuid4()
+                quizzes.append({
+                    "id": quiz_id, "title": _words(rng, 3), "file_name": f"doc-{i}.pdf",
+                    "question_type": "multiple-choice", "questions": questions, "question_count": len(questions),
+                    "version": 1, "created_by": teacher_id, "created_at": base + timedelta(seconds=i), "is_published": True,
+                })
+                documents.append({
+                    "quiz_id": quiz_id, "title": quizzes[-1]["title"],
+                    "questions_text": models.QuizSearchDocument.questions_text_for(questions),
+                    "document_text": _words(rng, DOCUMENT_WORDS),
+                })
+            db.execute(insert(models.Quiz), quizzes)
+            db.execute(insert(models.QuizSearchDocument), documents)
+            db.commit()
+    finally:
+        db.close()
+
+
+def _like_scan(query: str) -> float:
+    """Without the index: a substring scan of every quiz's text (ranking needs every match)."""
+    db = SessionLocal()
+    try:
+        pattern = f"%{query.split()[0]}%"
+        start = time.perf_counter()
+        db.execute(
+            select(func.count())
+            .where(models.QuizSearchDocument.title.like(pattern)
+                   | models.QuizSearchDocument.questions_text.like(pattern)
+                   | models.QuizSearchDocument.document_text.like(pattern))
+        ).scalar()
+        return time.perf_counter() - start
+    finally:
+        db.close()
+
+
+async def _timed_search(client, query: str, repeat: int = 20) -> tuple:
+    url = f"{settings.API_V1_STR}/quizzes/quizzes/search"
+    await client.get(url, params={"q": query})
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = await client.get(url, params={"q": query})
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2], len(response.json()["items"])
+
+
+async def main() -> None:
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10000, 100000]
+    rng = random.Random(5)
+
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    teacher = models.User(name="Bench", email=f"bench-{time.time_ns()}@example.com",
+                          hashed_password=get_password_hash("bench"), role="teacher")
+    db.add(teacher)
+    db.commit()
+    teacher_id = teacher.id
+    db.close()
+
+    print(f"{'quizzes':>8} {'query':>12} {'p50':>9} {'hits':>5} {'LIKE scan':>10}")
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://localhost") as client:
+        for size in sizes:
+            _grow_to(size, teacher_id, rng)
+            for name, query in QUERIES.items():
+                p50, hits = await _timed_search(client, query)
+                print(f"{size:8d} {name:>12} {p50 * 1000:7.1f}ms {hits:5d} {_like_scan(query) * 1000:8.1f}ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Serialization time per 1k quizzes and results: response-model validation
+against the compiled serializers of app/core/serialization.py.
+
+Usage (from the backend directory):
+
+    python -m benchmarks.bench_serialization [rows] [questions]
+
+Loads `rows` (default 1000) quizzes with `questions` (default 20) questions
+each and as many results with one answer per question from a temporary SQLite
+database, then times producing the JSON body of each listing shape: "before"
+validates the rows through the response model (from_attributes) and encodes
+the dump the way FastAPI's JSONResponse does; "after" is
+`dumps([serializer(row) ...])`. Both bodies are checked to decode to the same
+JSON. Reports the median of several runs.
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+from typing import List
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["SUPABASE_DB_URL"] = f"sqlite:///{os.path.join(_tmp.name, 'bench.db')}"
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+from sqlalchemy import insert, select  # noqa: E402
+
+from app.api.results import _SUMMARY_COLUMNS as _RESULT_SUMMARY_COLUMNS  # noqa: E402
+from app.api.v1.quizzes import _SUMMARY_COLUMNS as _QUIZ_SUMMARY_COLUMNS  # noqa: E402
+from app.core.serialization import compile_serializer, dumps, orjson  # noqa: E402
+from app.db import models, schemas  # noqa: E402
+from app.db.session import SessionLocal, engine  # noqa: E402
+
+RUNS = 7
+
+
+def _load(rows: int, questions: int) -> None:
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        teacher_id, student_id = uuid.uuid4(), uuid.uuid4()
+        db.execute(insert(models.User), [
+            {"id": teacher_id, "name": "Bench", "email": "bench@example.com", "hashed_password": "-", "role": "teacher"},
+            {"id": student_id, "name": "Student", "email": "student@example.com", "hashed_password": "-",
+             "role": "student", "student_number": "S1"},
+        ])
+        quiz_rows, result_rows = [], []
+        for i in range(rows):
+            quiz_questions = [schemas.Question(
+                id=str(n), question=f"Question {n} of quiz {i}: which option is right?",
+                options=[f"Option {o} for question {n}" for o in range(4)], correctAnswer=n % 4,
+                explanation=f"Option {n % 4} is right because of page {n}.", type="multiple-choice",
+            ).dict() for n in range(questions)]
+            answers = [schemas.Answer(questionId=str(n), selectedOption=(n + i) % 4, isCorrect=(n + i) % 4 == n % 4,
+                                      timeSpent=1000 + n).dict() for n in range(questions)]
+            quiz_id = uuid.uuid4()
+            quiz_rows.append({
+                "id": quiz_id, "title": f"Quiz {i}", "file_name": f"doc-{i}.pdf", "question_type": "multiple-choice",
+                "questions": quiz_questions, "question_count": questions, "version": 1, "created_by": teacher_id,
+                "is_published": True,
+            })
+            result_rows.append({
+                "quiz_id": quiz_id, "student_id": student_id, "student_name": "Student", "student_number": "S1",
+                "answers": answers, "score": sum(a["isCorrect"] for a in answers), "total_questions": questions,
+                "time_spent": 60000,
+            })
+        # Core inserts: the normalized questions/answers tables are not needed here
+        db.execute(insert(models.Quiz), quiz_rows)
+        db.execute(insert(models.QuizResult), result_rows)
+        db.commit()
+    finally:
+        db.close()
+
+
+def _before(schema, rows) -> bytes:
+    adapter = TypeAdapter(List[schema])
+    content = adapter.dump_python(adapter.validate_python(rows, from_attributes=True), mode="json")
+    return JSONResponse(content).body
+
+
+def _after(serialize, rows) -> bytes:
+    return dumps([serialize(row) for row in rows])
+
+
+def _median_ms(fn, *args) -> float:
+    timings = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2] * 1000
+
+
+def main() -> None:
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    questions = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    _load(rows, questions)
+
+    db = SessionLocal()
+    try:
+        shapes = [
+            ("QuizOut", schemas.QuizOut, db.scalars(select(models.Quiz)).all()),
+            ("QuizPublicOut", schemas.QuizPublicOut, db.scalars(select(models.Quiz)).all()),
+            ("QuizSummaryOut", schemas.QuizSummaryOut, db.execute(select(*_QUIZ_SUMMARY_COLUMNS)).all()),
+            ("QuizResultOut", schemas.QuizResultOut, db.scalars(select(models.QuizResult)).all()),
+            ("QuizResultSummaryOut", schemas.QuizResultSummaryOut, db.execute(select(*_RESULT_SUMMARY_COLUMNS)).all()),
+        ]
+        print(f"{rows} rows per listing, {questions} questions/answers each, "
+              f"{'orjson' if orjson is not None else 'json (orjson not installed)'}")
+        print(f"{'shape':>21} {'before':>10} {'after':>10} {'speed-up':>9} {'same JSON':>10}")
+        for name, schema, loaded in shapes:
+            serialize = compile_serializer(schema)
+            same = json.loads(_before(schema, loaded)) == json.loads(_after(serialize, loaded))
+            before_ms = _median_ms(_before, schema, loaded)
+            after_ms = _median_ms(_after, serialize, loaded)
+            print(f"{name:>21} {before_ms:8.1f}ms {after_ms:8.1f}ms {before_ms / after_ms:8.1f}x {str(same):>10}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+OpenAI-compatible mock chat-completion server for offline testing of the LLM gateway.
+
+    MOCK_LLM_LATENCY_MS=800 MOCK_LLM_ERROR_RATE=0.1 \\
+        uvicorn benchmarks.mock_llm_server:app --port 9000
+
+Then point the API at it:
+
+    LLM_PROVIDER=openai LLM_BASE_URL=http://localhost:9000/v1 OPENAI_API_KEY=test
+
+`MOCK_LLM_ERROR_RATE` of the requests fail with 429 (with Retry-After) or 503 so
+retry/backoff behaviour can be observed.
+"""
+
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from app.core.llm_gateway import fake_questions
+
+LATENCY_MS = int(os.getenv("MOCK_LLM_LATENCY_MS", "500"))
+ERROR_RATE = float(os.getenv("MOCK_LLM_ERROR_RATE", "0"))
+
+app = FastAPI(title="Mock LLM")
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    await asyncio.sleep(LATENCY_MS / 1000)
+
+    if random.random() < ERROR_RATE:
+        if random.random() < 0.5:
+            return JSONResponse(
+                status_code=429,
+                headers={"retry-after": "0.2"},
+                content={"error": {"message": "Rate limit reached", "type": "rate_limit_error"}},
+            )
+        return JSONResponse(status_code=503, content={"error": {"message": "Overloaded", "type": "server_error"}})
+
+    prompt = body["messages"][-1]["content"]
+    content = json.dumps(fake_questions(prompt))
+    prompt_tokens = sum(len(m["content"]) for m in body["messages"]) // 4
+    completion_tokens = len(content) // 4
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "mock"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
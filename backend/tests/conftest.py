@@ -0,0 +1,156 @@
+"""
+Shared fixtures. Settings are read from the environment when `app.core.config`
+is imported, so the test configuration is set here first: a temporary SQLite
+database, cache and upload directories, the offline LLM provider and the
+in-process backends.
+"""
+
+import os
+import tempfile
+import uuid
+
+import pytest
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ.update({
+    "SUPABASE_DB_URL": f"sqlite:///{os.path.join(_tmp.name, 'test.db')}",
+    "DB_ASYNC": "false",
+    "CACHE_DIR": os.path.join(_tmp.name, "cache"),
+    "UPLOAD_DIR": os.path.join(_tmp.name, "uploads"),
+    "LLM_PROVIDER": "fake",
+    "LLM_FAKE_LATENCY_MS": "0",
+    "JOB_BACKEND": "inprocess",
+    "QUIZ_SESSION_BUFFER": "inprocess",
+    "WEB_CONCURRENCY": "1",
+    "RESPONSE_CACHE_REDIS": "false",
+    "LIVE_RESULTS_BACKEND": "inprocess",
+})
+
+from app.core.security import create_access_token  # noqa: E402
+from app.db import models  # noqa: E402
+from app.db.session import SessionLocal, engine  # noqa: E402
+
+
+@pytest.fixture(scope="session", autouse=True)
+def schema():
+    models.Base.metadata.create_all(bind=engine)
+    yield
+    engine.dispose()
+
+
+@pytest.fixture(autouse=True)
+def clean_tables():
+    yield
+    with engine.begin() as connection:
+        for table in reversed(models.Base.metadata.sorted_tables):
+            connection.execute(table.delete())
+
+
+@pytest.fixture
+def client():
+    """API client; the startup hooks (job workers, session flusher) are not run."""
+    from fastapi.testclient import TestClient
+    from app.main import app
+    return TestClient(app, base_url="http://localhost")
+
+
+@pytest.fixture
+def auth_headers():
+    def headers(user: models.User) -> dict:
+        token = create_access_token({"sub": str(user.id), "role": user.role.value})
+        return {"Authorization": f"Bearer {token}"}
+    return headers
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+def _add_user(db, role: str, student_number=None) -> models.User:
+    user = models.User(
+        id=uuid.uuid4(),
+        name=f"Test {role}",
+        email=f"{uuid.uuid4().hex[:12]}@example.com",
+        hashed_password="-",
+        role=role,
+        student_number=student_number,
+    )
+    db.add(user)
+    db.commit()
+    return user
+
+
+@pytest.fixture
+def teacher(db) -> models.User:
+    return _add_user(db, "teacher")
+
+
+@pytest.fixture
+def student(db) -> models.User:
+    return _add_user(db, "student", student_number=uuid.uuid4().hex[:8])
+
+
+def mc_questions(count: int) -> list:
+    """`count` multiple-choice questions whose correct answer is option `i % 3`."""
+    return [
+        {
+            "id": str(i + 1),
+            "question": f"Question number {i + 1}?",
+            "options": ["a", "b", "c"],
+            "correctAnswer": i % 3,
+            "explanation": "",
+            "type": "multiple-choice",
+        }
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def make_quiz(db, teacher):
+    def make(questions=None, time_limit_seconds=None) -> models.Quiz:
+        quiz = models.Quiz(
+            id=uuid.uuid4(),
+            title="Test quiz",
+            file_name="test.pdf",
+            question_type="multiple-choice",
+            questions=questions if questions is not None else mc_questions(5),
+            created_by=teacher.id,
+            time_limit_seconds=time_limit_seconds,
+        )
+        db.add(quiz)
+        db.commit()
+        return quiz
+    return make
+
+
+@pytest.fixture
+def make_pdf():
+    """Builds a minimal PDF with one line of `text` (plus the page number) per page."""
+    def make(text: str, pages: int = 1) -> bytes:
+        objects = [b"<< /Type /Catalog /Pages 2 0 R >>"]
+        kids = " ".join(f"{3 + 2 * i} 0 R" for i in range(pages))
+        objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>".encode())
+        font = 3 + 2 * pages
+        for i in range(pages):
+            content = f"BT /F1 12 Tf 72 720 Td (Page {i + 1}. {text}) Tj ET".encode()
+            objects.append(
+                f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {4 + 2 * i} 0 R "
+                f"/Resources << /Font << /F1 {font} 0 R >> >> >>".encode()
+            )
+            objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content))
+        objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+        out = bytearray(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(len(out))
+            out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+        xref = len(out)
+        out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+        out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+        out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+        return bytes(out)
+    return make
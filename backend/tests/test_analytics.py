@@ -0,0 +1,96 @@
+import uuid
+
+import numpy as np
+
+from app.core.analytics import HISTOGRAM_BUCKETS, rebuild_quiz_stats, score_bucket
+from app.core.bulk_results import import_results
+from app.db import models
+
+
+def _students(db, count: int) -> list:
+    students = [
+        models.User(
+            id=uuid.uuid4(), name=f"Student {i}", email=f"{uuid.uuid4().hex}@example.com", hashed_password="-",
+            role="student", student_number=uuid.uuid4().hex[:8],
+        )
+        for i in range(count)
+    ]
+    db.add_all(students)
+    db.commit()
+    return students
+
+
+def _submission(quiz, student, rng) -> dict:
+    return {
+        "quiz_id": str(quiz.id), "student_id": str(student.id), "student_name": student.name,
+        "student_number": student.student_number, "time_spent": int(rng.integers(0, 120_000)),
+        "answers": [
+            {"questionId": str(q), "selectedOption": int(rng.integers(0, 3)), "timeSpent": 1000}
+            for q in rng.permutation(5)[:int(rng.integers(0, 6))] + 1
+        ],
+    }
+
+
+def _snapshot(db, quiz) -> dict:
+    db.expire_all()
+    stats = db.get(models.QuizStats, quiz.id)
+    return {
+        "submissions": stats.submissions,
+        "score_sum": stats.score_sum,
+        "percent_sum": round(stats.percent_sum, 6),  # summed in a different order
+        "time_spent_sum": stats.time_spent_sum,
+        "score_histogram": stats.score_histogram,
+        "question_counts": stats.question_counts,
+        "time_spent_sketch": stats.time_spent_sketch,
+    }
+
+
+def _rebuilt(db, quiz) -> dict:
+    rebuild_quiz_stats(db, quiz.id)
+    db.commit()
+    return _snapshot(db, quiz)
+
+
+def test_score_bucket_edges():
+    assert [score_bucket(score, 5) for score in range(6)] == [0, 2, 4, 6, 8, HISTOGRAM_BUCKETS - 1]
+    assert score_bucket(3, 0) == 0
+
+
+def test_incremental_stats_match_a_rebuild(client, db, make_quiz, teacher, auth_headers):
+    rng = np.random.default_rng(12)
+    quiz = make_quiz()
+    students = _students(db, 12)
+
+    # One at a time through the API
+    for student in students[:4]:
+        response = client.post(
+            "/api/v1/results/results/", json=_submission(quiz, student, rng), headers=auth_headers(student)
+        )
+        assert response.status_code == 200, response.text
+    # Then a bulk import on top
+    inserted, errors = import_results(teacher.id, [_submission(quiz, student, rng) for student in students[4:10]])
+    assert (inserted, errors) == (6, {})
+
+    incremental = _snapshot(db, quiz)
+    assert incremental["submissions"] == 10
+    assert _rebuilt(db, quiz) == incremental
+
+    # A corrected answer key re-grades everything (in the background task) and rebuilds the row
+    response = client.put(
+        f"/api/v1/quizzes/quizzes/{quiz.id}/answer-key",
+        json=[{"question_id": "1", "correctAnswer": 2}, {"question_id": "3", "correctAnswer": 0}],
+        headers=auth_headers(teacher),
+    )
+    assert response.status_code == 200, response.text
+    regraded = _snapshot(db, quiz)
+    assert regraded != incremental
+
+    # and later submissions are added on top of the rebuilt row
+    for student in students[10:]:
+        response = client.post(
+            "/api/v1/results/results/", json=_submission(quiz, student, rng), headers=auth_headers(student)
+        )
+        assert response.status_code == 200, response.text
+    incremental = _snapshot(db, quiz)
+    assert incremental["submissions"] == 12
+    assert _rebuilt(db, quiz) == incremental
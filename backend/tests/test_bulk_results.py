@@ -0,0 +1,161 @@
+import json
+import uuid
+
+import pytest
+from sqlalchemy import func, select
+
+from app.core import bulk_results
+from app.core.config import settings
+from app.db import models
+from app.db.session import SessionLocal
+
+BULK = "/api/v1/results/results/bulk"
+ALREADY_SUBMITTED = "This student has already submitted this quiz"
+
+
+@pytest.fixture
+def students(db) -> list:
+    students = [
+        models.User(
+            id=uuid.uuid4(), name=f"Student {i}", email=f"{uuid.uuid4().hex}@example.com", hashed_password="-",
+            role="student", student_number=uuid.uuid4().hex[:8],
+        )
+        for i in range(6)
+    ]
+    db.add_all(students)
+    db.commit()
+    return students
+
+
+def _row(quiz, student, option: int = 0) -> dict:
+    return {
+        "quiz_id": str(quiz.id), "student_id": str(student.id), "student_name": student.name,
+        "student_number": student.student_number, "time_spent": 60_000, "score": 5,
+        "answers": [{"questionId": "1", "selectedOption": option, "timeSpent": 1000}],
+    }
+
+
+def _add_result(quiz, student) -> None:
+    """A result committed by a session of its own, like a student submitting during the import."""
+    db = SessionLocal()
+    try:
+        db.add(models.QuizResult(
+            id=uuid.uuid4(), quiz_id=quiz.id, student_id=student.id, student_name=student.name,
+            student_number=student.student_number, answers=[], score=0, total_questions=5, time_spent=0,
+        ))
+        db.commit()
+    finally:
+        db.close()
+
+
+def _results(db, quiz) -> int:
+    return db.scalar(select(func.count()).select_from(models.QuizResult).where(models.QuizResult.quiz_id == quiz.id))
+
+
+def _errors(response) -> dict:
+    return {error["row"]: error["detail"] for error in response.json()["errors"]}
+
+
+def test_rows_that_cant_be_imported_are_reported(client, db, make_quiz, teacher, student, students, auth_headers):
+    quiz = make_quiz()
+    other_teachers_quiz = models.Quiz(
+        id=uuid.uuid4(), title="Other", file_name="o.pdf", question_type="multiple-choice", questions=[],
+        created_by=student.id,
+    )
+    db.add(other_teachers_quiz)
+    db.commit()
+    _add_result(quiz, students[1])
+    body = [
+        _row(quiz, students[0], option=0),                      # 0: imported, graded on the server
+        _row(quiz, students[0], option=1),                      # 1: duplicate of row 0
+        _row(quiz, students[1]),                                # 2: already submitted
+        {**_row(quiz, teacher), "student_number": "T1"},        # 3: not a student
+        _row(other_teachers_quiz, students[2]),                 # 4: not the teacher's quiz
+        {**_row(quiz, students[3]), "student_id": "nope"},      # 5
+        {"quiz_id": str(quiz.id)},                              # 6: missing fields
+        _row(quiz, students[4], option=2),                      # 7: imported
+    ]
+
+    response = client.post(BULK, json=body, headers=auth_headers(teacher))
+
+    assert response.status_code == 200, response.text
+    assert (response.json()["received"], response.json()["inserted"]) == (8, 2)
+    errors = _errors(response)
+    assert set(errors) == {1, 2, 3, 4, 5, 6}
+    assert errors[1] == "Duplicate of row 0"
+    assert errors[2] == ALREADY_SUBMITTED
+    assert errors[3] == "Student not found"
+    assert errors[4] == "Quiz not found"
+    assert errors[5] == "Invalid quiz_id or student_id"
+    assert "student_id" in errors[6] and "time_spent" in errors[6]
+
+    db.expire_all()
+    imported = {r.student_id: r for r in db.scalars(select(models.QuizResult).where(models.QuizResult.quiz_id == quiz.id))}
+    assert (imported[students[0].id].score, imported[students[4].id].score) == (1, 0)
+    assert imported[students[0].id].total_questions == 5
+
+
+def test_stats_count_imported_results(client, db, make_quiz, teacher, students, auth_headers):
+    quiz = make_quiz()
+    body = [_row(quiz, student, option=0) for student in students[:3]] + [_row(quiz, students[0])]
+
+    assert client.post(BULK, json=body, headers=auth_headers(teacher)).json()["inserted"] == 3
+
+    stats = client.get(f"/api/v1/results/results/quiz/{quiz.id}/stats", headers=auth_headers(teacher)).json()
+    assert stats["submissions"] == 3
+    assert stats["average_score"] == 1
+    assert {q["question_id"]: q["correct"] for q in stats["questions"]} == {"1": 3}
+
+
+def test_ndjson_lines_that_dont_parse_are_reported(client, db, make_quiz, teacher, students, auth_headers):
+    quiz = make_quiz()
+    lines = [json.dumps(_row(quiz, students[0])), "{not json", "", json.dumps(_row(quiz, students[1])), "[1, 2"]
+    body = "\n".join(lines).encode()
+
+    response = client.post(
+        BULK, content=body, headers={"Content-Type": "application/x-ndjson", **auth_headers(teacher)}
+    )
+
+    assert response.status_code == 200, response.text
+    assert (response.json()["received"], response.json()["inserted"]) == (4, 2)  # blank lines are skipped
+    errors = _errors(response)
+    assert set(errors) == {1, 3}
+    assert all(detail.startswith("Invalid JSON") for detail in errors.values())
+    assert _results(db, quiz) == 2
+
+
+@pytest.mark.parametrize("content_type", ["application/json", "application/x-ndjson"])
+def test_too_many_rows_get_413(client, db, make_quiz, teacher, students, auth_headers, monkeypatch, content_type):
+    monkeypatch.setattr(settings, "RESULTS_BULK_MAX_ROWS", 2)
+    quiz = make_quiz()
+    rows = [_row(quiz, student) for student in students[:3]]
+    body = json.dumps(rows) if content_type == "application/json" else "\n".join(map(json.dumps, rows))
+
+    response = client.post(BULK, content=body, headers={"Content-Type": content_type, **auth_headers(teacher)})
+
+    assert response.status_code == 413
+    assert _results(db, quiz) == 0
+
+
+def test_submissions_racing_the_import_are_reported_as_already_submitted(db, make_quiz, teacher, students, monkeypatch):
+    quiz = make_quiz()
+    insert = bulk_results._insert
+    racers = iter(students[:bulk_results.IMPORT_ATTEMPTS])
+    attempts = []
+
+    def racing_insert(db, new_results, row_by_row, errors):
+        # Every attempt loses a race: a student submits after the duplicate check
+        attempts.append(row_by_row)
+        _add_result(quiz, next(racers))
+        return insert(db, new_results, row_by_row, errors)
+
+    monkeypatch.setattr(bulk_results, "_insert", racing_insert)
+
+    inserted, errors = bulk_results.import_results(teacher.id, [_row(quiz, student) for student in students])
+
+    assert attempts == [False] * (bulk_results.IMPORT_ATTEMPTS - 1) + [True]
+    assert inserted == len(students) - bulk_results.IMPORT_ATTEMPTS
+    assert errors == {position: ALREADY_SUBMITTED for position in range(bulk_results.IMPORT_ATTEMPTS)}
+    assert _results(db, quiz) == len(students)
+    db.expire_all()
+    assert db.get(models.QuizStats, quiz.id).submissions == inserted
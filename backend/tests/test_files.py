@@ -0,0 +1,168 @@
+import asyncio
+import io
+import os
+import uuid
+
+import anyio
+import pytest
+from fastapi import UploadFile
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+from starlette.datastructures import Headers
+
+from app.api.v1 import files
+from app.core import blobs, jobs
+from app.core.config import settings
+from app.core.principals import Principal
+from app.db import models
+
+TEXT = "Glaciers carve deep U-shaped valleys as they slowly move downhill over many centuries."
+
+
+@pytest.fixture
+def queued_ids(monkeypatch):
+    ids = []
+    monkeypatch.setattr(jobs, "enqueue_upload_job", lambda job_id: ids.append(str(job_id)))
+    monkeypatch.setattr(files, "enqueue_upload_job", lambda job_id: ids.append(str(job_id)))
+    return ids
+
+
+def _upload(content: bytes, filename: str = "notes.pdf") -> UploadFile:
+    return UploadFile(file=io.BytesIO(content), filename=filename, headers=Headers({"content-type": "application/pdf"}))
+
+
+async def _open_stream(teacher, content: bytes):
+    response = await files.upload_file_stream(
+        pdf_file=_upload(content), question_type="multiple-choice", num_questions=3,
+        current_user=Principal.from_user(teacher),
+    )
+    return response.body_iterator
+
+
+def _job(db) -> models.UploadJob:
+    db.expire_all()
+    return db.query(models.UploadJob).one()
+
+
+def test_stream_closed_by_the_client_hands_the_job_to_a_worker(db, teacher, make_pdf, queued_ids):
+    async def run():
+        events = await _open_stream(teacher, make_pdf(TEXT))
+        assert '"queued"' in await events.__anext__()
+        assert '"extracting"' in await events.__anext__()
+        await events.aclose()  # what the server does with the body once the client is gone
+
+    asyncio.run(run())
+
+    job = _job(db)
+    assert job.status == models.JobStatusEnum.queued.value
+    assert queued_ids == [str(job.id)]
+    assert db.get(models.Blob, job.content_sha256).ref_count == 1
+
+
+def test_stream_cancelled_mid_generation_hands_the_job_to_a_worker(db, teacher, make_pdf, queued_ids, monkeypatch):
+    async def stalled_generation(*args, **kwargs):
+        await asyncio.sleep(60)
+        yield {}
+
+    monkeypatch.setattr(files, "astream_quiz_from_text", stalled_generation)
+
+    async def run():
+        events = await _open_stream(teacher, make_pdf(TEXT))
+        # Starlette cancels the response's scope on disconnect; the cancellation stays
+        # in effect, so the handler's own awaits must be shielded to complete
+        with anyio.CancelScope() as scope:
+            async for event in events:
+                if '"generating"' in event:
+                    scope.cancel()
+
+    asyncio.run(run())
+
+    job = _job(db)
+    assert job.status == models.JobStatusEnum.queued.value
+    assert queued_ids == [str(job.id)]
+
+
+def test_finished_stream_is_not_requeued(db, teacher, make_pdf, queued_ids):
+    async def run():
+        events = await _open_stream(teacher, make_pdf(TEXT))
+        return [event async for event in events]
+
+    events = asyncio.run(run())
+
+    assert events[-1].startswith("event: done")
+    job = _job(db)
+    assert job.status == models.JobStatusEnum.done.value
+    assert not jobs.requeue_job(db, job.id)
+    assert queued_ids == []
+
+
+def _post_upload(client, headers, content: bytes):
+    return client.post(
+        "/api/v1/files/files/upload", headers=headers,
+        files={"pdf_file": ("notes.pdf", content, "application/pdf")},
+        data={"question_type": "multiple-choice", "num_questions": "3"},
+    )
+
+
+def test_identical_uploads_share_a_blob_until_the_last_quiz_is_deleted(client, db, teacher, auth_headers, make_pdf, queued_ids):
+    headers = auth_headers(teacher)
+    content = make_pdf("Shared blob. " + TEXT)
+    quiz_ids = []
+    for _ in range(2):
+        response = _post_upload(client, headers, content)
+        assert response.status_code == 202, response.text
+        job_id = response.json()["id"]
+        jobs.process_upload_job(job_id)  # the second one is already done from the quiz cache
+        db.expire_all()
+        quiz_ids.append(db.get(models.UploadJob, uuid.UUID(job_id)).quiz_id)
+
+    sha256 = db.query(models.UploadJob).first().content_sha256
+    assert {job.file_path for job in db.query(models.UploadJob)} == {blobs.blob_path(sha256)}
+    assert db.get(models.Blob, sha256).ref_count == 2
+    assert os.listdir(blobs._TEMP_DIR) == []  # the second copy was dropped, not stored
+
+    assert client.delete(f"/api/v1/quizzes/quizzes/{quiz_ids[0]}", headers=headers).status_code == 204
+    db.expire_all()
+    assert db.get(models.Blob, sha256).ref_count == 1
+    assert os.path.exists(blobs.blob_path(sha256))
+
+    assert client.delete(f"/api/v1/quizzes/quizzes/{quiz_ids[1]}", headers=headers).status_code == 204
+    db.expire_all()
+    assert db.get(models.Blob, sha256) is None
+    assert not os.path.exists(blobs.blob_path(sha256))
+
+
+def test_upload_over_the_limit_is_not_stored(client, db, teacher, auth_headers, make_pdf, queued_ids, monkeypatch):
+    content = make_pdf(TEXT, pages=3)
+    monkeypatch.setattr(settings, "UPLOAD_MAX_BYTES", len(content) - 1)
+
+    response = _post_upload(client, auth_headers(teacher), content)
+
+    assert response.status_code == 413
+    assert db.query(models.Blob).count() == 0
+    assert os.listdir(blobs._TEMP_DIR) == []
+
+    # Without a declared size the limit is checked while the chunks are written
+    with pytest.raises(blobs.UploadRejected) as rejected:
+        asyncio.run(blobs.stage_upload(_upload(content), max_bytes=len(content) - 1))
+    assert rejected.value.status_code == 413
+    assert os.listdir(blobs._TEMP_DIR) == []
+
+
+def test_size_limit_refuses_the_body_before_it_is_read():
+    reached = []
+
+    async def endpoint(scope, receive, send):
+        reached.append(scope["path"])
+        await JSONResponse({})(scope, receive, send)
+
+    client = TestClient(blobs.UploadSizeLimit(endpoint, {"/files/": 10, "/files/upload-batch": 10**9}))
+    body = b"x" * (10 + blobs.FORM_OVERHEAD_BYTES + 1)
+
+    assert client.post("/files/upload", content=body).status_code == 413
+    assert reached == []
+    # The longest matching prefix applies; other paths have no limit
+    assert client.post("/files/upload-batch", content=body).status_code == 200
+    assert client.post("/quizzes/", content=body).status_code == 200
+    assert client.post("/files/upload", content=body[:10]).status_code == 200
+    assert reached == ["/files/upload-batch", "/quizzes/", "/files/upload"]
@@ -0,0 +1,127 @@
+import uuid
+
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.core.grading import NO_KEY, compile_answer_key, grade_submission, grade_submissions
+
+QUESTIONS = [
+    {"id": "1", "type": "multiple-choice", "question": "2 + 2?", "options": ["3", "4"], "correctAnswer": 1},
+    {"id": "2", "type": "multiple-choice", "question": "Capital of France?", "options": ["Paris", "Rome"], "correctAnswer": 0},
+    {"id": "3", "type": "multiple-choice", "question": "Unkeyed?", "options": ["a", "b"]},
+    {
+        "id": "4", "type": "open-ended", "question": "What does photosynthesis produce?",
+        "options": [], "correctAnswer": 0,
+        "explanation": "Photosynthesis turns light, water and carbon dioxide into glucose and oxygen.",
+    },
+]
+
+
+def _answer(question_id: str, option: int = 0, text=None, **extra) -> dict:
+    return {"questionId": question_id, "selectedOption": option, "timeSpent": 1000, "openEndedAnswer": text, **extra}
+
+
+@pytest.fixture
+def key():
+    return compile_answer_key(uuid.uuid4(), 1, QUESTIONS + [{"id": "1", "correctAnswer": 0}])
+
+
+def test_compile_answer_key(key):
+    assert key.positions == {"1": 0, "2": 1, "3": 2, "4": 3}  # a repeated id keeps the first question
+    assert key.correct.tolist() == [1, 0, NO_KEY, 0]
+    assert key.open_ended.tolist() == [False, False, False, True]
+    assert key.references[3].startswith("Photosynthesis")
+    assert key.references[:3] == (None, None, None)
+
+
+def test_scores_come_from_the_key_not_the_client(key):
+    answers, score = grade_submission(key, [
+        _answer("1", 1, isCorrect=False),
+        _answer("2", 1, isCorrect=True),
+        _answer("3", 0, isCorrect=True),
+    ])
+
+    assert score == 1
+    assert [a["isCorrect"] for a in answers] == [True, False, False]
+
+
+def test_unknown_and_repeated_answers_are_dropped(key):
+    answers, score = grade_submission(key, [_answer("1", 1), _answer("1", 0), _answer("99", 0), _answer("2", 0)])
+
+    assert [a["questionId"] for a in answers] == ["1", "2"]
+    assert score == 2
+
+
+def test_open_ended_answers_are_graded_against_the_explanation(key):
+    (close, close_score), (unrelated, unrelated_score) = grade_submissions(key, [
+        [_answer("4", text="It makes glucose and oxygen from light, water and carbon dioxide.")],
+        [_answer("4", text="The French revolution began in 1789.")],
+    ])
+
+    assert close[0]["isCorrect"] and close_score == 1
+    assert not unrelated[0]["isCorrect"] and unrelated_score == 0
+    assert close[0]["similarity"] > unrelated[0]["similarity"]
+    assert 0 <= unrelated[0]["confidence"] <= 1
+
+
+def test_completion_grading_accepts_any_open_ended_answer(key, monkeypatch):
+    monkeypatch.setattr(settings, "OPEN_ENDED_GRADING", "completion")
+
+    answers, score = grade_submission(key, [_answer("4", text="No idea, sorry.")])
+
+    assert score == 1
+    assert "similarity" not in answers[0]
+
+
+def test_batch_matches_one_by_one(key):
+    rng = np.random.default_rng(7)
+    submissions = [
+        [_answer(str(q), int(rng.integers(0, 2))) for q in rng.permutation([1, 2, 3])]
+        for _ in range(50)
+    ]
+
+    assert grade_submissions(key, submissions) == [grade_submission(key, answers) for answers in submissions]
+
+
+def test_submission_is_graded_on_the_server(client, db, make_quiz, student, auth_headers):
+    quiz = make_quiz()  # correct answers 0, 1, 2, 0, 1 for questions 1-5
+    body = {
+        "quiz_id": str(quiz.id),
+        "student_id": str(student.id),
+        "student_name": "Student",
+        "student_number": student.student_number,
+        "score": 5,
+        "total_questions": 5,
+        "time_spent": 5000,
+        "answers": [_answer("1", 0, isCorrect=False), _answer("2", 0, isCorrect=True), _answer("3", 2, isCorrect=False)],
+    }
+
+    response = client.post("/api/v1/results/results/", json=body, headers=auth_headers(student))
+
+    assert response.status_code == 200, response.text
+    result = response.json()
+    assert result["score"] == 2
+    assert result["total_questions"] == 5
+    assert [a["isCorrect"] for a in result["answers"]] == [True, False, True]
+
+
+@pytest.mark.parametrize("option", [2**32 + 1, 2**32, 2, -1, -2, 1.0, "1", None])
+def test_options_outside_the_question_are_not_answered(key, option):
+    # 2**32 + 1 would wrap to the correct option 1 in the int32 matrix; -2 would match NO_KEY
+    answers, score = grade_submission(key, [_answer("1", option), _answer("3", option)])
+
+    assert score == 0
+    assert [a["isCorrect"] for a in answers] == [False, False]
+
+
+def test_api_rejects_options_beyond_int32(client, make_quiz, student, auth_headers):
+    quiz = make_quiz()
+    body = {
+        "quiz_id": str(quiz.id), "student_id": str(student.id), "student_name": "Student",
+        "student_number": student.student_number, "time_spent": 5000, "answers": [_answer("2", 2**32 + 1)],
+    }
+
+    response = client.post("/api/v1/results/results/", json=body, headers=auth_headers(student))
+
+    assert response.status_code == 422
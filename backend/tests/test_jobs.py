@@ -0,0 +1,140 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import update
+
+from app.core import jobs
+from app.core.cache import quiz_cache, quiz_cache_key, text_cache
+from app.core.config import settings
+from app.db import models
+
+TEXT = (
+    "Photosynthesis converts light energy into chemical energy stored in glucose. "
+    "Mitochondria release energy from nutrients through cellular respiration. "
+    "Enzymes lower the activation energy needed for chemical reactions. "
+    "Xylem vessels carry water and dissolved minerals up from the roots. "
+    "Neurons transmit electrical signals along their axons to other cells. "
+)
+
+
+@pytest.fixture
+def make_job(db, teacher, tmp_path):
+    def make(status=models.JobStatusEnum.queued, content_sha256=None, attempts=0) -> models.UploadJob:
+        job = models.UploadJob(
+            id=uuid.uuid4(),
+            status=status.value,
+            file_name="notes.pdf",
+            file_path=str(tmp_path / f"{uuid.uuid4().hex}.pdf"),
+            content_sha256=content_sha256,
+            question_type="multiple-choice",
+            num_questions=3,
+            created_by=teacher.id,
+            attempts=attempts,
+        )
+        db.add(job)
+        db.commit()
+        return job
+    return make
+
+
+@pytest.fixture
+def queued_ids(monkeypatch):
+    ids = []
+    monkeypatch.setattr(jobs, "enqueue_upload_job", lambda job_id: ids.append(str(job_id)))
+    return ids
+
+
+def _reload(db, job_id) -> models.UploadJob:
+    db.expire_all()
+    return db.get(models.UploadJob, job_id)
+
+
+def test_queued_job_becomes_quiz(db, make_job):
+    sha256 = uuid.uuid4().hex * 2
+    text_cache.set(sha256, TEXT)  # skips PDF extraction
+    job = make_job(content_sha256=sha256)
+
+    jobs.process_upload_job(str(job.id))
+
+    job = _reload(db, job.id)
+    assert job.status == models.JobStatusEnum.done.value
+    assert job.attempts == 1
+    quiz = db.get(models.Quiz, job.quiz_id)
+    assert len(quiz.questions) == 3
+    assert quiz_cache.get(quiz_cache_key(sha256, "multiple-choice", 3)) == quiz.questions
+
+
+def test_unreadable_upload_fails_job(db, make_job):
+    job = make_job()  # its file_path does not exist
+
+    jobs.process_upload_job(str(job.id))
+
+    job = _reload(db, job.id)
+    assert job.status == models.JobStatusEnum.failed.value
+    assert job.error
+    assert job.quiz_id is None
+
+
+def test_cached_quiz_completes_job_without_generation(db, make_job, monkeypatch):
+    sha256 = uuid.uuid4().hex * 2
+    questions = [{"id": "1", "question": "Cached?", "options": ["yes", "no"], "correctAnswer": 0,
+                  "explanation": "", "type": "multiple-choice"}]
+    quiz_cache.set(quiz_cache_key(sha256, "multiple-choice", 3), questions)
+    monkeypatch.setattr(jobs, "generate_quiz_from_text", pytest.fail)
+    job = make_job(content_sha256=sha256)
+
+    jobs.process_upload_job(str(job.id))
+
+    job = _reload(db, job.id)
+    assert job.status == models.JobStatusEnum.done.value
+    assert job.attempts == 0
+    assert db.get(models.Quiz, job.quiz_id).questions == questions
+
+
+def test_job_not_queued_is_skipped(db, make_job):
+    job = make_job(status=models.JobStatusEnum.generating)
+
+    jobs.process_upload_job(str(job.id))
+
+    assert _reload(db, job.id).status == models.JobStatusEnum.generating.value
+
+
+def _age(db, job, seconds: float) -> None:
+    db.execute(
+        update(models.UploadJob)
+        .where(models.UploadJob.id == job.id)
+        .values(updated_at=datetime.now(timezone.utc) - timedelta(seconds=seconds))
+    )
+    db.commit()
+
+
+def test_stalled_job_is_requeued(db, make_job, queued_ids):
+    job = make_job(status=models.JobStatusEnum.extracting, attempts=1)
+    _age(db, job, settings.JOB_STALE_SECONDS + 60)
+
+    assert jobs.recover_stalled_jobs() == 1
+
+    assert _reload(db, job.id).status == models.JobStatusEnum.queued.value
+    assert queued_ids == [str(job.id)]
+
+
+def test_stalled_job_fails_after_max_attempts(db, make_job, queued_ids):
+    job = make_job(status=models.JobStatusEnum.generating, attempts=settings.JOB_MAX_ATTEMPTS)
+    _age(db, job, settings.JOB_STALE_SECONDS + 60)
+
+    assert jobs.recover_stalled_jobs() == 1
+
+    job = _reload(db, job.id)
+    assert job.status == models.JobStatusEnum.failed.value
+    assert "interrupted" in job.error
+    assert queued_ids == []
+
+
+def test_recent_and_finished_jobs_are_not_recovered(db, make_job, queued_ids):
+    make_job(status=models.JobStatusEnum.extracting)
+    done = make_job(status=models.JobStatusEnum.done)
+    _age(db, done, settings.JOB_STALE_SECONDS + 60)
+
+    assert jobs.recover_stalled_jobs() == 0
+    assert queued_ids == []
@@ -0,0 +1,120 @@
+import asyncio
+
+import pytest
+
+from app.core import llm
+from app.core.config import settings
+from app.core.llm import QuestionDeduper, merge_questions
+from app.core.llm_gateway import LLMError
+
+
+def _question(text: str) -> dict:
+    return {"id": "x", "question": text, "options": ["a", "b"], "correctAnswer": 0, "explanation": "", "type": "?"}
+
+
+def test_merge_picks_round_robin_across_chunks():
+    per_chunk = [
+        [_question("What do plants absorb?"), _question("Where is chlorophyll found?")],
+        [_question("Which gas do animals exhale?"), _question("How do lungs exchange gases?")],
+        [_question("What erodes river banks?")],
+    ]
+
+    merged = merge_questions(per_chunk, 4, "multiple-choice")
+
+    assert [q["question"] for q in merged] == [
+        "What do plants absorb?",
+        "Which gas do animals exhale?",
+        "What erodes river banks?",
+        "Where is chlorophyll found?",
+    ]
+    assert [q["id"] for q in merged] == ["1", "2", "3", "4"]
+    assert {q["type"] for q in merged} == {"multiple-choice"}
+
+
+def test_merge_drops_near_duplicates_across_chunks():
+    per_chunk = [
+        [_question("What is the primary purpose of photosynthesis?")],
+        [_question("What is the primary purpose of photosynthesis"), _question("Why do leaves change colour?")],
+    ]
+
+    merged = merge_questions(per_chunk, 5, "multiple-choice")
+
+    assert [q["question"] for q in merged] == [
+        "What is the primary purpose of photosynthesis?",
+        "Why do leaves change colour?",
+    ]
+
+
+def test_merge_skips_malformed_questions():
+    per_chunk = [["not a question", {"question": ""}, _question("Is this one kept?")]]
+
+    assert [q["question"] for q in merge_questions(per_chunk, 5, "open-ended")] == ["Is this one kept?"]
+
+
+def test_deduper_threshold(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_DEDUP_THRESHOLD", 0.5)
+    deduper = QuestionDeduper()
+
+    assert deduper.add(_question("how do plants make food"))
+    assert not deduper.add(_question("how do plants make sugar"))  # 4 of 6 words shared
+    assert deduper.add(_question("why is the sky blue"))
+
+
+def test_generation_covers_every_chunk(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_CHUNK_CHARS", 200)
+    sections = [
+        "Photosynthesis converts light energy into chemical energy stored in glucose.",
+        "Glaciers carve deep U-shaped valleys as they slowly move downhill.",
+        "Volcanoes erupt molten magma that cools into igneous rock.",
+        "Comets follow long elliptical orbits around the sun.",
+    ]
+    text = "\n\n".join(section + " " + section.replace(".", " again.") for section in sections)
+
+    questions = asyncio.run(llm.agenerate_quiz_from_text(text, "multiple-choice", 4))
+
+    assert len(questions) == 4
+    assert [q["id"] for q in questions] == ["1", "2", "3", "4"]
+    for section in sections:
+        assert any(section.rstrip(".") in q["question"] for q in questions)
+
+
+class _FailingGateway:
+    def __init__(self, error: Exception):
+        self.error = error
+
+    async def stream(self, messages, timeout=None):
+        raise self.error
+        yield
+
+
+def _stream_questions(text: str, num_questions: int) -> list:
+    async def collect():
+        return [q async for q in llm.astream_quiz_from_text(text, "multiple-choice", num_questions)]
+    return asyncio.run(asyncio.wait_for(collect(), 10))
+
+
+def test_stream_yields_unique_numbered_questions():
+    text = (
+        "Photosynthesis converts light energy into chemical energy stored in glucose. "
+        "Glaciers carve deep U-shaped valleys as they slowly move downhill. "
+        "Volcanoes erupt molten magma that cools into igneous rock. "
+    )
+
+    questions = _stream_questions(text, 2)
+
+    assert [q["id"] for q in questions] == ["1", "2"]
+
+
+def test_stream_raises_when_every_chunk_fails(monkeypatch):
+    monkeypatch.setattr(llm, "gateway", _FailingGateway(LLMError("rate limited")))
+
+    with pytest.raises(LLMError, match="rate limited"):
+        _stream_questions("Glaciers carve deep U-shaped valleys as they slowly move downhill.", 3)
+
+
+def test_stream_forwards_unexpected_errors(monkeypatch):
+    monkeypatch.setattr(llm, "gateway", _FailingGateway(KeyError("choices")))
+
+    # Raised to the consumer rather than lost in the chunk's task (which would hang it)
+    with pytest.raises(KeyError):
+        _stream_questions("Glaciers carve deep U-shaped valleys as they slowly move downhill.", 3)
@@ -0,0 +1,155 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.core.llm import build_prompt
+from app.core.llm_gateway import (
+    FakeProvider, LLMError, LLMGateway, LLMProvider, LLMResponse, RetryableLLMError, TokenBucket, fake_questions
+)
+
+MESSAGES = [{"role": "user", "content": build_prompt("Glaciers carve deep valleys as they move downhill.", "multiple-choice", 1)}]
+
+
+class FlakyProvider(LLMProvider):
+    """Fails with a retryable error `failures` times, then answers like FakeProvider."""
+
+    def __init__(self, failures: int, retry_after=None):
+        self.failures = failures
+        self.retry_after = retry_after
+        self.calls = 0
+        self.fake = FakeProvider()
+
+    async def complete(self, messages):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise RetryableLLMError("429 Too Many Requests", retry_after=self.retry_after)
+        return await self.fake.complete(messages)
+
+    async def stream(self, messages):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise RetryableLLMError("503 Service Unavailable")
+        async for delta in self.fake.stream(messages):
+            yield delta
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_MAX_RETRIES", 2)
+    monkeypatch.setattr(settings, "LLM_RETRY_BASE_DELAY", 0.01)
+    monkeypatch.setattr(settings, "LLM_RETRY_MAX_DELAY", 0.05)
+
+
+@pytest.fixture
+def make_gateway():
+    gateways = []
+
+    def make(provider: LLMProvider) -> LLMGateway:
+        gateway = LLMGateway(provider_factory=lambda: provider)
+        gateways.append(gateway)
+        return gateway
+    yield make
+    for gateway in gateways:
+        gateway.close()
+
+
+def test_fake_provider_completion(make_gateway):
+    gateway = make_gateway(FakeProvider())
+
+    content = gateway.complete_sync(MESSAGES)
+
+    assert json.loads(content) == fake_questions(MESSAGES[-1]["content"])
+    assert gateway.retries == 0
+
+
+def test_retryable_errors_are_retried(make_gateway):
+    provider = FlakyProvider(failures=2, retry_after=0.01)
+    gateway = make_gateway(provider)
+
+    content = gateway.complete_sync(MESSAGES)
+
+    assert json.loads(content)
+    assert provider.calls == 3
+    assert gateway.retries == 2
+    assert gateway.failures == 0
+
+
+def test_gives_up_after_max_retries(make_gateway):
+    provider = FlakyProvider(failures=10)
+    gateway = make_gateway(provider)
+
+    with pytest.raises(LLMError, match="after 3 attempts"):
+        gateway.complete_sync(MESSAGES)
+    assert provider.calls == settings.LLM_MAX_RETRIES + 1
+    assert gateway.failures == 1
+
+
+def test_non_retryable_errors_fail_at_once(make_gateway):
+    class Rejecting(LLMProvider):
+        calls = 0
+
+        async def complete(self, messages):
+            self.calls += 1
+            raise LLMError("400 Bad Request")
+
+    provider = Rejecting()
+    gateway = make_gateway(provider)
+
+    with pytest.raises(LLMError, match="400"):
+        gateway.complete_sync(MESSAGES)
+    assert provider.calls == 1
+
+
+def test_stream_retries_before_first_delta(make_gateway):
+    gateway = make_gateway(FlakyProvider(failures=1))
+
+    async def collect():
+        return "".join([delta async for delta in gateway.stream(MESSAGES)])
+
+    assert json.loads(asyncio.run(collect())) == fake_questions(MESSAGES[-1]["content"])
+    assert gateway.retries == 1
+
+
+def test_timeout_is_retryable(make_gateway):
+    class Slow(LLMProvider):
+        calls = 0
+
+        async def complete(self, messages):
+            self.calls += 1
+            if self.calls == 1:
+                await asyncio.sleep(1)
+            return LLMResponse(content="[]")
+
+    gateway = make_gateway(Slow())
+
+    assert gateway.complete_sync(MESSAGES, timeout=0.05) == "[]"
+    assert gateway.retries == 1
+
+
+def test_token_bucket_queues_callers_beyond_the_rate():
+    async def acquire_all() -> float:
+        bucket = TokenBucket(rate_per_minute=600, capacity=2)  # 10 per second
+        start = time.monotonic()
+        for _ in range(5):
+            await bucket.acquire(1)
+        return time.monotonic() - start
+
+    # Two from the full bucket, then one every 0.1s
+    assert 0.25 <= asyncio.run(acquire_all()) < 1.0
+
+
+def test_gateway_applies_the_request_rate(make_gateway, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_REQUESTS_PER_MINUTE", 600)
+    monkeypatch.setattr(settings, "LLM_TOKENS_PER_MINUTE", 10 ** 9)
+    gateway = make_gateway(FakeProvider())
+
+    async def burst():
+        return await asyncio.gather(*(gateway.complete(MESSAGES) for _ in range(605)))
+
+    start = time.monotonic()
+    assert len(asyncio.run(burst())) == 605
+    # 600 from the full bucket, the rest at 10 per second
+    assert time.monotonic() - start >= 0.4
@@ -0,0 +1,79 @@
+import base64
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import select
+
+from app.core.pagination import (
+    decode_cursor, decode_offset_cursor, encode_cursor, encode_offset_cursor, keyset_paginate, page_from_rows
+)
+from app.db import models
+
+
+def _raw_cursor(value) -> str:
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip("=")
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2025, 3, 1, 12, 30, 15, 123456, tzinfo=timezone.utc)
+    row_id = uuid.uuid4()
+
+    assert decode_cursor(encode_cursor(created_at, row_id)) == (created_at, row_id)
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64!",
+    _raw_cursor({"offset": 3}),
+    _raw_cursor(["2025-03-01T12:30:15"]),
+    _raw_cursor(["2025-03-01T12:30:15", "not-a-uuid"]),
+    _raw_cursor(["yesterday", str(uuid.uuid4())]),
+    _raw_cursor(["2025-03-01T12:30:15", 1]),
+    _raw_cursor([20250301, str(uuid.uuid4())]),
+    _raw_cursor(["2025-03-01T12:30:15", None]),
+])
+def test_malformed_cursors_raise_value_error(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_offset_cursor():
+    assert decode_offset_cursor(encode_offset_cursor(40)) == 40
+    for cursor in (_raw_cursor({"offset": -1}), _raw_cursor({"offset": "3"}), _raw_cursor([3])):
+        with pytest.raises(ValueError):
+            decode_offset_cursor(cursor)
+
+
+def test_keyset_pages_cover_every_row_once(db, teacher):
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    # Two quizzes share each timestamp, so pages must break ties on the id
+    for i in range(7):
+        db.add(models.Quiz(
+            id=uuid.uuid4(), title=f"Quiz {i}", file_name="q.pdf", question_type="multiple-choice",
+            questions=[], created_by=teacher.id, created_at=start + timedelta(minutes=i // 2),
+        ))
+    db.commit()
+    expected = db.execute(
+        select(models.Quiz.id).order_by(models.Quiz.created_at.desc(), models.Quiz.id.desc())
+    ).scalars().all()
+
+    seen, cursor = [], None
+    while True:
+        stmt = keyset_paginate(
+            select(models.Quiz.id, models.Quiz.created_at), models.Quiz.created_at, models.Quiz.id, cursor, 3
+        )
+        items, cursor = page_from_rows(db.execute(stmt).all(), 3)
+        seen.extend(row.id for row in items)
+        if cursor is None:
+            break
+
+    assert seen == expected
+
+
+def test_api_rejects_malformed_cursors_with_400(client, teacher, auth_headers):
+    for cursor in (_raw_cursor(["2025-03-01T12:30:15", 1]), _raw_cursor([1, 2]), "%%%"):
+        response = client.get("/api/v1/quizzes/quizzes/", params={"cursor": cursor})
+        assert response.status_code == 400, cursor
+        response = client.get("/api/v1/quizzes/quizzes/my-quizzes", params={"cursor": cursor}, headers=auth_headers(teacher))
+        assert response.status_code == 400, cursor
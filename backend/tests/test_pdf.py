@@ -0,0 +1,40 @@
+import pytest
+
+from app.core import pdf
+from app.core.config import settings
+
+
+@pytest.fixture
+def pdf_path(tmp_path, make_pdf):
+    path = tmp_path / "notes.pdf"
+    path.write_bytes(make_pdf("Rivers carry sediment to the sea.", pages=3))
+    return str(path)
+
+
+def test_in_process_extraction_reports_no_peak_memory(pdf_path):
+    stats = pdf.ExtractionStats()
+
+    text = pdf.extract_text_from_pdf(pdf_path, parallel=False, stats=stats)
+
+    assert "Page 3. Rivers carry sediment" in text
+    assert (stats.total_pages, stats.pages, stats.isolated) == (3, 3, False)
+    assert stats.peak_memory_bytes is None  # the worker's own peak isn't this document's
+
+
+@pytest.mark.skipif(pdf.resource is None, reason="peak memory needs the resource module")
+def test_isolated_extraction_reports_peak_memory(pdf_path, monkeypatch):
+    monkeypatch.setattr(settings, "PDF_LARGE_DOCUMENT_BYTES", 1)
+    monkeypatch.setattr(settings, "PDF_LARGE_WINDOW_PAGES", 2)
+    stats = pdf.ExtractionStats()
+
+    pages = list(pdf.iter_pages(pdf_path, stats=stats))
+
+    assert [page.split(".")[0] for page in pages] == ["Page 1", "Page 2", "Page 3"]
+    assert (stats.total_pages, stats.pages, stats.isolated) == (3, 3, True)
+    assert stats.peak_memory_bytes > 0
+
+
+def test_api_schema_documents_isolated_only_peak_memory(client):
+    job = client.get("/openapi.json").json()["components"]["schemas"]["UploadJobOut"]
+
+    assert "null for documents extracted in-process" in job["properties"]["extract_peak_memory_bytes"]["description"]
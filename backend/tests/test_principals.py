@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+
+from app.core.principals import Principal, load_principal, principal_cache
+from app.db import models
+from app.db.session import SessionLocal, ThreadedSession
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    principal_cache.clear()
+
+
+def _load(user_id):
+    """Load through the cache with a session of its own, like a concurrent request."""
+    async def load():
+        db = ThreadedSession(SessionLocal())
+        try:
+            return await load_principal(db, user_id)
+        finally:
+            await db.close()
+    return asyncio.run(load())
+
+
+def test_principal_is_cached(student):
+    assert _load(student.id).role == models.RoleEnum.student
+    assert principal_cache.get(student.id) == Principal.from_user(student)
+    assert _load(student.id) is principal_cache.get(student.id)
+
+
+def test_role_change_invalidates(db, student):
+    _load(student.id)
+
+    student.role = models.RoleEnum.teacher
+    db.commit()
+
+    assert principal_cache.get(student.id) is None
+    assert _load(student.id).role == models.RoleEnum.teacher
+
+
+def test_deletion_invalidates(db, student):
+    _load(student.id)
+
+    db.delete(student)
+    db.commit()
+
+    assert principal_cache.get(student.id) is None
+    assert _load(student.id) is None
+
+
+def test_lookup_racing_an_update_is_not_cached(student):
+    generation = principal_cache.generation
+    stale = Principal.from_user(student)
+
+    principal_cache.invalidate(student.id)  # an update lands while the lookup runs
+    principal_cache.set(stale, generation)
+
+    assert principal_cache.get(student.id) is None
+
+
+def test_rolled_back_savepoint_keeps_the_pending_invalidation(db, student):
+    student.role = models.RoleEnum.teacher
+    db.flush()  # invalidates at once, and again after the commit
+
+    savepoint = db.begin_nested()
+    student.name = "Renamed"
+    db.flush()
+    savepoint.rollback()
+    # Another request still reads the committed row and caches the old role
+    assert _load(student.id).role == models.RoleEnum.student
+    db.commit()
+
+    assert principal_cache.get(student.id) is None
+    assert _load(student.id).role == models.RoleEnum.teacher
+
+
+def test_released_savepoint_waits_for_the_commit(db, student):
+    student.name = "Renamed"
+    db.flush()  # opens the outer transaction; pysqlite would commit a bare SAVEPOINT on release
+    with db.begin_nested():
+        student.role = models.RoleEnum.teacher
+    assert _load(student.id).role == models.RoleEnum.student
+
+    db.commit()
+
+    assert _load(student.id).role == models.RoleEnum.teacher
+
+
+def test_rolled_back_transaction_drops_the_pending_invalidation(db, student):
+    student.role = models.RoleEnum.teacher
+    db.flush()
+    db.rollback()
+
+    assert db.info.get("principal_invalidations") is None
+    assert _load(student.id).role == models.RoleEnum.student
@@ -0,0 +1,114 @@
+import pytest
+from sqlalchemy import update
+
+from app.core.response_cache import listing_responses, quiz_responses
+from app.db import models
+
+
+@pytest.fixture(autouse=True)
+def empty_caches():
+    # The test tables are emptied with Core deletes, which invalidate nothing
+    quiz_responses.clear()
+    listing_responses.clear()
+
+
+def _url(quiz) -> str:
+    return f"/api/v1/quizzes/quizzes/{quiz.id}"
+
+
+def test_matching_etag_gets_304(client, make_quiz):
+    quiz = make_quiz()
+    first = client.get(_url(quiz))
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    hits = quiz_responses.hits
+
+    for if_none_match in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+        response = client.get(_url(quiz), headers={"If-None-Match": if_none_match})
+        assert response.status_code == 304, if_none_match
+        assert response.content == b""
+        assert response.headers["etag"] == etag
+    assert client.get(_url(quiz), headers={"If-None-Match": '"other"'}).json() == first.json()
+    assert quiz_responses.hits == hits + 5
+
+
+def test_owner_and_public_views_never_cross(client, make_quiz, teacher, student, auth_headers):
+    quiz = make_quiz()
+    public = client.get(_url(quiz))  # loads the entry with both views
+    owner = client.get(_url(quiz), headers=auth_headers(teacher))
+    other = client.get(_url(quiz), headers=auth_headers(student))
+
+    assert [q["correctAnswer"] for q in owner.json()["questions"]] == [0, 1, 2, 0, 1]
+    assert all("correctAnswer" not in q for q in public.json()["questions"])
+    assert other.content == public.content
+    assert owner.headers["etag"] != public.headers["etag"]
+    assert owner.headers["vary"] == "Authorization"
+
+    # A validator for one view doesn't revalidate the other
+    response = client.get(_url(quiz), headers={"If-None-Match": owner.headers["etag"], **auth_headers(student)})
+    assert response.status_code == 200
+    assert "correctAnswer" not in response.json()["questions"][0]
+    response = client.get(_url(quiz), headers={"If-None-Match": public.headers["etag"], **auth_headers(teacher)})
+    assert response.status_code == 200
+    assert response.json()["questions"][0]["correctAnswer"] == 0
+
+
+def test_update_drops_the_entry(client, make_quiz, teacher, auth_headers):
+    quiz = make_quiz()
+    headers = auth_headers(teacher)
+    before = client.get(_url(quiz), headers=headers)
+
+    response = client.put(f"{_url(quiz)}/answer-key", json=[{"question_id": "1", "correctAnswer": 2}], headers=headers)
+    assert response.status_code == 200, response.text
+
+    after = client.get(_url(quiz), headers={"If-None-Match": before.headers["etag"], **headers})
+    assert after.status_code == 200
+    assert after.json()["questions"][0]["correctAnswer"] == 2
+    assert after.json()["version"] == before.json()["version"] + 1
+
+
+def test_delete_drops_the_entry(client, make_quiz, teacher, auth_headers):
+    quiz = make_quiz()
+    assert client.get(_url(quiz)).status_code == 200
+    assert len(client.get("/api/v1/quizzes/quizzes/").json()["items"]) == 1
+
+    assert client.delete(_url(quiz), headers=auth_headers(teacher)).status_code == 204
+
+    assert client.get(_url(quiz)).status_code == 404
+    assert client.get("/api/v1/quizzes/quizzes/").json()["items"] == []
+
+
+def test_bulk_update_drops_every_entry(client, db, make_quiz):
+    quizzes = [make_quiz(), make_quiz()]
+    for quiz in quizzes:
+        assert client.get(_url(quiz)).json()["title"] == "Test quiz"
+    assert [item["title"] for item in client.get("/api/v1/quizzes/quizzes/").json()["items"]] == ["Test quiz"] * 2
+
+    # A bulk statement fires no mapper events and could touch any quiz
+    db.execute(update(models.Quiz).where(models.Quiz.id == quizzes[0].id).values(title="Renamed"))
+    db.commit()
+
+    assert client.get(_url(quizzes[0])).json()["title"] == "Renamed"
+    assert client.get(_url(quizzes[1])).json()["title"] == "Test quiz"
+    assert sorted(item["title"] for item in client.get("/api/v1/quizzes/quizzes/").json()["items"]) == ["Renamed", "Test quiz"]
+
+
+def test_new_quiz_drops_the_listing(client, make_quiz):
+    make_quiz()
+    assert len(client.get("/api/v1/quizzes/quizzes/").json()["items"]) == 1
+
+    make_quiz()
+
+    assert len(client.get("/api/v1/quizzes/quizzes/").json()["items"]) == 2
+
+
+def test_entry_cached_before_the_commit_is_dropped_again(client, db, make_quiz):
+    quiz = make_quiz()
+    quiz.title = "Renamed"
+    db.flush()  # drops the entry at once, and again after the commit
+
+    # Another request still reads the committed row and caches the old title
+    assert client.get(_url(quiz)).json()["title"] == "Test quiz"
+    db.commit()
+
+    assert client.get(_url(quiz)).json()["title"] == "Renamed"
@@ -0,0 +1,189 @@
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import func, select, update
+
+from app.core import sessions
+from app.core.config import settings
+from app.db import models
+from app.db.session import SessionLocal
+
+FINISHED = models.SessionStatusEnum.finished.value
+EXPIRED = models.SessionStatusEnum.expired.value
+SUPERSEDED = models.SessionStatusEnum.superseded.value
+
+
+@pytest.fixture(autouse=True)
+def fresh_buffer(monkeypatch):
+    monkeypatch.setattr(sessions, "answer_buffer", sessions.LocalAnswerBuffer())
+    sessions._states.clear()
+
+
+def _start(db, quiz, student, seconds: float = 600) -> models.QuizSession:
+    now = datetime.now(timezone.utc)
+    session = models.QuizSession(
+        id=uuid.uuid4(), quiz_id=quiz.id, student_id=student.id, started_at=now, deadline=now + timedelta(seconds=seconds)
+    )
+    db.add(session)
+    db.commit()
+    return session
+
+
+def _buffer(session, question_id: str, option: int) -> None:
+    sessions.answer_buffer.add(str(session.id), question_id, {
+        "questionId": question_id, "selectedOption": option, "timeSpent": 500, "answeredAt": time.time()
+    })
+
+
+def _add_result(quiz, student) -> uuid.UUID:
+    db = SessionLocal()
+    try:
+        result = models.QuizResult(
+            id=uuid.uuid4(), quiz_id=quiz.id, student_id=student.id, student_name="Imported",
+            student_number=student.student_number, answers=[], score=0, total_questions=5, time_spent=0,
+        )
+        db.add(result)
+        db.commit()
+        return result.id
+    finally:
+        db.close()
+
+
+def _reload(db, session) -> models.QuizSession:
+    db.expire_all()
+    return db.get(models.QuizSession, session.id)
+
+
+def _results(db, quiz) -> int:
+    return db.scalar(select(func.count()).select_from(models.QuizResult).where(models.QuizResult.quiz_id == quiz.id))
+
+
+def test_live_session_over_the_api(client, db, make_quiz, student, auth_headers):
+    quiz = make_quiz()  # correct answers 0, 1, 2, 0, 1
+    headers = auth_headers(student)
+    started = client.post("/api/v1/sessions/sessions/", json={"quiz_id": str(quiz.id)}, headers=headers)
+    assert started.status_code == 200, started.text
+    session_id = started.json()["id"]
+
+    def answer(question_id: str, option: int) -> int:
+        body = {"questionId": question_id, "selectedOption": option, "timeSpent": 500}
+        return client.post(f"/api/v1/sessions/sessions/{session_id}/answers", json=body, headers=headers).status_code
+
+    assert answer("1", 0) == 204
+    assert answer("2", 0) == 204
+    assert sessions.flush_answers(settings.QUIZ_SESSION_FLUSH_BATCH) == 2
+    assert answer("2", 1) == 204  # still buffered at the finish, and wins over the saved answer
+    assert answer("9", 0) == 404
+
+    # Submitting outside the session while it is open is refused
+    submission = {
+        "quiz_id": str(quiz.id), "student_id": str(student.id), "student_name": "S",
+        "student_number": student.student_number, "time_spent": 1, "answers": [],
+    }
+    assert client.post("/api/v1/results/results/", json=submission, headers=headers).status_code == 409
+
+    finished = client.post(f"/api/v1/sessions/sessions/{session_id}/finish", headers=headers)
+    assert finished.status_code == 200, finished.text
+    assert finished.json()["score"] == 2
+    assert client.post(f"/api/v1/sessions/sessions/{session_id}/finish", headers=headers).json()["id"] == finished.json()["id"]
+    assert answer("3", 2) == 409
+    assert client.get(f"/api/v1/sessions/sessions/{session_id}", headers=headers).json()["status"] == FINISHED
+
+
+def test_finish_supersedes_when_a_result_exists(db, make_quiz, student):
+    quiz = make_quiz()
+    session = _start(db, quiz, student)
+    _buffer(session, "1", 0)
+    existing = _add_result(quiz, student)  # e.g. imported in bulk while the session was open
+
+    assert sessions.finish_session(session.id) == existing
+
+    session = _reload(db, session)
+    assert session.status == SUPERSEDED
+    assert session.result_id == existing
+    assert _results(db, quiz) == 1
+    assert len(sessions.answer_buffer) == 0
+
+
+def test_result_committed_during_the_finish_supersedes(db, make_quiz, student, monkeypatch):
+    quiz = make_quiz()
+    session = _start(db, quiz, student)
+    _buffer(session, "1", 0)
+    existing = []
+    check = sessions._existing_result
+
+    def racing_check(db, session):
+        # The first check misses a result committed right after it, so the insert violates UNIQUE(quiz_id, student_id)
+        if not existing:
+            existing.append(_add_result(quiz, student))
+            return None
+        return check(db, session)
+
+    monkeypatch.setattr(sessions, "_existing_result", racing_check)
+
+    assert sessions.finish_session(session.id) == existing[0]
+
+    session = _reload(db, session)
+    assert session.status == SUPERSEDED
+    assert session.result_id == existing[0]
+    assert _results(db, quiz) == 1
+
+
+def test_overdue_sessions_expire_once(db, make_quiz, student):
+    quiz = make_quiz()
+    overdue = _start(db, quiz, student, seconds=-60)
+    _buffer(overdue, "1", 0)
+    other_student = models.User(
+        id=uuid.uuid4(), name="Other", email=f"{uuid.uuid4().hex}@example.com", hashed_password="-",
+        role="student", student_number=uuid.uuid4().hex[:8],
+    )
+    db.add(other_student)
+    db.commit()
+    imported = _start(db, quiz, other_student, seconds=-60)
+    existing = _add_result(quiz, other_student)
+    running = _start(db, make_quiz(), student)
+
+    assert sessions.expire_sessions(100) == 2
+    assert sessions.expire_sessions(100) == 0  # neither is retried
+
+    overdue = _reload(db, overdue)
+    assert overdue.status == EXPIRED
+    assert db.get(models.QuizResult, overdue.result_id).score == 1
+    imported = _reload(db, imported)
+    assert (imported.status, imported.result_id) == (SUPERSEDED, existing)
+    assert _reload(db, running).status == models.SessionStatusEnum.active.value
+
+
+def test_answers_for_closed_sessions_are_dropped(db, make_quiz, student):
+    session = _start(db, make_quiz(), student)
+    db.execute(update(models.QuizSession).where(models.QuizSession.id == session.id).values(status=FINISHED))
+    db.commit()
+    _buffer(session, "1", 0)
+
+    assert sessions.flush_answers(10) == 0
+    assert len(sessions.answer_buffer) == 0
+
+
+def test_flush_is_bounded(monkeypatch):
+    class BusyBuffer(sessions.LocalAnswerBuffer):
+        """Always reports pending sessions, like a buffer under steady answer traffic."""
+
+        def __len__(self):
+            return 5
+
+    calls = []
+    monkeypatch.setattr(sessions, "answer_buffer", BusyBuffer())
+    monkeypatch.setattr(sessions, "flush_answers", lambda batch_size: calls.append(batch_size) or batch_size)
+
+    assert sessions.SessionFlusher(interval=1, batch_size=2).flush() == 6
+    assert calls == [2, 2, 2]
+
+
+def test_inprocess_buffer_requires_a_single_process(monkeypatch):
+    monkeypatch.setattr(settings, "QUIZ_SESSION_BUFFER", "inprocess")
+    monkeypatch.setattr(settings, "WEB_CONCURRENCY", 2)
+
+    with pytest.raises(ValueError, match="redis"):
+        sessions.create_answer_buffer()
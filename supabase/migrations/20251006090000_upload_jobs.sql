@@ -0,0 +1,36 @@
+/*
+  # Background upload jobs
+
+  1. New Tables
+    - `upload_jobs`
+      - `id` (uuid, primary key)
+      - `status` (text, queued/extracting/generating/done/failed)
+      - `file_name` (text, original PDF filename)
+      - `file_path` (text, where the upload is stored until processed)
+      - `question_type` (text)
+      - `created_by` (uuid, foreign key to users.id)
+      - `quiz_id` (uuid, foreign key to quizzes.id, set when the job is done)
+      - `error` (text, set when the job failed)
+      - `created_at`, `updated_at` (timestamptz)
+*/
+
+CREATE TABLE IF NOT EXISTS upload_jobs (
+  id uuid PRIMARY KEY DEFAULT uuid_generate_v4(),
+  status text NOT NULL DEFAULT 'queued' CHECK (status IN ('queued', 'extracting', 'generating', 'done', 'failed')),
+  file_name text NOT NULL,
+  file_path text NOT NULL,
+  question_type text NOT NULL CHECK (question_type IN ('multiple-choice', 'open-ended')),
+  created_by uuid NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+  quiz_id uuid REFERENCES quizzes(id) ON DELETE SET NULL,
+  error text,
+  created_at timestamptz DEFAULT now(),
+  updated_at timestamptz DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_upload_jobs_created_by ON upload_jobs(created_by);
+CREATE INDEX IF NOT EXISTS idx_upload_jobs_status ON upload_jobs(status);
+
+ALTER TABLE upload_jobs ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Teachers can view own upload jobs" ON upload_jobs
+  FOR SELECT USING (auth.uid()::text = created_by::text);
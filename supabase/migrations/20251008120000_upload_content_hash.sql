@@ -0,0 +1,11 @@
+/*
+  # Content hash for uploads
+
+  1. Changes
+    - `upload_jobs.content_sha256` (text) - SHA-256 of the uploaded bytes, used
+      as the key of the extracted-text and generated-quiz caches
+*/
+
+ALTER TABLE upload_jobs ADD COLUMN IF NOT EXISTS content_sha256 text;
+
+CREATE INDEX IF NOT EXISTS idx_upload_jobs_content_sha256 ON upload_jobs(content_sha256);
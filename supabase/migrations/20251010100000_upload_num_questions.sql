@@ -0,0 +1,9 @@
+/*
+  # Requested question count for uploads
+
+  1. Changes
+    - `upload_jobs.num_questions` (integer, nullable) - number of questions to
+      generate; NULL uses the server default (QUIZ_NUM_QUESTIONS)
+*/
+
+ALTER TABLE upload_jobs ADD COLUMN IF NOT EXISTS num_questions integer CHECK (num_questions > 0);
@@ -0,0 +1,22 @@
+/*
+  # Quiz listing: question counts and keyset indexes
+
+  1. Changes
+    - `quizzes.question_count` (integer, not null) - number of entries in
+      `questions`, so listings can omit the JSON blob; backfilled below
+
+  2. Indexes
+    - published quizzes by (created_at, id), newest first, for keyset pagination
+    - (created_by, created_at, id) for a teacher's own quizzes
+*/
+
+ALTER TABLE quizzes ADD COLUMN IF NOT EXISTS question_count integer NOT NULL DEFAULT 0;
+
+UPDATE quizzes
+SET question_count = jsonb_array_length(questions)
+WHERE question_count = 0 AND jsonb_typeof(questions) = 'array';
+
+CREATE INDEX IF NOT EXISTS idx_quizzes_published_created_at
+  ON quizzes(created_at DESC, id DESC) WHERE is_published;
+CREATE INDEX IF NOT EXISTS idx_quizzes_created_by_created_at
+  ON quizzes(created_by, created_at DESC, id DESC);
@@ -0,0 +1,10 @@
+/*
+  # Quiz results: keyset pagination index
+
+  1. Indexes
+    - (quiz_id, completed_at, id), newest first, for paginated per-quiz
+      results and the teacher-scoped listing/export
+*/
+
+CREATE INDEX IF NOT EXISTS idx_quiz_results_quiz_completed_at
+  ON quiz_results(quiz_id, completed_at DESC, id DESC);
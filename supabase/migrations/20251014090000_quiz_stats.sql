@@ -0,0 +1,41 @@
+/*
+  # Per-quiz result aggregates
+
+  1. New Tables
+    - `quiz_stats` (one row per quiz with results)
+      - `quiz_id` (uuid, primary key, foreign key to quizzes.id)
+      - `submissions` (integer) - number of results
+      - `score_sum` (bigint), `percent_sum` (double precision) - for averages
+      - `time_spent_sum` (bigint) - milliseconds
+      - `score_histogram` (jsonb) - counts per 10% score bucket
+      - `question_counts` (jsonb) - {question_id: [answered, correct]}
+      - `time_spent_sketch` (jsonb) - mergeable quantile sketch of time spent
+      - `updated_at` (timestamptz)
+
+  2. Notes
+    - Maintained by the API on each submission; run
+      `python backfill_quiz_stats.py` once to populate it from existing results
+*/
+
+CREATE TABLE IF NOT EXISTS quiz_stats (
+  quiz_id uuid PRIMARY KEY REFERENCES quizzes(id) ON DELETE CASCADE,
+  submissions integer NOT NULL DEFAULT 0,
+  score_sum bigint NOT NULL DEFAULT 0,
+  percent_sum double precision NOT NULL DEFAULT 0,
+  time_spent_sum bigint NOT NULL DEFAULT 0,
+  score_histogram jsonb NOT NULL,
+  question_counts jsonb NOT NULL,
+  time_spent_sketch jsonb NOT NULL,
+  updated_at timestamptz DEFAULT now()
+);
+
+ALTER TABLE quiz_stats ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Teachers can view stats for their quizzes" ON quiz_stats
+  FOR SELECT USING (
+    EXISTS (
+      SELECT 1 FROM quizzes
+      WHERE quizzes.id = quiz_stats.quiz_id
+      AND quizzes.created_by::text = auth.uid()::text
+    )
+  );
@@ -0,0 +1,10 @@
+/*
+  # Quiz versions for server-side grading
+
+  1. Changes
+    - `quizzes.version` (integer, not null, default 1) - incremented by the
+      application whenever `questions` changes; compiled answer keys are
+      cached per (quiz, version)
+*/
+
+ALTER TABLE quizzes ADD COLUMN IF NOT EXISTS version integer NOT NULL DEFAULT 1;
@@ -0,0 +1,117 @@
+/*
+  # Normalized questions and answers
+
+  1. New Tables
+    - `questions` - one row per element of `quizzes.questions`
+      - `id` (uuid, primary key)
+      - `quiz_id` (uuid, foreign key to quizzes.id)
+      - `position` (integer) - index in the JSON array
+      - `question_id` (text) - the question's `id` within the quiz
+      - `type`, `question`, `options` (jsonb), `correct_answer`, `explanation`
+    - `answers` - one row per element of `quiz_results.answers`
+      - `id` (uuid, primary key)
+      - `result_id` (uuid, foreign key to quiz_results.id)
+      - `position` (integer), `question_id` (text)
+      - `selected_option`, `is_correct`, `time_spent` (ms), `open_ended_answer`
+      - `similarity`, `confidence` - set for semantically graded open-ended answers
+
+  2. Notes
+    - The API writes both tables in the same transaction as the JSON columns,
+      which stay the source for existing response shapes
+    - Existing quizzes and results are backfilled below; rows that already
+      have normalized children are skipped, so the migration can be re-run
+*/
+
+CREATE TABLE IF NOT EXISTS questions (
+  id uuid PRIMARY KEY DEFAULT uuid_generate_v4(),
+  quiz_id uuid NOT NULL REFERENCES quizzes(id) ON DELETE CASCADE,
+  position integer NOT NULL,
+  question_id text NOT NULL,
+  type text NOT NULL,
+  question text NOT NULL,
+  options jsonb NOT NULL,
+  correct_answer integer,
+  explanation text
+);
+
+CREATE TABLE IF NOT EXISTS answers (
+  id uuid PRIMARY KEY DEFAULT uuid_generate_v4(),
+  result_id uuid NOT NULL REFERENCES quiz_results(id) ON DELETE CASCADE,
+  position integer NOT NULL,
+  question_id text NOT NULL,
+  selected_option integer,
+  is_correct boolean NOT NULL DEFAULT false,
+  time_spent integer,
+  open_ended_answer text,
+  similarity double precision,
+  confidence double precision
+);
+
+CREATE INDEX IF NOT EXISTS idx_questions_quiz_position ON questions(quiz_id, position);
+CREATE INDEX IF NOT EXISTS idx_questions_quiz_question_id ON questions(quiz_id, question_id);
+CREATE INDEX IF NOT EXISTS idx_answers_result_position ON answers(result_id, position);
+
+-- Backfill from the JSON columns
+INSERT INTO questions (quiz_id, position, question_id, type, question, options, correct_answer, explanation)
+SELECT
+  q.id,
+  e.ordinality - 1,
+  coalesce(e.value->>'id', ''),
+  coalesce(e.value->>'type', ''),
+  coalesce(e.value->>'question', ''),
+  coalesce(e.value->'options', '[]'::jsonb),
+  CASE WHEN jsonb_typeof(e.value->'correctAnswer') = 'number' THEN (e.value->>'correctAnswer')::numeric::integer END,
+  e.value->>'explanation'
+FROM quizzes q
+CROSS JOIN LATERAL jsonb_array_elements(
+  CASE WHEN jsonb_typeof(q.questions) = 'array' THEN q.questions ELSE '[]'::jsonb END
+) WITH ORDINALITY AS e(value, ordinality)
+WHERE NOT EXISTS (SELECT 1 FROM questions x WHERE x.quiz_id = q.id);
+
+INSERT INTO answers (result_id, position, question_id, selected_option, is_correct, time_spent, open_ended_answer, similarity, confidence)
+SELECT
+  r.id,
+  e.ordinality - 1,
+  coalesce(e.value->>'questionId', ''),
+  CASE WHEN jsonb_typeof(e.value->'selectedOption') = 'number' THEN (e.value->>'selectedOption')::numeric::integer END,
+  coalesce(e.value->'isCorrect' = 'true'::jsonb, false),
+  CASE WHEN jsonb_typeof(e.value->'timeSpent') = 'number' THEN (e.value->>'timeSpent')::numeric::integer END,
+  e.value->>'openEndedAnswer',
+  CASE WHEN jsonb_typeof(e.value->'similarity') = 'number' THEN (e.value->>'similarity')::double precision END,
+  CASE WHEN jsonb_typeof(e.value->'confidence') = 'number' THEN (e.value->>'confidence')::double precision END
+FROM quiz_results r
+CROSS JOIN LATERAL jsonb_array_elements(
+  CASE WHEN jsonb_typeof(r.answers) = 'array' THEN r.answers ELSE '[]'::jsonb END
+) WITH ORDINALITY AS e(value, ordinality)
+WHERE NOT EXISTS (SELECT 1 FROM answers x WHERE x.result_id = r.id);
+
+ALTER TABLE questions ENABLE ROW LEVEL SECURITY;
+ALTER TABLE answers ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Teachers can view questions of their quizzes" ON questions
+  FOR SELECT USING (
+    EXISTS (
+      SELECT 1 FROM quizzes
+      WHERE quizzes.id = questions.quiz_id
+      AND quizzes.created_by::text = auth.uid()::text
+    )
+  );
+
+CREATE POLICY "Students can view own answers" ON answers
+  FOR SELECT USING (
+    EXISTS (
+      SELECT 1 FROM quiz_results
+      WHERE quiz_results.id = answers.result_id
+      AND quiz_results.student_id::text = auth.uid()::text
+    )
+  );
+
+CREATE POLICY "Teachers can view answers for their quizzes" ON answers
+  FOR SELECT USING (
+    EXISTS (
+      SELECT 1 FROM quiz_results
+      JOIN quizzes ON quizzes.id = quiz_results.quiz_id
+      WHERE quiz_results.id = answers.result_id
+      AND quizzes.created_by::text = auth.uid()::text
+    )
+  );
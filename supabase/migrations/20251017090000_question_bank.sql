@@ -0,0 +1,58 @@
+/*
+  # Question bank
+
+  1. New Tables
+    - `question_bank` - generated questions kept for reuse, per teacher
+      - `id` (uuid, primary key)
+      - `created_by` (uuid, foreign key to users.id)
+      - `question_type` (text) - 'multiple-choice' or 'open-ended'
+      - `question` (jsonb) - the question object as generated
+      - `signature` (bytea) - MinHash signature of the question's words (uint32 values)
+      - `source_sha256` (text) - upload the question was generated from
+      - `occurrences` (integer) - times it or a near-duplicate was generated
+      - `created_at` (timestamp)
+    - `question_bank_buckets` - LSH index, one row per band key of each signature
+      - `bucket` (bigint) and `entry_id` (uuid, foreign key to question_bank.id)
+
+  2. Notes
+    - Signatures depend on QUESTION_BANK_NUM_PERM and band keys on the
+      threshold as well; truncate both tables after changing either
+*/
+
+CREATE TABLE IF NOT EXISTS question_bank (
+  id uuid PRIMARY KEY DEFAULT uuid_generate_v4(),
+  created_by uuid NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+  question_type text NOT NULL,
+  question jsonb NOT NULL,
+  signature bytea NOT NULL,
+  source_sha256 varchar(64),
+  occurrences integer NOT NULL DEFAULT 1,
+  created_at timestamptz DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS question_bank_buckets (
+  bucket bigint NOT NULL,
+  entry_id uuid NOT NULL REFERENCES question_bank(id) ON DELETE CASCADE,
+  PRIMARY KEY (bucket, entry_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_question_bank_owner_type_created_at
+  ON question_bank(created_by, question_type, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_question_bank_source ON question_bank(source_sha256);
+-- Lets ON DELETE CASCADE find an entry's buckets without scanning the index
+CREATE INDEX IF NOT EXISTS idx_question_bank_buckets_entry ON question_bank_buckets(entry_id);
+
+ALTER TABLE question_bank ENABLE ROW LEVEL SECURITY;
+ALTER TABLE question_bank_buckets ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Teachers can view own question bank" ON question_bank
+  FOR SELECT USING (created_by::text = auth.uid()::text);
+
+CREATE POLICY "Teachers can view own question bank buckets" ON question_bank_buckets
+  FOR SELECT USING (
+    EXISTS (
+      SELECT 1 FROM question_bank
+      WHERE question_bank.id = question_bank_buckets.entry_id
+      AND question_bank.created_by::text = auth.uid()::text
+    )
+  );
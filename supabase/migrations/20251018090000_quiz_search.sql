@@ -0,0 +1,78 @@
+/*
+  # Full-text search over quizzes
+
+  1. New Tables
+    - `quiz_search` - searchable text of each quiz
+      - `id` (serial, primary key)
+      - `quiz_id` (uuid, unique, foreign key to quizzes.id)
+      - `title` (text)
+      - `questions_text` (text) - question wording and options, never answers
+      - `document_text` (text) - extracted PDF text (first SEARCH_DOCUMENT_MAX_CHARS)
+      - `search_vector` (tsvector, generated) - title (weight A), questions (B), document (C)
+
+  2. Indexes
+    - GIN index on `search_vector` for `GET /quizzes/search`
+
+  3. Notes
+    - The API writes `quiz_search` in the same transaction as the quiz
+    - Existing quizzes are backfilled from their title and questions; their
+      document text is not available and stays empty
+*/
+
+CREATE TABLE IF NOT EXISTS quiz_search (
+  id serial PRIMARY KEY,
+  quiz_id uuid NOT NULL UNIQUE REFERENCES quizzes(id) ON DELETE CASCADE,
+  title text NOT NULL,
+  questions_text text NOT NULL,
+  document_text text
+);
+
+ALTER TABLE quiz_search ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+  setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+  setweight(to_tsvector('english', coalesce(questions_text, '')), 'B') ||
+  setweight(to_tsvector('english', coalesce(document_text, '')), 'C')
+) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_quiz_search_vector ON quiz_search USING GIN (search_vector);
+
+-- Backfill from the quizzes table
+INSERT INTO quiz_search (quiz_id, title, questions_text)
+SELECT
+  q.id,
+  q.title,
+  coalesce((
+    SELECT string_agg(
+      trim(coalesce(e.value->>'question', '') || ' ' || coalesce((
+        SELECT string_agg(o.value, ' ')
+        FROM jsonb_array_elements_text(
+          CASE WHEN jsonb_typeof(e.value->'options') = 'array' THEN e.value->'options' ELSE '[]'::jsonb END
+        ) AS o(value)
+      ), '')),
+      E'\n' ORDER BY e.ordinality
+    )
+    FROM jsonb_array_elements(
+      CASE WHEN jsonb_typeof(q.questions) = 'array' THEN q.questions ELSE '[]'::jsonb END
+    ) WITH ORDINALITY AS e(value, ordinality)
+  ), '')
+FROM quizzes q
+ON CONFLICT (quiz_id) DO NOTHING;
+
+ALTER TABLE quiz_search ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Anyone can search published quizzes" ON quiz_search
+  FOR SELECT USING (
+    EXISTS (
+      SELECT 1 FROM quizzes
+      WHERE quizzes.id = quiz_search.quiz_id
+      AND quizzes.is_published = true
+    )
+  );
+
+CREATE POLICY "Teachers can search their own quizzes" ON quiz_search
+  FOR SELECT USING (
+    EXISTS (
+      SELECT 1 FROM quizzes
+      WHERE quizzes.id = quiz_search.quiz_id
+      AND quizzes.created_by::text = auth.uid()::text
+    )
+  );
@@ -0,0 +1,27 @@
+/*
+  # Deduplicated upload storage
+
+  1. New Tables
+    - `blobs` - uploaded files stored once per distinct content
+      - `sha256` (varchar(64), primary key) - SHA-256 of the bytes, also the file's name on disk
+      - `size` (bigint) - size in bytes
+      - `ref_count` (integer) - upload jobs holding the file; it is deleted at 0
+      - `created_at` (timestamp)
+
+  2. Security
+    - Enable RLS without policies: only the API (service role) reads or writes blobs
+
+  3. Notes
+    - New upload jobs point `file_path` at `<UPLOAD_DIR>/<sha256[:2]>/<sha256>`.
+      Files stored per job before this migration have no `blobs` row and are
+      left as they are
+*/
+
+CREATE TABLE IF NOT EXISTS blobs (
+  sha256 varchar(64) PRIMARY KEY,
+  size bigint NOT NULL,
+  ref_count integer NOT NULL DEFAULT 0,
+  created_at timestamptz DEFAULT now()
+);
+
+ALTER TABLE blobs ENABLE ROW LEVEL SECURITY;
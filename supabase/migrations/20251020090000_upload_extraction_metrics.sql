@@ -0,0 +1,11 @@
+/*
+  # Extraction metrics for upload jobs
+
+  1. Changes
+    - `upload_jobs.extract_seconds` (double precision) - time spent extracting the PDF's text
+    - `upload_jobs.extract_peak_memory_bytes` (bigint) - peak resident memory of the
+      extraction process, measured for large documents extracted in isolation
+*/
+
+ALTER TABLE upload_jobs ADD COLUMN IF NOT EXISTS extract_seconds double precision;
+ALTER TABLE upload_jobs ADD COLUMN IF NOT EXISTS extract_peak_memory_bytes bigint;
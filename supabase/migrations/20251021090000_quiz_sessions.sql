@@ -0,0 +1,57 @@
+/*
+  # Live quiz sessions
+
+  1. Changes
+    - `quizzes.time_limit_seconds` (integer, nullable) - duration of a live session;
+      QUIZ_SESSION_DURATION_SECONDS when unset
+
+  2. New Tables
+    - `quiz_sessions` - timed attempts at a quiz, one per student and quiz
+      - `id` (uuid, primary key)
+      - `quiz_id` (uuid, references quizzes)
+      - `student_id` (uuid, references users)
+      - `status` (text) - 'active', 'finished' (by the student) or 'expired' (by the server)
+      - `started_at`, `deadline`, `finished_at` (timestamp)
+      - `result_id` (uuid, references quiz_results) - the graded result once finished
+    - `quiz_session_answers` - the latest answer to each question of a session,
+      written in batches by the API
+      - `session_id` (uuid, references quiz_sessions), `question_id` (text) - primary key
+      - `selected_option`, `time_spent` (integer), `open_ended_answer` (text)
+      - `answered_at` (timestamp)
+
+  3. Indexes
+    - Unique (quiz_id, student_id) on `quiz_sessions`
+    - Partial index on the deadline of active sessions, for expiring them
+
+  4. Security
+    - Enable RLS without policies: only the API (service role) reads or writes sessions
+*/
+
+ALTER TABLE quizzes ADD COLUMN IF NOT EXISTS time_limit_seconds integer;
+
+CREATE TABLE IF NOT EXISTS quiz_sessions (
+  id uuid PRIMARY KEY DEFAULT uuid_generate_v4(),
+  quiz_id uuid NOT NULL REFERENCES quizzes(id) ON DELETE CASCADE,
+  student_id uuid NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+  status text NOT NULL DEFAULT 'active',
+  started_at timestamptz NOT NULL,
+  deadline timestamptz NOT NULL,
+  finished_at timestamptz,
+  result_id uuid REFERENCES quiz_results(id) ON DELETE SET NULL
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_quiz_sessions_quiz_student ON quiz_sessions (quiz_id, student_id);
+CREATE INDEX IF NOT EXISTS idx_quiz_sessions_active_deadline ON quiz_sessions (deadline) WHERE status = 'active';
+
+CREATE TABLE IF NOT EXISTS quiz_session_answers (
+  session_id uuid NOT NULL REFERENCES quiz_sessions(id) ON DELETE CASCADE,
+  question_id text NOT NULL,
+  selected_option integer NOT NULL,
+  time_spent integer NOT NULL,
+  open_ended_answer text,
+  answered_at timestamptz NOT NULL,
+  PRIMARY KEY (session_id, question_id)
+);
+
+ALTER TABLE quiz_sessions ENABLE ROW LEVEL SECURITY;
+ALTER TABLE quiz_session_answers ENABLE ROW LEVEL SECURITY;
@@ -0,0 +1,13 @@
+/*
+  # Upload job attempts
+
+  1. Changes
+    - `upload_jobs.attempts` (integer) - times a worker started the job; jobs left queued or
+      in progress by a stopped worker are requeued until they reach JOB_MAX_ATTEMPTS
+  2. Indexes
+    - `(status, updated_at)` for the sweep looking for stalled jobs
+*/
+
+ALTER TABLE upload_jobs ADD COLUMN IF NOT EXISTS attempts integer NOT NULL DEFAULT 0;
+
+CREATE INDEX IF NOT EXISTS idx_upload_jobs_status_updated_at ON upload_jobs(status, updated_at);